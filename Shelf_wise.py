@@ -1,2026 +1,3349 @@
-import sys
-import sqlite3
-from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QStackedWidget, QVBoxLayout,
-    QHBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox,
-    QTabWidget, QTableWidget, QTableWidgetItem, QFormLayout, QDialog,
-    QHeaderView, QCheckBox, QFrame, QSpacerItem, QSizePolicy, QSpinBox,
-    QComboBox, QDoubleSpinBox, QDateEdit, QInputDialog
-)
-from PyQt5.QtCore import Qt, QDate
-from PyQt5.QtGui import QFont, QPixmap, QPainter, QColor, QBrush
-import datetime
-import os
-
-# Color constants
-BURGUNDY = "#7D3750"
-LIGHT_BURGUNDY = "#9D5975"
-LIGHTER_BURGUNDY = "#B37990"
-WHITE = "#FFFFFF"
-VERY_LIGHT_BURGUNDY = "#D4A5B5"
-GRAY = "#E0E0E0"
-GREEN = "#4CAF50"
-RED = "#F44336"
-DARK_TEXT = "#333333"
-LOGOUT_COLOR = "#7D3750"  # Dark purple for logout buttons
-
-# Use absolute path to ensure database is saved in a consistent location
-DB_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shelfwise.db")
-
-# Initialize DB and tables
-def init_db():
-    # Ensure the database directory exists
-    db_dir = os.path.dirname(DB_NAME)
-    if db_dir and not os.path.exists(db_dir):
-        os.makedirs(db_dir)
-        
-    # Check if database exists before trying to recreate tables
-    db_exists = os.path.exists(DB_NAME)
-    
-    # Only initialize tables if database doesn't exist
-    if not db_exists:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
-        # Create the Users table
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS Users (
-            UserID INTEGER PRIMARY KEY AUTOINCREMENT,
-            FirstName TEXT,
-            LastName TEXT,
-            Username TEXT UNIQUE NOT NULL,
-            Password TEXT NOT NULL,
-            Email TEXT,
-            DateJoined DATE,
-            is_admin INTEGER NOT NULL DEFAULT 0
-        )''')
-        
-        # Create the Collections table
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS Collections (
-            CollectionID INTEGER PRIMARY KEY AUTOINCREMENT,
-            CollectionName TEXT UNIQUE NOT NULL,
-            Description TEXT
-        )''')
-        
-        # Create the Items table
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS Items (
-            ItemID INTEGER PRIMARY KEY AUTOINCREMENT,
-            CollectionID INTEGER,
-            ItemName TEXT NOT NULL,
-            Description TEXT,
-            Price REAL NOT NULL DEFAULT 0.0,
-            stock_quantity INTEGER NOT NULL DEFAULT 0,
-            FOREIGN KEY (CollectionID) REFERENCES Collections(CollectionID)
-        )''')
-        
-        # Create the Users_Items table with quantity field
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS Users_Items (
-            UI_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-            UserID INTEGER,
-            ItemID INTEGER,
-            DateAdded DATE,
-            Quantity INTEGER NOT NULL DEFAULT 1,
-            FOREIGN KEY (UserID) REFERENCES Users(UserID),
-            FOREIGN KEY (ItemID) REFERENCES Items(ItemID),
-            UNIQUE (UserID, ItemID)
-        )''')
-        
-        # Insert admin user if not exists
-        today = datetime.date.today().isoformat()
-        c.execute("INSERT INTO Users (Username, Password, is_admin, DateJoined) VALUES (?, ?, ?, ?)", 
-                ('admin', 'admin', 1, today))
-        
-        # Insert default collections
-        c.execute("INSERT INTO Collections (CollectionName, Description) VALUES (?, ?)", 
-                ('Books', 'Book collection'))
-        c.execute("INSERT INTO Collections (CollectionName, Description) VALUES (?, ?)", 
-                ('Toys', 'Toy collection'))
-        
-        conn.commit()
-        conn.close()
-    else:
-        # If database exists, check if Quantity column exists in Users_Items
-        # But we'll use a try-except to handle the case where it might already exist
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
-        # Let's first check if the Users_Items table exists at all
-        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Users_Items'")
-        if c.fetchone():
-            # Try to add the Quantity column, but catch the error if it already exists
-            try:
-                c.execute("ALTER TABLE Users_Items ADD COLUMN Quantity INTEGER NOT NULL DEFAULT 1")
-                conn.commit()
-            except sqlite3.OperationalError as e:
-                # If error is about duplicate column, just ignore it
-                if "duplicate column name" in str(e):
-                    pass
-                else:
-                    # If it's another type of error, re-raise it
-                    raise
-            
-        conn.close()
-    
-class AddEditUserDialog(QDialog):
-    def __init__(self, parent=None, user_data=None):
-        super().__init__(parent)
-        self.setWindowTitle("Add User" if user_data is None else "Edit User")
-        # Remove the question mark from the title bar
-        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-        self.user_data = user_data
-        self.setup_ui()
-        if user_data:
-            self.load_data(user_data)
-
-    def setup_ui(self):
-        self.layout = QFormLayout(self)
-        self.first_name_edit = QLineEdit()
-        self.last_name_edit = QLineEdit()
-        self.username_edit = QLineEdit()
-        self.password_edit = QLineEdit()
-        self.password_edit.setEchoMode(QLineEdit.Password)
-        self.email_edit = QLineEdit()
-        self.date_joined = QDateEdit()
-        self.date_joined.setDate(QDate.currentDate())
-        # Removed the is_admin checkbox as requested
-
-        self.layout.addRow("First Name:", self.first_name_edit)
-        self.layout.addRow("Last Name:", self.last_name_edit)
-        self.layout.addRow("Username:", self.username_edit)
-        self.layout.addRow("Password:", self.password_edit)
-        self.layout.addRow("Email:", self.email_edit)
-        self.layout.addRow("Date Joined:", self.date_joined)
-
-        self.buttons_layout = QHBoxLayout()
-        self.save_btn = QPushButton("Save")
-        self.cancel_btn = QPushButton("Cancel")
-        self.buttons_layout.addWidget(self.save_btn)
-        self.buttons_layout.addWidget(self.cancel_btn)
-        self.layout.addRow(self.buttons_layout)
-
-        self.save_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
-
-    def load_data(self, user_data):
-        user_id, first_name, last_name, username, password, email, date_joined, is_admin = user_data
-        self.first_name_edit.setText(first_name or "")
-        self.last_name_edit.setText(last_name or "")
-        self.username_edit.setText(username)
-        self.password_edit.setText(password)
-        self.email_edit.setText(email or "")
-        if date_joined:
-            self.date_joined.setDate(QDate.fromString(date_joined, "yyyy-MM-dd"))
-
-    def get_data(self):
-        first_name = self.first_name_edit.text().strip()
-        last_name = self.last_name_edit.text().strip()
-        username = self.username_edit.text().strip()
-        password = self.password_edit.text().strip()
-        email = self.email_edit.text().strip()
-        date_joined = self.date_joined.date().toString("yyyy-MM-dd")
-        is_admin = 0  # Always set to 0 - no new admin accounts
-        return first_name, last_name, username, password, email, date_joined, is_admin
-
-class AddCollectionDialog(QDialog):
-    def __init__(self, parent=None, collection_data=None):
-        super().__init__(parent)
-        self.setWindowTitle("Add Collection" if collection_data is None else "Edit Collection")
-        # Remove the question mark from the title bar
-        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-        self.collection_data = collection_data
-        self.setup_ui()
-        if collection_data:
-            self.load_data(collection_data)
-
-    def setup_ui(self):
-        self.layout = QFormLayout(self)
-        self.name_edit = QLineEdit()
-        self.desc_edit = QLineEdit()
-        
-        self.layout.addRow("Name:", self.name_edit)
-        self.layout.addRow("Description:", self.desc_edit)
-
-        self.buttons_layout = QHBoxLayout()
-        self.save_btn = QPushButton("Save")
-        self.cancel_btn = QPushButton("Cancel")
-        self.buttons_layout.addWidget(self.save_btn)
-        self.buttons_layout.addWidget(self.cancel_btn)
-        self.layout.addRow(self.buttons_layout)
-
-        self.save_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
-
-    def load_data(self, collection_data):
-        collection_id, name, desc = collection_data
-        self.name_edit.setText(name)
-        self.desc_edit.setText(desc if desc else "")
-
-    def get_data(self):
-        name = self.name_edit.text().strip()
-        desc = self.desc_edit.text().strip()
-        return name, desc
-
-class AddItemDialog(QDialog):
-    def __init__(self, parent=None, item_data=None):
-        super().__init__(parent)
-        self.setWindowTitle("Add Item" if item_data is None else "Edit Item")
-        # Remove the question mark from the title bar
-        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-        self.item_data = item_data
-        self.conn = sqlite3.connect(DB_NAME)
-        self.setup_ui()
-        if item_data:
-            self.load_data(item_data)
-
-    def setup_ui(self):
-        self.layout = QFormLayout(self)
-        
-        self.collection_combo = QComboBox()
-        self.load_collections()
-        
-        self.name_edit = QLineEdit()
-        self.desc_edit = QLineEdit()
-        self.price_spin = QDoubleSpinBox()
-        self.price_spin.setMinimum(0.0)
-        self.price_spin.setMaximum(999999.99)
-        self.price_spin.setDecimals(2)
-        self.price_spin.setPrefix("₱")
-        
-        self.stock_spin = QSpinBox()
-        self.stock_spin.setMinimum(0)
-        self.stock_spin.setMaximum(999999)
-        
-        self.layout.addRow("Collection:", self.collection_combo)
-        self.layout.addRow("Name:", self.name_edit)
-        self.layout.addRow("Description:", self.desc_edit)
-        self.layout.addRow("Price:", self.price_spin)
-        self.layout.addRow("Stock Quantity:", self.stock_spin)
-
-        self.buttons_layout = QHBoxLayout()
-        self.save_btn = QPushButton("Save")
-        self.cancel_btn = QPushButton("Cancel")
-        self.buttons_layout.addWidget(self.save_btn)
-        self.buttons_layout.addWidget(self.cancel_btn)
-        self.layout.addRow(self.buttons_layout)
-
-        self.save_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
-
-    def load_collections(self):
-        c = self.conn.cursor()
-        c.execute("SELECT CollectionID, CollectionName FROM Collections ORDER BY CollectionName")
-        collections = c.fetchall()
-        for col_id, col_name in collections:
-            self.collection_combo.addItem(col_name, col_id)
-
-    def load_data(self, item_data):
-        item_id, collection_id, name, desc, price, stock = item_data
-        
-        # Set collection
-        for i in range(self.collection_combo.count()):
-            if self.collection_combo.itemData(i) == collection_id:
-                self.collection_combo.setCurrentIndex(i)
-                break
-        
-        self.name_edit.setText(name)
-        self.desc_edit.setText(desc if desc else "")
-        self.price_spin.setValue(price)
-        self.stock_spin.setValue(stock)
-
-    def get_data(self):
-        collection_id = self.collection_combo.currentData()
-        name = self.name_edit.text().strip()
-        desc = self.desc_edit.text().strip()
-        price = self.price_spin.value()
-        stock = self.stock_spin.value()
-        return collection_id, name, desc, price, stock
-    
-    def closeEvent(self, event):
-        self.conn.close()
-        super().closeEvent(event)
-
-class EditUserItemDialog(QDialog):
-    def __init__(self, parent=None, user_item_data=None):
-        super().__init__(parent)
-        self.setWindowTitle("Edit User Item")
-        # Remove the question mark from the title bar
-        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-        self.user_item_data = user_item_data
-        self.conn = sqlite3.connect(DB_NAME)
-        self.setup_ui()
-        if user_item_data:
-            self.load_data(user_item_data)
-
-    def setup_ui(self):
-        self.layout = QFormLayout(self)
-        
-        # Quantity field
-        self.quantity_spin = QSpinBox()
-        self.quantity_spin.setMinimum(1)
-        self.quantity_spin.setMaximum(999)
-        
-        self.layout.addRow("Quantity:", self.quantity_spin)
-
-        # Buttons
-        self.buttons_layout = QHBoxLayout()
-        self.save_btn = QPushButton("Save")
-        self.cancel_btn = QPushButton("Cancel")
-        self.buttons_layout.addWidget(self.save_btn)
-        self.buttons_layout.addWidget(self.cancel_btn)
-        self.layout.addRow(self.buttons_layout)
-
-        self.save_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
-
-    def load_data(self, user_item_data):
-        ui_id, user_id, item_id, date_added, quantity = user_item_data
-        
-        # Set max quantity based on available stock
-        c = self.conn.cursor()
-        c.execute("SELECT stock_quantity FROM Items WHERE ItemID = ?", (item_id,))
-        result = c.fetchone()
-        if result:
-            max_stock = result[0]
-            self.quantity_spin.setMaximum(max_stock)
-        
-        self.quantity_spin.setValue(quantity)
-
-    def get_data(self):
-        quantity = self.quantity_spin.value()
-        return quantity
-        
-    def closeEvent(self, event):
-        self.conn.close()
-        super().closeEvent(event)
-
-# New dialog for admin to add item to user
-class AddItemToUserDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Add Item To User")
-        # Remove the question mark from the title bar
-        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-        self.conn = sqlite3.connect(DB_NAME)
-        self.setup_ui()
-
-    def setup_ui(self):
-        self.layout = QFormLayout(self)
-        
-        # User selection
-        self.user_combo = QComboBox()
-        self.load_users()
-        
-        # Collection selection (new)
-        self.collection_combo = QComboBox()
-        self.load_collections()
-        
-        # Item selection (modified to be dependent on collection)
-        self.item_combo = QComboBox()
-        
-        # Quantity field
-        self.quantity_spin = QSpinBox()
-        self.quantity_spin.setMinimum(1)
-        self.quantity_spin.setMaximum(1)  # Will be updated based on selected item
-        self.quantity_spin.setValue(1)
-        
-        self.layout.addRow("User:", self.user_combo)
-        self.layout.addRow("Collection:", self.collection_combo)
-        self.layout.addRow("Item:", self.item_combo)
-        self.layout.addRow("Quantity:", self.quantity_spin)
-
-        # Buttons
-        self.buttons_layout = QHBoxLayout()
-        self.save_btn = QPushButton("Add")
-        self.cancel_btn = QPushButton("Cancel")
-        self.buttons_layout.addWidget(self.save_btn)
-        self.buttons_layout.addWidget(self.cancel_btn)
-        self.layout.addRow(self.buttons_layout)
-
-        # Connect signals
-        self.collection_combo.currentIndexChanged.connect(self.update_items)
-        self.item_combo.currentIndexChanged.connect(self.update_max_quantity)
-        
-        self.save_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
-        
-        # Load initial items based on first collection
-        self.update_items()
-
-    def load_users(self):
-        c = self.conn.cursor()
-        c.execute("SELECT UserID, Username, FirstName, LastName FROM Users WHERE Username <> 'admin'")
-        users = c.fetchall()
-        for user_id, username, first_name, last_name in users:
-            display_name = f"{username}"
-            if first_name or last_name:
-                display_name += f" ({first_name} {last_name})".strip()
-            self.user_combo.addItem(display_name, user_id)
-
-    def load_collections(self):
-        c = self.conn.cursor()
-        c.execute("SELECT CollectionID, CollectionName FROM Collections ORDER BY CollectionName")
-        collections = c.fetchall()
-        for col_id, col_name in collections:
-            self.collection_combo.addItem(col_name, col_id)
-
-    def update_items(self):
-        # Clear current items
-        self.item_combo.clear()
-        
-        # Get selected collection ID
-        collection_id = self.collection_combo.currentData()
-        if collection_id is None:
-            return
-            
-        c = self.conn.cursor()
-        c.execute("""
-            SELECT i.ItemID, i.ItemName, i.stock_quantity
-            FROM Items i
-            WHERE i.CollectionID = ? AND i.stock_quantity > 0
-            ORDER BY i.ItemName
-        """, (collection_id,))
-        
-        items = c.fetchall()
-        for item_id, item_name, stock in items:
-            self.item_combo.addItem(f"{item_name} - Stock: {stock}", item_id)
-            
-        # Update max quantity based on first item (if any)
-        self.update_max_quantity()
-
-    def update_max_quantity(self):
-        if self.item_combo.count() == 0:
-            self.quantity_spin.setMaximum(1)
-            self.quantity_spin.setValue(1)
-            return
-            
-        # Get current item text which includes stock info
-        item_text = self.item_combo.currentText()
-        
-        # Extract stock from text (format: "ItemName - Stock: X")
-        try:
-            stock = int(item_text.split("Stock: ")[1])
-            self.quantity_spin.setMaximum(stock)
-            # If current value exceeds new maximum, adjust it
-            if self.quantity_spin.value() > stock:
-                self.quantity_spin.setValue(stock)
-        except (IndexError, ValueError):
-            self.quantity_spin.setMaximum(1)
-
-    def get_data(self):
-        user_id = self.user_combo.currentData()
-        item_id = self.item_combo.currentData()
-        quantity = self.quantity_spin.value()
-        return user_id, item_id, quantity
-    
-    def closeEvent(self, event):
-        self.conn.close()
-        super().closeEvent(event)
-    
-class AdminTab(QWidget):
-    def __init__(self, logout_callback):
-        super().__init__()
-        self.conn = sqlite3.connect(DB_NAME)
-        self.logout_callback = logout_callback
-        self.setup_ui()
-        self.load_users()
-        self.load_collections()
-        self.load_items()
-        self.load_user_items()
-
-    def setup_ui(self):
-        layout = QVBoxLayout(self)
-        
-        # Add a non-clickable role indicator tab
-        self.role_label = QLabel("ADMIN")
-        self.role_label.setStyleSheet(f"background-color: {BURGUNDY}; color: {WHITE}; font-weight: bold; padding: 8px; border-radius: 5px;")
-        self.role_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(self.role_label)
-        
-        self.tabs = QTabWidget()
-        layout.addWidget(self.tabs)
-
-        # Account tab for user management
-        self.account_tab = QWidget()
-        self.account_layout = QVBoxLayout(self.account_tab)
-
-        # User table
-        self.user_table = QTableWidget()
-        self.user_table.setColumnCount(8)
-        self.user_table.setHorizontalHeaderLabels(["ID", "First Name", "Last Name", "Username", "Email", "Date Joined", "Is Admin", "Password"])
-        self.user_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.user_table.setSelectionBehavior(self.user_table.SelectRows)
-        self.account_layout.addWidget(self.user_table)
-
-        # User buttons
-        user_btn_layout = QHBoxLayout()
-        self.add_user_btn = QPushButton("Add User")
-        self.edit_user_btn = QPushButton("Edit User")
-        self.delete_user_btn = QPushButton("Delete User")
-        self.logout_btn_users = QPushButton("Logout")
-        self.logout_btn_users.setObjectName("logoutButton")
-        user_btn_layout.addWidget(self.add_user_btn)
-        user_btn_layout.addWidget(self.edit_user_btn)
-        user_btn_layout.addWidget(self.delete_user_btn)
-        user_btn_layout.addWidget(self.logout_btn_users)
-        self.account_layout.addLayout(user_btn_layout)
-
-        self.tabs.addTab(self.account_tab, "Users")
-        
-        # Collections tab
-        self.collections_tab = QWidget()
-        self.collections_layout = QVBoxLayout(self.collections_tab)
-        
-        # Collections table
-        self.collections_table = QTableWidget()
-        self.collections_table.setColumnCount(3)
-        self.collections_table.setHorizontalHeaderLabels(["ID", "Name", "Description"])
-        self.collections_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.collections_table.setSelectionBehavior(self.collections_table.SelectRows)
-        self.collections_layout.addWidget(self.collections_table)
-        
-        # Collections buttons
-        collections_btn_layout = QHBoxLayout()
-        self.add_collection_btn = QPushButton("Add Collection")
-        self.edit_collection_btn = QPushButton("Edit Collection")
-        self.delete_collection_btn = QPushButton("Delete Collection")
-        self.logout_btn_collections = QPushButton("Logout")
-        self.logout_btn_collections.setObjectName("logoutButton")
-        collections_btn_layout.addWidget(self.add_collection_btn)
-        collections_btn_layout.addWidget(self.edit_collection_btn)
-        collections_btn_layout.addWidget(self.delete_collection_btn)
-        collections_btn_layout.addWidget(self.logout_btn_collections)
-        self.collections_layout.addLayout(collections_btn_layout)
-        
-        self.tabs.addTab(self.collections_tab, "Collections")
-
-        # Items tab
-        self.items_tab = QWidget()
-        self.items_layout = QVBoxLayout(self.items_tab)
-
-        # Items table
-        self.items_table = QTableWidget()
-        self.items_table.setColumnCount(6)
-        self.items_table.setHorizontalHeaderLabels(["ID", "Collection", "Name", "Description", "Price", "Stock"])
-        self.items_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.items_table.setSelectionBehavior(self.items_table.SelectRows)
-        self.items_layout.addWidget(self.items_table)
-
-        # Items buttons
-        items_btn_layout = QHBoxLayout()
-        self.add_item_btn = QPushButton("Add Item")
-        self.edit_item_btn = QPushButton("Edit Item")
-        self.delete_item_btn = QPushButton("Delete Item")
-        self.logout_btn_items = QPushButton("Logout")
-        self.logout_btn_items.setObjectName("logoutButton")
-        items_btn_layout.addWidget(self.add_item_btn)
-        items_btn_layout.addWidget(self.edit_item_btn)
-        items_btn_layout.addWidget(self.delete_item_btn)
-        items_btn_layout.addWidget(self.logout_btn_items)
-        self.items_layout.addLayout(items_btn_layout)
-
-        self.tabs.addTab(self.items_tab, "Items")
-        
-        # User Items tab (modified)
-        self.user_items_tab = QWidget()
-        self.user_items_layout = QVBoxLayout(self.user_items_tab)
-        
-        # User selection for filtering
-        user_filter_layout = QHBoxLayout()
-        user_filter_label = QLabel("Select User:")
-        self.user_filter_combo = QComboBox()
-        self.user_filter_combo.addItem("All Users", None)
-        user_filter_layout.addWidget(user_filter_label)
-        user_filter_layout.addWidget(self.user_filter_combo)
-        user_filter_layout.addStretch()
-        self.user_items_layout.addLayout(user_filter_layout)
-
-        # User Items table
-        self.user_items_table = QTableWidget()
-        self.user_items_table.setColumnCount(7)  # Added column for quantity
-        self.user_items_table.setHorizontalHeaderLabels(["ID", "User", "Item Name", "Collection", "Date Added", "Item Price", "Quantity"])
-        self.user_items_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.user_items_layout.addWidget(self.user_items_table)
-        
-        # User Items buttons
-        user_items_btn_layout = QHBoxLayout()
-        self.edit_user_item_btn = QPushButton("Edit Item Quantity")
-        self.add_item_to_user_btn = QPushButton("Add Item To User")  # New button
-        self.logout_btn_user_items = QPushButton("Logout")
-        self.logout_btn_user_items.setObjectName("logoutButton")
-        user_items_btn_layout.addWidget(self.edit_user_item_btn)
-        user_items_btn_layout.addWidget(self.add_item_to_user_btn)  # Add the new button
-        user_items_btn_layout.addWidget(self.logout_btn_user_items)
-        self.user_items_layout.addLayout(user_items_btn_layout)
-        
-        self.tabs.addTab(self.user_items_tab, "User Items")
-
-        # Connect buttons
-        self.add_user_btn.clicked.connect(self.add_user)
-        self.edit_user_btn.clicked.connect(self.edit_user)
-        self.delete_user_btn.clicked.connect(self.delete_user)
-        
-        self.add_collection_btn.clicked.connect(self.add_collection)
-        self.edit_collection_btn.clicked.connect(self.edit_collection)
-        self.delete_collection_btn.clicked.connect(self.delete_collection)
-
-        self.add_item_btn.clicked.connect(self.add_item)
-        self.edit_item_btn.clicked.connect(self.edit_item)
-        self.delete_item_btn.clicked.connect(self.delete_item)
-        
-        self.edit_user_item_btn.clicked.connect(self.edit_user_item)
-        self.add_item_to_user_btn.clicked.connect(self.add_item_to_user)  # Connect the new button
-        self.user_filter_combo.currentIndexChanged.connect(self.load_user_items)
-        
-        # Connect all logout buttons
-        self.logout_btn_users.clicked.connect(self.confirm_logout)
-        self.logout_btn_collections.clicked.connect(self.confirm_logout)
-        self.logout_btn_items.clicked.connect(self.confirm_logout)
-        self.logout_btn_user_items.clicked.connect(self.confirm_logout)
-
-    def load_users(self):
-        c = self.conn.cursor()
-        try:
-            c.execute("SELECT UserID, FirstName, LastName, Username, Email, DateJoined, is_admin, Password FROM Users WHERE Username <> 'admin'")
-            rows = c.fetchall()
-            self.user_table.setRowCount(len(rows))
-            
-            # Clear and repopulate user filter combo
-            self.user_filter_combo.clear()
-            self.user_filter_combo.addItem("All Users", None)
-            
-            for i, row in enumerate(rows):
-                user_id, first_name, last_name, username, email, date_joined, is_admin, password = row
-                self.user_table.setItem(i, 0, QTableWidgetItem(str(user_id)))
-                self.user_table.setItem(i, 1, QTableWidgetItem(first_name or ""))
-                self.user_table.setItem(i, 2, QTableWidgetItem(last_name or ""))
-                self.user_table.setItem(i, 3, QTableWidgetItem(username))
-                self.user_table.setItem(i, 4, QTableWidgetItem(email or ""))
-                self.user_table.setItem(i, 5, QTableWidgetItem(date_joined or ""))
-                self.user_table.setItem(i, 6, QTableWidgetItem("Yes" if is_admin else "No"))
-                self.user_table.setItem(i, 7, QTableWidgetItem(password))
-                
-                # Add to user filter combo
-                display_name = f"{username} ({first_name} {last_name})".strip()
-                if display_name.endswith("()"):
-                    display_name = display_name[:-3]
-                self.user_filter_combo.addItem(display_name, user_id)
-                
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load users: {str(e)}")
-    
-    def load_collections(self):
-        c = self.conn.cursor()
-        try:
-            c.execute("SELECT CollectionID, CollectionName, Description FROM Collections")
-            rows = c.fetchall()
-            self.collections_table.setRowCount(len(rows))
-            for i, row in enumerate(rows):
-                col_id, name, desc = row
-                self.collections_table.setItem(i, 0, QTableWidgetItem(str(col_id)))
-                self.collections_table.setItem(i, 1, QTableWidgetItem(name))
-                self.collections_table.setItem(i, 2, QTableWidgetItem(desc if desc else ""))
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load collections: {str(e)}")
-
-    def load_items(self):
-        c = self.conn.cursor()
-        try:
-            c.execute("""SELECT Items.ItemID, Collections.CollectionName, Items.ItemName, Items.Description, 
-                        Items.Price, Items.stock_quantity 
-                        FROM Items 
-                        JOIN Collections ON Items.CollectionID = Collections.CollectionID""")
-            rows = c.fetchall()
-            self.items_table.setRowCount(len(rows))
-            for i, row in enumerate(rows):
-                id_, collection, name, desc, price, stock = row
-                self.items_table.setItem(i, 0, QTableWidgetItem(str(id_)))
-                self.items_table.setItem(i, 1, QTableWidgetItem(collection))
-                self.items_table.setItem(i, 2, QTableWidgetItem(name))
-                self.items_table.setItem(i, 3, QTableWidgetItem(desc if desc else ""))
-                self.items_table.setItem(i, 4, QTableWidgetItem(f"${price:.2f}"))
-                self.items_table.setItem(i, 5, QTableWidgetItem(str(stock)))
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load items: {str(e)}")
-    
-    def load_user_items(self):
-        c = self.conn.cursor()
-        selected_user_id = self.user_filter_combo.currentData()
-        
-        try:
-            if selected_user_id is None:
-                # Show all user items
-                c.execute("""
-                    SELECT ui.UI_ID, u.Username, i.ItemName, c.CollectionName, ui.DateAdded, i.Price, ui.Quantity
-                    FROM Users_Items ui
-                    JOIN Users u ON ui.UserID = u.UserID
-                    JOIN Items i ON ui.ItemID = i.ItemID
-                    JOIN Collections c ON i.CollectionID = c.CollectionID
-                    ORDER BY u.Username, i.ItemName
-                """)
-            else:
-                # Show items for specific user
-                c.execute("""
-                    SELECT ui.UI_ID, u.Username, i.ItemName, c.CollectionName, ui.DateAdded, i.Price, ui.Quantity
-                    FROM Users_Items ui
-                    JOIN Users u ON ui.UserID = u.UserID
-                    JOIN Items i ON ui.ItemID = i.ItemID
-                    JOIN Collections c ON i.CollectionID = c.CollectionID
-                    WHERE ui.UserID = ?
-                    ORDER BY i.ItemName
-                """, (selected_user_id,))
-            
-            rows = c.fetchall()
-            self.user_items_table.setRowCount(len(rows))
-            
-            for i, row in enumerate(rows):
-                ui_id, username, item_name, collection_name, date_added, price, quantity = row
-                self.user_items_table.setItem(i, 0, QTableWidgetItem(str(ui_id)))
-                self.user_items_table.setItem(i, 1, QTableWidgetItem(username))
-                self.user_items_table.setItem(i, 2, QTableWidgetItem(item_name))
-                self.user_items_table.setItem(i, 3, QTableWidgetItem(collection_name))
-                self.user_items_table.setItem(i, 4, QTableWidgetItem(date_added or ""))
-                self.user_items_table.setItem(i, 5, QTableWidgetItem(f"${price:.2f}"))
-                self.user_items_table.setItem(i, 6, QTableWidgetItem(str(quantity)))
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load user items: {str(e)}")
-
-    def add_user(self):
-        dlg = AddEditUserDialog(self)
-        if dlg.exec_() == QDialog.Accepted:
-            first_name, last_name, username, password, email, date_joined, is_admin = dlg.get_data()
-            if not username or not password:
-                QMessageBox.warning(self, "Error", "Username and password cannot be empty.")
-                return
-            try:
-                c = self.conn.cursor()
-                c.execute("""INSERT INTO Users 
-                          (FirstName, LastName, Username, Password, Email, DateJoined, is_admin) 
-                          VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                          (first_name, last_name, username, password, email, date_joined, is_admin))
-                
-                self.conn.commit()
-                self.load_users()
-                QMessageBox.information(self, "Success", "User added successfully!")
-            except sqlite3.IntegrityError:
-                QMessageBox.warning(self, "Error", "Username already exists.")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Database Error", f"Failed to add user: {str(e)}")
-
-    def edit_user(self):
-        selected_rows = self.user_table.selectionModel().selectedRows()
-        if not selected_rows:
-            QMessageBox.warning(self, "Error", "Select a user first.")
-            return
-        row = selected_rows[0].row()
-        user_id = int(self.user_table.item(row, 0).text())
-        
-        try:
-            c = self.conn.cursor()
-            c.execute("SELECT UserID, FirstName, LastName, Username, Password, Email, DateJoined, is_admin FROM Users WHERE UserID=?", (user_id,))
-            user_data = c.fetchone()
-            
-            dlg = AddEditUserDialog(self, user_data)
-            if dlg.exec_() == QDialog.Accepted:
-                first_name, last_name, username, password, email, date_joined, is_admin = dlg.get_data()
-                if not username or not password:
-                    QMessageBox.warning(self, "Error", "Username and password cannot be empty.")
-                    return
-                try:
-                    c = self.conn.cursor()
-                    c.execute("""UPDATE Users SET 
-                            FirstName=?, LastName=?, Username=?, Password=?, 
-                            Email=?, DateJoined=?, is_admin=? WHERE UserID=?""",
-                            (first_name, last_name, username, password, email, date_joined, is_admin, user_id))
-                    self.conn.commit()
-                    self.load_users()
-                    QMessageBox.information(self, "Success", "User updated successfully!")
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "Error", "Username already exists.")
-                except sqlite3.Error as e:
-                    QMessageBox.critical(self, "Database Error", f"Failed to update user: {str(e)}")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load user data: {str(e)}")
-
-    def delete_user(self):
-        selected_rows = self.user_table.selectionModel().selectedRows()
-        if not selected_rows:
-            QMessageBox.warning(self, "Error", "Select a user first.")
-            return
-        row = selected_rows[0].row()
-        user_id = int(self.user_table.item(row, 0).text())
-        confirm = QMessageBox.question(self, "Confirm Delete",
-                                       f"Delete user id {user_id}?",
-                                       QMessageBox.Yes | QMessageBox.No)
-        if confirm == QMessageBox.Yes:
-            try:
-                c = self.conn.cursor()
-                
-                # Delete user's items
-                c.execute("DELETE FROM Users_Items WHERE UserID=?", (user_id,))
-                
-                # Finally delete the user
-                c.execute("DELETE FROM Users WHERE UserID=?", (user_id,))
-                
-                self.conn.commit()
-                self.load_users()
-                self.load_user_items()
-                QMessageBox.information(self, "Success", "User deleted successfully!")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Database Error", f"Failed to delete user: {str(e)}")
-    
-    def add_collection(self):
-        dlg = AddCollectionDialog(self)
-        if dlg.exec_() == QDialog.Accepted:
-            name, desc = dlg.get_data()
-            if not name:
-                QMessageBox.warning(self, "Error", "Collection name cannot be empty.")
-                return
-            try:
-                c = self.conn.cursor()
-                c.execute("INSERT INTO Collections (CollectionName, Description) VALUES (?, ?)", 
-                          (name, desc))
-                self.conn.commit()
-                self.load_collections()
-                QMessageBox.information(self, "Success", "Collection added successfully!")
-            except sqlite3.IntegrityError:
-                QMessageBox.warning(self, "Error", "Collection name already exists.")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Database Error", f"Failed to add collection: {str(e)}")
-    
-    def edit_collection(self):
-        selected_rows = self.collections_table.selectionModel().selectedRows()
-        if not selected_rows:
-            QMessageBox.warning(self, "Error", "Select a collection first.")
-            return
-        row = selected_rows[0].row()
-        collection_id = int(self.collections_table.item(row, 0).text())
-        name = self.collections_table.item(row, 1).text()
-        desc = self.collections_table.item(row, 2).text()
-        
-        dlg = AddCollectionDialog(self, (collection_id, name, desc))
-        if dlg.exec_() == QDialog.Accepted:
-            new_name, new_desc = dlg.get_data()
-            if not new_name:
-                QMessageBox.warning(self, "Error", "Collection name cannot be empty.")
-                return
-            try:
-                c = self.conn.cursor()
-                c.execute("UPDATE Collections SET CollectionName=?, Description=? WHERE CollectionID=?",
-                          (new_name, new_desc, collection_id))
-                self.conn.commit()
-                self.load_collections()
-                self.load_items()
-                QMessageBox.information(self, "Success", "Collection updated successfully!")
-            except sqlite3.IntegrityError:
-                QMessageBox.warning(self, "Error", "Collection name already exists.")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Database Error", f"Failed to update collection: {str(e)}")
-    
-    def delete_collection(self):
-        selected_rows = self.collections_table.selectionModel().selectedRows()
-        if not selected_rows:
-            QMessageBox.warning(self, "Error", "Select a collection first.")
-            return
-        row = selected_rows[0].row()
-        collection_id = int(self.collections_table.item(row, 0).text())
-        
-        try:
-            # Check if collection has items
-            c = self.conn.cursor()
-            c.execute("SELECT COUNT(*) FROM Items WHERE CollectionID=?", (collection_id,))
-            item_count = c.fetchone()[0]
-            
-            if item_count > 0:
-                QMessageBox.warning(self, "Error", 
-                                f"This collection has {item_count} items. Delete all items first.")
-                return
-                
-            confirm = QMessageBox.question(self, "Confirm Delete",
-                                        f"Delete collection id {collection_id}?",
-                                        QMessageBox.Yes | QMessageBox.No)
-            if confirm == QMessageBox.Yes:
-                c = self.conn.cursor()
-                c.execute("DELETE FROM Collections WHERE CollectionID=?", (collection_id,))
-                self.conn.commit()
-                self.load_collections()
-                QMessageBox.information(self, "Success", "Collection deleted successfully!")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to delete collection: {str(e)}")
-
-    def add_item(self):
-        dlg = AddItemDialog(self)
-        if dlg.exec_() == QDialog.Accepted:
-            collection_id, name, desc, price, stock = dlg.get_data()
-            if not name:
-                QMessageBox.warning(self, "Error", "Name cannot be empty.")
-                return
-            try:
-                c = self.conn.cursor()
-                c.execute("INSERT INTO Items (CollectionID, ItemName, Description, Price, stock_quantity) VALUES (?, ?, ?, ?, ?)", 
-                        (collection_id, name, desc, price, stock))
-                self.conn.commit()
-                self.load_items()
-                QMessageBox.information(self, "Success", "Item added successfully!")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Database Error", f"Failed to add item: {str(e)}")
-
-    def edit_item(self):
-        selected_rows = self.items_table.selectionModel().selectedRows()
-        if not selected_rows:
-            QMessageBox.warning(self, "Error", "Select an item first.")
-            return
-        row = selected_rows[0].row()
-        item_id = int(self.items_table.item(row, 0).text())
-        
-        try:
-            c = self.conn.cursor()
-            c.execute("SELECT ItemID, CollectionID, ItemName, Description, Price, stock_quantity FROM Items WHERE ItemID=?", (item_id,))
-            item_data = c.fetchone()
-            
-            dlg = AddItemDialog(self, item_data)
-            if dlg.exec_() == QDialog.Accepted:
-                collection_id, name, desc, price, stock = dlg.get_data()
-                if not name:
-                    QMessageBox.warning(self, "Error", "Name cannot be empty.")
-                    return
-                c = self.conn.cursor()
-                c.execute("UPDATE Items SET CollectionID=?, ItemName=?, Description=?, Price=?, stock_quantity=? WHERE ItemID=?",
-                        (collection_id, name, desc, price, stock, item_id))
-                self.conn.commit()
-                self.load_items()
-                self.load_user_items()
-                QMessageBox.information(self, "Success", "Item updated successfully!")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to update item: {str(e)}")
-
-    def delete_item(self):
-        selected_rows = self.items_table.selectionModel().selectedRows()
-        if not selected_rows:
-            QMessageBox.warning(self, "Error", "Select an item first.")
-            return
-        row = selected_rows[0].row()
-        item_id = int(self.items_table.item(row, 0).text())
-        confirm = QMessageBox.question(self, "Confirm Delete",
-                                      f"Delete item id {item_id}?",
-                                      QMessageBox.Yes | QMessageBox.No)
-        if confirm == QMessageBox.Yes:
-            try:
-                c = self.conn.cursor()
-                c.execute("DELETE FROM Users_Items WHERE ItemID=?", (item_id,))
-                c.execute("DELETE FROM Items WHERE ItemID=?", (item_id,))
-                self.conn.commit()
-                self.load_items()
-                self.load_user_items()
-                QMessageBox.information(self, "Success", "Item deleted successfully!")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Database Error", f"Failed to delete item: {str(e)}")
-                
-    def edit_user_item(self):
-        selected_rows = self.user_items_table.selectionModel().selectedRows()
-        if not selected_rows:
-            QMessageBox.warning(self, "Error", "Select a user item first.")
-            return
-        row = selected_rows[0].row()
-        ui_id = int(self.user_items_table.item(row, 0).text())
-        
-        try:
-            c = self.conn.cursor()
-            c.execute("SELECT UI_ID, UserID, ItemID, DateAdded, Quantity FROM Users_Items WHERE UI_ID=?", (ui_id,))
-            user_item_data = c.fetchone()
-            
-            dlg = EditUserItemDialog(self, user_item_data)
-            if dlg.exec_() == QDialog.Accepted:
-                quantity = dlg.get_data()
-                c = self.conn.cursor()
-                c.execute("UPDATE Users_Items SET Quantity=? WHERE UI_ID=?", (quantity, ui_id))
-                self.conn.commit()
-                self.load_user_items()
-                QMessageBox.information(self, "Success", "User item quantity updated successfully!")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to update user item: {str(e)}")
-    
-    # New method to add item to user
-    def add_item_to_user(self):
-        dlg = AddItemToUserDialog(self)
-        if dlg.exec_() == QDialog.Accepted:
-            user_id, item_id, quantity = dlg.get_data()
-            
-            try:
-                c = self.conn.cursor()
-                
-                # Get the current stock
-                c.execute("SELECT stock_quantity FROM Items WHERE ItemID=?", (item_id,))
-                current_stock = c.fetchone()[0]
-                
-                if quantity > current_stock:
-                    QMessageBox.warning(self, "Error", f"Not enough stock. Available: {current_stock}")
-                    return
-                
-                # Check if user already has this item
-                c.execute("SELECT UI_ID, Quantity FROM Users_Items WHERE UserID=? AND ItemID=?", 
-                        (user_id, item_id))
-                existing = c.fetchone()
-                
-                today = datetime.date.today().isoformat()
-                
-                if existing:
-                    # User already has this item, update quantity
-                    ui_id, current_quantity = existing
-                    new_quantity = current_quantity + quantity
-                    c.execute("UPDATE Users_Items SET Quantity=? WHERE UI_ID=?", 
-                            (new_quantity, ui_id))
-                    msg = f"Item quantity updated from {current_quantity} to {new_quantity}."
-                else:
-                    # Add new item to user
-                    c.execute("INSERT INTO Users_Items (UserID, ItemID, DateAdded, Quantity) VALUES (?, ?, ?, ?)",
-                            (user_id, item_id, today, quantity))
-                    msg = f"Item added to user with quantity {quantity}."
-                
-                # Update stock quantity
-                new_stock = current_stock - quantity
-                c.execute("UPDATE Items SET stock_quantity=? WHERE ItemID=?", (new_stock, item_id))
-                
-                self.conn.commit()
-                self.load_user_items()
-                self.load_items()  # Refresh items to show updated stock
-                QMessageBox.information(self, "Success", msg)
-                
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Database Error", f"Failed to add item to user: {str(e)}")
-    
-    # Add logout confirmation
-    def confirm_logout(self):
-        confirm = QMessageBox.question(self, "Confirm Logout",
-                                      "Are you sure you want to logout?",
-                                      QMessageBox.Yes | QMessageBox.No)
-        if confirm == QMessageBox.Yes:
-            self.logout_callback()
-    
-    def closeEvent(self, event):
-        self.conn.close()
-        super().closeEvent(event)
-            
-class UserTab(QWidget):
-    def __init__(self, user_id):
-        super().__init__()
-        self.user_id = user_id
-        self.conn = sqlite3.connect(DB_NAME)
-        self.setup_ui()
-        self.load_collections()
-        self.load_items()
-        self.load_my_items()
-        self.load_account_details()
-
-    def setup_ui(self):
-        layout = QVBoxLayout(self)
-        
-        # Add a non-clickable role indicator tab
-        self.role_label = QLabel("COLLECTOR")
-        self.role_label.setStyleSheet(f"background-color: {BURGUNDY}; color: {WHITE}; font-weight: bold; padding: 8px; border-radius: 5px;")
-        self.role_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(self.role_label)
-        
-        # Create tabs for different sections
-        self.tabs = QTabWidget()
-        layout.addWidget(self.tabs)
-        
-        # Shop tab
-        self.shop_tab = QWidget()
-        self.setup_shop_tab()
-        self.tabs.addTab(self.shop_tab, "Shop")
-        
-        # My Items tab
-        self.my_items_tab = QWidget()
-        self.setup_my_items_tab()
-        self.tabs.addTab(self.my_items_tab, "My Items")
-        
-        # Account Details tab (new)
-        self.account_tab = QWidget()
-        self.setup_account_tab()
-        self.tabs.addTab(self.account_tab, "Account Details")
-        
-        # Logout button
-        self.logout_btn = QPushButton("Logout")
-        self.logout_btn.setObjectName("logoutButton")
-        layout.addWidget(self.logout_btn)
-
-    def setup_shop_tab(self):
-        layout = QVBoxLayout(self.shop_tab)
-        
-        # Collection filter
-        filter_layout = QHBoxLayout()
-        filter_label = QLabel("Collection:")
-        self.collection_filter = QComboBox()
-        self.collection_filter.addItem("All Collections", None)
-        filter_layout.addWidget(filter_label)
-        filter_layout.addWidget(self.collection_filter)
-        filter_layout.addStretch()
-        layout.addLayout(filter_layout)
-
-        label = QLabel("Browse Items")
-        label.setStyleSheet("font-weight: bold; font-size: 16px;")
-        layout.addWidget(label)
-
-        # Items table
-        self.items_table = QTableWidget()
-        self.items_table.setColumnCount(6)
-        self.items_table.setHorizontalHeaderLabels(["ID", "Collection", "Name", "Price", "Stock", "Actions"])
-        self.items_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.items_table.setSelectionBehavior(self.items_table.SelectRows)
-        layout.addWidget(self.items_table)
-
-        # Connect signals
-        self.collection_filter.currentIndexChanged.connect(self.load_items)
-    
-    def setup_my_items_tab(self):
-        layout = QVBoxLayout(self.my_items_tab)
-        
-        label = QLabel("My Items")
-        label.setStyleSheet("font-weight: bold; font-size: 16px;")
-        layout.addWidget(label)
-        
-        # Add sorting options for My Items tab
-        filter_layout = QHBoxLayout()
-        
-        # Collection filter for My Items
-        collection_label = QLabel("Collection:")
-        self.my_items_collection_filter = QComboBox()
-        self.my_items_collection_filter.addItem("All Collections", None)
-        filter_layout.addWidget(collection_label)
-        filter_layout.addWidget(self.my_items_collection_filter)
-        
-        # Sort options
-        sort_label = QLabel("Sort by:")
-        self.sort_option = QComboBox()
-        self.sort_option.addItem("Name (A-Z)", "name_asc")
-        self.sort_option.addItem("Name (Z-A)", "name_desc")
-        filter_layout.addWidget(sort_label)
-        filter_layout.addWidget(self.sort_option)
-        
-        filter_layout.addStretch()
-        layout.addLayout(filter_layout)
-        
-        # My Items table
-        self.my_items_table = QTableWidget()
-        self.my_items_table.setColumnCount(6)
-        self.my_items_table.setHorizontalHeaderLabels(["ID", "Item Name", "Collection", "Price", "Date Added", "Quantity"])
-        self.my_items_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        layout.addWidget(self.my_items_table)
-        
-        # Connect signals for sorting and filtering
-        self.my_items_collection_filter.currentIndexChanged.connect(self.load_my_items)
-        self.sort_option.currentIndexChanged.connect(self.load_my_items)
-
-    # New method to set up account tab
-    def setup_account_tab(self):
-        layout = QVBoxLayout(self.account_tab)
-        
-        # Account details form
-        form_layout = QFormLayout()
-        
-        self.account_id_label = QLabel()
-        self.account_first_name_label = QLabel()
-        self.account_last_name_label = QLabel()
-        self.account_username_label = QLabel()
-        self.account_email_label = QLabel()
-        self.account_date_joined_label = QLabel()
-        
-        form_layout.addRow("User ID:", self.account_id_label)
-        form_layout.addRow("First Name:", self.account_first_name_label)
-        form_layout.addRow("Last Name:", self.account_last_name_label)
-        form_layout.addRow("Username:", self.account_username_label)
-        form_layout.addRow("Email:", self.account_email_label)
-        form_layout.addRow("Date Joined:", self.account_date_joined_label)
-        
-        account_container = QWidget()
-        account_container.setStyleSheet(f"background-color: {WHITE}; border-radius: 10px; padding: 20px;")
-        account_container.setLayout(form_layout)
-        
-        title_label = QLabel("My Account Details")
-        title_label.setStyleSheet("font-size: 18px; font-weight: bold; margin-bottom: 10px;")
-        
-        layout.addWidget(title_label)
-        layout.addWidget(account_container)
-        layout.addStretch()
-        
-        # Edit account button
-        self.edit_account_btn = QPushButton("Edit Account Details")
-        layout.addWidget(self.edit_account_btn)
-        
-        # Connect edit button
-        self.edit_account_btn.clicked.connect(self.edit_account)
-
-    def load_account_details(self):
-        c = self.conn.cursor()
-        try:
-            c.execute("SELECT UserID, FirstName, LastName, Username, Email, DateJoined FROM Users WHERE UserID=?", (self.user_id,))
-            user_data = c.fetchone()
-            
-            if user_data:
-                user_id, first_name, last_name, username, email, date_joined = user_data
-                
-                self.account_id_label.setText(str(user_id))
-                self.account_first_name_label.setText(first_name or "")
-                self.account_last_name_label.setText(last_name or "")
-                self.account_username_label.setText(username)
-                self.account_email_label.setText(email or "")
-                self.account_date_joined_label.setText(date_joined or "")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load account details: {str(e)}")
-
-    def edit_account(self):
-        try:
-            c = self.conn.cursor()
-            c.execute("SELECT UserID, FirstName, LastName, Username, Password, Email, DateJoined, is_admin FROM Users WHERE UserID=?", (self.user_id,))
-            user_data = c.fetchone()
-            
-            # Create custom dialog for editing account
-            dialog = QDialog(self)
-            dialog.setWindowTitle("Edit Account Details")
-            dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-            layout = QFormLayout(dialog)
-            
-            first_name_edit = QLineEdit(user_data[1] or "")
-            last_name_edit = QLineEdit(user_data[2] or "")
-            username_edit = QLineEdit(user_data[3])
-            current_password_edit = QLineEdit()
-            current_password_edit.setEchoMode(QLineEdit.Password)
-            new_password_edit = QLineEdit()
-            new_password_edit.setEchoMode(QLineEdit.Password)
-            confirm_password_edit = QLineEdit()
-            confirm_password_edit.setEchoMode(QLineEdit.Password)
-            email_edit = QLineEdit(user_data[5] or "")
-            
-            layout.addRow("First Name:", first_name_edit)
-            layout.addRow("Last Name:", last_name_edit)
-            layout.addRow("Username:", username_edit)
-            layout.addRow("Current Password:", current_password_edit)
-            layout.addRow("New Password (leave blank to keep current):", new_password_edit)
-            layout.addRow("Confirm New Password:", confirm_password_edit)
-            layout.addRow("Email:", email_edit)
-            
-            buttons_layout = QHBoxLayout()
-            save_btn = QPushButton("Save")
-            cancel_btn = QPushButton("Cancel")
-            buttons_layout.addWidget(save_btn)
-            buttons_layout.addWidget(cancel_btn)
-            layout.addRow(buttons_layout)
-            
-            def save_account():
-                # Validate current password
-                if current_password_edit.text() != user_data[4]:
-                    QMessageBox.warning(dialog, "Error", "Current password is incorrect.")
-                    return
-                
-                # Check if new password fields match
-                new_password = new_password_edit.text()
-                if new_password and new_password != confirm_password_edit.text():
-                    QMessageBox.warning(dialog, "Error", "New passwords do not match.")
-                    return
-                
-                # Use current password if new password is not provided
-                password = new_password if new_password else user_data[4]
-                
-                try:
-                    c = self.conn.cursor()
-                    c.execute("""UPDATE Users SET FirstName=?, LastName=?, Username=?, 
-                               Password=?, Email=? WHERE UserID=?""", 
-                            (first_name_edit.text(), last_name_edit.text(), 
-                             username_edit.text(), password, email_edit.text(), 
-                             self.user_id))
-                    self.conn.commit()
-                    dialog.accept()
-                    self.load_account_details()
-                    QMessageBox.information(self, "Success", "Account details updated successfully!")
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(dialog, "Error", "Username already exists.")
-                except sqlite3.Error as e:
-                    QMessageBox.critical(dialog, "Database Error", f"Failed to update account: {str(e)}")
-            
-            save_btn.clicked.connect(save_account)
-            cancel_btn.clicked.connect(dialog.reject)
-            
-            dialog.exec_()
-            
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load account data: {str(e)}")
-
-    def load_collections(self):
-        c = self.conn.cursor()
-        try:
-            c.execute("SELECT CollectionID, CollectionName FROM Collections ORDER BY CollectionName")
-            collections = c.fetchall()
-            
-            # Clear and repopulate collection filters
-            self.collection_filter.clear()
-            self.my_items_collection_filter.clear()
-            
-            self.collection_filter.addItem("All Collections", None)
-            self.my_items_collection_filter.addItem("All Collections", None)
-            
-            for col_id, col_name in collections:
-                self.collection_filter.addItem(col_name, col_id)
-                self.my_items_collection_filter.addItem(col_name, col_id)
-                
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load collections: {str(e)}")
-
-    def load_items(self):
-        c = self.conn.cursor()
-        collection_id = self.collection_filter.currentData()
-        
-        try:
-            if collection_id is None:
-                query = """SELECT Items.ItemID, Collections.CollectionName, Items.ItemName, Items.Price, Items.stock_quantity 
-                          FROM Items 
-                          JOIN Collections ON Items.CollectionID = Collections.CollectionID
-                          WHERE Items.stock_quantity > 0"""
-                c.execute(query)
-            else:
-                query = """SELECT Items.ItemID, Collections.CollectionName, Items.ItemName, Items.Price, Items.stock_quantity 
-                          FROM Items 
-                          JOIN Collections ON Items.CollectionID = Collections.CollectionID
-                          WHERE Items.CollectionID = ? AND Items.stock_quantity > 0"""
-                c.execute(query, (collection_id,))
-            
-            rows = c.fetchall()
-            self.items_table.setRowCount(len(rows))
-            
-            for i, row in enumerate(rows):
-                id_, collection, name, price, stock = row
-                self.items_table.setItem(i, 0, QTableWidgetItem(str(id_)))
-                self.items_table.setItem(i, 1, QTableWidgetItem(collection))
-                self.items_table.setItem(i, 2, QTableWidgetItem(name))
-                self.items_table.setItem(i, 3, QTableWidgetItem(f"${price:.2f}"))
-                self.items_table.setItem(i, 4, QTableWidgetItem(str(stock)))
-                
-                # Add actions container 
-                actions_widget = QWidget()
-                actions_layout = QHBoxLayout(actions_widget)
-                actions_layout.setContentsMargins(0, 0, 0, 0)
-                
-                add_to_myitems_btn = QPushButton("Add to My Items")
-                add_to_myitems_btn.clicked.connect(lambda checked, item_id=id_: self.add_to_my_items(item_id))
-                
-                # Disable button if stock is 0
-                if stock == 0:
-                    add_to_myitems_btn.setEnabled(False)
-                    add_to_myitems_btn.setToolTip("Out of stock")
-                
-                actions_layout.addWidget(add_to_myitems_btn)
-                
-                self.items_table.setCellWidget(i, 5, actions_widget)
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load items: {str(e)}")
-    
-    def load_my_items(self):
-        c = self.conn.cursor()
-        collection_id = self.my_items_collection_filter.currentData()
-        sort_option = self.sort_option.currentData()
-        
-        try:
-            # Base query
-            query = """
-                SELECT ui.UI_ID, i.ItemName, c.CollectionName, i.Price, ui.DateAdded, ui.Quantity
-                FROM Users_Items ui
-                JOIN Items i ON ui.ItemID = i.ItemID
-                JOIN Collections c ON i.CollectionID = c.CollectionID
-                WHERE ui.UserID = ?
-            """
-            
-            params = [self.user_id]
-            
-            # Add collection filter if needed
-            if collection_id is not None:
-                query += " AND i.CollectionID = ?"
-                params.append(collection_id)
-            
-            # Add sorting based on selected option
-            if sort_option == "name_asc":
-                query += " ORDER BY i.ItemName ASC"
-            elif sort_option == "name_desc":
-                query += " ORDER BY i.ItemName DESC"
-            elif sort_option == "collection":
-                query += " ORDER BY c.CollectionName ASC, i.ItemName ASC"
-            else:
-                # Default sort
-                query += " ORDER BY i.ItemName ASC"
-            
-            c.execute(query, params)
-            
-            rows = c.fetchall()
-            self.my_items_table.setRowCount(len(rows))
-            
-            for i, row in enumerate(rows):
-                ui_id, item_name, collection_name, price, date_added, quantity = row
-                self.my_items_table.setItem(i, 0, QTableWidgetItem(str(ui_id)))
-                self.my_items_table.setItem(i, 1, QTableWidgetItem(item_name))
-                self.my_items_table.setItem(i, 2, QTableWidgetItem(collection_name))
-                self.my_items_table.setItem(i, 3, QTableWidgetItem(f"${price:.2f}"))
-                self.my_items_table.setItem(i, 4, QTableWidgetItem(date_added or ""))
-                self.my_items_table.setItem(i, 5, QTableWidgetItem(str(quantity)))
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to load my items: {str(e)}")
-
-    def add_to_my_items(self, item_id):
-        c = self.conn.cursor()
-        try:
-            # Check if item already added
-            c.execute("SELECT UI_ID, Quantity FROM Users_Items WHERE UserID=? AND ItemID=?", 
-                      (self.user_id, item_id))
-            
-            existing = c.fetchone()
-            
-            # Get the item details for display
-            c.execute("SELECT ItemName, stock_quantity FROM Items WHERE ItemID=?", (item_id,))
-            item_name, max_stock = c.fetchone()
-            
-            # Check if item is in stock
-            if max_stock <= 0:
-                QMessageBox.warning(self, "Error", "This item is out of stock.")
-                return
-            
-            if existing:
-                ui_id, current_quantity = existing
-                # Ask if user wants to update quantity
-                confirm = QMessageBox.question(
-                    self, 
-                    "Update Quantity", 
-                    f"You already have {current_quantity} of this item. Do you want to update the quantity?",
-                    QMessageBox.Yes | QMessageBox.No
-                )
-                if confirm == QMessageBox.Yes:
-                    # Ask for new quantity
-                    quantity, ok = QInputDialog.getInt(
-                        self, "Enter Quantity", 
-                        f"How many {item_name} do you want? (Max: {max_stock})",
-                        value=current_quantity, min=1, max=max_stock
-                    )
-                    if ok:
-                        # Calculate quantity delta
-                        delta = quantity - current_quantity
-                        
-                        # Update user item quantity
-                        c.execute("UPDATE Users_Items SET Quantity=? WHERE UI_ID=?", (quantity, ui_id))
-                        
-                        # Update stock quantity
-                        if delta > 0:  # If increasing quantity
-                            c.execute("UPDATE Items SET stock_quantity = stock_quantity - ? WHERE ItemID=?", 
-                                    (delta, item_id))
-                        
-                        self.conn.commit()
-                        self.load_items()  # Refresh items to show updated stock
-                        self.load_my_items()
-                        QMessageBox.information(self, "Success", f"Updated to {quantity} items!")
-            else:
-                # Ask for quantity
-                quantity, ok = QInputDialog.getInt(
-                    self, "Enter Quantity", 
-                    f"How many {item_name} do you want? (Max: {max_stock})",
-                    value=1, min=1, max=max_stock
-                )
-                
-                if ok:
-                    # Add to my items with quantity
-                    today = datetime.date.today().isoformat()
-                    c.execute("INSERT INTO Users_Items (UserID, ItemID, DateAdded, Quantity) VALUES (?, ?, ?, ?)",
-                            (self.user_id, item_id, today, quantity))
-                    
-                    # Update stock quantity
-                    c.execute("UPDATE Items SET stock_quantity = stock_quantity - ? WHERE ItemID=?", 
-                            (quantity, item_id))
-                    
-                    self.conn.commit()
-                    self.load_items()  # Refresh items to show updated stock
-                    self.load_my_items()
-                    QMessageBox.information(self, "Success", f"Added {quantity} items to your collection!")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"Failed to add to items: {str(e)}")
-            
-    def closeEvent(self, event):
-        self.conn.close()
-        super().closeEvent(event)
-    
-class LoginPage(QWidget):
-    def __init__(self, parent):
-        super().__init__()
-        self.parent = parent
-        self.conn = sqlite3.connect(DB_NAME)
-        self.setup_ui()
-
-    def setup_ui(self):
-        # Main vertical layout
-        main_layout = QVBoxLayout(self)
-        main_layout.setAlignment(Qt.AlignCenter)
-        
-        # Center container for content
-        center_container = QWidget()
-        center_container.setMaximumWidth(600)
-        center_container.setMinimumWidth(500)
-        
-        layout = QVBoxLayout(center_container)
-        layout.setSpacing(30)
-
-        # Icon representation
-        icon_widget = QWidget()
-        icon_widget.setFixedHeight(120)
-        icon_layout = QVBoxLayout(icon_widget)
-        icon_layout.setAlignment(Qt.AlignCenter)
-        
-        # Stylized icon using text representation
-        icon_label = QLabel("📚")
-        icon_label.setStyleSheet("font-size: 72px;")
-        icon_label.setAlignment(Qt.AlignCenter)
-        icon_layout.addWidget(icon_label)
-        
-        layout.addWidget(icon_widget)
-
-        # Title
-        title = QLabel("Welcome to Shelfwise !")
-        title.setFont(QFont("Arial", 36, QFont.Bold))
-        title.setStyleSheet(f"""
-            font-size: 36px; 
-            font-weight: bold; 
-            color: {WHITE};
-            margin-top: 20px;
-            margin-bottom: 50px;
-        """)
-        title.setAlignment(Qt.AlignCenter)
-        layout.addWidget(title)
-
-        # Select Role label
-        role_label = QLabel("Select Role:")
-        role_label.setStyleSheet(f"""
-            font-size: 24px; 
-            color: {WHITE};
-            margin-bottom: 20px;
-        """)
-        role_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(role_label)
-
-        # Buttons container
-        buttons_container = QWidget()
-        buttons_layout = QHBoxLayout(buttons_container)
-        buttons_layout.setSpacing(40)
-        buttons_layout.setAlignment(Qt.AlignCenter)
-
-        # Admin button
-        self.admin_btn = QPushButton("ADMIN")
-        self.admin_btn.setFixedSize(200, 60)
-        self.admin_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {LIGHT_BURGUNDY};
-                color: {WHITE};
-                font-size: 20px;
-                font-weight: bold;
-                border-radius: 30px;
-                border: none;
-            }}
-            QPushButton:hover {{
-                background-color: {LIGHT_BURGUNDY};
-            }}
-        """)
-        
-        # Collector button (using USER functionality)
-        self.collector_btn = QPushButton("COLLECTOR")
-        self.collector_btn.setFixedSize(200, 60)
-        self.collector_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {LIGHT_BURGUNDY};
-                color: {WHITE};
-                font-size: 20px;
-                font-weight: bold;
-                border-radius: 30px;
-                border: none;
-            }}
-            QPushButton:hover {{
-                background-color: {LIGHT_BURGUNDY};
-            }}
-        """)
-
-        buttons_layout.addWidget(self.admin_btn)
-        buttons_layout.addWidget(self.collector_btn)
-        layout.addWidget(buttons_container)
-
-        main_layout.addWidget(center_container)
-
-        # Connect buttons to show appropriate dialogs
-        self.admin_btn.clicked.connect(self.show_admin_login)
-        self.collector_btn.clicked.connect(self.show_user_login)
-
-    def show_admin_login(self):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Admin Login")
-        dialog.setFixedSize(400, 200)
-        # Remove the question mark from the title bar
-        dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-        
-        layout = QFormLayout(dialog)
-        
-        username_edit = QLineEdit()
-        # Make admin username editable
-        username_edit.setText("admin")
-        
-        password_edit = QLineEdit()
-        password_edit.setEchoMode(QLineEdit.Password)
-        
-        layout.addRow("Username:", username_edit)
-        layout.addRow("Password:", password_edit)
-        
-        buttons_layout = QHBoxLayout()
-        login_btn = QPushButton("Login")
-        cancel_btn = QPushButton("Cancel")
-        
-        buttons_layout.addWidget(login_btn)
-        buttons_layout.addWidget(cancel_btn)
-        layout.addRow(buttons_layout)
-        
-        # Apply styling to dialog
-        dialog.setStyleSheet(f"""
-            QDialog {{
-                background-color: {VERY_LIGHT_BURGUNDY};
-            }}
-            QLineEdit {{
-                background-color: {WHITE};
-                border: 1px solid {LIGHT_BURGUNDY};
-                border-radius: 3px;
-                padding: 5px;
-            }}
-            QPushButton {{
-                background-color: {BURGUNDY};
-                color: {WHITE};
-                border-radius: 3px;
-                padding: 5px;
-                min-width: 80px;
-            }}
-            QPushButton:hover {{
-                background-color: {LIGHT_BURGUNDY};
-            }}
-        """)
-        
-        def do_admin_login():
-            username = username_edit.text().strip()
-            password = password_edit.text().strip()
-            
-            # Check credentials against database
-            try:
-                c = self.conn.cursor()
-                c.execute("SELECT UserID FROM Users WHERE Username=? AND Password=? AND is_admin=1", 
-                         (username, password))
-                row = c.fetchone()
-                
-                if row:
-                    dialog.accept()
-                    self.parent.login_success(admin=True)
-                else:
-                    QMessageBox.warning(dialog, "Error", "Invalid admin credentials.")
-            except sqlite3.Error as e:
-                QMessageBox.critical(dialog, "Database Error", f"Login failed: {str(e)}")
-        
-        login_btn.clicked.connect(do_admin_login)
-        cancel_btn.clicked.connect(dialog.reject)
-        
-        dialog.exec_()
-
-    def show_user_login(self):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Collector Login / Signup")
-        dialog.setFixedSize(450, 400)  # Increased height for additional confirm password field
-        # Remove the question mark from the title bar
-        dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-        
-        layout = QVBoxLayout(dialog)
-        
-        # Tabs for login/signup
-        tabs = QTabWidget()
-        
-        # Login tab
-        login_tab = QWidget()
-        login_layout = QFormLayout(login_tab)
-        
-        login_username = QLineEdit()
-        login_password = QLineEdit()
-        login_password.setEchoMode(QLineEdit.Password)
-        
-        login_layout.addRow("Username:", login_username)
-        login_layout.addRow("Password:", login_password)
-        
-        login_btn = QPushButton("Login")
-        login_layout.addRow("", login_btn)
-        
-        tabs.addTab(login_tab, "Login")
-        
-        # Signup tab
-        signup_tab = QWidget()
-        signup_layout = QFormLayout(signup_tab)
-        
-        signup_first_name = QLineEdit()
-        signup_last_name = QLineEdit()
-        signup_username = QLineEdit()
-        signup_password = QLineEdit()
-        signup_password.setEchoMode(QLineEdit.Password)
-        signup_confirm_password = QLineEdit()  # New confirm password field
-        signup_confirm_password.setEchoMode(QLineEdit.Password)
-        signup_email = QLineEdit()
-        
-        signup_layout.addRow("First Name:", signup_first_name)
-        signup_layout.addRow("Last Name:", signup_last_name)
-        signup_layout.addRow("Username:", signup_username)
-        signup_layout.addRow("Password:", signup_password)
-        signup_layout.addRow("Confirm Password:", signup_confirm_password)  # Add confirm password field
-        signup_layout.addRow("Email:", signup_email)
-        
-        signup_btn = QPushButton("Signup")
-        signup_layout.addRow("", signup_btn)
-        
-        tabs.addTab(signup_tab, "Signup")
-        
-        layout.addWidget(tabs)
-        
-        # Close button
-        close_btn = QPushButton("Close")
-        layout.addWidget(close_btn)
-        
-        # Apply styling to dialog
-        dialog.setStyleSheet(f"""
-            QDialog {{
-                background-color: {VERY_LIGHT_BURGUNDY};
-            }}
-            QLineEdit {{
-                background-color: {WHITE};
-                border: 1px solid {LIGHT_BURGUNDY};
-                border-radius: 3px;
-                padding: 5px;
-            }}
-            QPushButton {{
-                background-color: {BURGUNDY};
-                color: {WHITE};
-                border-radius: 3px;
-                padding: 5px;
-                min-width: 80px;
-            }}
-            QPushButton:hover {{
-                background-color: {LIGHT_BURGUNDY};
-            }}
-            QTabWidget::tab-bar {{
-                alignment: center;
-            }}
-            QTabBar::tab {{
-                background: {LIGHTER_BURGUNDY};
-                color: {WHITE};
-                padding: 8px 16px;
-                margin: 2px;
-            }}
-            QTabBar::tab:selected {{
-                background: {BURGUNDY};
-                font-weight: bold;
-            }}
-        """)
-        
-        def do_user_login():
-            username = login_username.text().strip()
-            password = login_password.text().strip()
-            if not username or not password:
-                QMessageBox.warning(dialog, "Error", "Please enter username and password.")
-                return
-            try:
-                c = self.conn.cursor()
-                c.execute("SELECT UserID FROM Users WHERE Username=? AND Password=? AND is_admin=0", (username, password))
-                row = c.fetchone()
-                if row:
-                    user_id = row[0]
-                    dialog.accept()
-                    self.parent.login_success(user_id=user_id)
-                else:
-                    QMessageBox.warning(dialog, "Error", "Invalid user credentials.")
-            except sqlite3.Error as e:
-                QMessageBox.critical(dialog, "Database Error", f"Login failed: {str(e)}")
-        
-        def do_user_signup():
-            first_name = signup_first_name.text().strip()
-            last_name = signup_last_name.text().strip()
-            username = signup_username.text().strip()
-            password = signup_password.text().strip()
-            confirm_password = signup_confirm_password.text().strip()  # Get confirm password
-            email = signup_email.text().strip()
-            
-            # Check if passwords match
-            if password != confirm_password:
-                QMessageBox.warning(dialog, "Error", "Passwords do not match.")
-                return
-            
-            if not username or not password:
-                QMessageBox.warning(dialog, "Error", "Username and password cannot be empty.")
-                return
-                
-            today = datetime.date.today().isoformat()
-            
-            try:
-                c = self.conn.cursor()
-                c.execute("""INSERT INTO Users 
-                           (FirstName, LastName, Username, Password, Email, DateJoined, is_admin) 
-                           VALUES (?, ?, ?, ?, ?, ?, 0)""", 
-                          (first_name, last_name, username, password, email, today))
-                
-                self.conn.commit()
-                QMessageBox.information(dialog, "Success", "User registered successfully! You may now login.")
-                signup_first_name.clear()
-                signup_last_name.clear()
-                signup_username.clear()
-                signup_password.clear()
-                signup_confirm_password.clear()  # Clear confirm password
-                signup_email.clear()
-                tabs.setCurrentWidget(login_tab)
-            except sqlite3.IntegrityError:
-                QMessageBox.warning(dialog, "Error", "Username already exists.")
-            except sqlite3.Error as e:
-                QMessageBox.critical(dialog, "Database Error", f"Registration failed: {str(e)}")
-        
-        login_btn.clicked.connect(do_user_login)
-        signup_btn.clicked.connect(do_user_signup)
-        close_btn.clicked.connect(dialog.reject)
-        
-        dialog.exec_()
-        
-    def closeEvent(self, event):
-        self.conn.close()
-        super().closeEvent(event)
-
-class MainWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Shelfwise")
-        self.resize(1000, 800)
-        self.setup_ui()
-        self.apply_styles()
-
-    def setup_ui(self):
-        self.stack = QStackedWidget()
-        self.setCentralWidget(self.stack)
-
-        self.login_page = LoginPage(self)
-        self.stack.addWidget(self.login_page)
-
-        self.admin_tab = AdminTab(logout_callback=self.confirm_logout)
-        self.stack.addWidget(self.admin_tab)
-
-        self.user_tab = None  # created dynamically for logged in user
-
-    def apply_styles(self):
-        # Apply the burgundy gradient background and updated styles using the color constants
-        style = f"""
-            QMainWindow {{
-                background: qlineargradient(x1: 0, y1: 0, x2: 1, y2: 1,
-                    stop: 0 {BURGUNDY}, stop: 0.5 {BURGUNDY}, stop: 1 {BURGUNDY});
-            }}
-            LoginPage {{
-                background: qlineargradient(x1: 0, y1: 0, x2: 1, y2: 1,
-                    stop: 0 {LIGHT_BURGUNDY}, stop: 0.5 {LIGHT_BURGUNDY}, stop: 1 {LIGHT_BURGUNDY});
-            }}
-            QWidget {{
-                font-family: Arial, sans-serif;
-                font-size: 14px;
-                color: {DARK_TEXT};
-            }}
-            AdminTab, UserTab {{
-                background-color: {VERY_LIGHT_BURGUNDY};
-            }}
-            QPushButton {{
-                background-color: {BURGUNDY};
-                color: {WHITE};
-                border-radius: 5px;
-                padding: 8px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {LIGHT_BURGUNDY};
-            }}
-            QPushButton:disabled {{
-                background-color: {GRAY};
-                color: {WHITE};
-            }}
-            QPushButton#logoutButton {{
-                background-color: {LOGOUT_COLOR};
-                color: {WHITE};
-                border-radius: 5px;
-                padding: 8px;
-                font-weight: bold;
-            }}
-            QPushButton#logoutButton:hover {{
-                background-color:({LOGOUT_COLOR}, 10%);
-            }}
-            QLineEdit {{
-                background-color: {WHITE};
-                border: 1px solid {LIGHT_BURGUNDY};
-                border-radius: 3px;
-                padding: 5px;
-                color: {DARK_TEXT};
-            }}
-            QTableWidget {{
-                background-color: {WHITE};
-                gridline-color: {LIGHTER_BURGUNDY};
-                color: {DARK_TEXT};
-            }}
-            QHeaderView::section {{
-                background-color: {LIGHT_BURGUNDY};
-                color: {WHITE};
-                padding: 4px;
-                border: 1px solid {BURGUNDY};
-            }}
-            QTabWidget::pane {{
-                border: 1px solid {LIGHT_BURGUNDY};
-                background: {VERY_LIGHT_BURGUNDY};
-            }}
-            QTabBar::tab {{
-                background: {LIGHTER_BURGUNDY};
-                border: 1px solid {LIGHT_BURGUNDY};
-                border-bottom-color: {VERY_LIGHT_BURGUNDY};
-                padding: 5px;
-                color: {WHITE};
-                min-width: 80px;
-            }}
-            QTabBar::tab:selected {{
-                background: {BURGUNDY};
-                border-bottom-color: {BURGUNDY};
-                font-weight: bold;
-            }}
-            QDialog {{
-                background-color: {VERY_LIGHT_BURGUNDY};
-            }}
-            QSpinBox, QDoubleSpinBox, QDateEdit {{
-                background-color: {WHITE};
-                border: 1px solid {LIGHT_BURGUNDY};
-                border-radius: 3px;
-                padding: 2px;
-                color: {DARK_TEXT};
-            }}
-            QComboBox {{
-                background-color: {WHITE};
-                border: 1px solid {LIGHT_BURGUNDY};
-                border-radius: 3px;
-                padding: 3px;
-                color: {DARK_TEXT};
-            }}
-            QComboBox::drop-down {{
-                border: none;
-            }}
-            QComboBox::down-arrow {{
-                image: none;
-                border-left: 5px solid transparent;
-                border-right: 5px solid transparent;
-                border-top: 5px solid {BURGUNDY};
-                margin-right: 5px;
-            }}
-        """
-        self.setStyleSheet(style)
-
-    def login_success(self, admin=False, user_id=None):
-        if admin:
-            self.admin_tab.load_users()
-            self.admin_tab.load_collections()
-            self.admin_tab.load_items()
-            self.admin_tab.load_user_items()
-            self.stack.setCurrentWidget(self.admin_tab)
-        else:
-            if self.user_tab:
-                # Remove old user tab to update for new user
-                self.stack.removeWidget(self.user_tab)
-                self.user_tab.deleteLater()
-            self.user_tab = UserTab(user_id)
-            self.stack.addWidget(self.user_tab)
-            self.stack.setCurrentWidget(self.user_tab)
-            # Connect the logout button
-            self.user_tab.logout_btn.clicked.connect(self.confirm_logout)
-
-    def confirm_logout(self):
-        # Ask for confirmation before logging out
-        confirm = QMessageBox.question(self, "Confirm Logout",
-                                      "Are you sure you want to logout?",
-                                      QMessageBox.Yes | QMessageBox.No)
-        if confirm == QMessageBox.Yes:
-            self.logout()
-
-    def logout(self):
-        # Return to login page
-        self.stack.setCurrentWidget(self.login_page)
-        
-# Main function
-def main():
-    # Create application directory if it doesn't exist
-    app_dir = os.path.dirname(os.path.abspath(__file__))
-    if not os.path.exists(app_dir):
-        os.makedirs(app_dir)
-        
-    # Ensure the database is initialized
-    init_db()
-    
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
-    sys.exit(app.exec_())
-
-if __name__ == '__main__':
+import sys
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QStackedWidget, QVBoxLayout,
+    QHBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox,
+    QTabWidget, QTableWidget, QTableWidgetItem, QFormLayout, QDialog,
+    QHeaderView, QCheckBox, QFrame, QSpacerItem, QSizePolicy, QSpinBox,
+    QComboBox, QDoubleSpinBox, QDateEdit, QInputDialog, QTableView, QAbstractButton, QFileDialog,
+    QListView, QStyledItemDelegate, QStyle, QCompleter, QListWidget, QListWidgetItem, QProgressBar
+)
+from PyQt5.QtCore import (Qt, QDate, QTimer, QThread, QAbstractTableModel, QModelIndex, QObject, pyqtSignal,
+                          QEvent, QAbstractEventDispatcher, QSize, QRect, QStringListModel)
+from PyQt5.QtGui import QFont, QPixmap, QPainter, QColor, QBrush, QPixmapCache
+from array import array
+from contextlib import nullcontext
+import datetime
+import os
+import re
+import time
+from shelfwise_db import (connect, ShelfwiseStore, WriteBehindStore, FlushError, OutOfStockError, open_backend,
+                          Permission, MANAGED_ROLES, ROLE_COLLECTOR, DEFAULT_STORE)
+from shelfwise_client import RemoteStore
+from shelfwise_session import SessionManager, RateLimitedError
+import shelfwise_audit
+from shelfwise_audit import USER_FIELDS, USER_ROW, ITEM_FIELDS
+import shelfwise_backup
+import shelfwise_currency
+import shelfwise_dedupe
+import shelfwise_images
+import shelfwise_metrics
+import shelfwise_profile
+from shelfwise_sku import SkuIndex, ScanBurst
+from shelfwise_typeahead import Typeahead
+
+# Color constants
+BURGUNDY = "#7D3750"
+LIGHT_BURGUNDY = "#9D5975"
+LIGHTER_BURGUNDY = "#B37990"
+WHITE = "#FFFFFF"
+VERY_LIGHT_BURGUNDY = "#D4A5B5"
+GRAY = "#E0E0E0"
+GREEN = "#4CAF50"
+RED = "#F44336"
+DARK_TEXT = "#333333"
+LOGOUT_COLOR = "#7D3750"  # Dark purple for logout buttons
+
+# Column kinds for ColumnarRows:
+#   "i" - integers stored in a typed array
+#   "f" - floats stored in a typed array
+#   "s" - repeated strings (collection names, usernames, dates), interned
+#   "t" - free text kept as plain strings
+ITEM_COLUMNS = (("ItemID", "i"), ("CollectionName", "s"), ("ItemName", "t"),
+                ("Description", "t"), ("Price", "f"), ("stock_quantity", "i"), ("SKU", "t"))
+USER_ITEM_COLUMNS = (("UI_ID", "i"), ("Username", "s"), ("ItemName", "t"), ("CollectionName", "s"),
+                     ("DateAdded", "s"), ("Price", "f"), ("Quantity", "i"))
+MY_ITEM_COLUMNS = (("UI_ID", "i"), ("ItemName", "t"), ("CollectionName", "s"),
+                   ("Price", "f"), ("DateAdded", "s"), ("Quantity", "i"))
+USER_COLUMNS = (("UserID", "i"), ("FirstName", "t"), ("LastName", "t"), ("Username", "t"), ("Email", "t"),
+                ("DateJoined", "s"), ("Role", "s"))
+# ImagePath has no header, so it isn't shown as a column; the picture goes
+# next to the name
+SHOP_COLUMNS = (("ItemID", "i"), ("CollectionName", "s"), ("ItemName", "t"), ("Price", "f"), ("Available", "i"),
+                ("ImagePath", "t"))
+LOW_STOCK_COLUMNS = (("ItemID", "i"), ("ItemName", "t"), ("CollectionName", "s"), ("stock_quantity", "i"),
+                     ("reorder_level", "i"), ("Acquired", "i"), ("Suggested", "i"))
+
+# Compact result set: one array per column instead of one tuple per row.
+# IDs, prices and quantities live in typed arrays (8 bytes per value), and
+# repeated strings share a single interned object, so large listings cost a
+# fraction of a list of tuples plus one QTableWidgetItem per cell.
+class ColumnarRows:
+    __slots__ = ("names", "kinds", "columns")
+
+    def __init__(self, spec):
+        self.names = tuple(name for name, kind in spec)
+        self.kinds = tuple(kind for name, kind in spec)
+        self.columns = []
+        for kind in self.kinds:
+            if kind == "i":
+                self.columns.append(array("q"))
+            elif kind == "f":
+                self.columns.append(array("d"))
+            else:
+                self.columns.append([])
+
+    @classmethod
+    def from_rows(cls, spec, rows):
+        # rows can be a cursor, so results are never materialized as tuples
+        result = cls(spec)
+        for row in rows:
+            result.append(row)
+        return result
+
+    def append(self, row):
+        for column, kind, value in zip(self.columns, self.kinds, row):
+            if kind == "i":
+                column.append(value or 0)
+            elif kind == "f":
+                column.append(value or 0.0)
+            elif kind == "s":
+                column.append(sys.intern(value) if value else "")
+            else:
+                column.append(value or "")
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def column(self, name):
+        return self.columns[self.names.index(name)]
+
+    def value(self, row, col):
+        return self.columns[col][row]
+
+    def row(self, row):
+        return tuple(column[row] for column in self.columns)
+
+    # The row as {column name: value}
+    def record(self, row):
+        return dict(zip(self.names, self.row(row)))
+
+# Set by main() when running with --profile (see shelfwise_profile)
+profiler = None
+
+# Set by main() to the audit log of changes (see shelfwise_audit)
+audit_log = None
+
+# Record a change made by user actor_id in the audit log. The entry is only
+# queued here; the log writes it on its own thread.
+def audit(actor_id, action, table=None, row_id=None, before=None, after=None):
+    if audit_log:
+        audit_log.record(actor_id, action, table, row_id, before, after)
+
+# Time a table or widget update as part of the current action
+def ui_span(name):
+    return profiler.span(name, "ui") if profiler else nullcontext()
+
+# Currency rates for showing prices (see shelfwise_currency). If the rates
+# file is broken, prices are shown in the base currency only.
+def load_currency_rates(parent=None):
+    try:
+        return shelfwise_currency.load_rates()
+    except ValueError as e:
+        QMessageBox.warning(parent, "Currency Rates", f"{e}\nPrices are shown in the base currency only.")
+        return shelfwise_currency.RateTable(shelfwise_currency.DEFAULT_RATES)
+
+# Thumbnails of item pictures for the tables (see shelfwise_images). Models
+# ask for one only when Qt paints the cell, so scrolling a large catalog
+# decodes just the rows on screen. Decoded thumbnails stay in QPixmapCache,
+# which drops the least recently used ones beyond THUMBNAIL_CACHE_KB.
+# Missing thumbnails are made in the background; ready is emitted when one
+# is on disk, and the models showing it repaint.
+THUMBNAIL_CACHE_KB = 16 * 1024
+
+class ThumbnailLoader(QObject):
+    # The image path whose thumbnail was just made
+    ready = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        QPixmapCache.setCacheLimit(THUMBNAIL_CACHE_KB)
+        # Emitted from a pool thread; Qt queues it to the window's thread
+        self.pool = shelfwise_images.ThumbnailPool(on_done=lambda image_path, thumb: self.ready.emit(image_path))
+        # image path -> thumbnail path (None: no such file), so painting a
+        # row doesn't stat the picture every time. clear() forgets them.
+        self.paths = {}
+
+    # The thumbnail of image_path, or None until it has been made
+    def pixmap(self, image_path):
+        if image_path not in self.paths:
+            self.paths[image_path] = self.pool.thumbnail_path(image_path)
+        thumb = self.paths[image_path]
+        if thumb is None:
+            return None
+        pixmap = QPixmapCache.find(thumb)
+        if pixmap is None:
+            if not self.pool.ready(image_path, thumb):
+                return None
+            pixmap = QPixmap(thumb)
+            if pixmap.isNull():
+                return None
+            QPixmapCache.insert(thumb, pixmap)
+        return pixmap
+
+    # Look at the picture files again, e.g. after one was replaced
+    def clear(self):
+        self.paths.clear()
+
+    def close(self):
+        self.pool.close()
+
+# Table model that reads straight from a ColumnarRows and only formats the
+# cells Qt actually paints.
+class ColumnarTableModel(QAbstractTableModel):
+    def __init__(self, spec, headers, formatters=None, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        # One formatter per column, applied on paint (default: str)
+        self.formatters = formatters or {}
+        self.rows = ColumnarRows(spec)
+
+    def set_rows(self, rows):
+        with ui_span(f"{type(self).__name__}.set_rows"):
+            self.beginResetModel()
+            self.rows = rows
+            self.endResetModel()
+
+    def set_formatter(self, col, formatter):
+        self.formatters[col] = formatter
+        if len(self.rows):
+            self.dataChanged.emit(self.index(0, col), self.index(len(self.rows) - 1, col))
+
+    def row_id(self, row):
+        # First column always holds the row's primary key
+        return self.rows.value(row, 0)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        col = index.column()
+        value = self.rows.value(index.row(), col)
+        return self.formatters.get(col, str)(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+# Table model over one of the listings in shelfwise_db.VIEWS. The spec's
+# column names are the view's. Sorting and filtering run as SQL, and rows
+# arrive PAGE_SIZE at a time as the table scrolls, each page picking up
+# after the last row already shown (keyset paging), so even a very large
+# listing opens at once and stays in the order asked for.
+class ViewTableModel(ColumnarTableModel):
+    PAGE_SIZE = 200
+    # A page failed to load while scrolling or re-sorting
+    failed = pyqtSignal(str)
+
+    def __init__(self, store, view, spec, headers, formatters=None, parent=None):
+        super().__init__(spec, headers, formatters, parent)
+        self.store = store
+        self.view = view
+        self.spec = spec
+        self.user_id = None  # for the views of one user's rows
+        self.store_id = DEFAULT_STORE  # and of one store's stock
+        self.sort_by = []  # [[column, "asc" or "desc"], ...]
+        self.filters = []  # [[column, op, value], ...] from the filter boxes
+        self.extra_filters = []  # and from the tab's own controls
+        self.more = False
+        # For views with an ImagePath column: a ThumbnailLoader, and the
+        # column the thumbnail is shown in
+        self.thumbnails = None
+        self.thumbnail_col = None
+
+    def set_thumbnails(self, loader, col):
+        self.thumbnails = loader
+        self.thumbnail_col = col
+        loader.ready.connect(self.thumbnail_ready)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DecorationRole and self.thumbnails and index.isValid() and index.column() == self.thumbnail_col:
+            image_path = self.rows.value(index.row(), self.rows.names.index("ImagePath"))
+            return self.thumbnails.pixmap(image_path) if image_path else None
+        return super().data(index, role)
+
+    # Only the rows on screen are repainted, so there's no need to look
+    # for the ones with that picture
+    def thumbnail_ready(self, image_path):
+        if len(self.rows):
+            self.dataChanged.emit(self.index(0, self.thumbnail_col), self.index(len(self.rows) - 1, self.thumbnail_col),
+                                  [Qt.DecorationRole])
+
+    # The list_view call for the first page, e.g. for prefetch()
+    def call(self, after=None):
+        return ("list_view", {"view": self.view, "filters": self.filters + self.extra_filters, "sort": self.sort_by,
+                              "after": after, "limit": self.PAGE_SIZE, "user_id": self.user_id,
+                              "store_id": self.store_id})
+
+    def fetch(self, after=None):
+        method, kwargs = self.call(after)
+        return list(self.store.list_view(**kwargs))
+
+    # Reload from the first page; raises store.Error like the list methods
+    def load(self):
+        rows = self.fetch()
+        self.more = len(rows) == self.PAGE_SIZE
+        self.set_rows(ColumnarRows.from_rows(self.spec, rows))
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self.more:
+            return
+        # The store picks the sort columns and key out of the last row
+        after = dict(zip(self.rows.names, self.rows.row(len(self.rows) - 1)))
+        try:
+            rows = self.fetch(after)
+        except self.store.Error as e:
+            self.more = False
+            self.failed.emit(str(e))
+            return
+        self.more = len(rows) == self.PAGE_SIZE
+        if rows:
+            with ui_span(f"{type(self).__name__}.fetchMore"):
+                self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+                for row in rows:
+                    self.rows.append(row)
+                self.endInsertRows()
+
+# "5", ">5", "<=2.5"... in a number column's filter box
+NUMBER_FILTER = re.compile(r"^(<=|>=|<>|<|>|=)?\s*(-?\d+(?:\.\d+)?)$")
+
+# Cards for a gallery of items (a QListView in IconMode over a
+# ViewTableModel, showing the name column): the thumbnail, then the name,
+# price and stock from the row's other cells, formatted by the model. All
+# cards are the same size, so with uniform item sizes the view lays out any
+# number of rows without measuring them, and only paints the cards on
+# screen.
+class ItemCardDelegate(QStyledItemDelegate):
+    CARD_SIZE = QSize(150, 170)
+
+    def __init__(self, price_col, stock_col, parent=None):
+        super().__init__(parent)
+        self.price_col = price_col
+        self.stock_col = stock_col
+
+    def sizeHint(self, option, index):
+        return self.CARD_SIZE
+
+    def paint(self, painter, option, index):
+        painter.save()
+        card = option.rect.adjusted(4, 4, -4, -4)
+        selected = option.state & QStyle.State_Selected
+        painter.setPen(QColor(BURGUNDY if selected else GRAY))
+        painter.setBrush(QColor(VERY_LIGHT_BURGUNDY if selected else WHITE))
+        painter.drawRoundedRect(card, 6, 6)
+
+        size = shelfwise_images.THUMB_SIZE
+        image = QRect(card.left() + (card.width() - size) // 2, card.top() + 6, size, size)
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap:
+            painter.drawPixmap(image.left() + (size - pixmap.width()) // 2,
+                               image.top() + (size - pixmap.height()) // 2, pixmap)
+        else:
+            painter.fillRect(image, QColor(GRAY))
+
+        model = index.model()
+        lines = (index.data(), model.index(index.row(), self.price_col).data(),
+                 f"{model.index(index.row(), self.stock_col).data()} left")
+        metrics = option.fontMetrics
+        painter.setPen(QColor(DARK_TEXT))
+        y = image.bottom() + 4
+        for line in lines:
+            painter.drawText(QRect(card.left() + 6, y, card.width() - 12, metrics.height()), Qt.AlignHCenter,
+                             metrics.elidedText(line, Qt.ElideRight, card.width() - 12))
+            y += metrics.height()
+        painter.restore()
+
+# A ViewTableModel in a table, with a filter box over every column.
+# Clicking a header sorts by that column; text typed in a box narrows the
+# rows (anywhere in text columns, "5" or ">5" style in number columns).
+# Other views of the same model can be added with add_view() and shown
+# instead of the table; they page, sort and filter along with it. Once
+# set_user() has been called, the sort, filters and view shown are saved
+# for that user whenever they change and come back the next time.
+class ViewTable(QWidget):
+    FILTER_DELAY = 300
+
+    def __init__(self, store, view, spec, headers, formatters=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.settings_user_id = None
+        self.model = ViewTableModel(store, view, spec, headers, formatters, self)
+        self.model.failed.connect(self.show_error)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        # Typing restarts the timer, so the query runs once typing pauses
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setObjectName(f"Filter {view}")
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(self.FILTER_DELAY)
+        self.filter_timer.timeout.connect(self.apply_filters)
+        filters_layout = QHBoxLayout()
+        self.filter_edits = []
+        for header in headers:
+            edit = QLineEdit()
+            edit.setPlaceholderText(header)
+            edit.setClearButtonEnabled(True)
+            edit.textChanged.connect(self.filter_timer.start)
+            filters_layout.addWidget(edit)
+            self.filter_edits.append(edit)
+        layout.addLayout(filters_layout)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setSelectionBehavior(self.table.SelectRows)
+        header = self.table.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        header.sortIndicatorChanged.connect(self.sort)
+        self.views = QStackedWidget()
+        self.views.addWidget(self.table)
+        layout.addWidget(self.views)
+
+    def show_error(self, message):
+        QMessageBox.critical(self, "Database Error", f"Failed to load rows: {message}")
+
+    # Another view of the model, e.g. a gallery; returns its number for
+    # show_view() (the table is 0)
+    def add_view(self, view):
+        view.setModel(self.model)
+        return self.views.addWidget(view)
+
+    def show_view(self, number):
+        self.views.setCurrentIndex(number)
+        self.save_settings()
+
+    # The row selected in the view shown, or None
+    def selected_row(self):
+        indexes = self.views.currentWidget().selectionModel().selectedIndexes()
+        return indexes[0].row() if indexes else None
+
+    def reload(self):
+        try:
+            self.model.load()
+        except self.store.Error as e:
+            self.show_error(str(e))
+
+    def sort(self, column, order):
+        self.model.sort_by = [[self.model.rows.names[column], "desc" if order == Qt.DescendingOrder else "asc"]]
+        self.reload()
+        self.save_settings()
+
+    # Filters from the boxes; a number box that doesn't parse is ignored and shown in red
+    def parse_filters(self):
+        filters = []
+        for edit, name, kind in zip(self.filter_edits, self.model.rows.names, self.model.rows.kinds):
+            text = edit.text().strip()
+            edit.setStyleSheet("")
+            if not text:
+                continue
+            if kind in ("i", "f"):
+                match = NUMBER_FILTER.match(text)
+                if not match:
+                    edit.setStyleSheet(f"color: {RED};")
+                    continue
+                number = float(match.group(2)) if kind == "f" or "." in match.group(2) else int(match.group(2))
+                filters.append([name, match.group(1) or "=", number])
+            else:
+                filters.append([name, "contains", text])
+        return filters
+
+    def apply_filters(self):
+        self.model.filters = self.parse_filters()
+        self.reload()
+        self.save_settings()
+
+    def settings(self):
+        return {"sort": self.model.sort_by,
+                "filters": {name: edit.text() for name, edit in zip(self.model.rows.names, self.filter_edits)
+                            if edit.text()},
+                "view": self.views.currentIndex()}
+
+    def save_settings(self):
+        if self.settings_user_id is None:
+            return
+        try:
+            self.store.save_view_settings(self.settings_user_id, self.model.view, self.settings())
+        except self.store.Error:
+            # Only a convenience; the view itself is fine
+            pass
+
+    # Show the view the way user_id last left it; the caller loads it
+    def set_user(self, user_id):
+        self.settings_user_id = user_id
+        try:
+            settings = self.store.get_view_settings(user_id, self.model.view) or {}
+        except self.store.Error:
+            settings = {}
+        names = self.model.rows.names
+        filters = settings.get("filters", {})
+        for name, edit in zip(names, self.filter_edits):
+            edit.blockSignals(True)
+            edit.setText(filters.get(name, ""))
+            edit.blockSignals(False)
+        self.model.filters = self.parse_filters()
+        self.model.sort_by = [[name, direction] for name, direction in settings.get("sort", []) if name in names]
+        view = settings.get("view", 0)
+        self.views.setCurrentIndex(view if 0 <= view < self.views.count() else 0)
+        header = self.table.horizontalHeader()
+        header.blockSignals(True)
+        if self.model.sort_by:
+            name, direction = self.model.sort_by[0]
+            header.setSortIndicator(names.index(name), Qt.DescendingOrder if direction == "desc" else Qt.AscendingOrder)
+        else:
+            header.setSortIndicator(-1, Qt.AscendingOrder)
+        header.blockSignals(False)
+
+class AddEditUserDialog(QDialog):
+    # roles: (RoleID, RoleName) of the roles the user can be given
+    def __init__(self, parent=None, user_data=None, roles=()):
+        super().__init__(parent)
+        self.setWindowTitle("Add User" if user_data is None else "Edit User")
+        # Remove the question mark from the title bar
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.user_data = user_data
+        self.roles = roles
+        self.setup_ui()
+        if user_data:
+            self.load_data(user_data)
+
+    def setup_ui(self):
+        self.layout = QFormLayout(self)
+        self.first_name_edit = QLineEdit()
+        self.last_name_edit = QLineEdit()
+        self.username_edit = QLineEdit()
+        self.password_edit = QLineEdit()
+        self.password_edit.setEchoMode(QLineEdit.Password)
+        self.email_edit = QLineEdit()
+        self.date_joined = QDateEdit()
+        self.date_joined.setDate(QDate.currentDate())
+        # Store managers can't be made here, only the roles passed in
+        self.role_combo = QComboBox()
+        for role_id, role_name in self.roles:
+            self.role_combo.addItem(role_name, role_id)
+        self.role_combo.setCurrentIndex(max(self.role_combo.findData(ROLE_COLLECTOR), 0))
+
+        self.layout.addRow("First Name:", self.first_name_edit)
+        self.layout.addRow("Last Name:", self.last_name_edit)
+        self.layout.addRow("Username:", self.username_edit)
+        self.layout.addRow("Password:", self.password_edit)
+        self.layout.addRow("Email:", self.email_edit)
+        self.layout.addRow("Date Joined:", self.date_joined)
+        self.layout.addRow("Role:", self.role_combo)
+
+        self.buttons_layout = QHBoxLayout()
+        self.save_btn = QPushButton("Save")
+        self.cancel_btn = QPushButton("Cancel")
+        self.buttons_layout.addWidget(self.save_btn)
+        self.buttons_layout.addWidget(self.cancel_btn)
+        self.layout.addRow(self.buttons_layout)
+
+        self.save_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+
+    def load_data(self, user_data):
+        user_id, first_name, last_name, username, email, date_joined, role_id = user_data
+        self.first_name_edit.setText(first_name or "")
+        self.last_name_edit.setText(last_name or "")
+        self.username_edit.setText(username)
+        # Passwords aren't read back; a blank one is left as it is
+        self.password_edit.setPlaceholderText("Leave blank to keep the current one")
+        self.email_edit.setText(email or "")
+        if date_joined:
+            self.date_joined.setDate(QDate.fromString(date_joined, "yyyy-MM-dd"))
+        if self.role_combo.findData(role_id) >= 0:
+            self.role_combo.setCurrentIndex(self.role_combo.findData(role_id))
+
+    def get_data(self):
+        first_name = self.first_name_edit.text().strip()
+        last_name = self.last_name_edit.text().strip()
+        username = self.username_edit.text().strip()
+        password = self.password_edit.text().strip()
+        email = self.email_edit.text().strip()
+        date_joined = self.date_joined.date().toString("yyyy-MM-dd")
+        role_id = self.role_combo.currentData()
+        if role_id is None:
+            role_id = ROLE_COLLECTOR
+        return first_name, last_name, username, password, email, date_joined, role_id
+
+class AddCollectionDialog(QDialog):
+    def __init__(self, parent=None, collection_data=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add Collection" if collection_data is None else "Edit Collection")
+        # Remove the question mark from the title bar
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.collection_data = collection_data
+        self.setup_ui()
+        if collection_data:
+            self.load_data(collection_data)
+
+    def setup_ui(self):
+        self.layout = QFormLayout(self)
+        self.name_edit = QLineEdit()
+        self.desc_edit = QLineEdit()
+        
+        self.layout.addRow("Name:", self.name_edit)
+        self.layout.addRow("Description:", self.desc_edit)
+
+        self.buttons_layout = QHBoxLayout()
+        self.save_btn = QPushButton("Save")
+        self.cancel_btn = QPushButton("Cancel")
+        self.buttons_layout.addWidget(self.save_btn)
+        self.buttons_layout.addWidget(self.cancel_btn)
+        self.layout.addRow(self.buttons_layout)
+
+        self.save_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+
+    def load_data(self, collection_data):
+        collection_id, name, desc = collection_data
+        self.name_edit.setText(name)
+        self.desc_edit.setText(desc if desc else "")
+
+    def get_data(self):
+        name = self.name_edit.text().strip()
+        desc = self.desc_edit.text().strip()
+        return name, desc
+
+class AddItemDialog(QDialog):
+    def __init__(self, store, parent=None, item_data=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add Item" if item_data is None else "Edit Item")
+        # Remove the question mark from the title bar
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.item_data = item_data
+        self.store = store
+        self.setup_ui()
+        if item_data:
+            self.load_data(item_data)
+
+    def setup_ui(self):
+        self.layout = QFormLayout(self)
+        
+        self.collection_combo = QComboBox()
+        self.load_collections()
+        
+        self.name_edit = QLineEdit()
+        self.desc_edit = QLineEdit()
+        self.price_spin = QDoubleSpinBox()
+        self.price_spin.setMinimum(0.0)
+        self.price_spin.setMaximum(999999.99)
+        self.price_spin.setDecimals(2)
+        self.price_spin.setPrefix(load_currency_rates(self).get(None).symbol)
+        
+        self.stock_spin = QSpinBox()
+        self.stock_spin.setMinimum(0)
+        self.stock_spin.setMaximum(999999)
+        
+        self.layout.addRow("Collection:", self.collection_combo)
+        self.layout.addRow("Name:", self.name_edit)
+        self.layout.addRow("Description:", self.desc_edit)
+        self.layout.addRow("Price:", self.price_spin)
+        self.layout.addRow("Stock Quantity:", self.stock_spin)
+
+        self.buttons_layout = QHBoxLayout()
+        self.save_btn = QPushButton("Save")
+        self.cancel_btn = QPushButton("Cancel")
+        self.buttons_layout.addWidget(self.save_btn)
+        self.buttons_layout.addWidget(self.cancel_btn)
+        self.layout.addRow(self.buttons_layout)
+
+        self.save_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+
+    def load_collections(self):
+        for col_id, col_name, desc in self.store.list_collections(by_name=True):
+            self.collection_combo.addItem(col_name, col_id)
+
+    def load_data(self, item_data):
+        item_id, collection_id, name, desc, price, stock = item_data
+        
+        # Set collection
+        for i in range(self.collection_combo.count()):
+            if self.collection_combo.itemData(i) == collection_id:
+                self.collection_combo.setCurrentIndex(i)
+                break
+        
+        self.name_edit.setText(name)
+        self.desc_edit.setText(desc if desc else "")
+        self.price_spin.setValue(price)
+        self.stock_spin.setValue(stock)
+
+    def get_data(self):
+        collection_id = self.collection_combo.currentData()
+        name = self.name_edit.text().strip()
+        desc = self.desc_edit.text().strip()
+        price = self.price_spin.value()
+        stock = self.stock_spin.value()
+        return collection_id, name, desc, price, stock
+
+class PriceHistoryDialog(QDialog):
+    def __init__(self, store, item_id, item_name, format_price, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Price History - {item_name}")
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.resize(400, 300)
+        layout = QVBoxLayout(self)
+
+        rows = list(store.list_price_history(item_id))
+        self.table = QTableWidget(len(rows), 2)
+        self.table.setHorizontalHeaderLabels(["Price", "Changed"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        for i, (price, changed_at) in enumerate(rows):
+            self.table.setItem(i, 0, QTableWidgetItem(format_price(price)))
+            self.table.setItem(i, 1, QTableWidgetItem(changed_at))
+        layout.addWidget(self.table)
+
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
+
+# Pairs of items or users that look like the same one entered twice
+# (shelfwise_dedupe), offered for merging. merge(keep_id, drop_id) does the
+# merge and returns whether it went through; names maps ids to how they are
+# shown.
+class DuplicatesDialog(QDialog):
+    def __init__(self, title, pairs, names, merge, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.resize(700, 400)
+        self.pairs = list(pairs)
+        self.names = names
+        self.merge = merge
+        # Whether anything was merged, so the tables need reloading
+        self.merged = False
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Match", "First", "Second"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+        self.fill()
+
+        btn_layout = QHBoxLayout()
+        keep_first_btn = QPushButton("Keep First")
+        keep_second_btn = QPushButton("Keep Second")
+        close_btn = QPushButton("Close")
+        keep_first_btn.clicked.connect(lambda: self.keep(0))
+        keep_second_btn.clicked.connect(lambda: self.keep(1))
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(keep_first_btn)
+        btn_layout.addWidget(keep_second_btn)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+    def fill(self):
+        self.table.setRowCount(len(self.pairs))
+        for i, (score, first, second) in enumerate(self.pairs):
+            self.table.setItem(i, 0, QTableWidgetItem(f"{score:.0%}"))
+            self.table.setItem(i, 1, QTableWidgetItem(self.names[first]))
+            self.table.setItem(i, 2, QTableWidgetItem(self.names[second]))
+
+    # Merge the selected pair into its first (side 0) or second one
+    def keep(self, side):
+        selected_rows = self.table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select a pair first.")
+            return
+        score, first, second = self.pairs[selected_rows[0].row()]
+        keep_id, drop_id = (first, second) if side == 0 else (second, first)
+        confirm = QMessageBox.question(self, "Confirm Merge",
+                                       f"Merge {self.names[drop_id]} into {self.names[keep_id]}?\n"
+                                       f"{self.names[drop_id]} will be deleted.",
+                                       QMessageBox.Yes | QMessageBox.No)
+        if confirm != QMessageBox.Yes or not self.merge(keep_id, drop_id):
+            return
+        self.merged = True
+        # Other pairs with the deleted one are settled now
+        self.pairs = [pair for pair in self.pairs if drop_id not in pair[1:]]
+        self.fill()
+
+class EditUserItemDialog(QDialog):
+    def __init__(self, store, parent=None, user_item_data=None, store_id=DEFAULT_STORE):
+        super().__init__(parent)
+        self.setWindowTitle("Edit User Item")
+        # Remove the question mark from the title bar
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.user_item_data = user_item_data
+        self.store = store
+        self.store_id = store_id
+        self.setup_ui()
+        if user_item_data:
+            self.load_data(user_item_data)
+
+    def setup_ui(self):
+        self.layout = QFormLayout(self)
+        
+        # Quantity field
+        self.quantity_spin = QSpinBox()
+        self.quantity_spin.setMinimum(1)
+        self.quantity_spin.setMaximum(999)
+        
+        self.layout.addRow("Quantity:", self.quantity_spin)
+
+        # Buttons
+        self.buttons_layout = QHBoxLayout()
+        self.save_btn = QPushButton("Save")
+        self.cancel_btn = QPushButton("Cancel")
+        self.buttons_layout.addWidget(self.save_btn)
+        self.buttons_layout.addWidget(self.cancel_btn)
+        self.layout.addRow(self.buttons_layout)
+
+        self.save_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+
+    def load_data(self, user_item_data):
+        ui_id, user_id, item_id, date_added, quantity = user_item_data
+        
+        # Set max quantity based on available stock
+        item = self.store.get_item(item_id, store_id=self.store_id)
+        if item:
+            max_stock = item[5]
+            self.quantity_spin.setMaximum(max_stock)
+        
+        self.quantity_spin.setValue(quantity)
+
+    def get_data(self):
+        quantity = self.quantity_spin.value()
+        return quantity
+
+# New dialog for admin to add item to user
+# A picker for long lists: typing shows the best matches from a Typeahead
+# (shelfwise_typeahead) in a popup, and choosing one picks its value.
+# Editing the text again unpicks it.
+class TypeaheadEdit(QLineEdit):
+    # The value picked, or None
+    picked = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.index = Typeahead()
+        self.value = None
+        # Values of the matches shown, by row
+        self.matches = []
+        self.completer_model = QStringListModel(self)
+        # Set on the widget rather than with setCompleter, so the popup
+        # shows the matches as ranked here instead of filtering them again
+        self.completer = QCompleter(self.completer_model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setWidget(self)
+        self.completer.activated[QModelIndex].connect(lambda index: self.pick(self.matches[index.row()]))
+        self.textEdited.connect(self.show_matches)
+        self.returnPressed.connect(self.pick_first)
+
+    def set_index(self, index):
+        self.index = index
+        self.setText("")
+        self.set_value(None)
+
+    def set_value(self, value):
+        if value != self.value:
+            self.value = value
+            self.picked.emit(value)
+
+    # Pick value if the index has it; returns whether it does
+    def pick(self, value):
+        label = self.index.label(value)
+        if label is None:
+            return False
+        self.setText(label)
+        self.completer.popup().hide()
+        self.set_value(value)
+        return True
+
+    def pick_first(self):
+        if self.value is None and self.matches:
+            self.pick(self.matches[0])
+
+    def show_matches(self, text=None):
+        self.set_value(None)
+        matches = self.index.matches(self.text() if text is None else text)
+        self.matches = [value for value, label in matches]
+        self.completer_model.setStringList([label for value, label in matches])
+        if matches:
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    # Clicking into an empty box lists the first entries, as a combo would
+    def mousePressEvent(self, event):
+        super().mousePressEvent(event)
+        if self.value is None and not self.text():
+            self.show_matches()
+
+class AddItemToUserDialog(QDialog):
+    def __init__(self, store, parent=None, store_id=DEFAULT_STORE, skus=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add Item To User")
+        # Remove the question mark from the title bar
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.store = store
+        # Items are offered, and taken, from this store's stock
+        self.store_id = store_id
+        # Resolves scanned barcodes (see shelfwise_sku)
+        self.skus = skus or SkuIndex(store)
+        self.burst = ScanBurst()
+        self.setup_ui()
+
+    def setup_ui(self):
+        self.layout = QFormLayout(self)
+        
+        # User and item are picked by typing part of their name; there can
+        # be too many of either for a combo box
+        self.user_edit = TypeaheadEdit()
+        self.user_edit.setPlaceholderText("Type a username or name")
+        self.load_users()
+
+        # Scanning an item's barcode picks it; scanning it again adds one.
+        # A burst without Enter is looked up once the scanner goes quiet.
+        self.scan_edit = QLineEdit()
+        self.scan_edit.setPlaceholderText("Scan or type a SKU and press Enter")
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setObjectName("Scan")
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.setInterval(int(ScanBurst.GAP * 1000) * 2)
+        
+        # Collection selection (new)
+        self.collection_combo = QComboBox()
+        self.load_collections()
+        
+        # Item selection (modified to be dependent on collection)
+        self.item_edit = TypeaheadEdit()
+        self.item_edit.setPlaceholderText("Type part of the item's name")
+        # item_id -> stock, for the collection's items
+        self.item_stock = {}
+        
+        # Quantity field
+        self.quantity_spin = QSpinBox()
+        self.quantity_spin.setMinimum(1)
+        self.quantity_spin.setMaximum(1)  # Will be updated based on selected item
+        self.quantity_spin.setValue(1)
+        
+        self.layout.addRow("User:", self.user_edit)
+        self.layout.addRow("Scan:", self.scan_edit)
+        self.layout.addRow("Collection:", self.collection_combo)
+        self.layout.addRow("Item:", self.item_edit)
+        self.layout.addRow("Quantity:", self.quantity_spin)
+
+        # Buttons
+        self.buttons_layout = QHBoxLayout()
+        self.save_btn = QPushButton("Add")
+        self.cancel_btn = QPushButton("Cancel")
+        # The Enter that ends a scan mustn't press Add
+        for button in (self.save_btn, self.cancel_btn):
+            button.setAutoDefault(False)
+        self.buttons_layout.addWidget(self.save_btn)
+        self.buttons_layout.addWidget(self.cancel_btn)
+        self.layout.addRow(self.buttons_layout)
+
+        # Connect signals
+        self.collection_combo.currentIndexChanged.connect(self.update_items)
+        self.item_edit.picked.connect(self.update_max_quantity)
+        self.scan_edit.returnPressed.connect(self.scan)
+        self.scan_edit.textEdited.connect(self.scan_edited)
+        self.scan_timer.timeout.connect(lambda: self.scan(cached_only=True))
+        
+        self.save_btn.clicked.connect(self.save)
+        self.cancel_btn.clicked.connect(self.reject)
+        
+        # Load initial items based on first collection
+        self.update_items()
+        self.scan_edit.setFocus()
+
+    def scan_edited(self, text):
+        if self.burst.edited(text):
+            self.scan_timer.start()
+        else:
+            self.scan_timer.stop()
+
+    # Pick the item whose barcode is in the scan box. cached_only is for a
+    # burst that ended without Enter: if it isn't a known code, it's left
+    # for Enter.
+    def scan(self, cached_only=False):
+        self.scan_timer.stop()
+        code = self.scan_edit.text().strip()
+        try:
+            found = self.skus.lookup(code, cached_only)
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to look up SKU: {str(e)}")
+            return
+        if found is None:
+            if not cached_only and code:
+                self.scan_edit.clear()
+                QMessageBox.warning(self, "Error", f"No item has SKU {code}.")
+            return
+        self.scan_edit.clear()
+        item_id, collection_id = found
+        if self.item_edit.value == item_id:
+            if self.quantity_spin.value() < self.quantity_spin.maximum():
+                self.quantity_spin.setValue(self.quantity_spin.value() + 1)
+            else:
+                QMessageBox.warning(self, "Error", "No more of this item in stock.")
+            return
+        self.collection_combo.setCurrentIndex(self.collection_combo.findData(collection_id))
+        if not self.item_edit.pick(item_id):
+            QMessageBox.warning(self, "Error", f"Item with SKU {code} is out of stock here.")
+            return
+        self.quantity_spin.setValue(1)
+
+    def load_users(self):
+        # Only collectors hold items
+        users = []
+        for user_id, first_name, last_name, username, *rest in self.store.list_users(role_id=ROLE_COLLECTOR):
+            display_name = f"{username}"
+            if first_name or last_name:
+                display_name += f" ({first_name} {last_name})".strip()
+            users.append((user_id, display_name, None))
+        self.user_edit.set_index(Typeahead(users))
+
+    def load_collections(self):
+        for col_id, col_name, desc in self.store.list_collections(by_name=True):
+            self.collection_combo.addItem(col_name, col_id)
+
+    def update_items(self):
+        # Get selected collection ID
+        collection_id = self.collection_combo.currentData()
+        items = []
+        self.item_stock = {}
+        if collection_id is not None:
+            for item_id, item_name, stock in self.store.list_stocked_items(collection_id, store_id=self.store_id):
+                items.append((item_id, f"{item_name} - Stock: {stock}", item_name))
+                self.item_stock[item_id] = stock
+        self.item_edit.set_index(Typeahead(items))
+        self.update_max_quantity()
+
+    def update_max_quantity(self):
+        stock = self.item_stock.get(self.item_edit.value)
+        if stock is None:
+            self.quantity_spin.setMaximum(1)
+            self.quantity_spin.setValue(1)
+            return
+        self.quantity_spin.setMaximum(stock)
+
+    def save(self):
+        if self.user_edit.value is None or self.item_edit.value is None:
+            QMessageBox.warning(self, "Error", "Pick a user and an item from the lists.")
+            return
+        self.accept()
+
+    def get_data(self):
+        user_id = self.user_edit.value
+        item_id = self.item_edit.value
+        quantity = self.quantity_spin.value()
+        return user_id, item_id, quantity
+    
+class AdminTab(QWidget):
+    def __init__(self, store, logout_callback, sessions=None, store_id=DEFAULT_STORE):
+        super().__init__()
+        self.store = store
+        self.logout_callback = logout_callback
+        self.sessions = sessions
+        # The store this terminal is in; stock, reorder levels and the low
+        # stock list are its own
+        self.store_id = store_id
+        # The admin logged in, who changes are recorded against, and what
+        # their role allows
+        self.user_id = None
+        self.permissions = Permission(0)
+        # Barcodes for scanning items in Add Item To User
+        self.skus = SkuIndex(store)
+        # Comparing for Find Duplicates, while it runs
+        self.duplicate_search = None
+        # The tables are loaded once an admin logs in (a server answers no
+        # one before that)
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        
+        # Add a non-clickable role indicator tab
+        self.role_label = QLabel("ADMIN")
+        self.role_label.setStyleSheet(f"background-color: {BURGUNDY}; color: {WHITE}; font-weight: bold; padding: 8px; border-radius: 5px;")
+        self.role_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.role_label)
+        
+        self.tabs = QTabWidget()
+        layout.addWidget(self.tabs)
+
+        # Account tab for user management
+        self.account_tab = QWidget()
+        self.account_layout = QVBoxLayout(self.account_tab)
+
+        # User table
+        self.users_view = ViewTable(self.store, "users", USER_COLUMNS,
+                                    ["ID", "First Name", "Last Name", "Username", "Email", "Date Joined", "Role"])
+        self.users_model = self.users_view.model
+        self.user_table = self.users_view.table
+        self.account_layout.addWidget(self.users_view)
+
+        # User buttons
+        user_btn_layout = QHBoxLayout()
+        self.add_user_btn = QPushButton("Add User")
+        self.edit_user_btn = QPushButton("Edit User")
+        self.delete_user_btn = QPushButton("Delete User")
+        self.duplicate_users_btn = QPushButton("Find Duplicates")
+        self.logout_btn_users = QPushButton("Logout")
+        self.logout_btn_users.setObjectName("logoutButton")
+        user_btn_layout.addWidget(self.add_user_btn)
+        user_btn_layout.addWidget(self.edit_user_btn)
+        user_btn_layout.addWidget(self.delete_user_btn)
+        user_btn_layout.addWidget(self.duplicate_users_btn)
+        user_btn_layout.addWidget(self.logout_btn_users)
+        self.account_layout.addLayout(user_btn_layout)
+
+        self.tabs.addTab(self.account_tab, "Users")
+        
+        # Collections tab
+        self.collections_tab = QWidget()
+        self.collections_layout = QVBoxLayout(self.collections_tab)
+        
+        # Collections table
+        self.collections_table = QTableWidget()
+        self.collections_table.setColumnCount(3)
+        self.collections_table.setHorizontalHeaderLabels(["ID", "Name", "Description"])
+        self.collections_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.collections_table.setSelectionBehavior(self.collections_table.SelectRows)
+        self.collections_layout.addWidget(self.collections_table)
+        
+        # Collections buttons
+        collections_btn_layout = QHBoxLayout()
+        self.add_collection_btn = QPushButton("Add Collection")
+        self.edit_collection_btn = QPushButton("Edit Collection")
+        self.delete_collection_btn = QPushButton("Delete Collection")
+        self.logout_btn_collections = QPushButton("Logout")
+        self.logout_btn_collections.setObjectName("logoutButton")
+        collections_btn_layout.addWidget(self.add_collection_btn)
+        collections_btn_layout.addWidget(self.edit_collection_btn)
+        collections_btn_layout.addWidget(self.delete_collection_btn)
+        collections_btn_layout.addWidget(self.logout_btn_collections)
+        self.collections_layout.addLayout(collections_btn_layout)
+        
+        self.tabs.addTab(self.collections_tab, "Collections")
+
+        # Items tab
+        self.items_tab = QWidget()
+        self.items_layout = QVBoxLayout(self.items_tab)
+
+        # Items table
+        # Admin screens show prices as entered, in the base currency
+        self.format_price = load_currency_rates(self).formatter()
+        self.items_view = ViewTable(self.store, "items", ITEM_COLUMNS,
+                                    ["ID", "Collection", "Name", "Description", "Price", "Stock", "SKU"],
+                                    {4: self.format_price})
+        self.items_model = self.items_view.model
+        self.items_model.store_id = self.store_id
+        self.items_table = self.items_view.table
+        self.items_layout.addWidget(self.items_view)
+
+        # Items buttons
+        items_btn_layout = QHBoxLayout()
+        self.add_item_btn = QPushButton("Add Item")
+        self.edit_item_btn = QPushButton("Edit Item")
+        self.delete_item_btn = QPushButton("Delete Item")
+        self.reorder_level_btn = QPushButton("Set Reorder Level")
+        self.item_image_btn = QPushButton("Set Picture")
+        self.item_sku_btn = QPushButton("Set SKU")
+        self.price_history_btn = QPushButton("Price History")
+        self.duplicate_items_btn = QPushButton("Find Duplicates")
+        self.logout_btn_items = QPushButton("Logout")
+        self.logout_btn_items.setObjectName("logoutButton")
+        items_btn_layout.addWidget(self.add_item_btn)
+        items_btn_layout.addWidget(self.edit_item_btn)
+        items_btn_layout.addWidget(self.delete_item_btn)
+        items_btn_layout.addWidget(self.reorder_level_btn)
+        items_btn_layout.addWidget(self.item_image_btn)
+        items_btn_layout.addWidget(self.item_sku_btn)
+        items_btn_layout.addWidget(self.price_history_btn)
+        items_btn_layout.addWidget(self.duplicate_items_btn)
+        items_btn_layout.addWidget(self.logout_btn_items)
+        self.items_layout.addLayout(items_btn_layout)
+
+        self.tabs.addTab(self.items_tab, "Items")
+        
+        # User Items tab (modified)
+        self.user_items_tab = QWidget()
+        self.user_items_layout = QVBoxLayout(self.user_items_tab)
+        
+        # User selection for filtering
+        user_filter_layout = QHBoxLayout()
+        user_filter_label = QLabel("Select User:")
+        self.user_filter_combo = QComboBox()
+        self.user_filter_combo.addItem("All Users", None)
+        user_filter_layout.addWidget(user_filter_label)
+        user_filter_layout.addWidget(self.user_filter_combo)
+        user_filter_layout.addStretch()
+        self.user_items_layout.addLayout(user_filter_layout)
+
+        # User Items table
+        self.user_items_view = ViewTable(self.store, "user_items", USER_ITEM_COLUMNS,
+                                         ["ID", "User", "Item Name", "Collection", "Date Added", "Item Price", "Quantity"],
+                                         {5: self.format_price})
+        self.user_items_model = self.user_items_view.model
+        self.user_items_table = self.user_items_view.table
+        self.user_items_layout.addWidget(self.user_items_view)
+        
+        # User Items buttons
+        user_items_btn_layout = QHBoxLayout()
+        self.edit_user_item_btn = QPushButton("Edit Item Quantity")
+        self.add_item_to_user_btn = QPushButton("Add Item To User")  # New button
+        self.logout_btn_user_items = QPushButton("Logout")
+        self.logout_btn_user_items.setObjectName("logoutButton")
+        user_items_btn_layout.addWidget(self.edit_user_item_btn)
+        user_items_btn_layout.addWidget(self.add_item_to_user_btn)  # Add the new button
+        user_items_btn_layout.addWidget(self.logout_btn_user_items)
+        self.user_items_layout.addLayout(user_items_btn_layout)
+        
+        self.tabs.addTab(self.user_items_tab, "User Items")
+
+        # Low Stock tab: items at or below their reorder level, kept up to
+        # date by the database so it loads instantly however many items there are
+        self.low_stock_tab = QWidget()
+        self.low_stock_layout = QVBoxLayout(self.low_stock_tab)
+        self.low_stock_model = ColumnarTableModel(LOW_STOCK_COLUMNS,
+                                                  ["ID", "Item", "Collection", "Stock", "Reorder Level",
+                                                   f"Acquired ({ShelfwiseStore.VELOCITY_DAYS} days)",
+                                                   "Suggested Order"])
+        self.low_stock_table = QTableView()
+        self.low_stock_table.setModel(self.low_stock_model)
+        self.low_stock_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.low_stock_table.setSelectionBehavior(self.low_stock_table.SelectRows)
+        self.low_stock_layout.addWidget(self.low_stock_table)
+
+        low_stock_btn_layout = QHBoxLayout()
+        self.low_stock_level_btn = QPushButton("Set Reorder Level")
+        self.refresh_low_stock_btn = QPushButton("Refresh")
+        self.logout_btn_low_stock = QPushButton("Logout")
+        self.logout_btn_low_stock.setObjectName("logoutButton")
+        low_stock_btn_layout.addWidget(self.low_stock_level_btn)
+        low_stock_btn_layout.addWidget(self.refresh_low_stock_btn)
+        low_stock_btn_layout.addWidget(self.logout_btn_low_stock)
+        self.low_stock_layout.addLayout(low_stock_btn_layout)
+
+        self.tabs.addTab(self.low_stock_tab, "Low Stock")
+
+        # Connect buttons
+        self.add_user_btn.clicked.connect(self.add_user)
+        self.edit_user_btn.clicked.connect(self.edit_user)
+        self.delete_user_btn.clicked.connect(self.delete_user)
+        self.duplicate_users_btn.clicked.connect(lambda: self.find_duplicates("users"))
+        
+        self.add_collection_btn.clicked.connect(self.add_collection)
+        self.edit_collection_btn.clicked.connect(self.edit_collection)
+        self.delete_collection_btn.clicked.connect(self.delete_collection)
+
+        self.add_item_btn.clicked.connect(self.add_item)
+        self.edit_item_btn.clicked.connect(self.edit_item)
+        self.delete_item_btn.clicked.connect(self.delete_item)
+        self.reorder_level_btn.clicked.connect(
+            lambda: self.set_reorder_level(self.items_table, self.items_model))
+        self.low_stock_level_btn.clicked.connect(
+            lambda: self.set_reorder_level(self.low_stock_table, self.low_stock_model))
+        self.refresh_low_stock_btn.clicked.connect(self.load_low_stock)
+        self.item_image_btn.clicked.connect(self.set_item_image)
+        self.item_sku_btn.clicked.connect(self.set_item_sku)
+        self.price_history_btn.clicked.connect(self.show_price_history)
+        self.duplicate_items_btn.clicked.connect(lambda: self.find_duplicates("items"))
+        
+        self.edit_user_item_btn.clicked.connect(self.edit_user_item)
+        self.add_item_to_user_btn.clicked.connect(self.add_item_to_user)  # Connect the new button
+        self.user_filter_combo.currentIndexChanged.connect(self.load_user_items)
+        
+        # Connect all logout buttons
+        self.logout_btn_users.clicked.connect(self.confirm_logout)
+        self.logout_btn_collections.clicked.connect(self.confirm_logout)
+        self.logout_btn_items.clicked.connect(self.confirm_logout)
+        self.logout_btn_user_items.clicked.connect(self.confirm_logout)
+        self.logout_btn_low_stock.clicked.connect(self.confirm_logout)
+
+        # Buttons that need more than getting into the admin pages
+        self.permission_buttons = {
+            Permission.MANAGE_USERS: (self.add_user_btn, self.edit_user_btn, self.delete_user_btn,
+                                      self.duplicate_users_btn),
+            Permission.MANAGE_CATALOG: (self.add_collection_btn, self.edit_collection_btn, self.delete_collection_btn,
+                                        self.add_item_btn, self.edit_item_btn, self.delete_item_btn,
+                                        self.item_image_btn, self.item_sku_btn, self.duplicate_items_btn),
+            Permission.MANAGE_STOCK: (self.reorder_level_btn, self.low_stock_level_btn),
+            Permission.MANAGE_HOLDINGS: (self.edit_user_item_btn, self.add_item_to_user_btn),
+        }
+
+    # What the logged-in admin's role allows (Permission bits, resolved at
+    # login); buttons for the rest are disabled, and the Users page is
+    # hidden without MANAGE_USERS
+    def set_permissions(self, permissions):
+        self.permissions = Permission(permissions)
+        for permission, buttons in self.permission_buttons.items():
+            for button in buttons:
+                button.setEnabled(permission in self.permissions)
+        self.tabs.setTabVisible(self.tabs.indexOf(self.account_tab), Permission.MANAGE_USERS in self.permissions)
+
+    # Checked by each action as well as by its button being enabled
+    def allowed(self, permission):
+        if permission in self.permissions:
+            return True
+        QMessageBox.warning(self, "Error", "Your role doesn't allow this.")
+        return False
+
+    # Sorting and filters of the tables are saved for this admin
+    def set_user(self, user_id):
+        self.user_id = user_id
+        for view in (self.users_view, self.items_view, self.user_items_view):
+            view.set_user(user_id)
+
+    def refresh(self):
+        # Barcodes may have changed on other terminals
+        self.skus.invalidate()
+        # Ask for all the listings up front so a remote store needs one round trip
+        self.user_items_model.extra_filters = self.user_items_filters()
+        self.store.prefetch([("list_users", {}), ("list_collections", {}),
+                             ("list_low_stock", {"store_id": self.store_id}),
+                             self.users_model.call(), self.items_model.call(), self.user_items_model.call()])
+        self.load_users()
+        self.load_collections()
+        self.load_items()
+        self.load_user_items()
+
+    def load_users(self):
+        self.users_view.reload()
+        try:
+            rows = list(self.store.list_users())
+            
+            # Clear and repopulate user filter combo
+            self.user_filter_combo.clear()
+            self.user_filter_combo.addItem("All Users", None)
+            
+            for row in rows:
+                user_id, first_name, last_name, username, email, date_joined, role_id = row
+                
+                # Add to user filter combo
+                display_name = f"{username} ({first_name} {last_name})".strip()
+                if display_name.endswith("()"):
+                    display_name = display_name[:-3]
+                self.user_filter_combo.addItem(display_name, username)
+                
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load users: {str(e)}")
+    
+    def load_collections(self):
+        try:
+            rows = list(self.store.list_collections())
+            with ui_span("collections_table"):
+                self.collections_table.setRowCount(len(rows))
+                for i, row in enumerate(rows):
+                    col_id, name, desc = row
+                    self.collections_table.setItem(i, 0, QTableWidgetItem(str(col_id)))
+                    self.collections_table.setItem(i, 1, QTableWidgetItem(name))
+                    self.collections_table.setItem(i, 2, QTableWidgetItem(desc if desc else ""))
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load collections: {str(e)}")
+
+    def load_items(self):
+        self.items_view.reload()
+        # Stock changes move items on and off the low-stock list
+        self.load_low_stock()
+
+    def load_low_stock(self):
+        try:
+            self.low_stock_model.set_rows(ColumnarRows.from_rows(LOW_STOCK_COLUMNS,
+                                                                 self.store.list_low_stock(store_id=self.store_id)))
+            count = self.low_stock_model.rowCount()
+            self.tabs.setTabText(self.tabs.indexOf(self.low_stock_tab),
+                                 f"Low Stock ({count})" if count else "Low Stock")
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load low stock: {str(e)}")
+    
+    # Show all user items, or only those of the selected user
+    def user_items_filters(self):
+        username = self.user_filter_combo.currentData()
+        return [["Username", "=", username]] if username is not None else []
+
+    def load_user_items(self):
+        self.user_items_model.extra_filters = self.user_items_filters()
+        self.user_items_view.reload()
+
+    # Roles a user can be given here, for AddEditUserDialog
+    def managed_roles(self):
+        return [(role_id, name) for role_id, name in self.store.list_roles() if role_id in MANAGED_ROLES]
+
+    def add_user(self):
+        if not self.allowed(Permission.MANAGE_USERS):
+            return
+        try:
+            dlg = AddEditUserDialog(self, roles=self.managed_roles())
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load roles: {str(e)}")
+            return
+        if dlg.exec_() == QDialog.Accepted:
+            first_name, last_name, username, password, email, date_joined, role_id = dlg.get_data()
+            if not username or not password:
+                QMessageBox.warning(self, "Error", "Username and password cannot be empty.")
+                return
+            try:
+                user_id = self.store.add_user(first_name, last_name, username, password, email, date_joined,
+                                              role_id)
+                audit(self.user_id, "add_user", "Users", user_id, after=dict(zip(USER_FIELDS, dlg.get_data())))
+                self.load_users()
+                QMessageBox.information(self, "Success", "User added successfully!")
+            except self.store.IntegrityError:
+                QMessageBox.warning(self, "Error", "Username already exists.")
+            except self.store.Error as e:
+                QMessageBox.critical(self, "Database Error", f"Failed to add user: {str(e)}")
+
+    def edit_user(self):
+        if not self.allowed(Permission.MANAGE_USERS):
+            return
+        selected_rows = self.user_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select a user first.")
+            return
+        row = selected_rows[0].row()
+        user_id = self.users_model.row_id(row)
+        
+        try:
+            user_data = self.store.get_user(user_id)
+            
+            dlg = AddEditUserDialog(self, user_data, self.managed_roles())
+            if dlg.exec_() == QDialog.Accepted:
+                first_name, last_name, username, password, email, date_joined, role_id = dlg.get_data()
+                if not username:
+                    QMessageBox.warning(self, "Error", "Username cannot be empty.")
+                    return
+                try:
+                    self.store.update_user(user_id, first_name, last_name, username, password or None, email,
+                                           date_joined, role_id)
+                    after = dict(zip(USER_FIELDS, dlg.get_data()))
+                    if not password:
+                        del after["Password"]
+                    audit(self.user_id, "update_user", "Users", user_id, dict(zip(USER_ROW, user_data)), after)
+                    if self.sessions:
+                        self.sessions.require_password(user_id)
+                    self.load_users()
+                    QMessageBox.information(self, "Success", "User updated successfully!")
+                except self.store.IntegrityError:
+                    QMessageBox.warning(self, "Error", "Username already exists.")
+                except self.store.Error as e:
+                    QMessageBox.critical(self, "Database Error", f"Failed to update user: {str(e)}")
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load user data: {str(e)}")
+
+    def delete_user(self):
+        if not self.allowed(Permission.MANAGE_USERS):
+            return
+        selected_rows = self.user_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select a user first.")
+            return
+        row = selected_rows[0].row()
+        user_id = self.users_model.row_id(row)
+        confirm = QMessageBox.question(self, "Confirm Delete",
+                                       f"Delete user id {user_id}?",
+                                       QMessageBox.Yes | QMessageBox.No)
+        if confirm == QMessageBox.Yes:
+            try:
+                # Marks the user deleted; the user's items are purged with it later
+                self.store.delete_user(user_id)
+                audit(self.user_id, "delete_user", "Users", user_id, before=self.users_model.rows.record(row))
+                if self.sessions:
+                    self.sessions.revoke_user(user_id)
+                self.load_users()
+                self.load_user_items()
+                QMessageBox.information(self, "Success", "User deleted successfully!")
+            except self.store.Error as e:
+                QMessageBox.critical(self, "Database Error", f"Failed to delete user: {str(e)}")
+    
+    def add_collection(self):
+        if not self.allowed(Permission.MANAGE_CATALOG):
+            return
+        dlg = AddCollectionDialog(self)
+        if dlg.exec_() == QDialog.Accepted:
+            name, desc = dlg.get_data()
+            if not name:
+                QMessageBox.warning(self, "Error", "Collection name cannot be empty.")
+                return
+            try:
+                collection_id = self.store.add_collection(name, desc)
+                audit(self.user_id, "add_collection", "Collections", collection_id,
+                      after={"CollectionName": name, "Description": desc})
+                self.load_collections()
+                QMessageBox.information(self, "Success", "Collection added successfully!")
+            except self.store.IntegrityError:
+                QMessageBox.warning(self, "Error", "Collection name already exists.")
+            except self.store.Error as e:
+                QMessageBox.critical(self, "Database Error", f"Failed to add collection: {str(e)}")
+    
+    def edit_collection(self):
+        if not self.allowed(Permission.MANAGE_CATALOG):
+            return
+        selected_rows = self.collections_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select a collection first.")
+            return
+        row = selected_rows[0].row()
+        collection_id = int(self.collections_table.item(row, 0).text())
+        name = self.collections_table.item(row, 1).text()
+        desc = self.collections_table.item(row, 2).text()
+        
+        dlg = AddCollectionDialog(self, (collection_id, name, desc))
+        if dlg.exec_() == QDialog.Accepted:
+            new_name, new_desc = dlg.get_data()
+            if not new_name:
+                QMessageBox.warning(self, "Error", "Collection name cannot be empty.")
+                return
+            try:
+                self.store.update_collection(collection_id, new_name, new_desc)
+                audit(self.user_id, "update_collection", "Collections", collection_id,
+                      {"CollectionName": name, "Description": desc},
+                      {"CollectionName": new_name, "Description": new_desc})
+                self.load_collections()
+                self.load_items()
+                QMessageBox.information(self, "Success", "Collection updated successfully!")
+            except self.store.IntegrityError:
+                QMessageBox.warning(self, "Error", "Collection name already exists.")
+            except self.store.Error as e:
+                QMessageBox.critical(self, "Database Error", f"Failed to update collection: {str(e)}")
+    
+    def delete_collection(self):
+        if not self.allowed(Permission.MANAGE_CATALOG):
+            return
+        selected_rows = self.collections_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select a collection first.")
+            return
+        row = selected_rows[0].row()
+        collection_id = int(self.collections_table.item(row, 0).text())
+        
+        try:
+            # Check if collection has items
+            item_count = self.store.count_collection_items(collection_id)
+            
+            if item_count > 0:
+                QMessageBox.warning(self, "Error", 
+                                f"This collection has {item_count} items. Delete all items first.")
+                return
+                
+            confirm = QMessageBox.question(self, "Confirm Delete",
+                                        f"Delete collection id {collection_id}?",
+                                        QMessageBox.Yes | QMessageBox.No)
+            if confirm == QMessageBox.Yes:
+                self.store.delete_collection(collection_id)
+                audit(self.user_id, "delete_collection", "Collections", collection_id,
+                      before={"CollectionName": self.collections_table.item(row, 1).text(),
+                              "Description": self.collections_table.item(row, 2).text()})
+                self.load_collections()
+                QMessageBox.information(self, "Success", "Collection deleted successfully!")
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to delete collection: {str(e)}")
+
+    def add_item(self):
+        if not self.allowed(Permission.MANAGE_CATALOG):
+            return
+        dlg = AddItemDialog(self.store, self)
+        if dlg.exec_() == QDialog.Accepted:
+            collection_id, name, desc, price, stock = dlg.get_data()
+            if not name:
+                QMessageBox.warning(self, "Error", "Name cannot be empty.")
+                return
+            try:
+                item_id = self.store.add_item(collection_id, name, desc, price, stock, store_id=self.store_id)
+                audit(self.user_id, "add_item", "Items", item_id, after=dict(zip(ITEM_FIELDS, dlg.get_data())))
+                self.load_items()
+                QMessageBox.information(self, "Success", "Item added successfully!")
+            except self.store.Error as e:
+                QMessageBox.critical(self, "Database Error", f"Failed to add item: {str(e)}")
+
+    def edit_item(self):
+        if not self.allowed(Permission.MANAGE_CATALOG):
+            return
+        selected_rows = self.items_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select an item first.")
+            return
+        row = selected_rows[0].row()
+        item_id = self.items_model.row_id(row)
+        
+        try:
+            item_data = self.store.get_item(item_id, store_id=self.store_id)
+            
+            dlg = AddItemDialog(self.store, self, item_data)
+            if dlg.exec_() == QDialog.Accepted:
+                collection_id, name, desc, price, stock = dlg.get_data()
+                if not name:
+                    QMessageBox.warning(self, "Error", "Name cannot be empty.")
+                    return
+                self.store.update_item(item_id, collection_id, name, desc, price, stock, store_id=self.store_id)
+                audit(self.user_id, "update_item", "Items", item_id,
+                      dict(zip(("ItemID",) + ITEM_FIELDS, item_data)), dict(zip(ITEM_FIELDS, dlg.get_data())))
+                self.load_items()
+                self.load_user_items()
+                QMessageBox.information(self, "Success", "Item updated successfully!")
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to update item: {str(e)}")
+
+    def delete_item(self):
+        if not self.allowed(Permission.MANAGE_CATALOG):
+            return
+        selected_rows = self.items_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select an item first.")
+            return
+        row = selected_rows[0].row()
+        item_id = self.items_model.row_id(row)
+        confirm = QMessageBox.question(self, "Confirm Delete",
+                                      f"Delete item id {item_id}?",
+                                      QMessageBox.Yes | QMessageBox.No)
+        if confirm == QMessageBox.Yes:
+            try:
+                self.store.delete_item(item_id)
+                self.skus.invalidate()
+                audit(self.user_id, "delete_item", "Items", item_id, before=self.items_model.rows.record(row))
+                self.load_items()
+                self.load_user_items()
+                QMessageBox.information(self, "Success", "Item deleted successfully!")
+            except self.store.Error as e:
+                QMessageBox.critical(self, "Database Error", f"Failed to delete item: {str(e)}")
+                
+    def show_price_history(self):
+        selected_rows = self.items_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select an item first.")
+            return
+        row = selected_rows[0].row()
+        item_id = self.items_model.row_id(row)
+        try:
+            PriceHistoryDialog(self.store, item_id, self.items_model.rows.value(row, 2), self.format_price, self).exec_()
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load price history: {str(e)}")
+
+    # Point the selected item at a picture file, shown in the shop. The file
+    # has to be somewhere every terminal can open it.
+    def set_item_image(self):
+        if not self.allowed(Permission.MANAGE_CATALOG):
+            return
+        selected_rows = self.items_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select an item first.")
+            return
+        item_id = self.items_model.row_id(selected_rows[0].row())
+        try:
+            image_path = self.store.get_item_image(item_id)
+            if image_path is None:
+                QMessageBox.warning(self, "Error", "Item not found.")
+                return
+            new_path = None
+            if image_path:
+                box = QMessageBox(QMessageBox.Question, "Set Picture", f"The item's picture is {image_path}.",
+                                  QMessageBox.Cancel, self)
+                choose_btn = box.addButton("Choose Another", QMessageBox.AcceptRole)
+                remove_btn = box.addButton("Remove", QMessageBox.DestructiveRole)
+                box.exec_()
+                if box.clickedButton() is remove_btn:
+                    new_path = ""
+                elif box.clickedButton() is not choose_btn:
+                    return
+            if new_path is None:
+                new_path, _ = QFileDialog.getOpenFileName(self, "Set Picture", os.path.dirname(image_path),
+                                                          "Pictures (*.png *.jpg *.jpeg *.gif *.bmp *.webp)")
+                if not new_path:
+                    return
+            self.store.set_item_image(item_id, new_path)
+            audit(self.user_id, "set_item_image", "Items", item_id, {"ImagePath": image_path}, {"ImagePath": new_path})
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to set picture: {str(e)}")
+
+    # Give the selected item a barcode; it can be scanned into the box
+    def set_item_sku(self):
+        if not self.allowed(Permission.MANAGE_CATALOG):
+            return
+        selected_rows = self.items_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select an item first.")
+            return
+        item_id = self.items_model.row_id(selected_rows[0].row())
+        try:
+            sku = self.store.get_item_sku(item_id)
+            if sku is None:
+                QMessageBox.warning(self, "Error", "Item not found.")
+                return
+            new_sku, ok = QInputDialog.getText(self, "Set SKU", "SKU or barcode (empty for none):", text=sku)
+            new_sku = new_sku.strip()
+            if not ok or new_sku == sku:
+                return
+            self.store.set_item_sku(item_id, new_sku)
+            self.skus.invalidate()
+            audit(self.user_id, "set_item_sku", "Items", item_id, {"SKU": sku}, {"SKU": new_sku})
+            self.load_items()
+        except self.store.IntegrityError:
+            QMessageBox.warning(self, "Error", f"Another item already has SKU {new_sku}.")
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to set SKU: {str(e)}")
+
+    # Look for users or items entered twice ("Harry Potter 1" and "harry
+    # potter  1"). The rows are read here, since the store belongs to this
+    # thread, and compared in the background; a whole catalogue takes a
+    # second or two.
+    def find_duplicates(self, kind):
+        if not self.allowed(Permission.MANAGE_USERS if kind == "users" else Permission.MANAGE_CATALOG):
+            return
+        if self.duplicate_search and self.duplicate_search.isRunning():
+            return
+        try:
+            if kind == "users":
+                rows = list(self.store.list_users())
+                find = shelfwise_dedupe.find_duplicate_users
+            else:
+                rows = list(self.store.list_items(store_id=self.store_id))
+                find = shelfwise_dedupe.find_duplicate_items
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load {kind}: {str(e)}")
+            return
+        for button in (self.duplicate_users_btn, self.duplicate_items_btn):
+            button.setEnabled(False)
+        self.duplicate_search = DuplicateSearch(find, rows, self)
+        self.duplicate_search.found.connect(lambda pairs: self.show_duplicates(kind, rows, pairs))
+        self.duplicate_search.start()
+
+    def show_duplicates(self, kind, rows, pairs):
+        self.duplicate_users_btn.setEnabled(Permission.MANAGE_USERS in self.permissions)
+        self.duplicate_items_btn.setEnabled(Permission.MANAGE_CATALOG in self.permissions)
+        # Logged out meanwhile
+        if not self.isVisible():
+            return
+        if not pairs:
+            QMessageBox.information(self, "Find Duplicates", f"No duplicate {kind} found.")
+            return
+        if kind == "users":
+            names = {}
+            for user_id, first_name, last_name, username, email, *rest in rows:
+                details = ", ".join(part for part in (f"{first_name} {last_name}".strip(), email) if part)
+                names[user_id] = f"{username} ({details})" if details else username
+            title = "Duplicate Users"
+        else:
+            names = {row[0]: f"{row[2]} ({row[1]}, id {row[0]})" for row in rows}
+            title = "Duplicate Items"
+        dlg = DuplicatesDialog(title, pairs, names, lambda keep_id, drop_id: self.merge(kind, keep_id, drop_id), self)
+        dlg.exec_()
+        if dlg.merged:
+            if kind == "users":
+                self.load_users()
+            else:
+                self.skus.invalidate()
+                self.load_items()
+            self.load_user_items()
+
+    # Fold drop_id into keep_id; for DuplicatesDialog
+    def merge(self, kind, keep_id, drop_id):
+        try:
+            if kind == "users":
+                self.store.merge_users(keep_id, drop_id)
+                if self.sessions:
+                    self.sessions.revoke_user(drop_id)
+                audit(self.user_id, "merge_users", "Users", drop_id, after={"MergedInto": keep_id})
+            else:
+                self.store.merge_items(keep_id, drop_id)
+                audit(self.user_id, "merge_items", "Items", drop_id, after={"MergedInto": keep_id})
+            return True
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to merge: {str(e)}")
+            return False
+
+    # The item selected in table goes on the Low Stock list once its stock
+    # falls to the level set here (0: only when sold out)
+    def set_reorder_level(self, table, model):
+        if not self.allowed(Permission.MANAGE_STOCK):
+            return
+        selected_rows = table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select an item first.")
+            return
+        item_id = model.row_id(selected_rows[0].row())
+        try:
+            level = self.store.get_reorder_level(item_id, store_id=self.store_id)
+            if level is None:
+                QMessageBox.warning(self, "Error", "Item not found.")
+                return
+            new_level, ok = QInputDialog.getInt(self, "Set Reorder Level",
+                                                "Reorder when stock falls to:", level, 0, 1000000)
+            if ok:
+                self.store.set_reorder_level(item_id, new_level, store_id=self.store_id)
+                audit(self.user_id, "set_reorder_level", "Items", item_id,
+                      {"reorder_level": level}, {"reorder_level": new_level})
+                self.load_low_stock()
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to set reorder level: {str(e)}")
+
+    def edit_user_item(self):
+        if not self.allowed(Permission.MANAGE_HOLDINGS):
+            return
+        selected_rows = self.user_items_table.selectionModel().selectedRows()
+        if not selected_rows:
+            QMessageBox.warning(self, "Error", "Select a user item first.")
+            return
+        row = selected_rows[0].row()
+        ui_id = self.user_items_model.row_id(row)
+        
+        try:
+            user_item_data = self.store.get_user_item(ui_id)
+            
+            dlg = EditUserItemDialog(self.store, self, user_item_data, self.store_id)
+            if dlg.exec_() == QDialog.Accepted:
+                quantity = dlg.get_data()
+                self.store.update_user_item_quantity(ui_id, quantity)
+                audit(self.user_id, "update_user_item_quantity", "Users_Items", ui_id,
+                      {"Quantity": user_item_data[4]}, {"Quantity": quantity})
+                self.load_user_items()
+                QMessageBox.information(self, "Success", "User item quantity updated successfully!")
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to update user item: {str(e)}")
+    
+    # New method to add item to user
+    def add_item_to_user(self):
+        if not self.allowed(Permission.MANAGE_HOLDINGS):
+            return
+        dlg = AddItemToUserDialog(self.store, self, self.store_id, self.skus)
+        if dlg.exec_() == QDialog.Accepted:
+            user_id, item_id, quantity = dlg.get_data()
+            
+            try:
+                # Takes the stock and adds to the user's existing quantity, if any
+                current_quantity, new_quantity = self.store.reserve_item(user_id, item_id, quantity,
+                                                                         store_id=self.store_id)
+                audit(self.user_id, "reserve_item", "Items", item_id,
+                      after={"UserID": user_id, "StoreID": self.store_id, "Quantity": quantity,
+                             "Holding": new_quantity})
+                
+                if current_quantity is not None:
+                    msg = f"Item quantity updated from {current_quantity} to {new_quantity}."
+                else:
+                    msg = f"Item added to user with quantity {quantity}."
+                
+                self.load_user_items()
+                self.load_items()  # Refresh items to show updated stock
+                QMessageBox.information(self, "Success", msg)
+                
+            except OutOfStockError as e:
+                QMessageBox.warning(self, "Error", f"Not enough stock. Available: {e.available}")
+            except self.store.Error as e:
+                QMessageBox.critical(self, "Database Error", f"Failed to add item to user: {str(e)}")
+    
+    # Add logout confirmation
+    def confirm_logout(self):
+        confirm = QMessageBox.question(self, "Confirm Logout",
+                                      "Are you sure you want to logout?",
+                                      QMessageBox.Yes | QMessageBox.No)
+        if confirm == QMessageBox.Yes:
+            self.logout_callback()
+            
+class UserTab(QWidget):
+    def __init__(self, store, user_id, currency=None, sessions=None, store_id=DEFAULT_STORE, thumbnails=None):
+        super().__init__()
+        self.user_id = user_id
+        self.store = store
+        self.sessions = sessions
+        # ThumbnailLoader for the items' pictures; without one the shop has none
+        self.thumbnails = thumbnails
+        # The shop sells, and holds, this store's stock
+        self.store_id = store_id
+        # Prices are shown in the base currency and, if it's another one, in
+        # the currency picked in the shop
+        self.rates = load_currency_rates(self)
+        self.currency = currency if currency in self.rates.currencies else self.rates.base
+        self.format_price = self.price_formatter()
+        # Items picked in the shop and not checked out yet:
+        # item_id -> [name, price, quantity]. The units are held for the
+        # user in the database while they are in the cart.
+        self.cart = {}
+        self.hold_timer = QTimer(self)
+        self.hold_timer.setObjectName("Renew holds")
+        self.hold_timer.timeout.connect(self.renew_holds)
+        self.hold_timer.start(ShelfwiseStore.HOLD_SECONDS * 1000 // 3)
+        self.setup_ui()
+        self.refresh()
+
+    def price_formatter(self):
+        if self.currency == self.rates.base:
+            return self.rates.formatter()
+        return self.rates.formatter(self.rates.base, self.currency)
+
+    def set_currency(self):
+        self.currency = self.currency_combo.currentData() or self.rates.base
+        self.format_price = self.price_formatter()
+        self.shop_model.set_formatter(3, self.format_price)
+        self.my_items_model.set_formatter(3, self.format_price)
+        self.load_cart()
+
+    def refresh(self):
+        # Picks up an edited rates file
+        rates = load_currency_rates(self)
+        if rates is not self.rates:
+            self.rates = rates
+            self.currency_combo.blockSignals(True)
+            self.currency_combo.clear()
+            for code in rates.codes():
+                self.currency_combo.addItem(code, code)
+            self.currency_combo.setCurrentIndex(max(self.currency_combo.findData(self.currency), 0))
+            self.currency_combo.blockSignals(False)
+            self.currency = self.currency_combo.currentData() or rates.base
+            self.format_price = self.price_formatter()
+            self.shop_model.set_formatter(3, self.format_price)
+            self.my_items_model.set_formatter(3, self.format_price)
+        self.shop_model.extra_filters = self.collection_filters(self.collection_filter)
+        self.my_items_model.extra_filters = self.collection_filters(self.my_items_collection_filter)
+        if self.thumbnails:
+            self.thumbnails.clear()
+        self.store.prefetch([("list_collections", {"by_name": True}), self.shop_model.call(),
+                             self.my_items_model.call(), ("get_user", {"user_id": self.user_id}),
+                             ("list_collection_progress", {"user_id": self.user_id})])
+        self.load_collections()
+        self.load_items()
+        self.load_my_items()
+        self.load_progress()
+        self.load_account_details()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        
+        # Add a non-clickable role indicator tab
+        self.role_label = QLabel("COLLECTOR")
+        self.role_label.setStyleSheet(f"background-color: {BURGUNDY}; color: {WHITE}; font-weight: bold; padding: 8px; border-radius: 5px;")
+        self.role_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.role_label)
+        
+        # Create tabs for different sections
+        self.tabs = QTabWidget()
+        layout.addWidget(self.tabs)
+        
+        # Shop tab
+        self.shop_tab = QWidget()
+        self.setup_shop_tab()
+        self.tabs.addTab(self.shop_tab, "Shop")
+        
+        # My Items tab
+        self.my_items_tab = QWidget()
+        self.setup_my_items_tab()
+        self.tabs.addTab(self.my_items_tab, "My Items")
+        
+        # Account Details tab (new)
+        self.account_tab = QWidget()
+        self.setup_account_tab()
+        self.tabs.addTab(self.account_tab, "Account Details")
+        
+        # Logout button
+        self.logout_btn = QPushButton("Logout")
+        self.logout_btn.setObjectName("logoutButton")
+        layout.addWidget(self.logout_btn)
+
+    def setup_shop_tab(self):
+        layout = QVBoxLayout(self.shop_tab)
+        
+        # Collection filter
+        filter_layout = QHBoxLayout()
+        filter_label = QLabel("Collection:")
+        self.collection_filter = QComboBox()
+        self.collection_filter.addItem("All Collections", None)
+        filter_layout.addWidget(filter_label)
+        filter_layout.addWidget(self.collection_filter)
+        filter_layout.addStretch()
+        view_label = QLabel("Show as:")
+        self.shop_view_combo = QComboBox()
+        self.shop_view_combo.addItem("Table")
+        self.shop_view_combo.addItem("Gallery")
+        filter_layout.addWidget(view_label)
+        filter_layout.addWidget(self.shop_view_combo)
+        currency_label = QLabel("Currency:")
+        self.currency_combo = QComboBox()
+        for code in self.rates.codes():
+            self.currency_combo.addItem(code, code)
+        self.currency_combo.setCurrentIndex(max(self.currency_combo.findData(self.currency), 0))
+        filter_layout.addWidget(currency_label)
+        filter_layout.addWidget(self.currency_combo)
+        layout.addLayout(filter_layout)
+
+        label = QLabel("Browse Items")
+        label.setStyleSheet("font-weight: bold; font-size: 16px;")
+        layout.addWidget(label)
+
+        # Items table; Stock leaves out what other collectors are holding
+        self.shop_view = ViewTable(self.store, "shop", SHOP_COLUMNS, ["ID", "Collection", "Name", "Price", "Stock"],
+                                   {3: self.format_price})
+        self.shop_model = self.shop_view.model
+        self.shop_model.user_id = self.user_id
+        self.shop_model.store_id = self.store_id
+        self.items_table = self.shop_view.table
+        if self.thumbnails:
+            self.shop_model.set_thumbnails(self.thumbnails, 2)
+            self.items_table.setIconSize(QSize(48, 48))
+            self.items_table.verticalHeader().setDefaultSectionSize(52)
+        # The same rows as cards; it pages through the model like the table
+        self.gallery = QListView()
+        self.gallery.setViewMode(QListView.IconMode)
+        self.gallery.setMovement(QListView.Static)
+        self.gallery.setResizeMode(QListView.Adjust)
+        self.gallery.setUniformItemSizes(True)
+        self.gallery.setItemDelegate(ItemCardDelegate(3, 4, self.gallery))
+        self.shop_view.add_view(self.gallery)
+        self.gallery.setModelColumn(2)
+        self.shop_view.set_user(self.user_id)
+        self.shop_view_combo.setCurrentIndex(self.shop_view.views.currentIndex())
+        layout.addWidget(self.shop_view)
+
+        # What collectors who hold the selected item also hold, read from
+        # the neighbours kept in the database (see ItemNeighbours); hidden
+        # when there is nothing to suggest. Double-click one to add it.
+        self.suggestions_label = QLabel()
+        self.suggestions_list = QListWidget()
+        self.suggestions_list.setFlow(QListView.LeftToRight)
+        self.suggestions_list.setFixedHeight(self.suggestions_list.fontMetrics().height() * 2 + 8)
+        self.suggestions_list.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        layout.addWidget(self.suggestions_label)
+        layout.addWidget(self.suggestions_list)
+        self.show_suggestions()
+
+        shop_btn_layout = QHBoxLayout()
+        shop_btn_layout.addStretch()
+        self.add_to_cart_btn = QPushButton("Add to Cart")
+        shop_btn_layout.addWidget(self.add_to_cart_btn)
+        layout.addLayout(shop_btn_layout)
+
+        # Cart: picks are collected here and taken from stock all at once
+        self.cart_label = QLabel("Cart")
+        self.cart_label.setStyleSheet("font-weight: bold; font-size: 16px;")
+        layout.addWidget(self.cart_label)
+
+        self.cart_table = QTableWidget()
+        self.cart_table.setColumnCount(5)
+        self.cart_table.setHorizontalHeaderLabels(["ID", "Item", "Price", "Quantity", "Subtotal"])
+        self.cart_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.cart_table.setSelectionBehavior(self.cart_table.SelectRows)
+        layout.addWidget(self.cart_table)
+
+        cart_btn_layout = QHBoxLayout()
+        self.cart_total_label = QLabel()
+        self.remove_from_cart_btn = QPushButton("Remove From Cart")
+        self.clear_cart_btn = QPushButton("Clear Cart")
+        self.checkout_btn = QPushButton("Checkout")
+        cart_btn_layout.addWidget(self.cart_total_label)
+        cart_btn_layout.addStretch()
+        cart_btn_layout.addWidget(self.remove_from_cart_btn)
+        cart_btn_layout.addWidget(self.clear_cart_btn)
+        cart_btn_layout.addWidget(self.checkout_btn)
+        layout.addLayout(cart_btn_layout)
+        self.load_cart()
+
+        # Connect signals
+        self.collection_filter.currentIndexChanged.connect(self.load_items)
+        self.currency_combo.currentIndexChanged.connect(self.set_currency)
+        self.add_to_cart_btn.clicked.connect(self.add_selected_to_cart)
+        self.items_table.doubleClicked.connect(self.add_selected_to_cart)
+        self.gallery.doubleClicked.connect(self.add_selected_to_cart)
+        self.items_table.selectionModel().selectionChanged.connect(self.show_suggestions)
+        self.gallery.selectionModel().selectionChanged.connect(self.show_suggestions)
+        self.suggestions_list.itemDoubleClicked.connect(
+            lambda item: self.add_to_cart(*item.data(Qt.UserRole)))
+        self.shop_view_combo.currentIndexChanged.connect(self.shop_view.show_view)
+        self.shop_view_combo.currentIndexChanged.connect(self.show_suggestions)
+        self.remove_from_cart_btn.clicked.connect(self.remove_from_cart)
+        self.clear_cart_btn.clicked.connect(self.clear_cart)
+        self.checkout_btn.clicked.connect(self.checkout)
+    
+    def setup_my_items_tab(self):
+        layout = QVBoxLayout(self.my_items_tab)
+        
+        label = QLabel("My Items")
+        label.setStyleSheet("font-weight: bold; font-size: 16px;")
+        layout.addWidget(label)
+        
+        # Collection filter; the table sorts by any column from its header
+        filter_layout = QHBoxLayout()
+        
+        # Collection filter for My Items
+        collection_label = QLabel("Collection:")
+        self.my_items_collection_filter = QComboBox()
+        self.my_items_collection_filter.addItem("All Collections", None)
+        filter_layout.addWidget(collection_label)
+        filter_layout.addWidget(self.my_items_collection_filter)
+        
+        filter_layout.addStretch()
+        layout.addLayout(filter_layout)
+        
+        # My Items table
+        self.my_items_view = ViewTable(self.store, "my_items", MY_ITEM_COLUMNS,
+                                       ["ID", "Item Name", "Collection", "Price", "Date Added", "Quantity"],
+                                       {3: self.format_price})
+        self.my_items_model = self.my_items_view.model
+        self.my_items_model.user_id = self.user_id
+        self.my_items_view.set_user(self.user_id)
+        self.my_items_table = self.my_items_view.table
+        layout.addWidget(self.my_items_view)
+        
+        # How much of each collection the user has, from counters the
+        # database keeps up to date
+        progress_label = QLabel("Collection Progress")
+        progress_label.setStyleSheet("font-weight: bold;")
+        layout.addWidget(progress_label)
+        self.progress_table = QTableWidget(0, 2)
+        self.progress_table.setHorizontalHeaderLabels(["Collection", "Progress"])
+        self.progress_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.progress_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.progress_table.verticalHeader().setVisible(False)
+        self.progress_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.progress_table.setSelectionMode(QTableWidget.NoSelection)
+        self.progress_table.setMaximumHeight(160)
+        layout.addWidget(self.progress_table)
+        
+        # Connect signals for filtering
+        self.my_items_collection_filter.currentIndexChanged.connect(self.load_my_items)
+
+    # New method to set up account tab
+    def setup_account_tab(self):
+        layout = QVBoxLayout(self.account_tab)
+        
+        # Account details form
+        form_layout = QFormLayout()
+        
+        self.account_id_label = QLabel()
+        self.account_first_name_label = QLabel()
+        self.account_last_name_label = QLabel()
+        self.account_username_label = QLabel()
+        self.account_email_label = QLabel()
+        self.account_date_joined_label = QLabel()
+        
+        form_layout.addRow("User ID:", self.account_id_label)
+        form_layout.addRow("First Name:", self.account_first_name_label)
+        form_layout.addRow("Last Name:", self.account_last_name_label)
+        form_layout.addRow("Username:", self.account_username_label)
+        form_layout.addRow("Email:", self.account_email_label)
+        form_layout.addRow("Date Joined:", self.account_date_joined_label)
+        
+        account_container = QWidget()
+        account_container.setStyleSheet(f"background-color: {WHITE}; border-radius: 10px; padding: 20px;")
+        account_container.setLayout(form_layout)
+        
+        title_label = QLabel("My Account Details")
+        title_label.setStyleSheet("font-size: 18px; font-weight: bold; margin-bottom: 10px;")
+        
+        layout.addWidget(title_label)
+        layout.addWidget(account_container)
+        layout.addStretch()
+        
+        # Edit account button
+        self.edit_account_btn = QPushButton("Edit Account Details")
+        layout.addWidget(self.edit_account_btn)
+        
+        # Connect edit button
+        self.edit_account_btn.clicked.connect(self.edit_account)
+
+    def load_account_details(self):
+        try:
+            user_data = self.store.get_user(self.user_id)
+            
+            if user_data:
+                user_id, first_name, last_name, username, email, date_joined, role_id = user_data
+                
+                self.account_id_label.setText(str(user_id))
+                self.account_first_name_label.setText(first_name or "")
+                self.account_last_name_label.setText(last_name or "")
+                self.account_username_label.setText(username)
+                self.account_email_label.setText(email or "")
+                self.account_date_joined_label.setText(date_joined or "")
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load account details: {str(e)}")
+
+    def edit_account(self):
+        try:
+            user_data = self.store.get_user(self.user_id)
+            
+            # Create custom dialog for editing account
+            dialog = QDialog(self)
+            dialog.setWindowTitle("Edit Account Details")
+            dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+            layout = QFormLayout(dialog)
+            
+            first_name_edit = QLineEdit(user_data[1] or "")
+            last_name_edit = QLineEdit(user_data[2] or "")
+            username_edit = QLineEdit(user_data[3])
+            current_password_edit = QLineEdit()
+            current_password_edit.setEchoMode(QLineEdit.Password)
+            new_password_edit = QLineEdit()
+            new_password_edit.setEchoMode(QLineEdit.Password)
+            confirm_password_edit = QLineEdit()
+            confirm_password_edit.setEchoMode(QLineEdit.Password)
+            email_edit = QLineEdit(user_data[4] or "")
+            
+            layout.addRow("First Name:", first_name_edit)
+            layout.addRow("Last Name:", last_name_edit)
+            layout.addRow("Username:", username_edit)
+            layout.addRow("Current Password:", current_password_edit)
+            layout.addRow("New Password (leave blank to keep current):", new_password_edit)
+            layout.addRow("Confirm New Password:", confirm_password_edit)
+            layout.addRow("Email:", email_edit)
+            
+            buttons_layout = QHBoxLayout()
+            save_btn = QPushButton("Save")
+            cancel_btn = QPushButton("Cancel")
+            buttons_layout.addWidget(save_btn)
+            buttons_layout.addWidget(cancel_btn)
+            layout.addRow(buttons_layout)
+            
+            def save_account():
+                # Check if new password fields match
+                new_password = new_password_edit.text()
+                if new_password and new_password != confirm_password_edit.text():
+                    QMessageBox.warning(dialog, "Error", "New passwords do not match.")
+                    return
+                
+                try:
+                    # The current password is checked by the database; no
+                    # new one keeps it
+                    if not self.store.update_account(self.user_id, first_name_edit.text(), last_name_edit.text(),
+                                                     username_edit.text(), new_password or None, email_edit.text(),
+                                                     current_password_edit.text()):
+                        QMessageBox.warning(dialog, "Error", "Current password is incorrect.")
+                        return
+                    after = {"FirstName": first_name_edit.text(), "LastName": last_name_edit.text(),
+                             "Username": username_edit.text(), "Email": email_edit.text()}
+                    if new_password:
+                        after["Password"] = new_password
+                    audit(self.user_id, "update_account", "Users", self.user_id, dict(zip(USER_ROW, user_data)), after)
+                    if self.sessions:
+                        self.sessions.require_password(self.user_id)
+                    dialog.accept()
+                    self.load_account_details()
+                    QMessageBox.information(self, "Success", "Account details updated successfully!")
+                except self.store.IntegrityError:
+                    QMessageBox.warning(dialog, "Error", "Username already exists.")
+                except self.store.Error as e:
+                    QMessageBox.critical(dialog, "Database Error", f"Failed to update account: {str(e)}")
+            
+            save_btn.clicked.connect(save_account)
+            cancel_btn.clicked.connect(dialog.reject)
+            
+            dialog.exec_()
+            
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load account data: {str(e)}")
+
+    def load_collections(self):
+        try:
+            collections = list(self.store.list_collections(by_name=True))
+            
+            # Clear and repopulate collection filters
+            self.collection_filter.clear()
+            self.my_items_collection_filter.clear()
+            
+            self.collection_filter.addItem("All Collections", None)
+            self.my_items_collection_filter.addItem("All Collections", None)
+            
+            for col_id, col_name, desc in collections:
+                self.collection_filter.addItem(col_name, col_name)
+                self.my_items_collection_filter.addItem(col_name, col_name)
+                
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load collections: {str(e)}")
+
+    def collection_filters(self, combo):
+        name = combo.currentData()
+        return [["CollectionName", "=", name]] if name is not None else []
+
+    def load_items(self):
+        self.shop_model.extra_filters = self.collection_filters(self.collection_filter)
+        self.shop_view.reload()
+        self.show_suggestions()
+
+    def show_suggestions(self):
+        row = self.shop_view.selected_row()
+        suggestions = []
+        if row is not None:
+            rows = self.shop_model.rows
+            name = rows.value(row, 2)
+            try:
+                suggestions = list(self.store.list_item_neighbours(rows.value(row, 0), self.user_id,
+                                                                   store_id=self.store_id))
+            except self.store.Error:
+                # Only suggestions; the shop works without them
+                pass
+        self.suggestions_list.clear()
+        for item_id, item_name, price, collectors in suggestions:
+            item = QListWidgetItem(f"{item_name}  {self.format_price(price)}")
+            item.setData(Qt.UserRole, (item_id, item_name, price))
+            item.setToolTip(f"Held by {collectors} collector{'s' if collectors != 1 else ''} who hold {name}")
+            self.suggestions_list.addItem(item)
+        if suggestions:
+            self.suggestions_label.setText(f"Collectors who hold {name} also hold:")
+        self.suggestions_label.setVisible(bool(suggestions))
+        self.suggestions_list.setVisible(bool(suggestions))
+    
+    def load_my_items(self):
+        self.my_items_model.extra_filters = self.collection_filters(self.my_items_collection_filter)
+        self.my_items_view.reload()
+
+    def load_progress(self):
+        try:
+            rows = list(self.store.list_collection_progress(self.user_id))
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to load collection progress: {str(e)}")
+            return
+        self.progress_table.setRowCount(len(rows))
+        for row, (collection_id, name, owned, items) in enumerate(rows):
+            self.progress_table.setItem(row, 0, QTableWidgetItem(name))
+            bar = QProgressBar()
+            # A collection emptied since can't show more held than it has
+            bar.setRange(0, max(items, owned))
+            bar.setValue(owned)
+            bar.setFormat("%v of %m")
+            self.progress_table.setCellWidget(row, 1, bar)
+
+    def add_selected_to_cart(self):
+        row = self.shop_view.selected_row()
+        if row is None:
+            QMessageBox.warning(self, "Error", "Select an item first.")
+            return
+        rows = self.shop_model.rows
+        self.add_to_cart(rows.value(row, 0), rows.value(row, 2), rows.value(row, 3))
+
+    # Put some of an item in the cart. One more unit than the cart already
+    # has is held while the quantity dialog is open, so the maximum offered
+    # is what is really left; the hold is then set to what was chosen.
+    # Stock is only taken at checkout.
+    def add_to_cart(self, item_id, name, price):
+        in_cart = self.cart[item_id][2] if item_id in self.cart else 0
+        try:
+            available = self.store.hold_stock(self.user_id, item_id, in_cart + 1, store_id=self.store_id)
+        except OutOfStockError as e:
+            if in_cart:
+                QMessageBox.warning(self, "Error", f"All {e.available} available are already in your cart.")
+            else:
+                QMessageBox.warning(self, "Error", f"No {name} left. Others may be holding the rest.")
+            self.load_items()
+            return
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to hold stock: {str(e)}")
+            return
+        quantity, ok = QInputDialog.getInt(
+            self, "Enter Quantity",
+            f"How many {name} do you want? (Max: {available - in_cart})",
+            value=1, min=1, max=available - in_cart
+        )
+        try:
+            if ok:
+                self.store.hold_stock(self.user_id, item_id, in_cart + quantity, store_id=self.store_id)
+                self.cart[item_id] = [name, price, in_cart + quantity]
+                self.load_cart()
+            elif in_cart:
+                self.store.hold_stock(self.user_id, item_id, in_cart, store_id=self.store_id)
+            else:
+                self.store.release_holds(self.user_id, item_id)
+        except OutOfStockError as e:
+            QMessageBox.warning(self, "Error", f"Not enough stock of {name}. Available: {e.available}")
+            self.load_items()
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to hold stock: {str(e)}")
+
+    def load_cart(self):
+        total = 0
+        units = 0
+        with ui_span("cart_table"):
+            self.cart_table.setRowCount(len(self.cart))
+            for i, (item_id, (name, price, quantity)) in enumerate(self.cart.items()):
+                self.cart_table.setItem(i, 0, QTableWidgetItem(str(item_id)))
+                self.cart_table.setItem(i, 1, QTableWidgetItem(name))
+                self.cart_table.setItem(i, 2, QTableWidgetItem(self.format_price(price)))
+                self.cart_table.setItem(i, 3, QTableWidgetItem(str(quantity)))
+                self.cart_table.setItem(i, 4, QTableWidgetItem(self.format_price(price * quantity)))
+                total += price * quantity
+                units += quantity
+        self.cart_label.setText(f"Cart ({units})" if units else "Cart")
+        self.cart_total_label.setText(f"Total: {self.format_price(total)}")
+        self.checkout_btn.setEnabled(bool(self.cart))
+
+    def remove_from_cart(self):
+        rows = sorted({index.row() for index in self.cart_table.selectionModel().selectedRows()})
+        if not rows:
+            QMessageBox.warning(self, "Error", "Select an item in the cart first.")
+            return
+        try:
+            for row in rows:
+                item_id = int(self.cart_table.item(row, 0).text())
+                self.store.release_holds(self.user_id, item_id)
+                self.cart.pop(item_id, None)
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to release held stock: {str(e)}")
+        self.load_cart()
+
+    # Empty the cart and give its held units back (also on logout)
+    def clear_cart(self):
+        self.cart.clear()
+        self.load_cart()
+        try:
+            self.store.release_holds(self.user_id)
+        except self.store.Error:
+            # They lapse on their own after HOLD_SECONDS
+            pass
+
+    def renew_holds(self):
+        if not self.cart:
+            return
+        try:
+            self.store.renew_holds(self.user_id)
+        except self.store.Error:
+            # Tried again on the next tick; checkout still checks the stock
+            pass
+
+    # Take everything in the cart in one go: one transaction, one stock check
+    # for all lines and one reload afterwards. If any line is short nothing
+    # is taken and the cart is kept so it can be adjusted.
+    def checkout(self):
+        if not self.cart:
+            return
+        try:
+            units = self.store.checkout(self.user_id, [(item_id, line[2]) for item_id, line in self.cart.items()],
+                                        store_id=self.store_id)
+            audit(self.user_id, "checkout", "Users_Items", None,
+                  after={"UserID": self.user_id, "StoreID": self.store_id,
+                         "Items": {item_id: line[2] for item_id, line in self.cart.items()}})
+            self.cart.clear()
+            self.load_cart()
+            self.load_items()  # Refresh items to show updated stock
+            self.load_my_items()
+            self.load_progress()
+            QMessageBox.information(self, "Success", f"Added {units} items to your collection!")
+        except OutOfStockError as e:
+            name = self.cart[e.item_id][0] if e.item_id in self.cart else "an item"
+            QMessageBox.warning(self, "Error", f"Not enough stock of {name}. Available: {e.available}")
+            self.load_items()
+        except self.store.Error as e:
+            QMessageBox.critical(self, "Database Error", f"Failed to check out: {str(e)}")
+    
+class LoginPage(QWidget):
+    def __init__(self, parent, store):
+        super().__init__()
+        self.parent = parent
+        self.store = store
+        self.setup_ui()
+
+    def setup_ui(self):
+        # Main vertical layout
+        main_layout = QVBoxLayout(self)
+        main_layout.setAlignment(Qt.AlignCenter)
+        
+        # Center container for content
+        center_container = QWidget()
+        center_container.setMaximumWidth(600)
+        center_container.setMinimumWidth(500)
+        
+        layout = QVBoxLayout(center_container)
+        layout.setSpacing(30)
+
+        # Icon representation
+        icon_widget = QWidget()
+        icon_widget.setFixedHeight(120)
+        icon_layout = QVBoxLayout(icon_widget)
+        icon_layout.setAlignment(Qt.AlignCenter)
+        
+        # Stylized icon using text representation
+        icon_label = QLabel("📚")
+        icon_label.setStyleSheet("font-size: 72px;")
+        icon_label.setAlignment(Qt.AlignCenter)
+        icon_layout.addWidget(icon_label)
+        
+        layout.addWidget(icon_widget)
+
+        # Title
+        title = QLabel("Welcome to Shelfwise !")
+        title.setFont(QFont("Arial", 36, QFont.Bold))
+        title.setStyleSheet(f"""
+            font-size: 36px; 
+            font-weight: bold; 
+            color: {WHITE};
+            margin-top: 20px;
+            margin-bottom: 50px;
+        """)
+        title.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title)
+
+        # Select Role label
+        role_label = QLabel("Select Role:")
+        role_label.setStyleSheet(f"""
+            font-size: 24px; 
+            color: {WHITE};
+            margin-bottom: 20px;
+        """)
+        role_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(role_label)
+
+        # Buttons container
+        buttons_container = QWidget()
+        buttons_layout = QHBoxLayout(buttons_container)
+        buttons_layout.setSpacing(40)
+        buttons_layout.setAlignment(Qt.AlignCenter)
+
+        # Admin button
+        self.admin_btn = QPushButton("ADMIN")
+        self.admin_btn.setFixedSize(200, 60)
+        self.admin_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {LIGHT_BURGUNDY};
+                color: {WHITE};
+                font-size: 20px;
+                font-weight: bold;
+                border-radius: 30px;
+                border: none;
+            }}
+            QPushButton:hover {{
+                background-color: {LIGHT_BURGUNDY};
+            }}
+        """)
+        
+        # Collector button (using USER functionality)
+        self.collector_btn = QPushButton("COLLECTOR")
+        self.collector_btn.setFixedSize(200, 60)
+        self.collector_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {LIGHT_BURGUNDY};
+                color: {WHITE};
+                font-size: 20px;
+                font-weight: bold;
+                border-radius: 30px;
+                border: none;
+            }}
+            QPushButton:hover {{
+                background-color: {LIGHT_BURGUNDY};
+            }}
+        """)
+
+        buttons_layout.addWidget(self.admin_btn)
+        buttons_layout.addWidget(self.collector_btn)
+        layout.addWidget(buttons_container)
+
+        main_layout.addWidget(center_container)
+
+        # Connect buttons to show appropriate dialogs
+        self.admin_btn.clicked.connect(self.show_admin_login)
+        self.collector_btn.clicked.connect(self.show_user_login)
+
+    def show_admin_login(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Admin Login")
+        dialog.setFixedSize(400, 200)
+        # Remove the question mark from the title bar
+        dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        
+        layout = QFormLayout(dialog)
+        
+        username_edit = QLineEdit()
+        # Make admin username editable
+        username_edit.setText("admin")
+        
+        password_edit = QLineEdit()
+        password_edit.setEchoMode(QLineEdit.Password)
+        
+        layout.addRow("Username:", username_edit)
+        layout.addRow("Password:", password_edit)
+        
+        buttons_layout = QHBoxLayout()
+        login_btn = QPushButton("Login")
+        cancel_btn = QPushButton("Cancel")
+        
+        buttons_layout.addWidget(login_btn)
+        buttons_layout.addWidget(cancel_btn)
+        layout.addRow(buttons_layout)
+        
+        # Apply styling to dialog
+        dialog.setStyleSheet(f"""
+            QDialog {{
+                background-color: {VERY_LIGHT_BURGUNDY};
+            }}
+            QLineEdit {{
+                background-color: {WHITE};
+                border: 1px solid {LIGHT_BURGUNDY};
+                border-radius: 3px;
+                padding: 5px;
+            }}
+            QPushButton {{
+                background-color: {BURGUNDY};
+                color: {WHITE};
+                border-radius: 3px;
+                padding: 5px;
+                min-width: 80px;
+            }}
+            QPushButton:hover {{
+                background-color: {LIGHT_BURGUNDY};
+            }}
+        """)
+        
+        def do_admin_login():
+            username = username_edit.text().strip()
+            password = password_edit.text().strip()
+            
+            # Check credentials against the open session or the database
+            try:
+                session = self.parent.sessions.login(self.store, username, password, admin=True)
+                
+                if session is not None:
+                    dialog.accept()
+                    self.parent.login_success(session)
+                else:
+                    QMessageBox.warning(dialog, "Error", "Invalid admin credentials.")
+            except RateLimitedError as e:
+                QMessageBox.warning(dialog, "Error", str(e))
+            except self.store.Error as e:
+                QMessageBox.critical(dialog, "Database Error", f"Login failed: {str(e)}")
+        
+        login_btn.clicked.connect(do_admin_login)
+        cancel_btn.clicked.connect(dialog.reject)
+        
+        dialog.exec_()
+
+    def show_user_login(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Collector Login / Signup")
+        dialog.setFixedSize(450, 400)  # Increased height for additional confirm password field
+        # Remove the question mark from the title bar
+        dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        
+        layout = QVBoxLayout(dialog)
+        
+        # Tabs for login/signup
+        tabs = QTabWidget()
+        
+        # Login tab
+        login_tab = QWidget()
+        login_layout = QFormLayout(login_tab)
+        
+        login_username = QLineEdit()
+        login_password = QLineEdit()
+        login_password.setEchoMode(QLineEdit.Password)
+        
+        login_layout.addRow("Username:", login_username)
+        login_layout.addRow("Password:", login_password)
+        
+        login_btn = QPushButton("Login")
+        login_layout.addRow("", login_btn)
+        
+        tabs.addTab(login_tab, "Login")
+        
+        # Signup tab
+        signup_tab = QWidget()
+        signup_layout = QFormLayout(signup_tab)
+        
+        signup_first_name = QLineEdit()
+        signup_last_name = QLineEdit()
+        signup_username = QLineEdit()
+        signup_password = QLineEdit()
+        signup_password.setEchoMode(QLineEdit.Password)
+        signup_confirm_password = QLineEdit()  # New confirm password field
+        signup_confirm_password.setEchoMode(QLineEdit.Password)
+        signup_email = QLineEdit()
+        
+        signup_layout.addRow("First Name:", signup_first_name)
+        signup_layout.addRow("Last Name:", signup_last_name)
+        signup_layout.addRow("Username:", signup_username)
+        signup_layout.addRow("Password:", signup_password)
+        signup_layout.addRow("Confirm Password:", signup_confirm_password)  # Add confirm password field
+        signup_layout.addRow("Email:", signup_email)
+        
+        signup_btn = QPushButton("Signup")
+        signup_layout.addRow("", signup_btn)
+        
+        tabs.addTab(signup_tab, "Signup")
+        
+        layout.addWidget(tabs)
+        
+        # Close button
+        close_btn = QPushButton("Close")
+        layout.addWidget(close_btn)
+        
+        # Apply styling to dialog
+        dialog.setStyleSheet(f"""
+            QDialog {{
+                background-color: {VERY_LIGHT_BURGUNDY};
+            }}
+            QLineEdit {{
+                background-color: {WHITE};
+                border: 1px solid {LIGHT_BURGUNDY};
+                border-radius: 3px;
+                padding: 5px;
+            }}
+            QPushButton {{
+                background-color: {BURGUNDY};
+                color: {WHITE};
+                border-radius: 3px;
+                padding: 5px;
+                min-width: 80px;
+            }}
+            QPushButton:hover {{
+                background-color: {LIGHT_BURGUNDY};
+            }}
+            QTabWidget::tab-bar {{
+                alignment: center;
+            }}
+            QTabBar::tab {{
+                background: {LIGHTER_BURGUNDY};
+                color: {WHITE};
+                padding: 8px 16px;
+                margin: 2px;
+            }}
+            QTabBar::tab:selected {{
+                background: {BURGUNDY};
+                font-weight: bold;
+            }}
+        """)
+        
+        def do_user_login():
+            username = login_username.text().strip()
+            password = login_password.text().strip()
+            if not username or not password:
+                QMessageBox.warning(dialog, "Error", "Please enter username and password.")
+                return
+            try:
+                session = self.parent.sessions.login(self.store, username, password)
+                if session is not None:
+                    dialog.accept()
+                    self.parent.login_success(session)
+                else:
+                    QMessageBox.warning(dialog, "Error", "Invalid user credentials.")
+            except RateLimitedError as e:
+                QMessageBox.warning(dialog, "Error", str(e))
+            except self.store.Error as e:
+                QMessageBox.critical(dialog, "Database Error", f"Login failed: {str(e)}")
+        
+        def do_user_signup():
+            first_name = signup_first_name.text().strip()
+            last_name = signup_last_name.text().strip()
+            username = signup_username.text().strip()
+            password = signup_password.text().strip()
+            confirm_password = signup_confirm_password.text().strip()  # Get confirm password
+            email = signup_email.text().strip()
+            
+            # Check if passwords match
+            if password != confirm_password:
+                QMessageBox.warning(dialog, "Error", "Passwords do not match.")
+                return
+            
+            if not username or not password:
+                QMessageBox.warning(dialog, "Error", "Username and password cannot be empty.")
+                return
+                
+            today = datetime.date.today().isoformat()
+            
+            try:
+                self.store.sign_up(first_name, last_name, username, password, email, today)
+                QMessageBox.information(dialog, "Success", "User registered successfully! You may now login.")
+                signup_first_name.clear()
+                signup_last_name.clear()
+                signup_username.clear()
+                signup_password.clear()
+                signup_confirm_password.clear()  # Clear confirm password
+                signup_email.clear()
+                tabs.setCurrentWidget(login_tab)
+            except self.store.IntegrityError:
+                QMessageBox.warning(dialog, "Error", "Username already exists.")
+            except self.store.Error as e:
+                QMessageBox.critical(dialog, "Database Error", f"Registration failed: {str(e)}")
+        
+        login_btn.clicked.connect(do_user_login)
+        signup_btn.clicked.connect(do_user_signup)
+        close_btn.clicked.connect(dialog.reject)
+        
+        dialog.exec_()
+
+# How often the window purges deleted rows (ms): normally, and while a
+# backlog is being worked off
+PURGE_INTERVAL = 5000
+PURGE_BUSY_INTERVAL = 50
+HOLD_SWEEP_INTERVAL = 30000
+# How often the window works on the queue of items whose neighbours ("also
+# hold" suggestions) need counting again (ms): normally, and with a backlog
+NEIGHBOURS_INTERVAL = 10000
+NEIGHBOURS_BUSY_INTERVAL = 50
+# How often --metrics-file is rewritten (ms)
+METRICS_INTERVAL = 15000
+# How often the window checks whether the session has expired (ms)
+SESSION_CHECK_INTERVAL = 60000
+
+# Carries errors from a background thread (RemoteStore's sender, the audit
+# log's writer) to the GUI thread
+class BackgroundErrorNotifier(QObject):
+    failed = pyqtSignal(str)
+
+# Takes a snapshot of the local database on a worker thread; the backup API
+# copies it a few pages at a time so the window keeps working meanwhile. It
+# goes through the window's own connection, so edits saved during the copy
+# end up in the snapshot instead of making it start over.
+class SnapshotWorker(QThread):
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_name, conn, parent=None):
+        super().__init__(parent)
+        self.db_name = db_name
+        self.conn = conn
+
+    def run(self):
+        try:
+            shelfwise_backup.snapshot(self.db_name, conn=self.conn)
+        except (OSError, shelfwise_backup.Error) as e:
+            self.failed.emit(str(e))
+
+# Runs a shelfwise_dedupe finder over rows already read from the store
+class DuplicateSearch(QThread):
+    found = pyqtSignal(list)
+
+    def __init__(self, find, rows, parent=None):
+        super().__init__(parent)
+        self.find = find
+        self.rows = rows
+
+    def run(self):
+        self.found.emit(self.find(self.rows))
+
+class MainWindow(QMainWindow):
+    def __init__(self, store=None, currency=None, metrics_file=None, store_id=DEFAULT_STORE, store_name=None):
+        super().__init__()
+        self.setWindowTitle(f"Shelfwise - {store_name}" if store_name else "Shelfwise")
+        # Second currency for collectors' prices, e.g. "USD"
+        self.currency = currency
+        # The store this terminal is in, whose stock both pages work with
+        self.store_id = store_id
+        self.resize(1000, 800)
+        # Sessions opened on this terminal, and the one logged in now
+        self.sessions = SessionManager()
+        self.session = None
+        self.session_timer = QTimer(self)
+        self.session_timer.setObjectName("Check session")
+        self.session_timer.timeout.connect(self.check_session)
+        self.session_timer.start(SESSION_CHECK_INTERVAL)
+        # One store shared by every page: the local database, or a Shelfwise server
+        self.store = store or ShelfwiseStore(connect())
+        if isinstance(self.store, RemoteStore):
+            self.remote_errors = BackgroundErrorNotifier()
+            self.remote_errors.failed.connect(self.show_save_error)
+            self.store.on_error = self.remote_errors.failed.emit
+        if isinstance(self.store, WriteBehindStore):
+            # Write queued edits out in groups rather than one commit per click
+            self.flush_timer = QTimer(self)
+            self.flush_timer.setObjectName("Flush writes")
+            self.flush_timer.timeout.connect(self.flush_writes)
+            self.flush_timer.start(WriteBehindStore.FLUSH_INTERVAL)
+        # Remove deleted rows a batch at a time, letting the window handle
+        # its events in between (a server does this itself)
+        if getattr(self.store, "backend", None):
+            self.purge_timer = QTimer(self)
+            self.purge_timer.setObjectName("Purge deleted")
+            self.purge_timer.timeout.connect(self.purge_deleted)
+            self.purge_timer.start(PURGE_INTERVAL)
+            self.hold_sweep_timer = QTimer(self)
+            self.hold_sweep_timer.setObjectName("Sweep holds")
+            self.hold_sweep_timer.timeout.connect(self.sweep_holds)
+            self.hold_sweep_timer.start(HOLD_SWEEP_INTERVAL)
+            self.neighbours_timer = QTimer(self)
+            self.neighbours_timer.setObjectName("Update neighbours")
+            self.neighbours_timer.timeout.connect(self.update_neighbours)
+            self.neighbours_timer.start(NEIGHBOURS_INTERVAL)
+        # Regular snapshots when working on a local SQLite file
+        self.snapshot_worker = None
+        backend = getattr(self.store, "backend", None)
+        if backend and backend.name == "sqlite" and not backend.check_same_thread:
+            self.snapshot_worker = SnapshotWorker(backend.db_name, self.store.conn, self)
+            self.snapshot_worker.failed.connect(self.show_snapshot_error)
+            self.snapshot_timer = QTimer(self)
+            self.snapshot_timer.setObjectName("Snapshot")
+            self.snapshot_timer.timeout.connect(self.take_snapshot)
+            self.snapshot_timer.start(shelfwise_backup.SNAPSHOT_INTERVAL * 1000)
+        if audit_log:
+            self.audit_errors = BackgroundErrorNotifier()
+            self.audit_errors.failed.connect(self.show_audit_error)
+            audit_log.on_error = self.audit_errors.failed.emit
+        # Counters and latencies for a collector to pick up
+        self.metrics_file = metrics_file
+        if metrics_file:
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.setObjectName("Write metrics")
+            self.metrics_timer.timeout.connect(self.write_metrics)
+            self.metrics_timer.start(METRICS_INTERVAL)
+        # Item pictures in the shop, shared by every collector logging in here
+        self.thumbnails = ThumbnailLoader(self)
+        self.setup_ui()
+        self.apply_styles()
+
+    def setup_ui(self):
+        self.stack = QStackedWidget()
+        self.setCentralWidget(self.stack)
+
+        self.login_page = LoginPage(self, self.store)
+        self.stack.addWidget(self.login_page)
+
+        self.admin_tab = AdminTab(self.store, logout_callback=self.confirm_logout, sessions=self.sessions,
+                                  store_id=self.store_id)
+        self.stack.addWidget(self.admin_tab)
+
+        self.user_tab = None  # created dynamically for logged in user
+
+    def apply_styles(self):
+        # Apply the burgundy gradient background and updated styles using the color constants
+        style = f"""
+            QMainWindow {{
+                background: qlineargradient(x1: 0, y1: 0, x2: 1, y2: 1,
+                    stop: 0 {BURGUNDY}, stop: 0.5 {BURGUNDY}, stop: 1 {BURGUNDY});
+            }}
+            LoginPage {{
+                background: qlineargradient(x1: 0, y1: 0, x2: 1, y2: 1,
+                    stop: 0 {LIGHT_BURGUNDY}, stop: 0.5 {LIGHT_BURGUNDY}, stop: 1 {LIGHT_BURGUNDY});
+            }}
+            QWidget {{
+                font-family: Arial, sans-serif;
+                font-size: 14px;
+                color: {DARK_TEXT};
+            }}
+            AdminTab, UserTab {{
+                background-color: {VERY_LIGHT_BURGUNDY};
+            }}
+            QPushButton {{
+                background-color: {BURGUNDY};
+                color: {WHITE};
+                border-radius: 5px;
+                padding: 8px;
+                font-weight: bold;
+            }}
+            QPushButton:hover {{
+                background-color: {LIGHT_BURGUNDY};
+            }}
+            QPushButton:disabled {{
+                background-color: {GRAY};
+                color: {WHITE};
+            }}
+            QPushButton#logoutButton {{
+                background-color: {LOGOUT_COLOR};
+                color: {WHITE};
+                border-radius: 5px;
+                padding: 8px;
+                font-weight: bold;
+            }}
+            QPushButton#logoutButton:hover {{
+                background-color:({LOGOUT_COLOR}, 10%);
+            }}
+            QLineEdit {{
+                background-color: {WHITE};
+                border: 1px solid {LIGHT_BURGUNDY};
+                border-radius: 3px;
+                padding: 5px;
+                color: {DARK_TEXT};
+            }}
+            QTableView {{
+                background-color: {WHITE};
+                gridline-color: {LIGHTER_BURGUNDY};
+                color: {DARK_TEXT};
+            }}
+            QHeaderView::section {{
+                background-color: {LIGHT_BURGUNDY};
+                color: {WHITE};
+                padding: 4px;
+                border: 1px solid {BURGUNDY};
+            }}
+            QTabWidget::pane {{
+                border: 1px solid {LIGHT_BURGUNDY};
+                background: {VERY_LIGHT_BURGUNDY};
+            }}
+            QTabBar::tab {{
+                background: {LIGHTER_BURGUNDY};
+                border: 1px solid {LIGHT_BURGUNDY};
+                border-bottom-color: {VERY_LIGHT_BURGUNDY};
+                padding: 5px;
+                color: {WHITE};
+                min-width: 80px;
+            }}
+            QTabBar::tab:selected {{
+                background: {BURGUNDY};
+                border-bottom-color: {BURGUNDY};
+                font-weight: bold;
+            }}
+            QDialog {{
+                background-color: {VERY_LIGHT_BURGUNDY};
+            }}
+            QSpinBox, QDoubleSpinBox, QDateEdit {{
+                background-color: {WHITE};
+                border: 1px solid {LIGHT_BURGUNDY};
+                border-radius: 3px;
+                padding: 2px;
+                color: {DARK_TEXT};
+            }}
+            QComboBox {{
+                background-color: {WHITE};
+                border: 1px solid {LIGHT_BURGUNDY};
+                border-radius: 3px;
+                padding: 3px;
+                color: {DARK_TEXT};
+            }}
+            QComboBox::drop-down {{
+                border: none;
+            }}
+            QComboBox::down-arrow {{
+                image: none;
+                border-left: 5px solid transparent;
+                border-right: 5px solid transparent;
+                border-top: 5px solid {BURGUNDY};
+                margin-right: 5px;
+            }}
+        """
+        self.setStyleSheet(style)
+
+    def login_success(self, session):
+        self.session = session
+        user_id = session.user_id
+        if session.admin:
+            self.admin_tab.set_user(user_id)
+            self.admin_tab.set_permissions(session.permissions)
+            self.admin_tab.refresh()
+            self.stack.setCurrentWidget(self.admin_tab)
+        else:
+            if self.user_tab:
+                # Remove old user tab to update for new user
+                self.stack.removeWidget(self.user_tab)
+                self.user_tab.deleteLater()
+            self.user_tab = UserTab(self.store, user_id, self.currency, self.sessions, self.store_id,
+                                    self.thumbnails)
+            self.stack.addWidget(self.user_tab)
+            self.stack.setCurrentWidget(self.user_tab)
+            # Connect the logout button
+            self.user_tab.logout_btn.clicked.connect(self.confirm_logout)
+
+    def confirm_logout(self):
+        # Ask for confirmation before logging out
+        confirm = QMessageBox.question(self, "Confirm Logout",
+                                      "Are you sure you want to logout?",
+                                      QMessageBox.Yes | QMessageBox.No)
+        if confirm == QMessageBox.Yes:
+            self.logout()
+
+    def logout(self):
+        # Give back whatever the collector's cart was holding
+        if self.user_tab:
+            self.user_tab.clear_cart()
+        # The session stays open, so logging in again here is quick; one
+        # opened by the server (--server) is ended there
+        if getattr(self.store, "keeps_sessions", False):
+            self.store.logout()
+        self.session = None
+        # Return to login page
+        self.stack.setCurrentWidget(self.login_page)
+
+    def check_session(self):
+        if self.session and self.sessions.get(self.session.token) is None:
+            self.logout()
+            QMessageBox.information(self, "Session Expired", "Your session has expired. Please log in again.")
+
+    def purge_deleted(self):
+        try:
+            batch = ShelfwiseStore.PURGE_BATCH
+            removed = self.store.purge_deleted(batch)
+        except self.store.Error:
+            # Left for the next round; deleted rows stay hidden meanwhile
+            return
+        # Keep going in short steps while there is a backlog
+        self.purge_timer.setInterval(PURGE_BUSY_INTERVAL if removed == batch else PURGE_INTERVAL)
+
+    def sweep_holds(self):
+        try:
+            self.store.sweep_holds()
+        except self.store.Error:
+            pass
+
+    def update_neighbours(self):
+        try:
+            batch = ShelfwiseStore.NEIGHBOURS_BATCH
+            done = self.store.update_neighbours(batch)
+        except self.store.Error:
+            # Left queued for the next round
+            return
+        self.neighbours_timer.setInterval(NEIGHBOURS_BUSY_INTERVAL if done == batch else NEIGHBOURS_INTERVAL)
+
+    def take_snapshot(self):
+        if self.snapshot_worker.isRunning():
+            return
+        # Queued edits go into the snapshot too
+        if isinstance(self.store, WriteBehindStore):
+            self.flush_writes()
+        self.snapshot_worker.start()
+
+    def show_snapshot_error(self, message):
+        QMessageBox.warning(self, "Backup Error", f"Could not take a snapshot of the database: {message}")
+
+    def flush_writes(self):
+        try:
+            self.store.flush()
+        except FlushError as e:
+            # One line for each edit that was lost
+            self.show_save_error(str(e), len(e.failed))
+        except self.store.Error as e:
+            self.show_save_error(str(e))
+
+    # count queued or optimistic changes were refused by the database or the
+    # server
+    def show_save_error(self, message, count=1):
+        title = "Server Error" if isinstance(self.store, RemoteStore) else "Database Error"
+        if count == 1:
+            QMessageBox.warning(self, title, f"A change could not be saved: {message}")
+        else:
+            QMessageBox.warning(self, title, f"{count} changes could not be saved:\n{message}")
+        current = self.stack.currentWidget()
+        if current in (self.admin_tab, self.user_tab):
+            current.refresh()
+
+    # Entries are kept and written once the log works again
+    def show_audit_error(self, message):
+        QMessageBox.warning(self, "Audit Log Error", f"Changes could not be written to the audit log: {message}")
+
+    def write_metrics(self):
+        try:
+            shelfwise_metrics.write_file(self.metrics_file)
+        except OSError:
+            # Monitoring only; tried again on the next tick
+            pass
+
+    def closeEvent(self, event):
+        if self.snapshot_worker:
+            self.snapshot_worker.wait()
+        if self.admin_tab.duplicate_search:
+            self.admin_tab.duplicate_search.wait()
+        try:
+            if self.user_tab:
+                self.user_tab.clear_cart()
+            self.store.close()
+        except self.store.Error as e:
+            QMessageBox.warning(self, "Database Error", f"A change could not be saved: {e}")
+        if self.metrics_file:
+            self.write_metrics()
+        self.thumbnails.close()
+        super().closeEvent(event)
+        
+# QApplication that times every user action, for the profiler (--profile)
+# and the action latency metric (--metrics-port, --metrics-file). A click,
+# key press or timer tick that arrives while nothing else is running starts
+# an action, named after the widget and the page it's on ("AdminTab: Add
+# User"). It lasts until the event loop is next idle, so the repaint it
+# caused is included. For a dialog opened meanwhile, the time from showing
+# it until it's drawn and waiting counts as "ui"; the time it then waits
+# for the user counts as "dialog" and is left out of the latency.
+class InstrumentedApplication(QApplication):
+    ACTION_EVENTS = (QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick, QEvent.KeyPress, QEvent.Timer)
+    RENDER_EVENTS = {QEvent.Paint: "Paint", QEvent.UpdateRequest: "UpdateRequest", QEvent.LayoutRequest: "Layout"}
+    # Quicker actions are left out of the profile (cursor blinks, keystrokes, idle timers)
+    MIN_ACTION_MS = 2
+
+    def __init__(self, argv, profiler=None, action_seconds=None):
+        super().__init__(argv)
+        self.profiler = profiler
+        self.action_seconds = action_seconds
+        self.depth = 0
+        # (name, started, whether the user started it), and the seconds
+        # it has spent waiting on the user in dialogs
+        self.action = None
+        self.waited = 0
+        # dialog -> [shown at, ready at]
+        self.dialogs = {}
+        QAbstractEventDispatcher.instance().aboutToBlock.connect(self.idle)
+
+    def notify(self, receiver, event):
+        kind = event.type()
+        if kind == QEvent.Show or kind == QEvent.Hide:
+            self.track_dialog(receiver, kind)
+        if self.depth or not (kind in self.ACTION_EVENTS or kind in self.RENDER_EVENTS):
+            self.depth += 1
+            try:
+                return super().notify(receiver, event)
+            finally:
+                self.depth -= 1
+        if kind in self.ACTION_EVENTS:
+            # No idle time since the last one: it ends here
+            self.end_action()
+            self.begin_action(receiver, kind)
+            span = nullcontext()
+        elif self.action is not None and self.profiler:
+            span = self.profiler.span(f"{self.RENDER_EVENTS[kind]} {type(receiver).__name__}", "ui")
+        else:
+            span = nullcontext()
+        self.depth += 1
+        try:
+            with span:
+                return super().notify(receiver, event)
+        finally:
+            self.depth -= 1
+
+    def begin_action(self, receiver, kind):
+        name = self.action_name(receiver)
+        self.action = (name, time.perf_counter(), kind != QEvent.Timer)
+        self.waited = 0
+        if self.profiler:
+            self.profiler.begin_action(name)
+
+    def end_action(self):
+        if self.action is None:
+            return
+        name, started, by_user = self.action
+        self.action = None
+        if self.profiler:
+            self.profiler.end_action(self.MIN_ACTION_MS)
+        if by_user and self.action_seconds:
+            self.action_seconds.observe(time.perf_counter() - started - self.waited, name)
+
+    def idle(self):
+        now = time.perf_counter()
+        for dialog, times in self.dialogs.items():
+            if times[1] is None:
+                times[1] = now
+                if self.profiler:
+                    self.profiler.record(f"Open {dialog.windowTitle()}", "ui", self.micros(times[0]), self.micros(now))
+        if not self.depth:
+            self.end_action()
+
+    def track_dialog(self, receiver, kind):
+        if not isinstance(receiver, QDialog):
+            return
+        if kind == QEvent.Show:
+            self.dialogs[receiver] = [time.perf_counter(), None]
+        elif receiver in self.dialogs:
+            shown, ready = self.dialogs.pop(receiver)
+            if ready is not None:
+                now = time.perf_counter()
+                self.waited += now - ready
+                if self.profiler:
+                    self.profiler.record(receiver.windowTitle(), "dialog", self.micros(ready), self.micros(now))
+
+    # perf_counter() time in the profiler's units
+    def micros(self, t):
+        return (t - self.profiler.origin) * 1e6
+
+    def action_name(self, receiver):
+        if receiver.objectName() == "qt_scrollarea_viewport":
+            receiver = receiver.parent()
+        if isinstance(receiver, QAbstractButton) and receiver.text():
+            name = receiver.text().replace("&", "")
+        elif isinstance(receiver, QLineEdit) and receiver.placeholderText():
+            name = receiver.placeholderText()
+        else:
+            name = receiver.objectName() or type(receiver).__name__
+        page = receiver.parent()
+        while page is not None and not isinstance(page, (AdminTab, UserTab, LoginPage, QDialog)):
+            page = page.parent()
+        if page is None:
+            return name
+        return f"{page.windowTitle() if isinstance(page, QDialog) else type(page).__name__}: {name}"
+
+# Main function
+def main():
+    # Create application directory if it doesn't exist
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    if not os.path.exists(app_dir):
+        os.makedirs(app_dir)
+    
+    # Talk to a Shelfwise server instead of the local database file when one
+    # is given with --server URL or the SHELFWISE_SERVER environment variable
+    server_url = os.environ.get("SHELFWISE_SERVER")
+    if "--server" in sys.argv[1:-1]:
+        server_url = sys.argv[sys.argv.index("--server") + 1]
+    # Or open another database directly: a sqlite file path or a
+    # postgresql:// URL, with --database or SHELFWISE_DATABASE
+    database = os.environ.get("SHELFWISE_DATABASE")
+    if "--database" in sys.argv[1:-1]:
+        database = sys.argv[sys.argv.index("--database") + 1]
+    
+    # Show collectors' prices in a second currency too (a code from
+    # currency_rates.json), with --currency or SHELFWISE_CURRENCY
+    currency = os.environ.get("SHELFWISE_CURRENCY")
+    if "--currency" in sys.argv[1:-1]:
+        currency = sys.argv[sys.argv.index("--currency") + 1]
+    # The store this terminal is in (a StoreID), with --store or SHELFWISE_STORE
+    store_id = os.environ.get("SHELFWISE_STORE")
+    if "--store" in sys.argv[1:-1]:
+        store_id = sys.argv[sys.argv.index("--store") + 1]
+
+    # Record where each action's time goes and write it to a trace file on
+    # exit, with --profile PATH or SHELFWISE_PROFILE
+    global profiler
+    profile_path = os.environ.get("SHELFWISE_PROFILE")
+    if "--profile" in sys.argv[1:-1]:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+    if profile_path:
+        profiler = shelfwise_profile.Profiler()
+    # Counters and latencies for monitoring (see shelfwise_metrics), served
+    # at http://127.0.0.1:PORT/metrics with --metrics-port PORT
+    # (SHELFWISE_METRICS_PORT) and/or rewritten every METRICS_INTERVAL ms
+    # into --metrics-file PATH (SHELFWISE_METRICS_FILE)
+    metrics_port = os.environ.get("SHELFWISE_METRICS_PORT")
+    if "--metrics-port" in sys.argv[1:-1]:
+        metrics_port = sys.argv[sys.argv.index("--metrics-port") + 1]
+    metrics_file = os.environ.get("SHELFWISE_METRICS_FILE")
+    if "--metrics-file" in sys.argv[1:-1]:
+        metrics_file = sys.argv[sys.argv.index("--metrics-file") + 1]
+    metrics = bool(metrics_port or metrics_file)
+    # Record changes made through the window in an audit log file (see
+    # shelfwise_audit), shelfwise_audit.db next to the app unless given with
+    # --audit PATH or SHELFWISE_AUDIT. With --server, the server records them.
+    global audit_log
+    audit_path = os.environ.get("SHELFWISE_AUDIT")
+    if "--audit" in sys.argv[1:-1]:
+        audit_path = sys.argv[sys.argv.index("--audit") + 1]
+    if profiler or metrics:
+        app = InstrumentedApplication(sys.argv, profiler, shelfwise_metrics.ACTION_SECONDS if metrics else None)
+    else:
+        app = QApplication(sys.argv)
+    if server_url:
+        store = RemoteStore(server_url)
+    else:
+        # threaded: snapshots are taken through the same connection on a worker thread
+        backend = open_backend(database, threaded=True)
+        # Ensure the database is initialized
+        backend.init_schema()
+        store = WriteBehindStore(backend.open_store())
+    if metrics:
+        shelfwise_metrics.instrument_store(store)
+    if profiler:
+        shelfwise_profile.profile_store(store, profiler)
+    if metrics_port:
+        try:
+            shelfwise_metrics.serve(int(metrics_port))
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(None, "Metrics", f"Cannot serve metrics on port {metrics_port}: {e}")
+    try:
+        stores = dict(store.list_stores())
+    except store.Error as e:
+        QMessageBox.critical(None, "Database Error", f"Failed to load stores: {str(e)}")
+        sys.exit(1)
+    try:
+        store_id = int(store_id) if store_id else DEFAULT_STORE
+    except ValueError:
+        store_id = None
+    if store_id not in stores:
+        QMessageBox.critical(None, "Error", "No such store. Pick one of: "
+                             + ", ".join(f"{sid} ({name})" for sid, name in stores.items()))
+        sys.exit(1)
+    try:
+        if not server_url:
+            audit_log = shelfwise_audit.AuditLog(audit_path)
+    except shelfwise_audit.Error as e:
+        QMessageBox.warning(None, "Audit Log Error", f"Cannot open the audit log, changes won't be recorded: {e}")
+    window = MainWindow(store, currency, metrics_file, store_id, stores[store_id])
+    window.show()
+    status = app.exec_()
+    if audit_log:
+        audit_log.close()
+    if profiler:
+        profiler.export(profile_path)
+    sys.exit(status)
+
+if __name__ == '__main__':
     main()
\ No newline at end of file
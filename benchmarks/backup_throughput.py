@@ -0,0 +1,111 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import shelfwise_db
+import shelfwise_backup
+
+# Backup throughput for shelfwise_backup on a large database, and how long
+# the desktop app's writes are held up meanwhile. As in the app, the backup
+# runs on a worker thread through the connection the main thread keeps
+# committing small edits on (--writes same). --writes other commits them from
+# a second connection instead, which makes SQLite restart the copy; runs are
+# cut off after --limit seconds.
+#
+#   python benchmarks/backup_throughput.py --size-mb 2048 --pages 64 256 1024 -1
+#
+# -1 copies everything in one step, i.e. the database is locked for the
+# whole backup. Put --dir on the disk being measured.
+
+def seed(db_name, size_mb):
+    shelfwise_db.init_db(db_name)
+    conn = shelfwise_db.connect(db_name)
+    conn.execute("INSERT INTO Items (CollectionID, ItemName, Price, stock_quantity) VALUES (1, 'Counted', 1.0, 0)")
+    # ~4 KB of description per item
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO Items (CollectionID, ItemName, Description, Price, stock_quantity)
+        SELECT 1 + i % 2, 'Item ' || i, hex(randomblob(2000)), 1.0, 10 FROM n
+    """, (size_mb * 256,))
+    conn.commit()
+    conn.close()
+
+def run(db_name, dest, pages, pause, writes, limit):
+    conn = shelfwise_db.connect(db_name, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout = 60000")
+    source = conn if writes != "other" else shelfwise_db.connect(db_name, check_same_thread=False)
+    steps = []
+    done = threading.Event()
+
+    def take():
+        try:
+            shelfwise_backup.backup(source, dest, pages=pages, pause=pause,
+                                    progress=lambda remaining, total: steps.append(remaining))
+        except sqlite3.Error:
+            pass
+        done.set()
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=take, daemon=True)
+    thread.start()
+    latencies = []
+    n = 0
+    while not done.is_set() and time.perf_counter() - start < limit:
+        if writes == "none":
+            done.wait(0.005)
+            continue
+        began = time.perf_counter()
+        conn.execute("UPDATE Items SET stock_quantity=? WHERE ItemID=1", (n,))
+        conn.commit()
+        latencies.append(time.perf_counter() - began)
+        n += 1
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    finished = done.is_set()
+    if not finished:
+        # Interrupt the copy so the thread lets go of the connection
+        source.interrupt()
+        thread.join()
+    conn.close()
+    if source is not conn:
+        source.close()
+    return finished, elapsed, len(steps), latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure online backup throughput")
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--pages", type=int, nargs="+", default=[64, 256, 1024, -1],
+                        help="pages copied per step (-1: all at once)")
+    parser.add_argument("--pause", type=float, default=shelfwise_backup.STEP_PAUSE, help="seconds between steps")
+    parser.add_argument("--writes", choices=("same", "other", "none"), default="same",
+                        help="connection the concurrent edits are committed on")
+    parser.add_argument("--limit", type=float, default=60, help="give up on a backup after this many seconds")
+    parser.add_argument("--dir", default=None, help="directory for the scratch databases")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(dir=args.dir)
+    db_name = os.path.join(tmp, "shelfwise.db")
+    start = time.perf_counter()
+    seed(db_name, args.size_mb)
+    size = os.path.getsize(db_name)
+    print(f"database {size / 2**20:.0f} MB, seeded in {time.perf_counter() - start:.1f}s, writes={args.writes}")
+    print(f"{'pages':>6} {'MB/s':>8} {'total':>8} {'steps':>6} {'writes':>7} {'p99 write':>10} {'max write':>10}")
+    for pages in args.pages:
+        dest = os.path.join(tmp, f"snapshot{pages}.db")
+        finished, elapsed, steps, latencies = run(db_name, dest, pages, args.pause, args.writes, args.limit)
+        latencies.sort()
+        p99 = f"{latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms" if latencies else "-"
+        worst = f"{latencies[-1] * 1000:.1f}ms" if latencies else "-"
+        rate = f"{size / 2**20 / elapsed:.0f}" if finished else "gave up"
+        print(f"{pages:>6} {rate:>8} {elapsed:>7.2f}s {steps:>6} {len(latencies):>7} {p99:>10} {worst:>10}")
+        if os.path.exists(dest):
+            os.remove(dest)
+    os.remove(db_name)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import shelfwise_db
+
+# Commit rate for a long run of quantity edits (stock-taking), one commit per
+# edit versus WriteBehindStore's group commits, in SQLite's rollback-journal
+# (DELETE) and WAL modes. The database goes in --dir, which should be on the
+# disk being measured: a tmpfs makes every fsync free.
+#
+#   python benchmarks/group_commit.py --edits 2000 --batch 1 50 500
+
+def seed(db_name, rows):
+    shelfwise_db.init_db(db_name)
+    conn = shelfwise_db.connect(db_name)
+    conn.execute("INSERT INTO Users (Username, Password, DateJoined) VALUES ('counter', 'pw', '2024-01-01')")
+    conn.executemany("INSERT INTO Items (CollectionID, ItemName, Price, stock_quantity) VALUES (1, ?, 1.0, 100)",
+                     [(f"Item {i}",) for i in range(rows)])
+    conn.executemany("INSERT INTO Users_Items (UserID, ItemID, DateAdded, Quantity) VALUES (2, ?, '2024-01-01', 1)",
+                     [(i + 1,) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+def run(db_name, journal_mode, batch, edits, rows):
+    conn = shelfwise_db.connect(db_name)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    store = shelfwise_db.ShelfwiseStore(conn)
+    if batch > 1:
+        store = shelfwise_db.WriteBehindStore(store, max_pending=batch)
+    rng = random.Random(1)
+    # Distinct rows, so coalescing repeated edits doesn't flatter the batches
+    ui_ids = rng.sample(range(1, rows + 1), edits)
+    start = time.perf_counter()
+    for ui_id in ui_ids:
+        store.update_user_item_quantity(ui_id, rng.randint(0, 50))
+    store.close()
+    elapsed = time.perf_counter() - start
+    commits = edits if batch == 1 else -(-edits // batch)
+    return elapsed, commits
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure group commit against a commit per edit")
+    parser.add_argument("--edits", type=int, default=2000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 50, 500],
+                        help="edits per commit; 1 is the old commit-per-click behaviour")
+    parser.add_argument("--dir", default=None, help="directory for the scratch database")
+    args = parser.parse_args()
+
+    rows = args.edits
+    print(f"edits={args.edits}")
+    print(f"{'journal':8} {'batch':>6} {'commits/s':>10} {'edits/s':>10} {'total':>9}")
+    for journal_mode in ("DELETE", "WAL"):
+        for batch in args.batch:
+            db_name = os.path.join(tempfile.mkdtemp(dir=args.dir), "shelfwise.db")
+            seed(db_name, rows)
+            elapsed, commits = run(db_name, journal_mode, batch, args.edits, rows)
+            print(f"{journal_mode:8} {batch:>6} {commits / elapsed:>10.0f} {args.edits / elapsed:>10.0f} "
+                  f"{elapsed * 1000:>7.0f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import shelfwise_db
+
+# Load test for shelfwise_server: starts the server on a scratch database in
+# a separate process, then hammers it from many concurrent clients with a
+# mix of catalogue reads and reservations, all in one store manager session.
+#
+#   python benchmarks/loadtest_server.py --clients 300 --duration 10
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shelfwise_server.py")
+
+def seed(db_name, users, items):
+    shelfwise_db.DB_NAME = db_name
+    shelfwise_db.init_db()
+    conn = shelfwise_db.connect(db_name)
+    conn.executemany("INSERT INTO Users (Username, Password, DateJoined) VALUES (?, 'pw', '2024-01-01')",
+                     [(f"collector{i}",) for i in range(users)])
+    conn.executemany("INSERT INTO Items (CollectionID, ItemName, Price) VALUES (?, ?, ?)",
+                     [(1 + i % 2, f"Item {i}", 1.0 + i % 50) for i in range(items)])
+    conn.execute("INSERT INTO ItemStock (StoreID, ItemID, Quantity) SELECT ?, ItemID, 1000000 FROM Items",
+                 (shelfwise_db.DEFAULT_STORE,))
+    conn.commit()
+    conn.close()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def wait_for_server(base_url, timeout=15):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(base_url + "/api/stores") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+# Log in as the admin the scratch database starts with; returns the token
+async def log_in(base_url):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(base_url + "/api/login",
+                                json={"username": "admin", "password": "admin", "admin": True}) as resp:
+            body = await resp.json()
+    if not body.get("token"):
+        raise RuntimeError(f"cannot log in: {body}")
+    return body["token"]
+
+async def client(session, base_url, args, deadline, stats):
+    rng = random.Random()
+    while time.monotonic() < deadline:
+        user_id = rng.randint(2, args.users + 1)
+        item_id = rng.randint(1, args.items)
+        if rng.random() < args.write_ratio:
+            kind = "write"
+            request = session.post(base_url + "/api/reservations",
+                                   json={"user_id": user_id, "item_id": item_id, "quantity": 1})
+        else:
+            kind = "read"
+            choice = rng.random()
+            if choice < 0.4:
+                request = session.get(base_url + f"/api/items/{item_id}")
+            elif choice < 0.8:
+                request = session.get(base_url + f"/api/users/{user_id}/items")
+            else:
+                request = session.get(base_url + "/api/items",
+                                      params={"collection_id": str(rng.randint(1, 2)), "in_stock": "true"})
+        start = time.perf_counter()
+        try:
+            async with request as resp:
+                await resp.read()
+                ok = resp.status == 200
+        except aiohttp.ClientError:
+            ok = False
+        stats[kind].append(time.perf_counter() - start)
+        if not ok:
+            stats["errors"] += 1
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+async def run(args, base_url):
+    await wait_for_server(base_url)
+    token = await log_in(base_url)
+    stats = {"read": [], "write": [], "errors": 0}
+    connector = aiohttp.TCPConnector(limit=args.clients)
+    async with aiohttp.ClientSession(connector=connector, headers={"Authorization": f"Bearer {token}"}) as session:
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(*(client(session, base_url, args, deadline, stats) for _ in range(args.clients)))
+    total = len(stats["read"]) + len(stats["write"])
+    print(f"clients={args.clients} readers={args.readers} duration={args.duration}s write_ratio={args.write_ratio}")
+    print(f"requests={total} errors={stats['errors']} throughput={total / args.duration:.0f} req/s")
+    for kind in ("read", "write"):
+        values = stats[kind]
+        print(f"  {kind:5} n={len(values):7} p50={percentile(values, 0.5):7.1f} ms "
+              f"p95={percentile(values, 0.95):7.1f} ms p99={percentile(values, 0.99):7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Shelfwise HTTP service")
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--items", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "shelfwise.db")
+        seed(db_name, args.users, args.items)
+        port = free_port()
+        server = subprocess.Popen([sys.executable, SERVER, "--db", db_name, "--port", str(port),
+                                   "--readers", str(args.readers), "--audit", os.path.join(tmp, "audit.db")],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    main()
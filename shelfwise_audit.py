@@ -0,0 +1,196 @@
+import argparse
+import datetime
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+
+# Append-only record of who changed what: every add, edit and delete made in
+# the admin pages, collectors' account edits and checkouts, with the row as
+# it was before and after. Entries are handed to a writer thread and saved
+# in their own SQLite file, a batch per transaction, so recording one costs
+# the window a queue put and never waits on the disk. The table refuses
+# UPDATE and DELETE, and is indexed on the time for range queries:
+#
+#   python shelfwise_audit.py --since "2026-10-19 09:00" --until "2026-10-19 17:00"
+#   python shelfwise_audit.py --since 2026-10-01 --actor 1 --action delete_item
+#
+# Passwords are never written; an entry only says whether one changed.
+
+AUDIT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shelfwise_audit.db")
+
+# Most entries written in one transaction
+BATCH = 500
+# Seconds before writing again after a failure
+RETRY_PAUSE = 5
+
+SECRET_FIELDS = ("Password",)
+
+# Names of the fields a user or item is added or edited with, and of
+# get_user()'s row, so every client's entries read the same
+USER_FIELDS = ("FirstName", "LastName", "Username", "Password", "Email", "DateJoined", "RoleID")
+USER_ROW = ("UserID", "FirstName", "LastName", "Username", "Email", "DateJoined", "RoleID")
+ITEM_FIELDS = ("CollectionID", "ItemName", "Description", "Price", "stock_quantity")
+
+# Database problems; file system ones are OSError
+Error = sqlite3.Error
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS AuditLog (
+    EntryID INTEGER PRIMARY KEY,
+    At TEXT NOT NULL,
+    ActorID INTEGER,
+    Action TEXT NOT NULL,
+    TargetTable TEXT,
+    TargetID INTEGER,
+    Before TEXT,
+    After TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_auditlog_at ON AuditLog(At);
+CREATE TRIGGER IF NOT EXISTS auditlog_no_update BEFORE UPDATE ON AuditLog
+BEGIN SELECT RAISE(ABORT, 'the audit log is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS auditlog_no_delete BEFORE DELETE ON AuditLog
+BEGIN SELECT RAISE(ABORT, 'the audit log is append-only'); END;
+"""
+
+def connect(path=None):
+    conn = sqlite3.connect(path or AUDIT_DB, check_same_thread=False)
+    # Readers (the command below) don't hold up the writer or the other way round
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+# Times are local, like the backups', and sort as text
+def timestamp(when=None):
+    return (when or datetime.datetime.now()).isoformat(sep=" ", timespec="milliseconds")
+
+# The before and after of an edit, cut down to the fields that changed.
+# Secrets are left out, except that an edit that changes one says so.
+def changes(before, after):
+    edit = before is not None and after is not None
+    if edit:
+        changed = [name for name in after if before.get(name) != after[name]]
+        before = {name: before.get(name) for name in changed}
+        after = {name: after[name] for name in changed}
+    for name in SECRET_FIELDS:
+        if before:
+            before.pop(name, None)
+        if after and name in after:
+            if edit:
+                after[name] = "(changed)"
+            else:
+                del after[name]
+    return before or None, after or None
+
+class AuditLog:
+    def __init__(self, path=None, on_error=None):
+        self.path = path or AUDIT_DB
+        # Called with the message from the writer thread when entries can't
+        # be saved; they are kept and tried again
+        self.on_error = on_error
+        self.conn = connect(self.path)
+        self.queue = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self.write_entries, name="shelfwise-audit", daemon=True)
+        self.writer.start()
+
+    # actor_id did action (a store method name) to row target_id of
+    # target_table; before and after are the row's fields as dicts
+    def record(self, actor_id, action, target_table=None, target_id=None, before=None, after=None):
+        before, after = changes(dict(before) if before is not None else None,
+                                dict(after) if after is not None else None)
+        self.queue.put((timestamp(), actor_id, action, target_table, target_id,
+                        json.dumps(before, default=str) if before else None,
+                        json.dumps(after, default=str) if after else None))
+
+    # Save whatever is queued and stop the writer
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        self.conn.close()
+
+    def write_entries(self):
+        pending = []
+        closing = False
+        failing = False
+        while True:
+            try:
+                entry = self.queue.get(timeout=RETRY_PAUSE if pending else None)
+                # Take whatever else is waiting along with it
+                while entry is not None:
+                    pending.append(entry)
+                    if len(pending) >= BATCH:
+                        break
+                    entry = self.queue.get_nowait()
+                closing = entry is None
+            except queue.Empty:
+                pass
+            if pending:
+                try:
+                    with self.conn:
+                        self.conn.executemany("""INSERT INTO AuditLog
+                                                 (At, ActorID, Action, TargetTable, TargetID, Before, After)
+                                                 VALUES (?, ?, ?, ?, ?, ?, ?)""", pending)
+                    pending = []
+                    failing = False
+                except sqlite3.Error as e:
+                    # Report once per run of failures, not on every retry
+                    if not failing and self.on_error:
+                        self.on_error(str(e))
+                    failing = True
+            if closing:
+                return
+
+# Entries between since and until (inclusive, YYYY-MM-DD[ HH:MM[:SS]]),
+# oldest first, as (at, actor_id, action, table, id, before, after)
+def entries(path=None, since=None, until=None, actor_id=None, action=None):
+    conditions = []
+    params = []
+    if since:
+        conditions.append("At >= ?")
+        params.append(since)
+    if until:
+        # A bare date or minute means up to the end of it ("~" sorts after
+        # the digits and separators of a time)
+        conditions.append("At <= ?")
+        params.append(until + "~")
+    if actor_id is not None:
+        conditions.append("ActorID = ?")
+        params.append(actor_id)
+    if action:
+        conditions.append("Action = ?")
+        params.append(action)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    conn = connect(path)
+    try:
+        rows = conn.execute(f"""SELECT At, ActorID, Action, TargetTable, TargetID, Before, After
+                                FROM AuditLog{where} ORDER BY At, EntryID""", params).fetchall()
+    finally:
+        conn.close()
+    return [row[:5] + tuple(json.loads(value) if value else None for value in row[5:]) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the Shelfwise audit log")
+    parser.add_argument("--file", default=AUDIT_DB, help="path to the audit log")
+    parser.add_argument("--since", help="first time to show (YYYY-MM-DD[ HH:MM])")
+    parser.add_argument("--until", help="last time to show (YYYY-MM-DD[ HH:MM])")
+    parser.add_argument("--actor", type=int, help="only changes made by this user id")
+    parser.add_argument("--action", help="only this kind of change, e.g. delete_user")
+    args = parser.parse_args()
+
+    try:
+        rows = entries(args.file, args.since, args.until, args.actor, args.action)
+    except sqlite3.Error as e:
+        sys.exit(f"Cannot read {args.file}: {e}")
+    for at, actor_id, action, table, target_id, before, after in rows:
+        target = f"{table} {target_id}" if table else ""
+        print(f"{at}  user {actor_id}  {action} {target}".rstrip())
+        if before:
+            print(f"    before: {json.dumps(before, default=str)}")
+        if after:
+            print(f"    after:  {json.dumps(after, default=str)}")
+
+if __name__ == '__main__':
+    main()
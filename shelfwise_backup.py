@@ -0,0 +1,161 @@
+import argparse
+import datetime
+import os
+import re
+import sqlite3
+import sys
+
+import shelfwise_db
+
+# Backups of a SQLite shelfwise.db that are safe to take while the app is
+# running. Copying the file directly can catch a write half-way; this goes
+# through SQLite's online backup API instead, PAGES_PER_STEP pages at a time
+# with a short pause between steps, so the database is only locked for
+# moments and other connections keep working.
+#
+# Every snapshot is a consistent state of the database: if another
+# connection writes while a copy is in progress, SQLite starts the copy over,
+# which under a steady stream of edits can go on indefinitely. Writes made
+# through the connection being backed up are copied into the snapshot as
+# they happen instead, so the desktop app backs up through its own
+# connection (opened with check_same_thread=False) from a worker thread.
+#
+#   python shelfwise_backup.py snapshot            # take one now
+#   python shelfwise_backup.py list
+#   python shelfwise_backup.py restore --at "2026-10-19 14:00"
+#
+# Snapshots are shelfwise-YYYYMMDD-HHMMSS.db files in a backups directory
+# next to the database. Only the newest KEEP are kept. The desktop app takes
+# one every SNAPSHOT_INTERVAL seconds.
+
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.005
+SNAPSHOT_INTERVAL = 3600
+KEEP = 24
+
+# Database problems; file system ones are OSError
+Error = sqlite3.Error
+
+SNAPSHOT_NAME = re.compile(r"^shelfwise-(\d{8}-\d{6})(?:-(\d+))?\.db$")
+
+# Copy every page of the source database (a path or an open connection)
+# into the database dst_name, through SQLite so that connections open on
+# either one stay valid. progress(remaining, total) is called after every step.
+def copy_pages(source, dst_name, pages=PAGES_PER_STEP, pause=STEP_PAUSE, progress=None):
+    src = sqlite3.connect(source) if isinstance(source, str) else source
+    try:
+        dst = sqlite3.connect(dst_name)
+        try:
+            src.backup(dst, pages=pages, sleep=pause,
+                       progress=(lambda status, remaining, total: progress(remaining, total)) if progress else None)
+        finally:
+            dst.close()
+    finally:
+        if src is not source:
+            src.close()
+
+# Copy the database (a path or an open connection) to a new file dest. The
+# copy is written next to dest and renamed into place when complete, so dest
+# is never a partial file.
+def backup(source, dest, **options):
+    partial = dest + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    copy_pages(source, partial, **options)
+    os.replace(partial, dest)
+
+def default_backup_dir(db_name=None):
+    return os.path.join(os.path.dirname(os.path.abspath(db_name or shelfwise_db.DB_NAME)), "backups")
+
+# Newest last: [(taken at, path), ...]
+def list_snapshots(backup_dir=None):
+    backup_dir = backup_dir or default_backup_dir()
+    if not os.path.isdir(backup_dir):
+        return []
+    snapshots = []
+    for name in os.listdir(backup_dir):
+        match = SNAPSHOT_NAME.match(name)
+        if match:
+            taken_at = datetime.datetime.strptime(match.group(1), "%Y%m%d-%H%M%S")
+            # -1, -2, ... tell apart snapshots taken in the same second
+            snapshots.append((taken_at, int(match.group(2) or 0), os.path.join(backup_dir, name)))
+    snapshots.sort()
+    return [(taken_at, path) for taken_at, _, path in snapshots]
+
+def prune(backup_dir=None, keep=KEEP):
+    snapshots = list_snapshots(backup_dir)
+    for _, path in snapshots[:max(len(snapshots) - keep, 0)]:
+        os.remove(path)
+
+# Take a snapshot of db_name, drop the ones past the retention limit and
+# return the new snapshot's path. conn: copy through this open connection
+# to db_name rather than a new one.
+def snapshot(db_name=None, backup_dir=None, keep=KEEP, conn=None, **options):
+    db_name = db_name or shelfwise_db.DB_NAME
+    backup_dir = backup_dir or default_backup_dir(db_name)
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    dest = os.path.join(backup_dir, f"shelfwise-{stamp}.db")
+    n = 1
+    while os.path.exists(dest):
+        dest = os.path.join(backup_dir, f"shelfwise-{stamp}-{n}.db")
+        n += 1
+    backup(conn or db_name, dest, **options)
+    prune(backup_dir, keep)
+    return dest
+
+# The newest snapshot taken at or before the given time
+def find_snapshot(at, backup_dir=None):
+    earlier = [path for taken_at, path in list_snapshots(backup_dir) if taken_at <= at]
+    if not earlier:
+        raise FileNotFoundError(f"No snapshot taken at or before {at:%Y-%m-%d %H:%M:%S}")
+    return earlier[-1]
+
+# Replace the contents of db_name with a snapshot. The snapshot is checked
+# first, and the current database is copied to db_name + ".before-restore"
+# so the restore can itself be undone. The pages are written into the
+# existing database rather than swapping the file, which would leave open
+# connections (and any -wal file) pointing at the old one.
+def restore(snapshot_path, db_name=None, **options):
+    db_name = db_name or shelfwise_db.DB_NAME
+    check = sqlite3.connect(snapshot_path)
+    try:
+        result = check.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        check.close()
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"{snapshot_path} is damaged: {result}")
+    if os.path.exists(db_name):
+        backup(db_name, db_name + ".before-restore", **options)
+    copy_pages(snapshot_path, db_name, **options)
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up and restore shelfwise.db")
+    parser.add_argument("--db", default=shelfwise_db.DB_NAME, help="path to shelfwise.db")
+    parser.add_argument("--dir", default=None, help="snapshot directory (default: backups next to the database)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    take = commands.add_parser("snapshot", help="take a snapshot now")
+    take.add_argument("--keep", type=int, default=KEEP, help="number of snapshots to keep")
+    commands.add_parser("list", help="list snapshots")
+    back = commands.add_parser("restore", help="restore a snapshot (close the app first)")
+    which = back.add_mutually_exclusive_group(required=True)
+    which.add_argument("--snapshot", help="path of the snapshot to restore")
+    which.add_argument("--at", help="restore the newest snapshot taken at or before this time (YYYY-MM-DD HH:MM)")
+    args = parser.parse_args()
+
+    backup_dir = args.dir or default_backup_dir(args.db)
+    if args.command == "snapshot":
+        print(snapshot(args.db, backup_dir, args.keep))
+    elif args.command == "list":
+        for taken_at, path in list_snapshots(backup_dir):
+            print(f"{taken_at:%Y-%m-%d %H:%M:%S}  {os.path.getsize(path):>12}  {path}")
+    else:
+        try:
+            path = args.snapshot or find_snapshot(datetime.datetime.fromisoformat(args.at), backup_dir)
+            restore(path, args.db)
+        except (FileNotFoundError, ValueError, sqlite3.Error) as e:
+            sys.exit(f"Restore failed: {e}")
+        print(f"Restored {path} into {args.db}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+import http.client
+import inspect
+import json
+import queue
+import re
+import threading
+import time
+from urllib.parse import urlsplit, urlencode, quote
+
+from shelfwise_db import API_ROUTES, ShelfwiseStore, OutOfStockError, apply_user_item_quantity, apply_item
+from shelfwise_session import RateLimitedError
+
+# RemoteStore has the same methods as ShelfwiseStore but talks to a running
+# shelfwise_server instead of opening shelfwise.db, so many front-desk
+# terminals can share one store without sharing a database file.
+#
+# - GET results are cached; for FRESH_FOR seconds they are reused as is,
+#   after that they are revalidated with If-None-Match (304 = reuse).
+# - prefetch() fetches several reads in one POST /api/batch.
+# - Edits listed in OPTIMISTIC are applied to the cached results straight
+#   away and sent in the background, coalesced into batches. A failure is
+#   reported through on_error and the cache is revalidated.
+# - authenticate() logs in on the server (POST /api/login); every request
+#   after that carries the session's token, and the server checks what the
+#   user's role allows. logout() ends the session. The cache is emptied on
+#   both, so one user's results are never served to the next.
+
+class RemoteError(Exception):
+    pass
+
+class RemoteIntegrityError(RemoteError):
+    pass
+
+ROUTES = {method: (http_method, path, kind) for http_method, path, method, kind, _ in API_ROUTES}
+SIGNATURES = {method: inspect.signature(getattr(ShelfwiseStore, method)) for method in ROUTES}
+
+# Keep-alive HTTP connection, reopened when the server has closed it
+class HttpConnection:
+    def __init__(self, base_url, timeout=10):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.https = parts.scheme == "https"
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None, retry=True):
+        if self.conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self.conn = cls(self.host, self.port, timeout=self.timeout)
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.getheader("ETag"), response.read()
+        except (http.client.HTTPException, OSError) as e:
+            self.close()
+            # Only a GET is safe to repeat: a write may already have been applied
+            if retry and method == "GET":
+                return self.request(method, path, None, headers, False)
+            raise RemoteError(f"Cannot reach Shelfwise server: {e}")
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+class CacheEntry:
+    __slots__ = ("etag", "value", "fetched_at")
+
+    def __init__(self, etag, value, fetched_at):
+        self.etag = etag
+        self.value = value
+        self.fetched_at = fetched_at
+
+def unpack(body):
+    if "columns" in body:
+        return [tuple(row) for row in body["rows"]]
+    value = body["result"]
+    return tuple(value) if isinstance(value, list) else value
+
+# Cache key of a call; list and dict arguments (list_view's filters) are
+# keyed by their JSON text
+def cache_key(method, params):
+    return (method, json.dumps(params, sort_keys=True))
+
+def raise_for(status, body):
+    message = body.get("error") or f"HTTP {status}"
+    if status == 409 and "available" in body:
+        raise OutOfStockError(body["available"], body.get("item_id"))
+    if status == 409:
+        raise RemoteIntegrityError(message)
+    raise RemoteError(message)
+
+class RemoteStore:
+    # Same names as the DB-API exceptions ShelfwiseStore exposes
+    Error = RemoteError
+    IntegrityError = RemoteIntegrityError
+
+    FRESH_FOR = 1.0
+    MAX_CACHED = 256
+    MAX_BATCH = 50
+    OPTIMISTIC = ("update_user_item_quantity", "update_item")
+    # The server opens the sessions and counts failed logins, so
+    # SessionManager asks it on every login instead of reusing its own
+    keeps_sessions = True
+
+    def __init__(self, base_url, on_error=None, timeout=10):
+        self.http = HttpConnection(base_url, timeout)
+        self.on_error = on_error
+        self.cache = {}
+        self.lock = threading.Lock()
+        # Token of the server session, None until authenticate() succeeds
+        self.token = None
+        # Optimistic edits not yet confirmed by the server; while there are
+        # any, cached results are served without revalidating so the local
+        # edits don't flicker away
+        self.pending = 0
+        self.outbox = queue.Queue()
+        self.sender_http = HttpConnection(base_url, timeout)
+        self.sender = threading.Thread(target=self._send_loop, name="shelfwise-sender", daemon=True)
+        self.sender.start()
+
+    def close(self):
+        self.logout()
+        self.outbox.put(None)
+        self.sender.join()
+        self.http.close()
+
+    def _headers(self, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    # The user's id, or None for wrong credentials. Raises RateLimitedError
+    # once the server refuses further attempts.
+    def authenticate(self, username, password, admin=False):
+        self.logout()
+        status, etag, data = self.http.request(
+            "POST", ROUTES["authenticate"][1], {"username": username, "password": password, "admin": admin})
+        body = json.loads(data)
+        if status == 429:
+            raise RateLimitedError(body.get("retry_after", 0))
+        if status != 200:
+            raise_for(status, body)
+        self.token = body.get("token")
+        return body["result"]
+
+    # End the server session, once the edits made in it have been sent
+    def logout(self):
+        self.flush()
+        if self.token:
+            try:
+                self.http.request("POST", "/api/logout", {}, self._headers())
+            except RemoteError:
+                # It expires on the server in any case
+                pass
+            self.token = None
+        with self.lock:
+            self.cache.clear()
+
+    # Wait until every optimistic edit has reached the server
+    def flush(self):
+        self.outbox.join()
+
+    def _bind(self, method, args, kwargs):
+        bound = SIGNATURES[method].bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        params.pop("self")
+        return params
+
+    def _path(self, method, params):
+        http_method, path, kind = ROUTES[method]
+        params = dict(params)
+        for name in re.findall(r"{(\w+)}", path):
+            path = path.replace("{" + name + "}", quote(str(params.pop(name))))
+        return http_method, path, params
+
+    def call(self, method, *args, **kwargs):
+        params = self._bind(method, args, kwargs)
+        if method in self.OPTIMISTIC:
+            return self._send_optimistic(method, params)
+        http_method, path, rest = self._path(method, params)
+        if http_method == "GET":
+            return self._get(method, params, path, rest)
+        # Queued edits go first so the server sees changes in the order they were made
+        self.flush()
+        status, etag, data = self.http.request(http_method, path, rest, self._headers())
+        body = json.loads(data)
+        if ROUTES[method][2] == "write":
+            self._mark_stale()
+        if status != 200:
+            raise_for(status, body)
+        return unpack(body)
+
+    def _get(self, method, params, path, rest):
+        key = cache_key(method, params)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry and (self.pending or now - entry.fetched_at < self.FRESH_FOR):
+                return entry.value
+        query = urlencode({k: json.dumps(v) for k, v in rest.items() if v is not None})
+        headers = {"If-None-Match": entry.etag} if entry and entry.etag else {}
+        status, etag, data = self.http.request("GET", path + ("?" + query if query else ""),
+                                               headers=self._headers(headers))
+        if status == 304 and entry:
+            entry.fetched_at = now
+            return entry.value
+        body = json.loads(data)
+        if status != 200:
+            raise_for(status, body)
+        value = unpack(body)
+        self._remember(key, etag, value, now)
+        return value
+
+    def _remember(self, key, etag, value, now):
+        with self.lock:
+            self.cache.pop(key, None)
+            self.cache[key] = CacheEntry(etag, value, now)
+            while len(self.cache) > self.MAX_CACHED:
+                del self.cache[next(iter(self.cache))]
+
+    def _mark_stale(self):
+        with self.lock:
+            for entry in self.cache.values():
+                entry.fetched_at = 0
+
+    # Fetch several reads in one round trip, e.g.
+    #   store.prefetch([("list_users", {}), ("list_items", {"in_stock": True})])
+    # The results land in the cache for the calls that follow.
+    def prefetch(self, calls):
+        batch, keys = [], []
+        now = time.monotonic()
+        for method, kwargs in calls:
+            params = self._bind(method, (), kwargs)
+            key = cache_key(method, params)
+            with self.lock:
+                entry = self.cache.get(key)
+            if entry and (self.pending or now - entry.fetched_at < self.FRESH_FOR):
+                continue
+            batch.append({"method": method, "params": params, "etag": entry.etag if entry else None})
+            keys.append(key)
+        if not batch:
+            return
+        # Only a hint: if it fails, the calls that follow fetch (and report) on their own
+        try:
+            status, etag, data = self.http.request("POST", "/api/batch", {"calls": batch}, self._headers())
+        except RemoteError:
+            return
+        if status != 200:
+            return
+        for key, result in zip(keys, json.loads(data)["results"]):
+            if result["status"] == 304:
+                with self.lock:
+                    if key in self.cache:
+                        self.cache[key].fetched_at = now
+            elif result["status"] == 200:
+                self._remember(key, result.get("etag"), unpack(result["body"]), now)
+
+    def _send_optimistic(self, method, params):
+        with self.lock:
+            self.pending += 1
+            getattr(self, "_patch_" + method)(**params)
+        self.outbox.put((method, params))
+
+    # Background thread: send queued edits, as many per request as are waiting
+    def _send_loop(self):
+        while True:
+            first = self.outbox.get()
+            if first is None:
+                self.outbox.task_done()
+                self.sender_http.close()
+                return
+            calls = [first]
+            while len(calls) < self.MAX_BATCH:
+                try:
+                    call = self.outbox.get_nowait()
+                except queue.Empty:
+                    break
+                if call is None:
+                    self.outbox.put(None)
+                    self.outbox.task_done()
+                    break
+                calls.append(call)
+            errors = []
+            try:
+                status, etag, data = self.sender_http.request(
+                    "POST", "/api/batch", {"calls": [{"method": m, "params": p} for m, p in calls]},
+                    self._headers())
+                if status != 200:
+                    errors.append(json.loads(data).get("error") or f"HTTP {status}")
+                else:
+                    for result in json.loads(data)["results"]:
+                        if result["status"] != 200:
+                            errors.append(result["body"].get("error") or f"HTTP {result['status']}")
+            except RemoteError as e:
+                errors.append(str(e))
+            with self.lock:
+                self.pending -= len(calls)
+            self._mark_stale()
+            for _ in calls:
+                self.outbox.task_done()
+            if errors and self.on_error:
+                self.on_error("; ".join(errors))
+
+    # Local effects of the optimistic edits on cached results (lock held)
+
+    def _patch_update_user_item_quantity(self, **params):
+        for (method, _), entry in self.cache.items():
+            entry.value = apply_user_item_quantity(method, entry.value, **params)
+
+    def _patch_update_item(self, **params):
+        collection_names = {}
+        for (method, _), entry in self.cache.items():
+            if method == "list_collections":
+                collection_names.update((row[0], row[1]) for row in entry.value)
+        for (method, key), entry in self.cache.items():
+            # Reads of other stores' stock catch up once the edit is sent
+            if method in ("get_item", "list_items") and json.loads(key)["store_id"] == params["store_id"]:
+                entry.value = apply_item(method, entry.value, collection_names, **params)
+
+def _remote_method(method):
+    def call(self, *args, **kwargs):
+        return self.call(method, *args, **kwargs)
+    call.__name__ = method
+    call.__signature__ = SIGNATURES[method]
+    return call
+
+for _method in ROUTES:
+    # authenticate() is written out above
+    if not hasattr(RemoteStore, _method):
+        setattr(RemoteStore, _method, _remote_method(_method))
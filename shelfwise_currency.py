@@ -0,0 +1,82 @@
+import functools
+import json
+import os
+
+# Currencies for showing prices. Items.Price is stored in one base currency
+# (the one AddItemDialog takes prices in); other currencies are shown by
+# converting with the rates in a local JSON file:
+#
+#   {"base": "PHP",
+#    "currencies": {"PHP": {"symbol": "₱", "rate": 1},
+#                   "USD": {"symbol": "$", "rate": 0.0172}}}
+#
+# rate is how much of the currency one unit of the base buys; "decimals"
+# (default 2) sets how prices in it are rounded. The file is read once and
+# read again only when it changes on disk.
+
+RATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "currency_rates.json")
+
+# Used when there is no rates file
+DEFAULT_RATES = {"base": "PHP", "currencies": {"PHP": {"symbol": "₱", "rate": 1}}}
+
+class Currency:
+    __slots__ = ("code", "symbol", "rate", "decimals")
+
+    def __init__(self, code, symbol, rate, decimals=2):
+        self.code = code
+        self.symbol = symbol
+        self.rate = rate
+        self.decimals = decimals
+
+class RateTable:
+    def __init__(self, data):
+        try:
+            self.base = data["base"]
+            self.currencies = {code: Currency(code, spec.get("symbol", code + " "), float(spec["rate"]),
+                                              int(spec.get("decimals", 2)))
+                               for code, spec in data["currencies"].items()}
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            raise ValueError(f"Bad currency rates: {e!r}")
+        if self.base not in self.currencies:
+            raise ValueError(f"Bad currency rates: base currency {self.base} has no entry")
+
+    def codes(self):
+        return list(self.currencies)
+
+    def get(self, code):
+        return self.currencies.get(code) or self.currencies[self.base]
+
+    def formatter(self, *codes):
+        return price_formatter(tuple(self.get(code) for code in codes or (self.base,)))
+
+# (path, mtime) -> RateTable
+_loaded = {}
+
+# The rate table in path, from cache unless the file has changed since.
+# Raises ValueError if the file can't be parsed.
+def load_rates(path=None):
+    path = path or RATES_FILE
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return RateTable(DEFAULT_RATES)
+    cached = _loaded.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, encoding="utf-8") as f:
+            table = RateTable(json.load(f))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read {path}: {e}")
+    _loaded[path] = (mtime, table)
+    return table
+
+# A function from a base-currency price to its text in each of currencies,
+# e.g. "₱500.00 / $8.60". Each distinct price is formatted once; tables
+# repeat the same few prices over and over.
+@functools.lru_cache(maxsize=32)
+def price_formatter(currencies):
+    @functools.lru_cache(maxsize=4096)
+    def format_price(price):
+        return " / ".join(f"{currency.symbol}{price * currency.rate:,.{currency.decimals}f}" for currency in currencies)
+    return format_price
@@ -0,0 +1,2169 @@
+import sqlite3
+import collections
+import datetime
+import enum
+import heapq
+import inspect
+import itertools
+import json
+import os
+import re
+from contextlib import contextmanager
+
+# Data layer shared by the desktop app and the HTTP service. Nothing in here
+# imports Qt, so the service can run on a headless machine.
+
+# Use absolute path to ensure database is saved in a consistent location
+DB_NAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shelfwise.db")
+
+# Tables rebuilt by upgrade_schema when an older database lacks their
+# cascading foreign keys, so the definition lives in one place
+ITEMS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            ItemID INTEGER PRIMARY KEY AUTOINCREMENT,
+            CollectionID INTEGER,
+            ItemName TEXT NOT NULL,
+            Description TEXT,
+            Price REAL NOT NULL DEFAULT 0.0,
+            stock_quantity INTEGER NOT NULL DEFAULT 0,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            reorder_level INTEGER NOT NULL DEFAULT 0,
+            ImagePath TEXT,
+            SKU TEXT,
+            FOREIGN KEY (CollectionID) REFERENCES Collections(CollectionID) ON DELETE CASCADE
+        )'''
+
+USERS_ITEMS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            UI_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            UserID INTEGER,
+            ItemID INTEGER,
+            DateAdded DATE,
+            Quantity INTEGER NOT NULL DEFAULT 1,
+            FOREIGN KEY (UserID) REFERENCES Users(UserID) ON DELETE CASCADE,
+            FOREIGN KEY (ItemID) REFERENCES Items(ItemID) ON DELETE CASCADE,
+            UNIQUE (UserID, ItemID)
+        )'''
+
+# A barcode (SKU) belongs to at most one item. Deleting the item frees it
+# at once, without waiting for the purge.
+ITEMS_SKU_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_items_sku ON Items(SKU) WHERE deleted = 0"
+
+# Stock is kept per store. Each terminal works in one store (--store) and
+# every stock query names it; ItemStock's key and indexes all start with the
+# store, so a terminal only ever reads its own store's rows. A store that
+# has no row for an item has none of it. Items.stock_quantity and
+# Items.reorder_level date from before stores and are no longer read.
+DEFAULT_STORE = 1
+DEFAULT_STORE_NAME = "Main store"
+
+STORES_TABLES = (
+    '''CREATE TABLE IF NOT EXISTS Stores (
+        StoreID INTEGER PRIMARY KEY,
+        StoreName TEXT UNIQUE NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS ItemStock (
+        StoreID INTEGER NOT NULL REFERENCES Stores(StoreID) ON DELETE CASCADE,
+        ItemID INTEGER NOT NULL REFERENCES Items(ItemID) ON DELETE CASCADE,
+        Quantity INTEGER NOT NULL DEFAULT 0,
+        reorder_level INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (StoreID, ItemID)
+    )''',
+    # A store's items in stock, and its stock column sorted
+    "CREATE INDEX IF NOT EXISTS idx_item_stock_quantity ON ItemStock(StoreID, Quantity, ItemID)",
+    # Cascades from Items
+    "CREATE INDEX IF NOT EXISTS idx_item_stock_item ON ItemStock(ItemID)",
+)
+
+# Short-lived claims on a store's stock, see ShelfwiseStore.hold_stock.
+# Expires is a "YYYY-MM-DD HH:MM:SS" local time, as written by timestamp().
+HOLDS_TABLE = f'''
+        CREATE TABLE IF NOT EXISTS Holds (
+            UserID INTEGER NOT NULL REFERENCES Users(UserID) ON DELETE CASCADE,
+            ItemID INTEGER NOT NULL REFERENCES Items(ItemID) ON DELETE CASCADE,
+            Quantity INTEGER NOT NULL CONSTRAINT holds_quantity_positive CHECK (Quantity > 0),
+            Expires TEXT NOT NULL,
+            StoreID INTEGER NOT NULL DEFAULT {DEFAULT_STORE},
+            PRIMARY KEY (UserID, ItemID)
+        )'''
+
+HOLDS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_holds_store_item ON Holds(StoreID, ItemID, Expires)",
+    "CREATE INDEX IF NOT EXISTS idx_holds_expires ON Holds(Expires)",
+)
+
+# Each user's last sort and filters per table (ShelfwiseStore.save_view_settings)
+VIEW_SETTINGS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS ViewSettings (
+            UserID INTEGER NOT NULL REFERENCES Users(UserID) ON DELETE CASCADE,
+            ViewName TEXT NOT NULL,
+            Settings TEXT NOT NULL,
+            PRIMARY KEY (UserID, ViewName)
+        )'''
+
+# Indexes for the orders list_view is most often asked for; each ends in the
+# view's key so a sorted page is read straight off the index
+VIEW_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_items_name ON Items(ItemName, ItemID)",
+    "CREATE INDEX IF NOT EXISTS idx_items_price ON Items(Price, ItemID)",
+    "CREATE INDEX IF NOT EXISTS idx_users_items_user_date ON Users_Items(UserID, DateAdded, UI_ID)",
+    "CREATE INDEX IF NOT EXISTS idx_users_joined ON Users(DateJoined, UserID)",
+)
+
+# What a user may do. The bits are fixed here; which roles have which is
+# kept in RolePermissions. A user's permissions are read once at login
+# (ShelfwiseStore.get_permissions) into one of these, so checking one is a
+# single AND.
+class Permission(enum.IntFlag):
+    ADMIN_PAGES = 1         # log in to the admin pages
+    MANAGE_USERS = 2
+    MANAGE_CATALOG = 4      # collections and items
+    MANAGE_STOCK = 8        # reorder levels
+    MANAGE_HOLDINGS = 16    # collectors' items
+    SHOP = 32               # log in to the shop
+
+ROLE_STORE_MANAGER = 1
+ROLE_CLERK = 2
+ROLE_COLLECTOR = 3
+
+# RoleID -> (RoleName, what it starts out allowed to do)
+ROLES = {
+    ROLE_STORE_MANAGER: ("Store manager", Permission.ADMIN_PAGES | Permission.MANAGE_USERS | Permission.MANAGE_CATALOG
+                         | Permission.MANAGE_STOCK | Permission.MANAGE_HOLDINGS),
+    ROLE_CLERK: ("Clerk", Permission.ADMIN_PAGES | Permission.MANAGE_STOCK | Permission.MANAGE_HOLDINGS),
+    ROLE_COLLECTOR: ("Collector", Permission.SHOP),
+}
+
+# The users the admin pages list and edit: everyone but store managers
+MANAGED_ROLES = (ROLE_CLERK, ROLE_COLLECTOR)
+
+# Who may make a call through shelfwise_server (the last field of
+# API_ROUTES, and ListView.access):
+#   PUBLIC      anyone, logged in or not
+#   Permission  a session whose role has all of these bits; SESSION (no
+#               bits) is any session
+#   Own(bits)   a session of the user the call is about (its user_id, when
+#               it has one), or one whose role has bits (None: no one else)
+PUBLIC = None
+SESSION = Permission(0)
+
+class Own:
+    def __init__(self, permission=None):
+        self.permission = permission
+
+# Whether the session of user_id (None: not logged in), whose role has
+# permissions, may make a call with params that needs access
+def allowed(access, user_id, permissions, params):
+    if access is PUBLIC:
+        return True
+    if user_id is None:
+        return False
+    if isinstance(access, Own):
+        if params.get("user_id") in (None, user_id):
+            return True
+        return access.permission is not None and access.permission in permissions
+    return access in permissions
+
+ROLES_TABLES = (
+    '''CREATE TABLE IF NOT EXISTS Roles (
+        RoleID INTEGER PRIMARY KEY,
+        RoleName TEXT UNIQUE NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS Permissions (
+        PermissionID INTEGER PRIMARY KEY,
+        Name TEXT UNIQUE NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS RolePermissions (
+        RoleID INTEGER NOT NULL REFERENCES Roles(RoleID) ON DELETE CASCADE,
+        PermissionID INTEGER NOT NULL REFERENCES Permissions(PermissionID) ON DELETE CASCADE,
+        PRIMARY KEY (RoleID, PermissionID)
+    )''',
+)
+
+# Users.LoginVersion goes up whenever a user's username or password
+# changes, so a session can tell it was opened with the old ones
+SQLITE_LOGIN_VERSION = (
+    "ALTER TABLE Users ADD COLUMN LoginVersion INTEGER NOT NULL DEFAULT 0",
+    '''CREATE TRIGGER IF NOT EXISTS users_login_version AFTER UPDATE OF Username, Password ON Users
+    WHEN NEW.Username IS NOT OLD.Username OR NEW.Password IS NOT OLD.Password
+    BEGIN
+        UPDATE Users SET LoginVersion = LoginVersion + 1 WHERE UserID = NEW.UserID;
+    END''',
+)
+
+# Rows for the roles tables: Roles, Permissions (PermissionID is the bit)
+# and RolePermissions
+def role_rows():
+    return ([(role_id, name) for role_id, (name, _) in ROLES.items()],
+            [(int(permission), permission.name.lower()) for permission in Permission],
+            [(role_id, int(permission)) for role_id, (_, granted) in ROLES.items()
+             for permission in Permission if permission in granted])
+
+def timestamp(seconds=0):
+    return (datetime.datetime.now() + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+# Initialize DB and tables
+def init_db(db_name=None):
+    db_name = db_name or DB_NAME
+    # Ensure the database directory exists
+    db_dir = os.path.dirname(db_name)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    # Check if database exists before trying to recreate tables
+    db_exists = os.path.exists(db_name)
+
+    # Only initialize tables if database doesn't exist
+    if not db_exists:
+        conn = sqlite3.connect(db_name)
+        c = conn.cursor()
+
+        # Create the Users table
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS Users (
+            UserID INTEGER PRIMARY KEY AUTOINCREMENT,
+            FirstName TEXT,
+            LastName TEXT,
+            Username TEXT UNIQUE NOT NULL,
+            Password TEXT NOT NULL,
+            Email TEXT,
+            DateJoined DATE,
+            is_admin INTEGER NOT NULL DEFAULT 0,
+            deleted INTEGER NOT NULL DEFAULT 0
+        )''')
+
+        # Create the Collections table
+        c.execute('''
+        CREATE TABLE IF NOT EXISTS Collections (
+            CollectionID INTEGER PRIMARY KEY AUTOINCREMENT,
+            CollectionName TEXT UNIQUE NOT NULL,
+            Description TEXT,
+            deleted INTEGER NOT NULL DEFAULT 0
+        )''')
+
+        # Create the Items table
+        c.execute(ITEMS_TABLE.format(name="Items"))
+
+        # Create the Users_Items table with quantity field
+        c.execute(USERS_ITEMS_TABLE.format(name="Users_Items"))
+
+        # Insert admin user if not exists
+        today = datetime.date.today().isoformat()
+        c.execute("INSERT INTO Users (Username, Password, is_admin, DateJoined) VALUES (?, ?, ?, ?)",
+                ('admin', 'admin', 1, today))
+
+        # Insert default collections
+        c.execute("INSERT INTO Collections (CollectionName, Description) VALUES (?, ?)",
+                ('Books', 'Book collection'))
+        c.execute("INSERT INTO Collections (CollectionName, Description) VALUES (?, ?)",
+                ('Toys', 'Toy collection'))
+
+        conn.commit()
+        upgrade_schema(conn)
+        conn.close()
+    else:
+        # If database exists, check if Quantity column exists in Users_Items
+        # But we'll use a try-except to handle the case where it might already exist
+        conn = sqlite3.connect(db_name)
+        c = conn.cursor()
+
+        # Let's first check if the Users_Items table exists at all
+        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Users_Items'")
+        if c.fetchone():
+            # Try to add the Quantity column, but catch the error if it already exists
+            try:
+                c.execute("ALTER TABLE Users_Items ADD COLUMN Quantity INTEGER NOT NULL DEFAULT 1")
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                # If error is about duplicate column, just ignore it
+                if "duplicate column name" in str(e):
+                    pass
+                else:
+                    # If it's another type of error, re-raise it
+                    raise
+
+        upgrade_schema(conn)
+        conn.close()
+
+# Bring a database created by an older version up to date; safe to run on
+# every start
+def upgrade_schema(conn):
+    c = conn.cursor()
+    # Soft-delete flags and reorder levels
+    for table, column in (("Users", "deleted"), ("Collections", "deleted"), ("Items", "deleted"),
+                          ("Items", "reorder_level")):
+        try:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" not in str(e):
+                raise
+    # Item pictures (see shelfwise_images) and barcodes
+    for column in ("ImagePath", "SKU"):
+        try:
+            c.execute(f"ALTER TABLE Items ADD COLUMN {column} TEXT")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" not in str(e):
+                raise
+    conn.commit()
+
+    # Foreign keys can't be altered in place: rebuild the tables that don't
+    # cascade yet, following https://sqlite.org/lang_altertable.html#otheralter
+    rebuild = [(table, schema, columns) for table, schema, columns in (
+        ("Items", ITEMS_TABLE,
+         "ItemID, CollectionID, ItemName, Description, Price, stock_quantity, deleted, reorder_level, ImagePath, SKU"),
+        ("Users_Items", USERS_ITEMS_TABLE, "UI_ID, UserID, ItemID, DateAdded, Quantity"),
+    ) if any(fk[6] != "CASCADE" for fk in c.execute(f"PRAGMA foreign_key_list({table})"))]
+    if rebuild:
+        c.execute("PRAGMA foreign_keys = OFF")
+        try:
+            # Holdings whose user or item is already gone would fail the new constraints
+            c.execute('''DELETE FROM Users_Items WHERE UserID NOT IN (SELECT UserID FROM Users)
+                         OR ItemID NOT IN (SELECT ItemID FROM Items)''')
+            for table, schema, columns in rebuild:
+                c.execute(schema.format(name=table + "_new"))
+                c.execute(f"INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}")
+                # Keep AUTOINCREMENT from handing out ids of rows deleted earlier
+                c.execute("""UPDATE sqlite_sequence SET seq = (SELECT MAX(seq) FROM sqlite_sequence WHERE name IN (?, ?))
+                             WHERE name = ?""", (table, table + "_new", table + "_new"))
+                c.execute(f"DROP TABLE {table}")
+                c.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            c.execute("PRAGMA foreign_keys = ON")
+
+    # Cascades and the purger look rows up by these
+    c.execute("CREATE INDEX IF NOT EXISTS idx_items_collection ON Items(CollectionID)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_items_item ON Users_Items(ItemID)")
+    for table, key in (("Users", "UserID"), ("Collections", "CollectionID"), ("Items", "ItemID")):
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table.lower()}_deleted ON {table}({key}) WHERE deleted = 1")
+    c.execute(ITEMS_SKU_INDEX)
+    conn.commit()
+
+    # Stock moves to ItemStock and what Items had becomes the default
+    # store's. The low-stock queue was kept per item, so it goes with the
+    # triggers that filled it and is built again below.
+    fresh = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='ItemStock'").fetchone()
+    for statement in STORES_TABLES:
+        c.execute(statement)
+    c.execute("INSERT OR IGNORE INTO Stores (StoreID, StoreName) VALUES (?, ?)", (DEFAULT_STORE, DEFAULT_STORE_NAME))
+    if fresh:
+        c.execute("""INSERT INTO ItemStock (StoreID, ItemID, Quantity, reorder_level)
+                     SELECT ?, ItemID, stock_quantity, reorder_level FROM Items""", (DEFAULT_STORE,))
+        c.execute("DROP TRIGGER IF EXISTS items_low_stock_insert")
+        c.execute("DROP TRIGGER IF EXISTS items_low_stock_update")
+        c.execute("DROP TABLE IF EXISTS LowStock")
+        c.execute("DROP INDEX IF EXISTS idx_items_stock")
+    conn.commit()
+
+    # The low-stock queue and daily acquisition counts, filled in on first
+    # run and kept current by triggers from then on
+    fresh_queue = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='LowStock'").fetchone()
+    fresh_counts = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='Acquisitions'").fetchone()
+    # Made again each time: earlier versions used INSERT OR IGNORE (see SQLITE_ALERTS)
+    c.execute("DROP TRIGGER IF EXISTS item_stock_low_insert")
+    c.execute("DROP TRIGGER IF EXISTS item_stock_low_update")
+    for statement in SQLITE_ALERTS:
+        c.execute(statement)
+    if fresh_queue:
+        c.execute("""INSERT OR IGNORE INTO LowStock (StoreID, ItemID, Since)
+                     SELECT StoreID, ItemID, datetime('now', 'localtime') FROM ItemStock
+                     WHERE Quantity <= reorder_level""")
+    if fresh_counts:
+        c.execute("""INSERT INTO Acquisitions (ItemID, Day, Units)
+                     SELECT ItemID, COALESCE(DateAdded, date('now', 'localtime')), SUM(Quantity)
+                     FROM Users_Items GROUP BY 1, 2""")
+    conn.commit()
+
+    c.execute(HOLDS_TABLE)
+    try:
+        c.execute(f"ALTER TABLE Holds ADD COLUMN StoreID INTEGER NOT NULL DEFAULT {DEFAULT_STORE}")
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" not in str(e):
+            raise
+    # Holds from before quantities were checked are made again with the
+    # check; the rows (a few minutes' worth) are copied over, less any that
+    # held nothing
+    if "holds_quantity_positive" not in c.execute(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name='Holds'").fetchone()[0]:
+        c.execute("ALTER TABLE Holds RENAME TO HoldsBefore")
+        c.execute(HOLDS_TABLE)
+        c.execute("""INSERT INTO Holds (UserID, ItemID, Quantity, Expires, StoreID)
+                     SELECT UserID, ItemID, Quantity, Expires, StoreID FROM HoldsBefore WHERE Quantity > 0""")
+        c.execute("DROP TABLE HoldsBefore")
+    c.execute("DROP INDEX IF EXISTS idx_holds_item")
+    for statement in HOLDS_INDEXES:
+        c.execute(statement)
+    c.execute(VIEW_SETTINGS_TABLE)
+    for statement in VIEW_INDEXES:
+        c.execute(statement)
+    conn.commit()
+
+    # Roles replace is_admin: admins become store managers, everyone else
+    # collectors. is_admin is kept in step for older versions of the app.
+    fresh = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='Roles'").fetchone()
+    for statement in ROLES_TABLES:
+        c.execute(statement)
+    roles, permissions, role_permissions = role_rows()
+    c.executemany("INSERT OR IGNORE INTO Roles (RoleID, RoleName) VALUES (?, ?)", roles)
+    c.executemany("INSERT OR IGNORE INTO Permissions (PermissionID, Name) VALUES (?, ?)", permissions)
+    if fresh:
+        c.executemany("INSERT INTO RolePermissions (RoleID, PermissionID) VALUES (?, ?)", role_permissions)
+    try:
+        c.execute(f"ALTER TABLE Users ADD COLUMN RoleID INTEGER NOT NULL DEFAULT {ROLE_COLLECTOR}")
+        c.execute("UPDATE Users SET RoleID = ? WHERE is_admin = 1", (ROLE_STORE_MANAGER,))
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" not in str(e):
+            raise
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_role ON Users(RoleID, UserID)")
+    try:
+        c.execute(SQLITE_LOGIN_VERSION[0])
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" not in str(e):
+            raise
+    for statement in SQLITE_LOGIN_VERSION[1:]:
+        c.execute(statement)
+    conn.commit()
+
+    # Price history starts from the prices items have today
+    fresh = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='PriceHistory'").fetchone()
+    for statement in SQLITE_PRICE_HISTORY:
+        c.execute(statement)
+    if fresh:
+        c.execute("""INSERT INTO PriceHistory (ItemID, Price, ChangedAt)
+                     SELECT ItemID, Price, datetime('now', 'localtime') FROM Items""")
+    conn.commit()
+
+    # Progress counters start from what collectors hold today
+    fresh = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='CollectionProgress'").fetchone()
+    for statement in SQLITE_PROGRESS:
+        c.execute(statement)
+    if fresh:
+        for statement in PROGRESS_BACKFILL:
+            c.execute(statement)
+    conn.commit()
+
+    # Every item anyone holds starts out queued for its neighbours
+    fresh = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='NeighbourQueue'").fetchone()
+    for statement in SQLITE_NEIGHBOURS:
+        c.execute(statement)
+    if fresh:
+        c.execute("INSERT OR IGNORE INTO NeighbourQueue (ItemID) SELECT ItemID FROM Users_Items")
+    conn.commit()
+
+# A store's stock of an item at or below its reorder level is queued in
+# LowStock, and every unit a collector takes is counted in Acquisitions
+# under the day it was taken (the first units under Users_Items.DateAdded),
+# so the alert panel reads only the store's queued items and a few days of
+# counts for each.
+SQLITE_ALERTS = (
+    '''CREATE TABLE IF NOT EXISTS LowStock (
+        StoreID INTEGER NOT NULL,
+        ItemID INTEGER NOT NULL,
+        Since TEXT,
+        PRIMARY KEY (StoreID, ItemID),
+        FOREIGN KEY (StoreID, ItemID) REFERENCES ItemStock(StoreID, ItemID) ON DELETE CASCADE
+    )''',
+    '''CREATE TABLE IF NOT EXISTS Acquisitions (
+        ItemID INTEGER NOT NULL REFERENCES Items(ItemID) ON DELETE CASCADE,
+        Day TEXT NOT NULL,
+        Units INTEGER NOT NULL,
+        PRIMARY KEY (ItemID, Day)
+    )''',
+    # ItemStock is written with upserts, whose conflict handling overrides
+    # an OR IGNORE in a trigger; an ON CONFLICT clause of its own is kept
+    '''CREATE TRIGGER IF NOT EXISTS item_stock_low_insert AFTER INSERT ON ItemStock
+    WHEN NEW.Quantity <= NEW.reorder_level
+    BEGIN
+        INSERT INTO LowStock (StoreID, ItemID, Since)
+        VALUES (NEW.StoreID, NEW.ItemID, datetime('now', 'localtime'))
+        ON CONFLICT (StoreID, ItemID) DO NOTHING;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS item_stock_low_update AFTER UPDATE OF Quantity, reorder_level ON ItemStock
+    BEGIN
+        DELETE FROM LowStock WHERE StoreID = NEW.StoreID AND ItemID = NEW.ItemID
+            AND NEW.Quantity > NEW.reorder_level;
+        INSERT INTO LowStock (StoreID, ItemID, Since)
+        SELECT NEW.StoreID, NEW.ItemID, datetime('now', 'localtime') WHERE NEW.Quantity <= NEW.reorder_level
+        ON CONFLICT (StoreID, ItemID) DO NOTHING;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_items_acquired AFTER INSERT ON Users_Items
+    BEGIN
+        INSERT INTO Acquisitions (ItemID, Day, Units)
+        VALUES (NEW.ItemID, COALESCE(NEW.DateAdded, date('now', 'localtime')), NEW.Quantity)
+        ON CONFLICT (ItemID, Day) DO UPDATE SET Units = Units + excluded.Units;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_items_acquired_more AFTER UPDATE OF Quantity ON Users_Items
+    WHEN NEW.Quantity > OLD.Quantity
+    BEGIN
+        INSERT INTO Acquisitions (ItemID, Day, Units)
+        VALUES (NEW.ItemID, date('now', 'localtime'), NEW.Quantity - OLD.Quantity)
+        ON CONFLICT (ItemID, Day) DO UPDATE SET Units = Units + excluded.Units;
+    END''',
+)
+
+# Every price an item has had, recorded by triggers on Items
+SQLITE_PRICE_HISTORY = (
+    '''CREATE TABLE IF NOT EXISTS PriceHistory (
+        ChangeID INTEGER PRIMARY KEY,
+        ItemID INTEGER NOT NULL REFERENCES Items(ItemID) ON DELETE CASCADE,
+        Price REAL NOT NULL,
+        ChangedAt TEXT NOT NULL
+    )''',
+    "CREATE INDEX IF NOT EXISTS idx_price_history_item ON PriceHistory(ItemID, ChangeID)",
+    '''CREATE TRIGGER IF NOT EXISTS items_price_insert AFTER INSERT ON Items
+    BEGIN
+        INSERT INTO PriceHistory (ItemID, Price, ChangedAt) VALUES (NEW.ItemID, NEW.Price, datetime('now', 'localtime'));
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_price_update AFTER UPDATE OF Price ON Items
+    WHEN NEW.Price IS NOT OLD.Price
+    BEGIN
+        INSERT INTO PriceHistory (ItemID, Price, ChangedAt) VALUES (NEW.ItemID, NEW.Price, datetime('now', 'localtime'));
+    END''',
+)
+
+# How much of each collection a collector has: the collection's items
+# (CollectionSizes) and how many of them each collector holds
+# (CollectionProgress), both kept by triggers so the My Items page reads a
+# few rows however much the collector has. Deleted items count in neither.
+PROGRESS_TABLES = (
+    '''CREATE TABLE IF NOT EXISTS CollectionSizes (
+        CollectionID INTEGER PRIMARY KEY REFERENCES Collections(CollectionID) ON DELETE CASCADE,
+        Items INTEGER NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS CollectionProgress (
+        UserID INTEGER NOT NULL REFERENCES Users(UserID) ON DELETE CASCADE,
+        CollectionID INTEGER NOT NULL REFERENCES Collections(CollectionID) ON DELETE CASCADE,
+        Owned INTEGER NOT NULL,
+        PRIMARY KEY (UserID, CollectionID)
+    )''',
+    # Cascades from Collections
+    "CREATE INDEX IF NOT EXISTS idx_collection_progress_collection ON CollectionProgress(CollectionID)",
+)
+
+PROGRESS_BACKFILL = (
+    '''INSERT INTO CollectionSizes (CollectionID, Items)
+    SELECT CollectionID, COUNT(*) FROM Items WHERE deleted = 0 AND CollectionID IS NOT NULL GROUP BY CollectionID''',
+    '''INSERT INTO CollectionProgress (UserID, CollectionID, Owned)
+    SELECT ui.UserID, i.CollectionID, COUNT(*) FROM Users_Items ui JOIN Items i ON i.ItemID = ui.ItemID
+    WHERE i.deleted = 0 AND i.CollectionID IS NOT NULL GROUP BY ui.UserID, i.CollectionID''',
+)
+
+SQLITE_PROGRESS = PROGRESS_TABLES + (
+    '''CREATE TRIGGER IF NOT EXISTS users_items_progress_insert AFTER INSERT ON Users_Items
+    BEGIN
+        INSERT INTO CollectionProgress (UserID, CollectionID, Owned)
+        SELECT NEW.UserID, CollectionID, 1 FROM Items
+        WHERE ItemID = NEW.ItemID AND deleted = 0 AND CollectionID IS NOT NULL
+        ON CONFLICT (UserID, CollectionID) DO UPDATE SET Owned = Owned + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_items_progress_delete AFTER DELETE ON Users_Items
+    BEGIN
+        UPDATE CollectionProgress SET Owned = Owned - 1 WHERE UserID = OLD.UserID
+            AND CollectionID = (SELECT CollectionID FROM Items WHERE ItemID = OLD.ItemID AND deleted = 0);
+        DELETE FROM CollectionProgress WHERE UserID = OLD.UserID AND Owned <= 0;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_items_progress_update AFTER UPDATE OF UserID, ItemID ON Users_Items
+    BEGIN
+        UPDATE CollectionProgress SET Owned = Owned - 1 WHERE UserID = OLD.UserID
+            AND CollectionID = (SELECT CollectionID FROM Items WHERE ItemID = OLD.ItemID AND deleted = 0);
+        DELETE FROM CollectionProgress WHERE UserID = OLD.UserID AND Owned <= 0;
+        INSERT INTO CollectionProgress (UserID, CollectionID, Owned)
+        SELECT NEW.UserID, CollectionID, 1 FROM Items
+        WHERE ItemID = NEW.ItemID AND deleted = 0 AND CollectionID IS NOT NULL
+        ON CONFLICT (UserID, CollectionID) DO UPDATE SET Owned = Owned + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_progress_insert AFTER INSERT ON Items
+    WHEN NEW.deleted = 0 AND NEW.CollectionID IS NOT NULL
+    BEGIN
+        INSERT INTO CollectionSizes (CollectionID, Items) VALUES (NEW.CollectionID, 1)
+        ON CONFLICT (CollectionID) DO UPDATE SET Items = Items + 1;
+    END''',
+    # An item deleted or moved to another collection takes its holders'
+    # counts with it
+    '''CREATE TRIGGER IF NOT EXISTS items_progress_update AFTER UPDATE OF deleted, CollectionID ON Items
+    WHEN OLD.deleted IS NOT NEW.deleted OR OLD.CollectionID IS NOT NEW.CollectionID
+    BEGIN
+        UPDATE CollectionSizes SET Items = Items - 1 WHERE CollectionID = OLD.CollectionID AND OLD.deleted = 0;
+        UPDATE CollectionProgress SET Owned = Owned - 1
+        WHERE CollectionID = OLD.CollectionID AND OLD.deleted = 0
+            AND UserID IN (SELECT UserID FROM Users_Items WHERE ItemID = OLD.ItemID);
+        DELETE FROM CollectionProgress WHERE CollectionID = OLD.CollectionID AND Owned <= 0;
+        INSERT INTO CollectionSizes (CollectionID, Items)
+        SELECT NEW.CollectionID, 1 WHERE NEW.deleted = 0 AND NEW.CollectionID IS NOT NULL
+        ON CONFLICT (CollectionID) DO UPDATE SET Items = Items + 1;
+        INSERT INTO CollectionProgress (UserID, CollectionID, Owned)
+        SELECT UserID, NEW.CollectionID, 1 FROM Users_Items
+        WHERE ItemID = NEW.ItemID AND NEW.deleted = 0 AND NEW.CollectionID IS NOT NULL
+        ON CONFLICT (UserID, CollectionID) DO UPDATE SET Owned = Owned + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS items_progress_delete AFTER DELETE ON Items
+    WHEN OLD.deleted = 0
+    BEGIN
+        UPDATE CollectionSizes SET Items = Items - 1 WHERE CollectionID = OLD.CollectionID;
+    END''',
+)
+
+# "Collectors who hold this also hold": for each item, the NEIGHBOURS other
+# items most often held by the same collectors, with how many collectors
+# hold both (ItemNeighbours). Triggers queue an item whenever who holds it
+# changes (NeighbourQueue), and ShelfwiseStore.update_neighbours works
+# through the queue, so reading an item's neighbours is one indexed query.
+NEIGHBOURS = 20
+
+NEIGHBOURS_TABLES = (
+    '''CREATE TABLE IF NOT EXISTS ItemNeighbours (
+        ItemID INTEGER NOT NULL,
+        NeighbourID INTEGER NOT NULL,
+        Together INTEGER NOT NULL,
+        PRIMARY KEY (ItemID, NeighbourID)
+    )''',
+    # The lists an item is in
+    "CREATE INDEX IF NOT EXISTS idx_item_neighbours_neighbour ON ItemNeighbours(NeighbourID)",
+    "CREATE TABLE IF NOT EXISTS NeighbourQueue (ItemID INTEGER PRIMARY KEY)",
+)
+
+SQLITE_NEIGHBOURS = NEIGHBOURS_TABLES + (
+    '''CREATE TRIGGER IF NOT EXISTS users_items_neighbours_insert AFTER INSERT ON Users_Items
+    BEGIN
+        INSERT OR IGNORE INTO NeighbourQueue (ItemID) VALUES (NEW.ItemID);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_items_neighbours_delete AFTER DELETE ON Users_Items
+    BEGIN
+        INSERT OR IGNORE INTO NeighbourQueue (ItemID) VALUES (OLD.ItemID);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS users_items_neighbours_update AFTER UPDATE OF UserID, ItemID ON Users_Items
+    BEGIN
+        INSERT OR IGNORE INTO NeighbourQueue (ItemID) VALUES (OLD.ItemID);
+        INSERT OR IGNORE INTO NeighbourQueue (ItemID) VALUES (NEW.ItemID);
+    END''',
+)
+
+def connect(db_name=None, check_same_thread=True):
+    conn = sqlite3.connect(db_name or DB_NAME, check_same_thread=check_same_thread)
+    # SQLite leaves foreign keys (and so ON DELETE CASCADE) off unless asked
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+# Storage backends. The store's SQL is written once, with "?" placeholders;
+# a backend supplies connections, runs queries and covers the few places
+# where the databases differ (new row ids, schema, change detection).
+
+class SqliteBackend:
+    name = "sqlite"
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, db_name=None, check_same_thread=True):
+        self.db_name = db_name or DB_NAME
+        self.check_same_thread = check_same_thread
+
+    def init_schema(self):
+        init_db(self.db_name)
+
+    def connect(self):
+        conn = connect(self.db_name, self.check_same_thread)
+        # Wait for another writer instead of failing straight away with "database is locked"
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def release(self, conn):
+        conn.close()
+
+    def open_store(self):
+        return ShelfwiseStore(self.connect(), self)
+
+    def cursor(self, conn):
+        return conn.cursor()
+
+    # SQLite cursors already step through the result as they are iterated
+    def query(self, conn, sql, params=()):
+        c = conn.cursor()
+        c.execute(sql, params)
+        return c
+
+    def query_one(self, conn, sql, params=()):
+        return self.query(conn, sql, params).fetchone()
+
+    def insert(self, c, sql, params, key):
+        c.execute(sql, params)
+        return c.lastrowid
+
+    # Readers keep going while the single writer commits
+    def prepare_writer(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+
+    # Changes whenever another connection commits
+    def data_version(self, conn):
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+POSTGRES_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS Users (
+        UserID SERIAL PRIMARY KEY,
+        FirstName TEXT,
+        LastName TEXT,
+        Username TEXT UNIQUE NOT NULL,
+        Password TEXT NOT NULL,
+        Email TEXT,
+        DateJoined TEXT,
+        is_admin INTEGER NOT NULL DEFAULT 0,
+        deleted INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS Collections (
+        CollectionID SERIAL PRIMARY KEY,
+        CollectionName TEXT UNIQUE NOT NULL,
+        Description TEXT,
+        deleted INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS Items (
+        ItemID SERIAL PRIMARY KEY,
+        CollectionID INTEGER REFERENCES Collections(CollectionID) ON DELETE CASCADE,
+        ItemName TEXT NOT NULL,
+        Description TEXT,
+        Price DOUBLE PRECISION NOT NULL DEFAULT 0.0,
+        stock_quantity INTEGER NOT NULL DEFAULT 0,
+        deleted INTEGER NOT NULL DEFAULT 0,
+        reorder_level INTEGER NOT NULL DEFAULT 0,
+        ImagePath TEXT,
+        SKU TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS Users_Items (
+        UI_ID SERIAL PRIMARY KEY,
+        UserID INTEGER REFERENCES Users(UserID) ON DELETE CASCADE,
+        ItemID INTEGER REFERENCES Items(ItemID) ON DELETE CASCADE,
+        DateAdded TEXT,
+        Quantity INTEGER NOT NULL DEFAULT 1,
+        UNIQUE (UserID, ItemID)
+    )''',
+    # Databases created before soft delete and cascades
+    "ALTER TABLE Users ADD COLUMN IF NOT EXISTS deleted INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE Collections ADD COLUMN IF NOT EXISTS deleted INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE Items ADD COLUMN IF NOT EXISTS deleted INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE Items ADD COLUMN IF NOT EXISTS reorder_level INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE Items ADD COLUMN IF NOT EXISTS ImagePath TEXT",
+    "ALTER TABLE Items ADD COLUMN IF NOT EXISTS SKU TEXT",
+    '''ALTER TABLE Items DROP CONSTRAINT IF EXISTS items_collectionid_fkey,
+        ADD CONSTRAINT items_collectionid_fkey FOREIGN KEY (CollectionID)
+        REFERENCES Collections(CollectionID) ON DELETE CASCADE''',
+    '''ALTER TABLE Users_Items DROP CONSTRAINT IF EXISTS users_items_userid_fkey,
+        ADD CONSTRAINT users_items_userid_fkey FOREIGN KEY (UserID) REFERENCES Users(UserID) ON DELETE CASCADE''',
+    '''ALTER TABLE Users_Items DROP CONSTRAINT IF EXISTS users_items_itemid_fkey,
+        ADD CONSTRAINT users_items_itemid_fkey FOREIGN KEY (ItemID) REFERENCES Items(ItemID) ON DELETE CASCADE''',
+    "CREATE INDEX IF NOT EXISTS idx_items_collection ON Items(CollectionID)",
+    "CREATE INDEX IF NOT EXISTS idx_users_items_item ON Users_Items(ItemID)",
+    "CREATE INDEX IF NOT EXISTS idx_users_deleted ON Users(UserID) WHERE deleted = 1",
+    "CREATE INDEX IF NOT EXISTS idx_collections_deleted ON Collections(CollectionID) WHERE deleted = 1",
+    "CREATE INDEX IF NOT EXISTS idx_items_deleted ON Items(ItemID) WHERE deleted = 1",
+    ITEMS_SKU_INDEX,
+) + STORES_TABLES + (
+    # Low-stock queue and acquisition counts, as SQLITE_ALERTS
+    '''CREATE TABLE IF NOT EXISTS LowStock (
+        StoreID INTEGER NOT NULL,
+        ItemID INTEGER NOT NULL,
+        Since TEXT,
+        PRIMARY KEY (StoreID, ItemID),
+        FOREIGN KEY (StoreID, ItemID) REFERENCES ItemStock(StoreID, ItemID) ON DELETE CASCADE
+    )''',
+    '''CREATE TABLE IF NOT EXISTS Acquisitions (
+        ItemID INTEGER NOT NULL REFERENCES Items(ItemID) ON DELETE CASCADE,
+        Day TEXT NOT NULL,
+        Units INTEGER NOT NULL,
+        PRIMARY KEY (ItemID, Day)
+    )''',
+    '''CREATE OR REPLACE FUNCTION shelfwise_track_low_stock() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.Quantity <= NEW.reorder_level THEN
+            INSERT INTO LowStock (StoreID, ItemID, Since)
+            VALUES (NEW.StoreID, NEW.ItemID, to_char(localtimestamp, 'YYYY-MM-DD HH24:MI:SS'))
+            ON CONFLICT DO NOTHING;
+        ELSE
+            DELETE FROM LowStock WHERE StoreID = NEW.StoreID AND ItemID = NEW.ItemID;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER item_stock_low AFTER INSERT OR UPDATE OF Quantity, reorder_level
+    ON ItemStock FOR EACH ROW EXECUTE FUNCTION shelfwise_track_low_stock()''',
+    '''CREATE OR REPLACE FUNCTION shelfwise_track_acquisitions() RETURNS trigger AS $$
+    DECLARE
+        taken INTEGER := NEW.Quantity;
+        taken_on TEXT := COALESCE(NEW.DateAdded, to_char(current_date, 'YYYY-MM-DD'));
+    BEGIN
+        IF TG_OP = 'UPDATE' THEN
+            taken := NEW.Quantity - OLD.Quantity;
+            taken_on := to_char(current_date, 'YYYY-MM-DD');
+        END IF;
+        IF taken > 0 THEN
+            INSERT INTO Acquisitions (ItemID, Day, Units) VALUES (NEW.ItemID, taken_on, taken)
+            ON CONFLICT (ItemID, Day) DO UPDATE SET Units = Acquisitions.Units + EXCLUDED.Units;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER users_items_acquired AFTER INSERT OR UPDATE OF Quantity
+    ON Users_Items FOR EACH ROW EXECUTE FUNCTION shelfwise_track_acquisitions()''',
+    HOLDS_TABLE,
+    f"ALTER TABLE Holds ADD COLUMN IF NOT EXISTS StoreID INTEGER NOT NULL DEFAULT {DEFAULT_STORE}",
+    # Quantity check, for Holds from before it (see HOLDS_TABLE)
+    '''DO $$ BEGIN
+        DELETE FROM Holds WHERE Quantity <= 0;
+        ALTER TABLE Holds ADD CONSTRAINT holds_quantity_positive CHECK (Quantity > 0);
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$''',
+    "DROP INDEX IF EXISTS idx_holds_item",
+    VIEW_SETTINGS_TABLE,
+) + HOLDS_INDEXES + VIEW_INDEXES + ROLES_TABLES + (
+    f"ALTER TABLE Users ADD COLUMN IF NOT EXISTS RoleID INTEGER NOT NULL DEFAULT {ROLE_COLLECTOR}",
+    "CREATE INDEX IF NOT EXISTS idx_users_role ON Users(RoleID, UserID)",
+    # Login version, as SQLITE_LOGIN_VERSION
+    "ALTER TABLE Users ADD COLUMN IF NOT EXISTS LoginVersion INTEGER NOT NULL DEFAULT 0",
+    '''CREATE OR REPLACE FUNCTION shelfwise_bump_login_version() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.Username IS DISTINCT FROM OLD.Username OR NEW.Password IS DISTINCT FROM OLD.Password THEN
+            NEW.LoginVersion := OLD.LoginVersion + 1;
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER users_login_version BEFORE UPDATE OF Username, Password
+    ON Users FOR EACH ROW EXECUTE FUNCTION shelfwise_bump_login_version()''',
+) + (
+    # Price history, as SQLITE_PRICE_HISTORY
+    '''CREATE TABLE IF NOT EXISTS PriceHistory (
+        ChangeID SERIAL PRIMARY KEY,
+        ItemID INTEGER NOT NULL REFERENCES Items(ItemID) ON DELETE CASCADE,
+        Price REAL NOT NULL,
+        ChangedAt TEXT NOT NULL
+    )''',
+    "CREATE INDEX IF NOT EXISTS idx_price_history_item ON PriceHistory(ItemID, ChangeID)",
+    '''CREATE OR REPLACE FUNCTION shelfwise_track_price() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' OR NEW.Price IS DISTINCT FROM OLD.Price THEN
+            INSERT INTO PriceHistory (ItemID, Price, ChangedAt)
+            VALUES (NEW.ItemID, NEW.Price, to_char(localtimestamp, 'YYYY-MM-DD HH24:MI:SS'));
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER items_price AFTER INSERT OR UPDATE OF Price
+    ON Items FOR EACH ROW EXECUTE FUNCTION shelfwise_track_price()''',
+) + PROGRESS_TABLES + (
+    # Progress counters, as SQLITE_PROGRESS
+    '''CREATE OR REPLACE FUNCTION shelfwise_track_progress() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            UPDATE CollectionProgress SET Owned = Owned - 1 WHERE UserID = OLD.UserID
+                AND CollectionID = (SELECT CollectionID FROM Items WHERE ItemID = OLD.ItemID AND deleted = 0);
+            DELETE FROM CollectionProgress WHERE UserID = OLD.UserID AND Owned <= 0;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO CollectionProgress (UserID, CollectionID, Owned)
+            SELECT NEW.UserID, CollectionID, 1 FROM Items
+            WHERE ItemID = NEW.ItemID AND deleted = 0 AND CollectionID IS NOT NULL
+            ON CONFLICT (UserID, CollectionID) DO UPDATE SET Owned = CollectionProgress.Owned + 1;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER users_items_progress AFTER INSERT OR DELETE OR UPDATE OF UserID, ItemID
+    ON Users_Items FOR EACH ROW EXECUTE FUNCTION shelfwise_track_progress()''',
+    '''CREATE OR REPLACE FUNCTION shelfwise_track_collection_size() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.deleted IS NOT DISTINCT FROM NEW.deleted
+                AND OLD.CollectionID IS NOT DISTINCT FROM NEW.CollectionID THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP <> 'INSERT' AND OLD.deleted = 0 THEN
+            UPDATE CollectionSizes SET Items = Items - 1 WHERE CollectionID = OLD.CollectionID;
+            UPDATE CollectionProgress SET Owned = Owned - 1
+            WHERE CollectionID = OLD.CollectionID AND UserID IN (SELECT UserID FROM Users_Items WHERE ItemID = OLD.ItemID);
+            DELETE FROM CollectionProgress WHERE CollectionID = OLD.CollectionID AND Owned <= 0;
+        END IF;
+        IF TG_OP <> 'DELETE' AND NEW.deleted = 0 AND NEW.CollectionID IS NOT NULL THEN
+            INSERT INTO CollectionSizes (CollectionID, Items) VALUES (NEW.CollectionID, 1)
+            ON CONFLICT (CollectionID) DO UPDATE SET Items = CollectionSizes.Items + 1;
+            INSERT INTO CollectionProgress (UserID, CollectionID, Owned)
+            SELECT UserID, NEW.CollectionID, 1 FROM Users_Items WHERE ItemID = NEW.ItemID
+            ON CONFLICT (UserID, CollectionID) DO UPDATE SET Owned = CollectionProgress.Owned + 1;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER items_progress AFTER INSERT OR DELETE OR UPDATE OF deleted, CollectionID
+    ON Items FOR EACH ROW EXECUTE FUNCTION shelfwise_track_collection_size()''',
+) + NEIGHBOURS_TABLES + (
+    # Neighbour queue, as SQLITE_NEIGHBOURS
+    '''CREATE OR REPLACE FUNCTION shelfwise_queue_neighbours() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            INSERT INTO NeighbourQueue (ItemID) VALUES (OLD.ItemID) ON CONFLICT DO NOTHING;
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO NeighbourQueue (ItemID) VALUES (NEW.ItemID) ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER users_items_neighbours AFTER INSERT OR DELETE OR UPDATE OF UserID, ItemID
+    ON Users_Items FOR EACH ROW EXECUTE FUNCTION shelfwise_queue_neighbours()''',
+)
+
+# Run when the alert tables are first created
+POSTGRES_ALERTS_BACKFILL = (
+    '''INSERT INTO LowStock (StoreID, ItemID, Since)
+    SELECT StoreID, ItemID, to_char(localtimestamp, 'YYYY-MM-DD HH24:MI:SS') FROM ItemStock
+    WHERE Quantity <= reorder_level ON CONFLICT DO NOTHING''',
+    '''INSERT INTO Acquisitions (ItemID, Day, Units)
+    SELECT ItemID, COALESCE(DateAdded, to_char(current_date, 'YYYY-MM-DD')), SUM(Quantity)
+    FROM Users_Items GROUP BY 1, 2''',
+)
+
+def to_pyformat(sql):
+    return sql.replace("%", "%%").replace("?", "%s")
+
+# psycopg2 cursor that takes the store's "?" placeholders and returns itself
+# from execute, like sqlite3's
+class PostgresCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(to_pyformat(sql), tuple(params))
+        return self
+
+    def executemany(self, sql, rows):
+        self.cursor.executemany(to_pyformat(sql), [tuple(row) for row in rows])
+        return self
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+# Result of a listing on PostgreSQL: a named (server-side) cursor, so rows
+# arrive ITERSIZE at a time as they are consumed instead of all at once. The
+# read transaction ends when the rows run out.
+class ServerSideRows:
+    def __init__(self, backend, conn, sql, params):
+        self.backend = backend
+        self.conn = conn
+        self.sql = to_pyformat(sql)
+        self.params = tuple(params)
+        self.description = None
+
+    def __iter__(self):
+        cursor = self.conn.cursor(name=f"shelfwise_{next(self.backend.cursor_names)}")
+        cursor.itersize = self.backend.ITERSIZE
+        try:
+            cursor.execute(self.sql, self.params)
+            for row in cursor:
+                if self.description is None:
+                    self.description = cursor.description
+                yield row
+            self.description = self.description or cursor.description
+        finally:
+            cursor.close()
+            self.conn.commit()
+
+    def fetchall(self):
+        return list(self)
+
+# Client/server RDBMS for more than one sqlite file's worth of writers.
+# Needs psycopg2; connections come from a thread-safe pool.
+class PostgresBackend:
+    name = "postgres"
+    ITERSIZE = 2000
+
+    def __init__(self, dsn, min_connections=1, max_connections=10):
+        try:
+            import psycopg2
+            import psycopg2.pool
+        except ImportError:
+            raise RuntimeError("The PostgreSQL backend needs psycopg2 (pip install psycopg2-binary)")
+        self.Error = psycopg2.Error
+        self.IntegrityError = psycopg2.IntegrityError
+        self.pool = psycopg2.pool.ThreadedConnectionPool(min_connections, max_connections, dsn)
+        self.cursor_names = itertools.count()
+
+    def init_schema(self):
+        conn = self.connect()
+        try:
+            c = conn.cursor()
+            c.execute("""SELECT to_regclass('lowstock') IS NULL, to_regclass('pricehistory') IS NULL,
+                                to_regclass('roles') IS NULL, to_regclass('itemstock') IS NULL,
+                                to_regclass('neighbourqueue') IS NULL, to_regclass('collectionprogress') IS NULL""")
+            fresh, fresh_prices, fresh_roles, fresh_stock, fresh_neighbours, fresh_progress = c.fetchone()
+            if fresh_stock:
+                # As upgrade_schema does for SQLite; the low-stock trigger
+                # goes with its function
+                c.execute("DROP FUNCTION IF EXISTS shelfwise_track_low_stock() CASCADE")
+                c.execute("DROP TABLE IF EXISTS LowStock")
+                c.execute("DROP INDEX IF EXISTS idx_items_stock")
+            for statement in POSTGRES_SCHEMA:
+                c.execute(statement)
+            c.execute("INSERT INTO Stores (StoreID, StoreName) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                      (DEFAULT_STORE, DEFAULT_STORE_NAME))
+            if fresh_stock:
+                # The trigger on ItemStock queues what is low
+                c.execute("""INSERT INTO ItemStock (StoreID, ItemID, Quantity, reorder_level)
+                             SELECT %s, ItemID, stock_quantity, reorder_level FROM Items""", (DEFAULT_STORE,))
+            roles, permissions, role_permissions = role_rows()
+            c.executemany("INSERT INTO Roles (RoleID, RoleName) VALUES (%s, %s) ON CONFLICT DO NOTHING", roles)
+            c.executemany("INSERT INTO Permissions (PermissionID, Name) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                          permissions)
+            if fresh_roles:
+                # As upgrade_schema does for SQLite
+                c.executemany("INSERT INTO RolePermissions (RoleID, PermissionID) VALUES (%s, %s)", role_permissions)
+                c.execute("UPDATE Users SET RoleID = %s WHERE is_admin = 1", (ROLE_STORE_MANAGER,))
+            if fresh:
+                for statement in POSTGRES_ALERTS_BACKFILL:
+                    c.execute(statement)
+            if fresh_prices:
+                c.execute("""INSERT INTO PriceHistory (ItemID, Price, ChangedAt)
+                             SELECT ItemID, Price, to_char(localtimestamp, 'YYYY-MM-DD HH24:MI:SS') FROM Items""")
+            if fresh_progress:
+                for statement in PROGRESS_BACKFILL:
+                    c.execute(statement)
+            if fresh_neighbours:
+                c.execute("INSERT INTO NeighbourQueue (ItemID) SELECT DISTINCT ItemID FROM Users_Items")
+            c.execute("SELECT COUNT(*) FROM Users")
+            if c.fetchone()[0] == 0:
+                today = datetime.date.today().isoformat()
+                c.execute("""INSERT INTO Users (Username, Password, is_admin, RoleID, DateJoined)
+                             VALUES (%s, %s, %s, %s, %s)""", ('admin', 'admin', 1, ROLE_STORE_MANAGER, today))
+                c.executemany("INSERT INTO Collections (CollectionName, Description) VALUES (%s, %s)",
+                              [('Books', 'Book collection'), ('Toys', 'Toy collection')])
+            conn.commit()
+        finally:
+            self.release(conn)
+
+    def connect(self):
+        return self.pool.getconn()
+
+    def release(self, conn):
+        conn.rollback()
+        self.pool.putconn(conn)
+
+    def close(self):
+        self.pool.closeall()
+
+    def open_store(self):
+        return ShelfwiseStore(self.connect(), self)
+
+    def cursor(self, conn):
+        return PostgresCursor(conn.cursor())
+
+    def query(self, conn, sql, params=()):
+        return ServerSideRows(self, conn, sql, params)
+
+    def query_one(self, conn, sql, params=()):
+        c = conn.cursor()
+        try:
+            c.execute(to_pyformat(sql), tuple(params))
+            return c.fetchone()
+        finally:
+            c.close()
+            # Don't leave the connection idle in a transaction
+            conn.commit()
+
+    def insert(self, c, sql, params, key):
+        c.execute(sql + f" RETURNING {key}", params)
+        return c.fetchone()[0]
+
+    def prepare_writer(self, conn):
+        pass
+
+    # Moves forward with every commit on the server
+    def data_version(self, conn):
+        return self.query_one(conn, "SELECT pg_current_wal_lsn()::text")[0]
+
+# database is a path to a sqlite file (default: DB_NAME) or a
+# postgresql:// URL. threaded=True when connections will be used from
+# worker threads.
+def open_backend(database=None, threaded=False, max_connections=10):
+    if database and database.startswith(("postgres://", "postgresql://")):
+        return PostgresBackend(database, max_connections=max_connections)
+    return SqliteBackend(database, check_same_thread=not threaded)
+
+# Raised when a reservation asks for more than is left on the shelf
+class OutOfStockError(Exception):
+    def __init__(self, available, item_id=None):
+        super().__init__(f"Not enough stock. Available: {available}")
+        self.available = available
+        # Which item ran short, when several were asked for at once
+        self.item_id = item_id
+
+MY_ITEMS_ORDER = {
+    "name_asc": "i.ItemName ASC",
+    "name_desc": "i.ItemName DESC",
+    "collection": "c.CollectionName ASC, i.ItemName ASC",
+}
+
+# A listing the app's tables page through with ShelfwiseStore.list_view.
+# sql is a query without ORDER BY whose output columns are named in
+# columns as (name, "n" for numbers or "t" for text); filters and sorting
+# only ever name those columns. Nullable text is COALESCEd to '' so every
+# column orders and compares like a plain value. key is the unique column
+# that breaks ties, giving every row a fixed place in any order, so a page
+# can start right after the last row of the one before (keyset paging)
+# instead of counting past OFFSET rows. params(user_id, store_id) gives the
+# parameters sql needs, and access who may read it over HTTP (see allowed).
+class ListView:
+    def __init__(self, sql, columns, key, params=lambda user_id, store_id: (), access=SESSION, holds=False):
+        self.sql = sql
+        self.columns = dict(columns)
+        self.key = key
+        self.params = params
+        self.access = access
+        # True if the rows count holds still in force, and so change as
+        # holds lapse, without any write
+        self.holds = holds
+
+VIEWS = {
+    "users": ListView(f"""
+        SELECT u.UserID, COALESCE(u.FirstName, '') AS FirstName, COALESCE(u.LastName, '') AS LastName, u.Username,
+               COALESCE(u.Email, '') AS Email, COALESCE(u.DateJoined, '') AS DateJoined, r.RoleName AS Role
+        FROM Users u JOIN Roles r ON u.RoleID = r.RoleID
+        WHERE u.RoleID IN ({", ".join(map(str, MANAGED_ROLES))}) AND u.deleted = 0
+    """, (("UserID", "n"), ("FirstName", "t"), ("LastName", "t"), ("Username", "t"), ("Email", "t"),
+          ("DateJoined", "t"), ("Role", "t")), "UserID", access=Permission.ADMIN_PAGES),
+    # Every item, with the store's stock of it
+    "items": ListView("""
+        SELECT i.ItemID, c.CollectionName, i.ItemName, COALESCE(i.Description, '') AS Description,
+               i.Price, COALESCE(s.Quantity, 0) AS stock_quantity, COALESCE(i.SKU, '') AS SKU
+        FROM Items i JOIN Collections c ON i.CollectionID = c.CollectionID
+        LEFT JOIN ItemStock s ON s.StoreID = ? AND s.ItemID = i.ItemID
+        WHERE i.deleted = 0 AND c.deleted = 0
+    """, (("ItemID", "n"), ("CollectionName", "t"), ("ItemName", "t"), ("Description", "t"),
+          ("Price", "n"), ("stock_quantity", "n"), ("SKU", "t")), "ItemID", lambda user_id, store_id: (store_id,)),
+    # Items the store has in stock, with what is left once other collectors'
+    # holds there are taken off (everyone's, without a user_id)
+    "shop": ListView("""
+        SELECT i.ItemID, c.CollectionName, i.ItemName, i.Price,
+               s.Quantity - COALESCE((SELECT SUM(h.Quantity) FROM Holds h
+                   WHERE h.StoreID = s.StoreID AND h.ItemID = s.ItemID AND (? IS NULL OR h.UserID <> ?)
+                       AND h.Expires > ?), 0)
+                   AS Available,
+               COALESCE(i.ImagePath, '') AS ImagePath
+        FROM ItemStock s
+        JOIN Items i ON i.ItemID = s.ItemID
+        JOIN Collections c ON i.CollectionID = c.CollectionID
+        WHERE s.StoreID = ? AND s.Quantity > 0 AND i.deleted = 0 AND c.deleted = 0
+    """, (("ItemID", "n"), ("CollectionName", "t"), ("ItemName", "t"), ("Price", "n"), ("Available", "n"),
+          ("ImagePath", "t")), "ItemID", lambda user_id, store_id: (user_id, user_id, timestamp(), store_id),
+        Own(Permission.MANAGE_HOLDINGS), holds=True),
+    "user_items": ListView("""
+        SELECT ui.UI_ID, u.Username, i.ItemName, c.CollectionName, COALESCE(ui.DateAdded, '') AS DateAdded,
+               i.Price, ui.Quantity
+        FROM Users_Items ui
+        JOIN Users u ON ui.UserID = u.UserID
+        JOIN Items i ON ui.ItemID = i.ItemID
+        JOIN Collections c ON i.CollectionID = c.CollectionID
+        WHERE u.deleted = 0 AND i.deleted = 0 AND c.deleted = 0
+    """, (("UI_ID", "n"), ("Username", "t"), ("ItemName", "t"), ("CollectionName", "t"), ("DateAdded", "t"),
+          ("Price", "n"), ("Quantity", "n")), "UI_ID", access=Permission.ADMIN_PAGES),
+    "my_items": ListView("""
+        SELECT ui.UI_ID, i.ItemName, c.CollectionName, i.Price, COALESCE(ui.DateAdded, '') AS DateAdded,
+               ui.Quantity
+        FROM Users_Items ui
+        JOIN Items i ON ui.ItemID = i.ItemID
+        JOIN Collections c ON i.CollectionID = c.CollectionID
+        WHERE ui.UserID = ? AND i.deleted = 0 AND c.deleted = 0
+    """, (("UI_ID", "n"), ("ItemName", "t"), ("CollectionName", "t"), ("Price", "n"), ("DateAdded", "t"),
+          ("Quantity", "n")), "UI_ID", lambda user_id, store_id: (user_id,), Own(Permission.MANAGE_HOLDINGS)),
+}
+
+FILTER_OPS = ("=", "<>", "<", "<=", ">", ">=", "contains")
+
+class ViewError(ValueError):
+    pass
+
+# All reads and writes against the Shelfwise schema. List methods return the
+# cursor so callers can stream rows; single-row lookups return a tuple or None.
+# Every write runs in its own transaction.
+#
+# Deleting a user, collection or item only marks it deleted, so it is
+# instant however much refers to it; reads leave marked rows (and anything
+# under them) out. purge_deleted() removes them for good a batch at a time.
+class ShelfwiseStore:
+    PURGE_BATCH = 500
+    # Queued items update_neighbours does per call
+    NEIGHBOURS_BATCH = 5
+    # Reorder suggestions: demand is measured over VELOCITY_DAYS and the
+    # suggested order covers COVER_DAYS of it
+    VELOCITY_DAYS = 30
+    COVER_DAYS = 14
+    # How long a hold on stock lasts unless renewed
+    HOLD_SECONDS = 120
+    # Rows per list_view page, by default and at most
+    PAGE_SIZE = 200
+    MAX_PAGE_SIZE = 1000
+
+    # DB-API exceptions callers should catch; RemoteStore has its own
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, conn, backend=None):
+        self.conn = conn
+        self.backend = backend or SqliteBackend()
+        self.cursor = None
+        self.Error = self.backend.Error
+        self.IntegrityError = self.backend.IntegrityError
+
+    def close(self):
+        self.backend.release(self.conn)
+
+    # Lets callers announce the reads they are about to make so a remote
+    # store can fetch them in one round trip; nothing to do locally
+    def prefetch(self, calls):
+        pass
+
+    # A transaction opened inside another one joins it, so several calls
+    # can be committed together:
+    #   with store.transaction():
+    #       store.update_item(...)
+    #       store.update_item(...)
+    @contextmanager
+    def transaction(self):
+        if self.cursor is not None:
+            yield self.cursor
+            return
+        c = self.cursor = self.backend.cursor(self.conn)
+        try:
+            yield c
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self.cursor = None
+
+    def _query(self, sql, params=()):
+        return self.backend.query(self.conn, sql, params)
+
+    def _query_one(self, sql, params=()):
+        return self.backend.query_one(self.conn, sql, params)
+
+    # Users
+
+    # admin: for the admin pages, otherwise for the shop; the user's role
+    # must allow it
+    def authenticate(self, username, password, admin=False):
+        permission = Permission.ADMIN_PAGES if admin else Permission.SHOP
+        row = self._query_one("""SELECT u.UserID FROM Users u
+                                 JOIN RolePermissions rp ON rp.RoleID = u.RoleID AND rp.PermissionID = ?
+                                 WHERE u.Username=? AND u.Password=? AND u.deleted = 0""",
+                              (int(permission), username, password))
+        return row[0] if row else None
+
+    # (deleted, RoleID, LoginVersion) of the user, None once purged; a
+    # session keeps it to tell whether the user has changed since
+    def get_login_stamp(self, user_id):
+        return self._query_one("SELECT deleted, RoleID, LoginVersion FROM Users WHERE UserID=?", (user_id,))
+
+    # Everything the user's role allows, as Permission bits (0 for no such user)
+    def get_permissions(self, user_id):
+        return sum(row[0] for row in self._query("""SELECT rp.PermissionID FROM Users u
+                                                     JOIN RolePermissions rp ON rp.RoleID = u.RoleID
+                                                     WHERE u.UserID=? AND u.deleted = 0""", (user_id,)))
+
+    def list_roles(self):
+        return self._query("SELECT RoleID, RoleName FROM Roles ORDER BY RoleID")
+
+    # Users with role_id, or by default everyone the admin pages manage
+    def list_users(self, role_id=None):
+        if role_id is None:
+            where, params = f"RoleID IN ({', '.join('?' * len(MANAGED_ROLES))})", MANAGED_ROLES
+        else:
+            where, params = "RoleID = ?", (role_id,)
+        return self._query(f"""SELECT UserID, FirstName, LastName, Username, Email, DateJoined, RoleID
+                               FROM Users WHERE {where} AND deleted = 0""", params)
+
+    # Passwords are only ever compared in the database, never read back
+    def get_user(self, user_id):
+        return self._query_one("""SELECT UserID, FirstName, LastName, Username, Email, DateJoined, RoleID
+                                  FROM Users WHERE UserID=? AND deleted = 0""", (user_id,))
+
+    # One page of a listing in VIEWS.
+    #   filters: [[column, op, value], ...], all of which must hold; op is
+    #            one of FILTER_OPS ("contains" is a case-insensitive substring)
+    #   sort:    [[column, "asc" or "desc"], ...]; ties go by the view's key
+    #   after:   {column: value} of the last row of the previous page, for
+    #            every sort column and the key; the page starts after it
+    #   user_id: whose rows, for the views that are per user
+    #   store_id: whose stock, for the views that show it
+    # Raises ViewError for an unknown view, column or operator.
+    def list_view(self, view, filters=None, sort=None, after=None, limit=None, user_id=None,
+                  store_id=DEFAULT_STORE):
+        spec = VIEWS.get(view)
+        if spec is None:
+            raise ViewError(f"Unknown view: {view}")
+        where, params = [], []
+        for column, op, value in filters or ():
+            if column not in spec.columns or op not in FILTER_OPS:
+                raise ViewError(f"Bad filter for {view}: {column} {op}")
+            if op == "contains":
+                where.append(f"LOWER({column}) LIKE ? ESCAPE '\\'")
+                params.append("%" + re.sub(r"([\\%_])", r"\\\1", str(value).lower()) + "%")
+            else:
+                where.append(f"{column} {op} ?")
+                params.append(value)
+        order = []
+        for column, direction in sort or ():
+            if column not in spec.columns or direction not in ("asc", "desc"):
+                raise ViewError(f"Bad sort for {view}: {column} {direction}")
+            if column != spec.key and column not in [c for c, _ in order]:
+                order.append((column, direction))
+        # The key runs the same way as the column before it, so an index on
+        # (column, key) serves the whole order
+        order.append((spec.key, order[-1][1] if order else "asc"))
+        if after:
+            # Rows past the last one: greater (or smaller, descending) on
+            # the first sort column, or equal on it and past on the next...
+            try:
+                values = [after[column] for column, _ in order]
+            except KeyError as e:
+                raise ViewError(f"after needs a value for {e.args[0]}")
+            # ...which all lie on one side of the first value; saying so
+            # lets the database seek there in the index rather than scan
+            where.append(f"{order[0][0]} {'>=' if order[0][1] == 'asc' else '<='} ?")
+            params.append(values[0])
+            alternatives = []
+            for n, (column, direction) in enumerate(order):
+                alternatives.append("(" + " AND ".join(
+                    [f"{c} = ?" for c, _ in order[:n]] + [f"{column} {'>' if direction == 'asc' else '<'} ?"]) + ")")
+                params.extend(values[:n + 1])
+            where.append("(" + " OR ".join(alternatives) + ")")
+        limit = min(limit or self.PAGE_SIZE, self.MAX_PAGE_SIZE)
+        query = (f"SELECT * FROM ({spec.sql}) v" + (" WHERE " + " AND ".join(where) if where else "")
+                 + " ORDER BY " + ", ".join(f"{column} {direction.upper()}" for column, direction in order)
+                 + " LIMIT ?")
+        return self._query(query, list(spec.params(user_id, store_id)) + params + [limit])
+
+    # The sort and filters the user last had on a view, or None
+    def get_view_settings(self, user_id, view):
+        row = self._query_one("SELECT Settings FROM ViewSettings WHERE UserID=? AND ViewName=?", (user_id, view))
+        return json.loads(row[0]) if row else None
+
+    def save_view_settings(self, user_id, view, settings):
+        with self.transaction() as c:
+            c.execute("""INSERT INTO ViewSettings (UserID, ViewName, Settings) VALUES (?, ?, ?)
+                         ON CONFLICT (UserID, ViewName) DO UPDATE SET Settings = excluded.Settings""",
+                      (user_id, view, json.dumps(settings)))
+
+    # A deleted row keeps its unique name until purged; taking the name
+    # again purges it on the spot
+    def _reclaim(self, c, table, column, value):
+        c.execute(f"DELETE FROM {table} WHERE {column}=? AND deleted = 1", (value,))
+
+    def add_user(self, first_name, last_name, username, password, email, date_joined, role_id=ROLE_COLLECTOR):
+        with self.transaction() as c:
+            self._reclaim(c, "Users", "Username", username)
+            return self.backend.insert(c, """INSERT INTO Users
+                      (FirstName, LastName, Username, Password, Email, DateJoined, RoleID, is_admin)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                      (first_name, last_name, username, password, email, date_joined, role_id,
+                       int(role_id == ROLE_STORE_MANAGER)), "UserID")
+
+    # A collector signing themselves up
+    def sign_up(self, first_name, last_name, username, password, email, date_joined):
+        return self.add_user(first_name, last_name, username, password, email, date_joined, ROLE_COLLECTOR)
+
+    # password None keeps the current one
+    def update_user(self, user_id, first_name, last_name, username, password, email, date_joined,
+                    role_id=ROLE_COLLECTOR):
+        with self.transaction() as c:
+            self._reclaim(c, "Users", "Username", username)
+            c.execute("""UPDATE Users SET
+                    FirstName=?, LastName=?, Username=?, Password=COALESCE(?, Password),
+                    Email=?, DateJoined=?, RoleID=?, is_admin=? WHERE UserID=?""",
+                    (first_name, last_name, username, password, email, date_joined, role_id,
+                     int(role_id == ROLE_STORE_MANAGER), user_id))
+
+    # A user editing their own account, which takes their current password;
+    # password None keeps it. False (and nothing changed) if
+    # current_password is wrong.
+    def update_account(self, user_id, first_name, last_name, username, password, email, current_password):
+        with self.transaction() as c:
+            if not c.execute("SELECT 1 FROM Users WHERE UserID=? AND Password=? AND deleted = 0",
+                             (user_id, current_password)).fetchone():
+                return False
+            self._reclaim(c, "Users", "Username", username)
+            c.execute("""UPDATE Users SET FirstName=?, LastName=?, Username=?,
+                       Password=COALESCE(?, Password), Email=? WHERE UserID=?""",
+                    (first_name, last_name, username, password, email, user_id))
+            return True
+
+    def delete_user(self, user_id):
+        with self.transaction() as c:
+            # The user's items go with the user when it is purged
+            c.execute("UPDATE Users SET deleted = 1 WHERE UserID=?", (user_id,))
+
+    # Fold user drop_id into keep_id (one person with two accounts): drop's
+    # items move to keep, keep gets drop's names and email where it has
+    # none, and drop is deleted, all in one transaction. Drop's holds go.
+    def merge_users(self, keep_id, drop_id):
+        # Nothing to do, and going on would delete it
+        if keep_id == drop_id:
+            return
+        with self.transaction() as c:
+            self._merge_holdings(c, "UserID", keep_id, drop_id)
+            c.execute("DELETE FROM Holds WHERE UserID=?", (drop_id,))
+            c.execute("""UPDATE Users SET
+                             FirstName = COALESCE(NULLIF(FirstName, ''), (SELECT FirstName FROM Users WHERE UserID=?)),
+                             LastName = COALESCE(NULLIF(LastName, ''), (SELECT LastName FROM Users WHERE UserID=?)),
+                             Email = COALESCE(NULLIF(Email, ''), (SELECT Email FROM Users WHERE UserID=?))
+                         WHERE UserID=?""", (drop_id, drop_id, drop_id, keep_id))
+            c.execute("UPDATE Users SET deleted = 1 WHERE UserID=?", (drop_id,))
+
+    # Point drop's Users_Items rows (column: "UserID" or "ItemID") at keep.
+    # Where keep already has a row for the same item (or user) the two
+    # quantities are added up, which the acquisition triggers would count
+    # as units taken today; those units were taken before, so they are
+    # taken off again.
+    def _merge_holdings(self, c, column, keep, drop):
+        other = "ItemID" if column == "UserID" else "UserID"
+        c.execute(f"""SELECT k.ItemID, d.Quantity FROM Users_Items d
+                      JOIN Users_Items k ON k.{other} = d.{other} AND k.{column} = ?
+                      WHERE d.{column} = ?""", (keep, drop))
+        both = c.fetchall()
+        if both:
+            c.execute(f"""UPDATE Users_Items SET Quantity = Quantity + (SELECT d.Quantity FROM Users_Items d
+                                                                     WHERE d.{column} = ? AND d.{other} = Users_Items.{other})
+                          WHERE {column} = ? AND {other} IN (SELECT {other} FROM Users_Items WHERE {column} = ?)""",
+                      (drop, keep, drop))
+            today = datetime.date.today().isoformat()
+            for item_id, quantity in both:
+                c.execute("UPDATE Acquisitions SET Units = Units - ? WHERE ItemID = ? AND Day = ?",
+                          (quantity, item_id, today))
+                c.execute("DELETE FROM Acquisitions WHERE ItemID = ? AND Day = ? AND Units <= 0", (item_id, today))
+            c.execute(f"""DELETE FROM Users_Items
+                          WHERE {column} = ? AND {other} IN (SELECT {other} FROM Users_Items WHERE {column} = ?)""",
+                      (drop, keep))
+        c.execute(f"UPDATE Users_Items SET {column} = ? WHERE {column} = ?", (keep, drop))
+
+    # Collections
+
+    def list_collections(self, by_name=False):
+        order = "CollectionName" if by_name else "CollectionID"
+        return self._query(f"SELECT CollectionID, CollectionName, Description FROM Collections WHERE deleted = 0 ORDER BY {order}")
+
+    def add_collection(self, name, description):
+        with self.transaction() as c:
+            self._reclaim(c, "Collections", "CollectionName", name)
+            return self.backend.insert(c, "INSERT INTO Collections (CollectionName, Description) VALUES (?, ?)",
+                                       (name, description), "CollectionID")
+
+    def update_collection(self, collection_id, name, description):
+        with self.transaction() as c:
+            self._reclaim(c, "Collections", "CollectionName", name)
+            c.execute("UPDATE Collections SET CollectionName=?, Description=? WHERE CollectionID=?",
+                      (name, description, collection_id))
+
+    def count_collection_items(self, collection_id):
+        return self._query_one("SELECT COUNT(*) FROM Items WHERE CollectionID=? AND deleted = 0", (collection_id,))[0]
+
+    def delete_collection(self, collection_id):
+        with self.transaction() as c:
+            c.execute("UPDATE Collections SET deleted = 1 WHERE CollectionID=?", (collection_id,))
+
+    # Stores
+
+    def list_stores(self):
+        return self._query("SELECT StoreID, StoreName FROM Stores ORDER BY StoreID")
+
+    # Items. The catalog is shared; stock and reorder levels are those of
+    # store_id.
+
+    def list_items(self, collection_id=None, in_stock=False, store_id=DEFAULT_STORE):
+        query = """SELECT Items.ItemID, Collections.CollectionName, Items.ItemName, Items.Description,
+                   Items.Price, COALESCE(ItemStock.Quantity, 0)
+                   FROM Items
+                   JOIN Collections ON Items.CollectionID = Collections.CollectionID
+                   LEFT JOIN ItemStock ON ItemStock.StoreID = ? AND ItemStock.ItemID = Items.ItemID
+                   WHERE Items.deleted = 0 AND Collections.deleted = 0"""
+        params = [store_id]
+        if collection_id is not None:
+            query += " AND Items.CollectionID = ?"
+            params.append(collection_id)
+        if in_stock:
+            query += " AND ItemStock.Quantity > 0"
+        query += " ORDER BY Items.ItemID"
+        return self._query(query, params)
+
+    def list_stocked_items(self, collection_id, store_id=DEFAULT_STORE):
+        return self._query("""
+            SELECT i.ItemID, i.ItemName, s.Quantity
+            FROM ItemStock s
+            JOIN Items i ON i.ItemID = s.ItemID
+            WHERE s.StoreID = ? AND s.Quantity > 0 AND i.CollectionID = ? AND i.deleted = 0
+            ORDER BY i.ItemName
+        """, (store_id, collection_id))
+
+    def get_item(self, item_id, store_id=DEFAULT_STORE):
+        return self._query_one("""SELECT i.ItemID, i.CollectionID, i.ItemName, i.Description, i.Price,
+                                         COALESCE(s.Quantity, 0)
+                                  FROM Items i LEFT JOIN ItemStock s ON s.StoreID = ? AND s.ItemID = i.ItemID
+                                  WHERE i.ItemID=? AND i.deleted = 0""", (store_id, item_id))
+
+    # Adds the item to the catalog with stock in store_id only
+    def add_item(self, collection_id, name, description, price, stock, store_id=DEFAULT_STORE):
+        with self.transaction() as c:
+            item_id = self.backend.insert(c, "INSERT INTO Items (CollectionID, ItemName, Description, Price) VALUES (?, ?, ?, ?)",
+                                          (collection_id, name, description, price), "ItemID")
+            c.execute("INSERT INTO ItemStock (StoreID, ItemID, Quantity) VALUES (?, ?, ?)", (store_id, item_id, stock))
+            return item_id
+
+    def update_item(self, item_id, collection_id, name, description, price, stock, store_id=DEFAULT_STORE):
+        with self.transaction() as c:
+            c.execute("UPDATE Items SET CollectionID=?, ItemName=?, Description=?, Price=? WHERE ItemID=?",
+                      (collection_id, name, description, price, item_id))
+            # Like the UPDATE, does nothing for an item that is gone
+            c.execute("""INSERT INTO ItemStock (StoreID, ItemID, Quantity) SELECT ?, ItemID, ? FROM Items WHERE ItemID=?
+                         ON CONFLICT (StoreID, ItemID) DO UPDATE SET Quantity = excluded.Quantity""",
+                      (store_id, stock, item_id))
+
+    def delete_item(self, item_id):
+        with self.transaction() as c:
+            c.execute("UPDATE Items SET deleted = 1 WHERE ItemID=?", (item_id,))
+
+    # Fold item drop_id into keep_id (the same thing entered twice), in one
+    # transaction: collectors' holdings, every store's stock and the
+    # acquisitions counted for reordering move to keep, keep takes drop's
+    # picture and SKU where it has none, and drop is deleted. Holds on drop
+    # go; the carts holding it have to add keep instead.
+    def merge_items(self, keep_id, drop_id):
+        # Nothing to do, and going on would delete it
+        if keep_id == drop_id:
+            return
+        with self.transaction() as c:
+            self._merge_holdings(c, "ItemID", keep_id, drop_id)
+            c.execute("""INSERT INTO ItemStock (StoreID, ItemID, Quantity, reorder_level)
+                         SELECT StoreID, ?, Quantity, reorder_level FROM ItemStock WHERE ItemID = ?
+                         ON CONFLICT (StoreID, ItemID) DO UPDATE SET Quantity = ItemStock.Quantity + excluded.Quantity""",
+                      (keep_id, drop_id))
+            c.execute("""INSERT INTO Acquisitions (ItemID, Day, Units)
+                         SELECT ?, Day, Units FROM Acquisitions WHERE ItemID = ?
+                         ON CONFLICT (ItemID, Day) DO UPDATE SET Units = Acquisitions.Units + excluded.Units""",
+                      (keep_id, drop_id))
+            c.execute("DELETE FROM Acquisitions WHERE ItemID=?", (drop_id,))
+            c.execute("DELETE FROM Holds WHERE ItemID=?", (drop_id,))
+            # Deleted first, so the SKU is free for keep
+            c.execute("UPDATE Items SET deleted = 1 WHERE ItemID=?", (drop_id,))
+            c.execute("""UPDATE Items SET SKU = COALESCE(SKU, (SELECT SKU FROM Items WHERE ItemID=?)),
+                                         ImagePath = COALESCE(ImagePath, (SELECT ImagePath FROM Items WHERE ItemID=?))
+                         WHERE ItemID=?""", (drop_id, drop_id, keep_id))
+
+    # Prices the item has had, newest first: [(price, changed at), ...]
+    def list_price_history(self, item_id):
+        return self._query("""SELECT Price, ChangedAt FROM PriceHistory WHERE ItemID=?
+                              ORDER BY ChangeID DESC""", (item_id,))
+
+    def get_reorder_level(self, item_id, store_id=DEFAULT_STORE):
+        row = self._query_one("""SELECT COALESCE(s.reorder_level, 0)
+                                 FROM Items i LEFT JOIN ItemStock s ON s.StoreID = ? AND s.ItemID = i.ItemID
+                                 WHERE i.ItemID=? AND i.deleted = 0""", (store_id, item_id))
+        return row[0] if row else None
+
+    # The path of the item's picture, '' if it has none
+    def get_item_image(self, item_id):
+        row = self._query_one("SELECT COALESCE(ImagePath, '') FROM Items WHERE ItemID=? AND deleted = 0", (item_id,))
+        return row[0] if row else None
+
+    # image_path is a file every terminal can open (e.g. on a share), or
+    # None to take the picture away
+    def set_item_image(self, item_id, image_path):
+        with self.transaction() as c:
+            c.execute("UPDATE Items SET ImagePath=? WHERE ItemID=?", (image_path or None, item_id))
+
+    # The item's barcode, '' if it has none
+    def get_item_sku(self, item_id):
+        row = self._query_one("SELECT COALESCE(SKU, '') FROM Items WHERE ItemID=? AND deleted = 0", (item_id,))
+        return row[0] if row else None
+
+    # None takes the barcode away; raises IntegrityError if another item
+    # has it
+    def set_item_sku(self, item_id, sku):
+        with self.transaction() as c:
+            c.execute("UPDATE Items SET SKU=? WHERE ItemID=?", (sku or None, item_id))
+
+    # (ItemID, CollectionID) of the item with the barcode, or None
+    def find_item_by_sku(self, sku):
+        return self._query_one("SELECT ItemID, CollectionID FROM Items WHERE SKU=? AND deleted = 0", (sku,))
+
+    # (SKU, ItemID, CollectionID) of every item that has a barcode
+    def list_skus(self):
+        return self._query("SELECT SKU, ItemID, CollectionID FROM Items WHERE SKU IS NOT NULL AND deleted = 0")
+
+    # The item goes on the store's low-stock list once its stock there is
+    # at or below level
+    def set_reorder_level(self, item_id, level, store_id=DEFAULT_STORE):
+        with self.transaction() as c:
+            c.execute("""INSERT INTO ItemStock (StoreID, ItemID, reorder_level) SELECT ?, ItemID, ? FROM Items WHERE ItemID=?
+                         ON CONFLICT (StoreID, ItemID) DO UPDATE SET reorder_level = excluded.reorder_level""",
+                      (store_id, level, item_id))
+
+    # The store's items at or below their reorder level, furthest below
+    # first, with the units collectors took over the last VELOCITY_DAYS and
+    # a suggested order: enough to get back above the level plus COVER_DAYS
+    # of demand at that pace. Acquisitions are counted across all stores.
+    def list_low_stock(self, store_id=DEFAULT_STORE):
+        since = (datetime.date.today() - datetime.timedelta(days=self.VELOCITY_DAYS)).isoformat()
+        return self._query("""
+            SELECT i.ItemID, i.ItemName, c.CollectionName, s.Quantity, s.reorder_level,
+                   COALESCE(SUM(a.Units), 0) AS Acquired,
+                   s.reorder_level - s.Quantity + 1
+                       + (COALESCE(SUM(a.Units), 0) * ? + ? - 1) / ? AS Suggested
+            FROM LowStock l
+            JOIN ItemStock s ON s.StoreID = l.StoreID AND s.ItemID = l.ItemID
+            JOIN Items i ON i.ItemID = l.ItemID
+            JOIN Collections c ON c.CollectionID = i.CollectionID
+            LEFT JOIN Acquisitions a ON a.ItemID = l.ItemID AND a.Day >= ?
+            WHERE l.StoreID = ? AND i.deleted = 0 AND c.deleted = 0
+            GROUP BY i.ItemID, i.ItemName, c.CollectionName, s.Quantity, s.reorder_level, l.Since
+            ORDER BY s.Quantity - s.reorder_level, l.Since
+        """, (self.COVER_DAYS, self.VELOCITY_DAYS, self.VELOCITY_DAYS, since, store_id))
+
+    # User items and reservations
+
+    def list_user_items(self, user_id=None):
+        query = """
+            SELECT ui.UI_ID, u.Username, i.ItemName, c.CollectionName, ui.DateAdded, i.Price, ui.Quantity
+            FROM Users_Items ui
+            JOIN Users u ON ui.UserID = u.UserID
+            JOIN Items i ON ui.ItemID = i.ItemID
+            JOIN Collections c ON i.CollectionID = c.CollectionID
+            WHERE u.deleted = 0 AND i.deleted = 0 AND c.deleted = 0
+        """
+        if user_id is None:
+            return self._query(query + " ORDER BY u.Username, i.ItemName")
+        return self._query(query + " AND ui.UserID = ? ORDER BY i.ItemName", (user_id,))
+
+    def list_my_items(self, user_id, collection_id=None, sort="name_asc"):
+        query = """
+            SELECT ui.UI_ID, i.ItemName, c.CollectionName, i.Price, ui.DateAdded, ui.Quantity
+            FROM Users_Items ui
+            JOIN Items i ON ui.ItemID = i.ItemID
+            JOIN Collections c ON i.CollectionID = c.CollectionID
+            WHERE ui.UserID = ? AND i.deleted = 0 AND c.deleted = 0
+        """
+        params = [user_id]
+        if collection_id is not None:
+            query += " AND i.CollectionID = ?"
+            params.append(collection_id)
+        query += " ORDER BY " + MY_ITEMS_ORDER.get(sort, MY_ITEMS_ORDER["name_asc"])
+        return self._query(query, params)
+
+    def get_user_item(self, ui_id):
+        return self._query_one("SELECT UI_ID, UserID, ItemID, DateAdded, Quantity FROM Users_Items WHERE UI_ID=?",
+                               (ui_id,))
+
+    def get_holding(self, user_id, item_id):
+        return self._query_one("SELECT UI_ID, Quantity FROM Users_Items WHERE UserID=? AND ItemID=?",
+                               (user_id, item_id))
+
+    def update_user_item_quantity(self, ui_id, quantity):
+        with self.transaction() as c:
+            c.execute("UPDATE Users_Items SET Quantity=? WHERE UI_ID=?", (quantity, ui_id))
+
+    def _take_stock(self, c, item_id, quantity, store_id):
+        # Check and decrement in one statement so two terminals can never
+        # both take the last unit
+        c.execute("""UPDATE ItemStock SET Quantity = Quantity - ?
+                     WHERE StoreID=? AND ItemID=? AND Quantity >= ?
+                     AND EXISTS (SELECT 1 FROM Items WHERE ItemID = ItemStock.ItemID AND deleted = 0)""",
+                  (quantity, store_id, item_id, quantity))
+        if c.rowcount == 0:
+            row = c.execute("""SELECT s.Quantity FROM ItemStock s JOIN Items i ON i.ItemID = s.ItemID
+                               WHERE s.StoreID=? AND s.ItemID=? AND i.deleted = 0""", (store_id, item_id)).fetchone()
+            raise OutOfStockError(row[0] if row else 0)
+
+    # Add quantity units of an item to a user, taking them from the store's
+    # stock. Returns (previous quantity or None, new quantity).
+    def reserve_item(self, user_id, item_id, quantity, store_id=DEFAULT_STORE):
+        with self.transaction() as c:
+            self._take_stock(c, item_id, quantity, store_id)
+            existing = c.execute("SELECT UI_ID, Quantity FROM Users_Items WHERE UserID=? AND ItemID=?",
+                                 (user_id, item_id)).fetchone()
+            if existing:
+                ui_id, current_quantity = existing
+                c.execute("UPDATE Users_Items SET Quantity=? WHERE UI_ID=?", (current_quantity + quantity, ui_id))
+                return current_quantity, current_quantity + quantity
+            today = datetime.date.today().isoformat()
+            c.execute("INSERT INTO Users_Items (UserID, ItemID, DateAdded, Quantity) VALUES (?, ?, ?, ?)",
+                      (user_id, item_id, today, quantity))
+            return None, quantity
+
+    # Set how many of an item a user holds. Only an increase is taken from
+    # stock; lowering the quantity does not return units to the shelf.
+    def set_reserved_quantity(self, user_id, item_id, quantity, store_id=DEFAULT_STORE):
+        with self.transaction() as c:
+            existing = c.execute("SELECT UI_ID, Quantity FROM Users_Items WHERE UserID=? AND ItemID=?",
+                                 (user_id, item_id)).fetchone()
+            if existing:
+                ui_id, current_quantity = existing
+                delta = quantity - current_quantity
+                if delta > 0:
+                    self._take_stock(c, item_id, delta, store_id)
+                c.execute("UPDATE Users_Items SET Quantity=? WHERE UI_ID=?", (quantity, ui_id))
+                return current_quantity, quantity
+            self._take_stock(c, item_id, quantity, store_id)
+            today = datetime.date.today().isoformat()
+            c.execute("INSERT INTO Users_Items (UserID, ItemID, DateAdded, Quantity) VALUES (?, ?, ?, ?)",
+                      (user_id, item_id, today, quantity))
+            return None, quantity
+
+    # Check out a cart: lines is [(item_id, quantity), ...]. One query checks
+    # the store's stock of every line up front, then the whole cart is taken
+    # from stock and added to the user's items in one transaction, so either
+    # every line goes through or none does. Returns the number of units added.
+    def checkout(self, user_id, lines, store_id=DEFAULT_STORE):
+        wanted = {}
+        for item_id, quantity in lines:
+            if quantity > 0:
+                wanted[item_id] = wanted.get(item_id, 0) + quantity
+        if not wanted:
+            return 0
+        marks = ", ".join("?" * len(wanted))
+        with self.transaction() as c:
+            # Units other collectors hold are not for sale; the user's own
+            # holds are what the cart is made of
+            stock = dict(c.execute(f"""
+                SELECT s.ItemID, s.Quantity - COALESCE(SUM(h.Quantity), 0)
+                FROM ItemStock s
+                JOIN Items i ON i.ItemID = s.ItemID
+                LEFT JOIN Holds h ON h.StoreID = s.StoreID AND h.ItemID = s.ItemID
+                    AND h.UserID <> ? AND h.Expires > ?
+                WHERE s.StoreID = ? AND s.ItemID IN ({marks}) AND i.deleted = 0
+                GROUP BY s.ItemID, s.Quantity
+            """, [user_id, timestamp(), store_id] + list(wanted)).fetchall())
+            for item_id, quantity in wanted.items():
+                if stock.get(item_id, 0) < quantity:
+                    raise OutOfStockError(stock.get(item_id, 0), item_id)
+            held = {item_id: (ui_id, quantity) for ui_id, item_id, quantity in c.execute(
+                f"SELECT UI_ID, ItemID, Quantity FROM Users_Items WHERE UserID=? AND ItemID IN ({marks})",
+                [user_id] + list(wanted)).fetchall()}
+            today = datetime.date.today().isoformat()
+            for item_id, quantity in wanted.items():
+                # Still guarded, for a terminal that got in after the check
+                try:
+                    self._take_stock(c, item_id, quantity, store_id)
+                except OutOfStockError as e:
+                    raise OutOfStockError(e.available, item_id)
+                if item_id in held:
+                    ui_id, current_quantity = held[item_id]
+                    c.execute("UPDATE Users_Items SET Quantity=? WHERE UI_ID=?", (current_quantity + quantity, ui_id))
+                else:
+                    c.execute("INSERT INTO Users_Items (UserID, ItemID, DateAdded, Quantity) VALUES (?, ?, ?, ?)",
+                              (user_id, item_id, today, quantity))
+            c.execute(f"DELETE FROM Holds WHERE UserID=? AND ItemID IN ({marks})", [user_id] + list(wanted))
+        return sum(wanted.values())
+
+    # Holds: while a collector decides how many of an item to take, and while
+    # it sits in their cart, the units are held for them so other collectors
+    # see what is really left. A hold is only a row with an expiry, written
+    # in a short transaction, so nothing stays locked during the user's
+    # think time; holds that are not renewed lapse and sweep_holds removes
+    # them. Stock is still only taken, and checked for good, at checkout.
+
+    # Hold quantity units of an item in a store for the user for
+    # HOLD_SECONDS, replacing their earlier hold on it. Returns how many
+    # units the user could have (the store's stock less what others hold
+    # there), or raises OutOfStockError, leaving the earlier hold as it was,
+    # if that is fewer than quantity. A quantity below 1 raises ValueError
+    # (release_holds gives a hold back).
+    def hold_stock(self, user_id, item_id, quantity, store_id=DEFAULT_STORE):
+        if not isinstance(quantity, int) or quantity < 1:
+            raise ValueError(f"Can only hold 1 or more units, not {quantity}")
+        with self.transaction() as c:
+            # Write first: on SQLite a competing hold then waits for this one
+            c.execute("""INSERT INTO Holds (UserID, ItemID, Quantity, Expires, StoreID) VALUES (?, ?, ?, ?, ?)
+                         ON CONFLICT (UserID, ItemID) DO UPDATE SET Quantity = excluded.Quantity,
+                         Expires = excluded.Expires, StoreID = excluded.StoreID""",
+                      (user_id, item_id, quantity, timestamp(self.HOLD_SECONDS), store_id))
+            row = c.execute("""
+                SELECT s.Quantity - COALESCE(SUM(h.Quantity), 0)
+                FROM ItemStock s
+                JOIN Items i ON i.ItemID = s.ItemID
+                LEFT JOIN Holds h ON h.StoreID = s.StoreID AND h.ItemID = s.ItemID
+                    AND h.UserID <> ? AND h.Expires > ?
+                WHERE s.StoreID = ? AND s.ItemID = ? AND i.deleted = 0
+                GROUP BY s.Quantity
+            """, (user_id, timestamp(), store_id, item_id)).fetchone()
+            available = row[0] if row else 0
+            if available < quantity:
+                raise OutOfStockError(available, item_id)
+        return available
+
+    # Give back the user's hold on an item, or all of their holds
+    def release_holds(self, user_id, item_id=None):
+        with self.transaction() as c:
+            if item_id is None:
+                c.execute("DELETE FROM Holds WHERE UserID=?", (user_id,))
+            else:
+                c.execute("DELETE FROM Holds WHERE UserID=? AND ItemID=?", (user_id, item_id))
+
+    # Keep the user's holds for another HOLD_SECONDS
+    def renew_holds(self, user_id):
+        with self.transaction() as c:
+            c.execute("UPDATE Holds SET Expires=? WHERE UserID=?", (timestamp(self.HOLD_SECONDS), user_id))
+
+    # Units of each item held in the store by collectors other than
+    # user_id: [(item_id, held), ...]
+    def list_held_stock(self, user_id=None, store_id=DEFAULT_STORE):
+        return self._query("""
+            SELECT ItemID, SUM(Quantity) FROM Holds
+            WHERE StoreID = ? AND Expires > ? AND (? IS NULL OR UserID <> ?)
+            GROUP BY ItemID
+        """, (store_id, timestamp(), user_id, user_id))
+
+    # Remove lapsed holds; returns how many went
+    def sweep_holds(self):
+        with self.transaction() as c:
+            c.execute("DELETE FROM Holds WHERE Expires <= ?", (timestamp(),))
+            return max(c.rowcount, 0)
+
+    # The collections user_id holds items of, with how many of their items
+    # the user holds: [(CollectionID, CollectionName, owned, items), ...]
+    def list_collection_progress(self, user_id):
+        return self._query("""
+            SELECT c.CollectionID, c.CollectionName, p.Owned, COALESCE(s.Items, 0)
+            FROM CollectionProgress p
+            JOIN Collections c ON c.CollectionID = p.CollectionID
+            LEFT JOIN CollectionSizes s ON s.CollectionID = p.CollectionID
+            WHERE p.UserID = ? AND c.deleted = 0
+            ORDER BY c.CollectionName
+        """, (user_id,))
+
+    # Items that collectors who hold item_id also hold, most such collectors
+    # first, leaving out what user_id already has and what the store has
+    # none of: [(ItemID, ItemName, Price, collectors), ...]
+    def list_item_neighbours(self, item_id, user_id=None, store_id=DEFAULT_STORE, limit=5):
+        return self._query("""
+            SELECT i.ItemID, i.ItemName, i.Price, n.Together
+            FROM ItemNeighbours n
+            JOIN Items i ON i.ItemID = n.NeighbourID
+            JOIN Collections c ON c.CollectionID = i.CollectionID
+            JOIN ItemStock s ON s.StoreID = ? AND s.ItemID = i.ItemID
+            WHERE n.ItemID = ? AND s.Quantity > 0 AND i.deleted = 0 AND c.deleted = 0
+                AND NOT EXISTS (SELECT 1 FROM Users_Items ui WHERE ui.UserID = ? AND ui.ItemID = i.ItemID)
+            ORDER BY n.Together DESC, n.NeighbourID
+            LIMIT ?
+        """, (store_id, item_id, user_id, limit))
+
+    # Work through up to batch queued items (see ItemNeighbours). Returns
+    # how many were done: fewer than batch means the queue is empty.
+    def update_neighbours(self, batch=None):
+        batch = batch or self.NEIGHBOURS_BATCH
+        done = 0
+        with self.transaction() as c:
+            queued = {row[0] for row in c.execute("SELECT ItemID FROM NeighbourQueue").fetchall()}
+            # Working on an item can queue others (or itself) again
+            while done < batch:
+                next_items = [row[0] for row in c.execute("SELECT ItemID FROM NeighbourQueue ORDER BY ItemID LIMIT ?",
+                                                          (batch - done,)).fetchall()]
+                if not next_items:
+                    break
+                for item_id in next_items:
+                    c.execute("DELETE FROM NeighbourQueue WHERE ItemID = ?", (item_id,))
+                    queued.discard(item_id)
+                    queued.update(self._update_neighbours(c, item_id, queued))
+                done += len(next_items)
+        return done
+
+    # Count, for every other item, the collectors who hold it as well as
+    # item_id and keep the top NEIGHBOURS as item_id's list. The counts are
+    # also what the other items' lists have for item_id: a count that went
+    # up is put in their list if it now makes the top NEIGHBOURS, and an
+    # item whose count for item_id went down is queued to be counted again,
+    # since something left out before may now belong in its list. Items
+    # still queued are left alone; they are counted in full anyway. Returns
+    # the items it queued.
+    def _update_neighbours(self, c, item_id, queued):
+        held_with = """SELECT o.ItemID FROM Users_Items h JOIN Users_Items o ON o.UserID = h.UserID
+                       WHERE h.ItemID = ? AND o.ItemID <> ?"""
+        together = collections.Counter(row[0] for row in c.execute(held_with, (item_id, item_id)).fetchall())
+        rank = lambda entry: (-entry[1], entry[0])
+        c.execute("DELETE FROM ItemNeighbours WHERE ItemID = ?", (item_id,))
+        c.executemany("INSERT INTO ItemNeighbours (ItemID, NeighbourID, Together) VALUES (?, ?, ?)",
+                      [(item_id, other, count) for other, count in heapq.nsmallest(NEIGHBOURS, together.items(), rank)])
+
+        lists = collections.defaultdict(dict)
+        for other, neighbour, count in c.execute(f"""
+                SELECT ItemID, NeighbourID, Together FROM ItemNeighbours
+                WHERE ItemID IN ({held_with} UNION SELECT ItemID FROM ItemNeighbours WHERE NeighbourID = ?)
+                    AND ItemID NOT IN (SELECT ItemID FROM NeighbourQueue)""",
+                (item_id, item_id, item_id)).fetchall():
+            lists[other][neighbour] = count
+        changed, dropped, recount = [], [], []
+        for other in (set(together) | set(lists)) - queued:
+            entries = lists[other]
+            count = together.get(other, 0)
+            before = entries.get(item_id)
+            if before == count or before is None and count == 0:
+                continue
+            if before is not None and count < before:
+                recount.append((other,))
+                continue
+            if before is None and len(entries) >= NEIGHBOURS:
+                last = max(entries.items(), key=rank)
+                if rank((item_id, count)) > rank(last):
+                    continue
+                dropped.append((other, last[0]))
+            changed.append((other, item_id, count))
+        c.executemany("DELETE FROM ItemNeighbours WHERE ItemID = ? AND NeighbourID = ?", dropped)
+        c.executemany("""INSERT INTO ItemNeighbours (ItemID, NeighbourID, Together) VALUES (?, ?, ?)
+                         ON CONFLICT (ItemID, NeighbourID) DO UPDATE SET Together = excluded.Together""", changed)
+        c.executemany("INSERT INTO NeighbourQueue (ItemID) VALUES (?) ON CONFLICT DO NOTHING", recount)
+        return [other for other, in recount]
+
+    # Remove up to batch rows marked deleted, holdings first, so that no one
+    # statement has to cascade through every holding of a popular item.
+    # Returns how many rows went: fewer than batch means nothing is left.
+    def purge_deleted(self, batch=None):
+        budget = batch = batch or self.PURGE_BATCH
+        with self.transaction() as c:
+            for sql in PURGE_STEPS:
+                c.execute(sql, (budget,))
+                budget -= max(c.rowcount, 0)
+                # A step runs only once the ones before it have nothing left
+                if budget <= 0:
+                    break
+        return batch - budget
+
+# What purge_deleted removes, in order: each step's rows only refer to rows
+# removed by the steps after it
+PURGE_STEPS = (
+    """DELETE FROM Users_Items WHERE UI_ID IN (SELECT ui.UI_ID FROM Users u
+           JOIN Users_Items ui ON ui.UserID = u.UserID WHERE u.deleted = 1 LIMIT ?)""",
+    """DELETE FROM Users_Items WHERE UI_ID IN (SELECT ui.UI_ID FROM Items i
+           JOIN Users_Items ui ON ui.ItemID = i.ItemID WHERE i.deleted = 1 LIMIT ?)""",
+    """DELETE FROM Users_Items WHERE UI_ID IN (SELECT ui.UI_ID FROM Collections c
+           JOIN Items i ON i.CollectionID = c.CollectionID
+           JOIN Users_Items ui ON ui.ItemID = i.ItemID WHERE c.deleted = 1 LIMIT ?)""",
+    "DELETE FROM Items WHERE ItemID IN (SELECT ItemID FROM Items WHERE deleted = 1 LIMIT ?)",
+    """DELETE FROM Items WHERE ItemID IN (SELECT i.ItemID FROM Collections c
+           JOIN Items i ON i.CollectionID = c.CollectionID WHERE c.deleted = 1 LIMIT ?)""",
+    "DELETE FROM Users WHERE UserID IN (SELECT UserID FROM Users WHERE deleted = 1 LIMIT ?)",
+    "DELETE FROM Collections WHERE CollectionID IN (SELECT CollectionID FROM Collections WHERE deleted = 1 LIMIT ?)",
+)
+
+# How an edit that has not reached the database yet shows in a result read
+# before it does (write-behind here, optimistic edits in RemoteStore)
+
+def apply_user_item_quantity(method, value, ui_id, quantity):
+    if method in ("list_user_items", "list_my_items"):
+        # Quantity is the last column of both listings
+        return [row[:-1] + (quantity,) if row[0] == ui_id else row for row in value]
+    if method == "get_user_item" and value and value[0] == ui_id:
+        return value[:-1] + (quantity,)
+    return value
+
+# Only for reads of the store the edit was made in
+def apply_item(method, value, collection_names, item_id, collection_id, name, description, price, stock,
+               store_id=DEFAULT_STORE):
+    if method == "get_item" and value and value[0] == item_id:
+        return (item_id, collection_id, name, description, price, stock)
+    if method == "list_items":
+        return [(item_id, collection_names.get(collection_id, row[1]), name, description, price, stock)
+                if row[0] == item_id else row for row in value]
+    return value
+
+# Raised by WriteBehindStore.flush() for the queued edits it could not
+# save: failed is [(method, params, error), ...], one for each edit lost
+class FlushError(Exception):
+    def __init__(self, failed):
+        super().__init__("\n".join(
+            f"{method}({', '.join(f'{name}={value!r}' for name, value in params.items())}): {error}"
+            for method, params, error in failed))
+        self.failed = failed
+
+# Write-behind for the edits that come in long runs during stock-taking:
+# update_user_item_quantity and update_item are queued and written together,
+# in one transaction (one fsync), instead of committing every click. Later
+# edits to the same row replace earlier ones in the queue.
+#
+# The queue is written out by flush(): automatically once max_pending edits
+# are waiting and before any other write, from a timer in the desktop app
+# (FLUSH_INTERVAL ms), and on close().
+#
+# Durability: an edit is on disk once the flush that carries it has
+# committed. Until then it lives only in memory and is lost if the process
+# dies, so at most FLUSH_INTERVAL ms / max_pending edits are at risk. Reads
+# show queued edits where they can be applied to the result exactly; other
+# reads flush first. If a group fails, it is rolled back and the edits are
+# retried one by one so a single bad edit doesn't take the others with it;
+# those that still fail are lost and raised together as a FlushError.
+class WriteBehindStore:
+    FLUSH_INTERVAL = 250
+    MAX_PENDING = 500
+
+    # Reads that can show queued edits of these kinds without flushing
+    OVERLAYS = {
+        "list_user_items": ("update_user_item_quantity",),
+        "list_my_items": ("update_user_item_quantity",),
+        # Quantities don't change how many items are held
+        "list_collection_progress": ("update_user_item_quantity",),
+        "get_user_item": ("update_user_item_quantity",),
+        "get_item": ("update_user_item_quantity", "update_item"),
+        "list_items": ("update_user_item_quantity", "update_item"),
+    }
+
+    def __init__(self, store, max_pending=None):
+        self.store = store
+        # Queued edits that can't be saved raise FlushError, so callers that
+        # catch Error see those as well
+        self.Error = (store.Error, FlushError)
+        self.IntegrityError = store.IntegrityError
+        self.max_pending = max_pending or self.MAX_PENDING
+        # (method, row id) -> (method, arguments), in the order first edited
+        self.pending = {}
+
+    def close(self):
+        self.flush()
+        self.store.close()
+
+    def update_user_item_quantity(self, ui_id, quantity):
+        self._queue("update_user_item_quantity", ui_id, dict(ui_id=ui_id, quantity=quantity))
+
+    def update_item(self, item_id, collection_id, name, description, price, stock, store_id=DEFAULT_STORE):
+        self._queue("update_item", (item_id, store_id),
+                    dict(item_id=item_id, collection_id=collection_id, name=name, description=description,
+                         price=price, stock=stock, store_id=store_id))
+
+    def _queue(self, method, row_id, params):
+        self.pending[(method, row_id)] = (method, params)
+        if len(self.pending) >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        edits = list(self.pending.values())
+        self.pending.clear()
+        try:
+            with self.store.transaction():
+                for method, params in edits:
+                    getattr(self.store, method)(**params)
+        except self.store.Error:
+            failed = []
+            for method, params in edits:
+                try:
+                    getattr(self.store, method)(**params)
+                except self.store.Error as e:
+                    failed.append((method, params, e))
+            if failed:
+                raise FlushError(failed)
+
+    def __getattr__(self, name):
+        attr = getattr(self.store, name)
+        if name.startswith("_") or not inspect.ismethod(attr):
+            return attr
+        if name in self.OVERLAYS:
+            def read(*args, **kwargs):
+                return self._read(name, attr, args, kwargs)
+            return read
+
+        def call(*args, **kwargs):
+            self.flush()
+            return attr(*args, **kwargs)
+        return call
+
+    def _read(self, name, method, args, kwargs):
+        queued = {edit for edit, _ in self.pending.values()}
+        exact = queued <= set(self.OVERLAYS[name])
+        if exact and "update_item" in queued:
+            params = inspect.signature(method).bind(*args, **kwargs)
+            params.apply_defaults()
+            params = params.arguments
+            # Stock edits in another store don't show in this one's
+            exact = all(edit_params["store_id"] == params["store_id"]
+                        for edit, edit_params in self.pending.values() if edit == "update_item")
+            if name == "list_items":
+                # An edited item could move in or out of a filtered listing
+                exact = exact and params["collection_id"] is None and not params["in_stock"]
+        if not exact:
+            self.flush()
+        value = method(*args, **kwargs)
+        if not self.pending:
+            return value
+        if name.startswith("list_"):
+            value = list(value)
+        collection_names = {}
+        if "update_item" in queued:
+            collection_names = {row[0]: row[1] for row in self.store.list_collections()}
+        for edit, params in self.pending.values():
+            if edit == "update_user_item_quantity":
+                value = apply_user_item_quantity(name, value, **params)
+            else:
+                value = apply_item(name, value, collection_names, **params)
+        return value
+
+# How each store method is exposed by shelfwise_server:
+#   (HTTP method, path, store method, "read" or "write", who may call it)
+# Path parameters are named after the store method's arguments; remaining
+# arguments travel in the query string (GET) or the JSON body.
+API_ROUTES = (
+    ("POST", "/api/login", "authenticate", "read", PUBLIC),
+    ("GET", "/api/roles", "list_roles", "read", Permission.ADMIN_PAGES),
+    ("GET", "/api/users", "list_users", "read", Permission.ADMIN_PAGES),
+    ("GET", "/api/users/{user_id}/permissions", "get_permissions", "read", Own(Permission.MANAGE_USERS)),
+    ("GET", "/api/users/{user_id}/login_stamp", "get_login_stamp", "read", Own(Permission.MANAGE_USERS)),
+    ("GET", "/api/users/{user_id}", "get_user", "read", Own(Permission.MANAGE_USERS)),
+    ("POST", "/api/signup", "sign_up", "write", PUBLIC),
+    ("POST", "/api/users", "add_user", "write", Permission.MANAGE_USERS),
+    ("PUT", "/api/users/{user_id}", "update_user", "write", Permission.MANAGE_USERS),
+    ("PATCH", "/api/users/{user_id}", "update_account", "write", Own()),
+    ("DELETE", "/api/users/{user_id}", "delete_user", "write", Permission.MANAGE_USERS),
+    ("POST", "/api/users/merge", "merge_users", "write", Permission.MANAGE_USERS),
+    ("GET", "/api/users/{user_id}/items", "list_my_items", "read", Own(Permission.MANAGE_HOLDINGS)),
+    ("GET", "/api/users/{user_id}/progress", "list_collection_progress", "read", Own(Permission.MANAGE_HOLDINGS)),
+    ("GET", "/api/collections", "list_collections", "read", SESSION),
+    ("POST", "/api/collections", "add_collection", "write", Permission.MANAGE_CATALOG),
+    ("PUT", "/api/collections/{collection_id}", "update_collection", "write", Permission.MANAGE_CATALOG),
+    ("DELETE", "/api/collections/{collection_id}", "delete_collection", "write", Permission.MANAGE_CATALOG),
+    ("GET", "/api/collections/{collection_id}/item_count", "count_collection_items", "read", SESSION),
+    ("GET", "/api/collections/{collection_id}/stocked_items", "list_stocked_items", "read", SESSION),
+    ("GET", "/api/stores", "list_stores", "read", PUBLIC),
+    ("GET", "/api/items", "list_items", "read", SESSION),
+    ("GET", "/api/items/{item_id}", "get_item", "read", SESSION),
+    ("POST", "/api/items", "add_item", "write", Permission.MANAGE_CATALOG),
+    ("PUT", "/api/items/{item_id}", "update_item", "write", Permission.MANAGE_CATALOG),
+    ("DELETE", "/api/items/{item_id}", "delete_item", "write", Permission.MANAGE_CATALOG),
+    ("POST", "/api/items/merge", "merge_items", "write", Permission.MANAGE_CATALOG),
+    ("GET", "/api/items/{item_id}/prices", "list_price_history", "read", SESSION),
+    ("GET", "/api/items/{item_id}/neighbours", "list_item_neighbours", "read", Own(Permission.MANAGE_HOLDINGS)),
+    ("GET", "/api/items/{item_id}/reorder_level", "get_reorder_level", "read", SESSION),
+    ("PUT", "/api/items/{item_id}/reorder_level", "set_reorder_level", "write", Permission.MANAGE_STOCK),
+    ("GET", "/api/items/{item_id}/image", "get_item_image", "read", SESSION),
+    ("PUT", "/api/items/{item_id}/image", "set_item_image", "write", Permission.MANAGE_CATALOG),
+    ("GET", "/api/items/{item_id}/sku", "get_item_sku", "read", SESSION),
+    ("PUT", "/api/items/{item_id}/sku", "set_item_sku", "write", Permission.MANAGE_CATALOG),
+    ("GET", "/api/skus", "list_skus", "read", SESSION),
+    # The SKU goes in the query string, where it stays text ("0123" is not 123)
+    ("GET", "/api/skus/lookup", "find_item_by_sku", "read", SESSION),
+    ("GET", "/api/low_stock", "list_low_stock", "read", Permission.ADMIN_PAGES),
+    ("GET", "/api/user_items", "list_user_items", "read", Permission.ADMIN_PAGES),
+    ("GET", "/api/user_items/{ui_id}", "get_user_item", "read", Permission.ADMIN_PAGES),
+    ("PUT", "/api/user_items/{ui_id}", "update_user_item_quantity", "write", Permission.MANAGE_HOLDINGS),
+    ("GET", "/api/holdings", "get_holding", "read", Own(Permission.MANAGE_HOLDINGS)),
+    ("POST", "/api/reservations", "reserve_item", "write", Permission.MANAGE_HOLDINGS),
+    ("PUT", "/api/reservations", "set_reserved_quantity", "write", Permission.MANAGE_HOLDINGS),
+    ("POST", "/api/checkout", "checkout", "write", Own(Permission.MANAGE_HOLDINGS)),
+    ("PUT", "/api/holds", "hold_stock", "write", Own(Permission.MANAGE_HOLDINGS)),
+    ("DELETE", "/api/holds", "release_holds", "write", Own(Permission.MANAGE_HOLDINGS)),
+    ("POST", "/api/holds/renew", "renew_holds", "write", Own(Permission.MANAGE_HOLDINGS)),
+    ("GET", "/api/holds", "list_held_stock", "read", Own(Permission.MANAGE_HOLDINGS)),
+    # Who may read a view is up to the view (ListView.access)
+    ("GET", "/api/views/{view}", "list_view", "read", SESSION),
+    ("GET", "/api/users/{user_id}/views/{view}", "get_view_settings", "read", Own()),
+    ("PUT", "/api/users/{user_id}/views/{view}", "save_view_settings", "write", Own()),
+)
+
+# Reads whose results change when a hold lapses, as well as on writes
+HOLD_READS = ("list_held_stock",)
+
+# When the first hold still in force lapses, None if there is none
+NEXT_HOLD_EXPIRY = "SELECT MIN(Expires) FROM Holds WHERE Expires > ?"
+
+def counts_holds(method, params):
+    if method == "list_view":
+        view = VIEWS.get(params.get("view"))
+        return bool(view and view.holds)
+    return method in HOLD_READS
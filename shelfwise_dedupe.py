@@ -0,0 +1,107 @@
+import collections
+import re
+import unicodedata
+
+# Finding items and users entered twice ("Harry Potter 1" and
+# "harry potter  1", or one collector with two accounts), for the admin
+# pages to merge (ShelfwiseStore.merge_items / merge_users).
+#
+# Names are normalized first: accents, case, punctuation and spacing are
+# dropped. Comparing every pair of a whole catalogue would be quadratic, so
+# rows are put into blocks that duplicates almost always share: the same
+# collection and the first PREFIX letters of the name for items, the same
+# email or the first letters of the name for users. Only rows in the same
+# block are compared, by the overlap of their names' letter trigrams (Dice
+# coefficient, 0 to 1). A block still larger than MAX_BLOCK is split again
+# on a longer prefix.
+
+PREFIX = 3
+MAX_BLOCK = 500
+# Lowest similarity reported
+THRESHOLD = 0.8
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return " ".join(re.findall(r"[^\W_]+", text))
+
+def trigrams(key):
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+class Entry:
+    __slots__ = ("row_id", "key", "grams", "numbers")
+
+    def __init__(self, row_id, text):
+        self.row_id = row_id
+        self.key = normalize(text)
+        self.grams = trigrams(self.key)
+        # "Volume 1" and "Volume 2" are different items however alike
+        # the rest of the name is
+        self.numbers = tuple(re.findall(r"\d+", self.key))
+
+def _blocks(entries, prefix):
+    groups = collections.defaultdict(list)
+    for entry in entries:
+        groups[entry.key[:prefix]].append(entry)
+    for key, group in groups.items():
+        if len(group) > MAX_BLOCK and len(key) == prefix:
+            yield from _blocks(group, prefix + PREFIX)
+        else:
+            yield group
+
+# blocked: {block: [Entry, ...]}. Returns {(id_a, id_b): score} with
+# id_a < id_b for the pairs at or above threshold; score(a, b) gives the
+# score of two entries of a block.
+def _compare(blocked, score, threshold):
+    pairs = {}
+    for entries in blocked.values():
+        for group in _blocks(entries, PREFIX):
+            for i, a in enumerate(group):
+                for b in group[i + 1:]:
+                    if a.row_id == b.row_id:
+                        continue
+                    value = score(a, b)
+                    if value >= threshold:
+                        pair = (a.row_id, b.row_id) if a.row_id < b.row_id else (b.row_id, a.row_id)
+                        pairs[pair] = max(value, pairs.get(pair, 0.0))
+    return pairs
+
+def _item_score(a, b):
+    if a.numbers != b.numbers:
+        return 0.0
+    return 1.0 if a.key == b.key else similarity(a.grams, b.grams)
+
+# rows: (ItemID, CollectionName, ItemName, ...) as from list_items().
+# Returns [(score, item_a, item_b), ...], likeliest first.
+def find_duplicate_items(rows, threshold=THRESHOLD):
+    blocked = collections.defaultdict(list)
+    for item_id, collection, name, *rest in rows:
+        blocked[collection].append(Entry(item_id, name))
+    pairs = _compare(blocked, _item_score, threshold)
+    return sorted(((score, a, b) for (a, b), score in pairs.items()), key=lambda pair: (-pair[0], pair[1], pair[2]))
+
+# rows: (UserID, FirstName, LastName, Username, Email, ...) as from
+# list_users(). Users with the same email are taken to be duplicates;
+# otherwise the full names (the username if there is none) are compared.
+# Returns [(score, user_a, user_b), ...], likeliest first.
+def find_duplicate_users(rows, threshold=THRESHOLD):
+    blocked = collections.defaultdict(list)
+    emails = collections.defaultdict(list)
+    for user_id, first_name, last_name, username, email, *rest in rows:
+        name = f"{first_name or ''} {last_name or ''}".strip() or username
+        blocked[None].append(Entry(user_id, name))
+        email = (email or "").strip().casefold()
+        if email:
+            emails[email].append(user_id)
+    pairs = _compare(blocked, lambda a, b: 1.0 if a.key == b.key else similarity(a.grams, b.grams), threshold)
+    for user_ids in emails.values():
+        for i, a in enumerate(user_ids):
+            for b in user_ids[i + 1:]:
+                pairs[(min(a, b), max(a, b))] = 1.0
+    return sorted(((score, a, b) for (a, b), score in pairs.items()), key=lambda pair: (-pair[0], pair[1], pair[2]))
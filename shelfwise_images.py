@@ -0,0 +1,102 @@
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import threading
+
+# Thumbnails of item pictures, so long listings can show them without
+# decoding the full-size files. Items only keep a reference to their picture
+# (Items.ImagePath, a file every terminal can open, e.g. on a share). Its
+# thumbnail is a small PNG in THUMB_DIR named after the picture's path, size
+# and modification time, so replacing a picture makes a new thumbnail and an
+# old one is never shown. Thumbnails are made by a pool of worker processes:
+# scaling down camera photos neither blocks the window nor competes with it
+# for the GIL.
+#
+# The workers decode and scale with QImage, which works without a
+# QApplication. They are started with "spawn", since forking a process that
+# has Qt threads running isn't safe.
+
+THUMB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thumbnails")
+# Longest side, in pixels
+THUMB_SIZE = 96
+WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+# Where the thumbnail of image_path goes, or None if there is no such file
+def thumbnail_path(image_path, thumb_dir=THUMB_DIR, size=THUMB_SIZE):
+    try:
+        st = os.stat(image_path)
+    except OSError:
+        return None
+    key = f"{os.path.abspath(image_path)}\0{st.st_size}\0{st.st_mtime_ns}\0{size}"
+    return os.path.join(thumb_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+
+# Scale image_path down to fit in size x size and save it as dest. Runs in
+# a worker process.
+def make_thumbnail(image_path, dest, size=THUMB_SIZE):
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage
+    image = QImage(image_path)
+    if image.isNull():
+        raise ValueError(f"{image_path} is not a picture")
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    # Written aside and moved into place, so a reader never sees half a file
+    partial = f"{dest}.{os.getpid()}.partial"
+    if not image.save(partial, "PNG"):
+        raise OSError(f"Cannot write {dest}")
+    os.replace(partial, dest)
+    return dest
+
+class ThumbnailPool:
+    def __init__(self, thumb_dir=None, size=THUMB_SIZE, workers=WORKERS, on_done=None):
+        self.thumb_dir = thumb_dir or THUMB_DIR
+        self.size = size
+        self.workers = workers
+        # Called with (image_path, thumbnail path) from a pool thread once a
+        # thumbnail has been made
+        self.on_done = on_done
+        self.lock = threading.Lock()
+        # Started on the first thumbnail that has to be made
+        self.executor = None
+        # Thumbnail paths being made, and ones whose picture couldn't be read
+        # (tried again once the picture changes, which changes the path)
+        self.pending = set()
+        self.failed = set()
+
+    def thumbnail_path(self, image_path):
+        return thumbnail_path(image_path, self.thumb_dir, self.size)
+
+    # True if thumb (self.thumbnail_path(image_path)) is ready; otherwise has
+    # it made, once, and returns False
+    def ready(self, image_path, thumb):
+        if os.path.exists(thumb):
+            return True
+        with self.lock:
+            if thumb in self.pending or thumb in self.failed:
+                return False
+            if self.executor is None:
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn"))
+            future = self.executor.submit(make_thumbnail, image_path, thumb, self.size)
+            self.pending.add(thumb)
+        future.add_done_callback(lambda future: self.finished(image_path, thumb, future))
+        return False
+
+    def finished(self, image_path, thumb, future):
+        made = not future.cancelled() and future.exception() is None
+        with self.lock:
+            self.pending.discard(thumb)
+            if not made:
+                self.failed.add(thumb)
+        if made and self.on_done:
+            self.on_done(image_path, thumb)
+
+    # Drop thumbnails not started yet and stop the workers once the ones
+    # they are making are done
+    def close(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(cancel_futures=True)
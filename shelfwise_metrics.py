@@ -0,0 +1,228 @@
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from shelfwise_db import ShelfwiseStore, OutOfStockError
+
+# Counters and latency histograms for monitoring terminals and servers, in
+# the Prometheus text format. shelfwise_server serves them at /metrics; the
+# desktop app can serve them on a local port or write them to a file for a
+# collector to pick up (e.g. node_exporter's textfile directory):
+#
+#   python Shelf_wise.py --metrics-port 9464
+#   python Shelf_wise.py --metrics-file /var/lib/node_exporter/shelfwise.prom
+#
+# Updating a metric is a lock and a few additions; text is only built when
+# the metrics are read.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def label_text(names, values, extra=""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+# A count that only goes up, one per combination of label values
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values = {} if labels else {(): 0}
+
+    def inc(self, *label_values):
+        self.add(1, *label_values)
+
+    def add(self, amount, *label_values):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = list(self.values.items())
+        return [f"{self.name}{label_text(self.labels, key)} {value}" for key, value in values]
+
+# Observations counted into fixed buckets, plus their sum and count
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # label values -> [per-bucket counts (the last one past every bucket), sum]
+        self.values = {}
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self.lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self.values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{label_text(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{label_text(self.labels, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+LOGINS = REGISTRY.counter("shelfwise_logins_total", "Successful logins")
+FAILED_LOGINS = REGISTRY.counter("shelfwise_failed_logins_total", "Logins refused for a wrong username or password")
+RESERVATIONS = REGISTRY.counter("shelfwise_reservations_total", "Stock taken for collectors", ("method",))
+RESERVED_UNITS = REGISTRY.counter("shelfwise_reserved_units_total", "Units of stock taken for collectors")
+OUT_OF_STOCK = REGISTRY.counter("shelfwise_out_of_stock_total", "Requests refused for lack of stock", ("method",))
+DB_ERRORS = REGISTRY.counter("shelfwise_db_errors_total", "Store calls that failed with a database error",
+                             ("method",))
+QUERY_SECONDS = REGISTRY.histogram("shelfwise_query_seconds", "Time in store calls", ("method",))
+ACTION_SECONDS = REGISTRY.histogram("shelfwise_action_seconds",
+                                    "Time to handle a user action or API request", ("action",))
+
+# Count what a successful store call did
+def record_result(method, value):
+    if method == "authenticate":
+        (LOGINS if value is not None else FAILED_LOGINS).inc()
+    elif method == "reserve_item":
+        current, new = value
+        RESERVATIONS.inc(method)
+        RESERVED_UNITS.add(new - (current or 0))
+    elif method == "checkout":
+        RESERVATIONS.inc(method)
+        RESERVED_UNITS.add(value)
+
+# Count a failed store call. Integrity errors (a taken username, ...) are
+# the caller's mistake rather than the database's and aren't counted.
+def record_error(method, error, store):
+    if isinstance(error, OutOfStockError):
+        OUT_OF_STOCK.inc(method)
+    elif isinstance(error, store.Error) and not isinstance(error, store.IntegrityError):
+        DB_ERRORS.inc(method)
+
+# Count and time every call to the store's methods, wrapped in place like
+# shelfwise_profile.profile_store. A listing is timed until its last row has
+# been read (PostgreSQL only runs the query then).
+def instrument_store(store):
+    names = [name for name, value in vars(ShelfwiseStore).items()
+             if inspect.isfunction(value) and not name.startswith("_") and name not in ("close", "transaction")]
+    calls = threading.local()
+    for name in names + ["flush"]:
+        method = getattr(store, name, None)
+        if method is not None:
+            setattr(store, name, _instrumented(store, name, method, calls))
+    return store
+
+def _instrumented(store, name, method, calls):
+    @functools.wraps(method)
+    def call(*args, **kwargs):
+        # Calls the store makes to itself are part of the outer one
+        if getattr(calls, "active", False):
+            return method(*args, **kwargs)
+        start = time.perf_counter()
+        calls.active = True
+        try:
+            value = method(*args, **kwargs)
+        except Exception as e:
+            record_error(name, e, store)
+            raise
+        finally:
+            calls.active = False
+        if value is None or isinstance(value, (tuple, list, dict, int, float, str)):
+            QUERY_SECONDS.observe(time.perf_counter() - start, name)
+            record_result(name, value)
+            return value
+        return _timed_rows(store, name, value, time.perf_counter() - start)
+    return call
+
+def _timed_rows(store, name, rows, spent):
+    it = iter(rows)
+    while True:
+        start = time.perf_counter()
+        try:
+            row = next(it)
+        except StopIteration:
+            spent += time.perf_counter() - start
+            break
+        except Exception as e:
+            record_error(name, e, store)
+            raise
+        spent += time.perf_counter() - start
+        yield row
+    QUERY_SECONDS.observe(spent, name)
+
+# Serve GET /metrics on a daemon thread; returns the server (shutdown() stops it)
+def serve(port, host="127.0.0.1", registry=REGISTRY):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="shelfwise-metrics", daemon=True).start()
+    return server
+
+# Replace path with the current metrics in one step, so a collector never
+# reads a half-written file
+def write_file(path, registry=REGISTRY):
+    partial = path + ".partial"
+    with open(partial, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(partial, path)
@@ -0,0 +1,186 @@
+import collections
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from shelfwise_db import ShelfwiseStore
+
+# Where the time goes in each user action, for finding out whether a slow
+# click is spent in SQL, in updating tables or in dialogs.
+#
+# An action is one click, key press or timer tick and everything it sets
+# off. Inside it, spans record store calls ("sql"), reading the rows they
+# return ("fetch"), table and widget updates ("ui") and time a dialog sat
+# waiting for the user ("dialog"). When the action ends it is recorded with
+# the totals:
+#
+#   wall_ms    from the event until the window had redrawn and gone idle
+#   sql_ms     in store calls, including reading their rows
+#   queries    store calls made
+#   rows       rows read, plus rows written on a SQLite database
+#   ui_ms      in the "ui" spans
+#   dialog_ms  waiting on the user in dialogs (anything that ran while a
+#              dialog was open is counted there as well)
+#   other_ms   the rest: handler code, building rows for the tables, ...
+#
+# export() writes everything as Chrome trace-event JSON, which opens in
+# chrome://tracing or https://ui.perfetto.dev:
+#
+#   python Shelf_wise.py --profile trace.json
+#
+# Only the newest MAX_EVENTS spans are kept.
+
+MAX_EVENTS = 200000
+
+class Action:
+    __slots__ = ("name", "start", "thread", "events", "totals")
+
+    def __init__(self, name, start, thread):
+        self.name = name
+        self.start = start
+        self.thread = thread
+        self.events = []
+        self.totals = collections.Counter()
+
+class Profiler:
+    def __init__(self, max_events=MAX_EVENTS):
+        self.events = collections.deque(maxlen=max_events)
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        # The action in progress, if any; spans only count towards it when
+        # they run on the thread that started it
+        self.action = None
+
+    # Microseconds since the profiler was created, the unit of trace events
+    def now(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    # A finished span; counted (default: its whole length) goes into the
+    # current action's total for cat
+    def record(self, name, cat, start, end, args=None, counted=None):
+        event = {"name": name, "cat": cat, "ph": "X", "ts": start, "dur": end - start,
+                 "pid": self.pid, "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        action = self.action
+        if action is not None and action.thread == event["tid"]:
+            action.events.append(event)
+            action.totals[cat] += end - start if counted is None else counted
+            action.totals["rows"] += (args or {}).get("rows", 0)
+            if cat == "sql":
+                action.totals["queries"] += 1
+        else:
+            self.events.append(event)
+
+    # Time the block as a span; the block can add to args
+    @contextmanager
+    def span(self, name, cat, **args):
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.record(name, cat, start, self.now(), args)
+
+    def begin_action(self, name):
+        self.action = Action(name, self.now(), threading.get_ident())
+        return self.action
+
+    # Close the current action. Actions shorter than min_ms that opened no
+    # dialog are dropped with their spans.
+    def end_action(self, min_ms=0):
+        action, self.action = self.action, None
+        if action is None:
+            return None
+        end = self.now()
+        totals = action.totals
+        wall = end - action.start
+        if wall < min_ms * 1000 and not totals["dialog"]:
+            return None
+        args = {"wall_ms": round(wall / 1000, 3),
+                "sql_ms": round((totals["sql"] + totals["fetch"]) / 1000, 3),
+                "queries": totals["queries"],
+                "rows": totals["rows"],
+                "ui_ms": round(totals["ui"] / 1000, 3),
+                "dialog_ms": round(totals["dialog"] / 1000, 3),
+                "other_ms": round(max(wall - sum(totals[cat] for cat in ("sql", "fetch", "ui", "dialog")), 0) / 1000,
+                                  3)}
+        self.events.append({"name": action.name, "cat": "action", "ph": "X", "ts": action.start, "dur": wall,
+                            "pid": self.pid, "tid": action.thread, "args": args})
+        self.events.extend(action.events)
+        return args
+
+    def trace(self):
+        names = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "Shelfwise"}},
+                 {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": threading.main_thread().ident,
+                  "args": {"name": "GUI"}}]
+        return {"traceEvents": names + list(self.events), "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f)
+
+# Rows from a store call, timed as they are read
+def profiled_rows(profiler, method, rows):
+    start = profiler.now()
+    spent = 0
+    n = 0
+    it = iter(rows)
+    try:
+        while True:
+            began = time.perf_counter()
+            try:
+                row = next(it)
+            except StopIteration:
+                spent += time.perf_counter() - began
+                break
+            spent += time.perf_counter() - began
+            n += 1
+            yield row
+    finally:
+        profiler.record(method, "fetch", start, profiler.now(), {"rows": n}, counted=spent * 1e6)
+
+# Time every store call. The store's methods are wrapped in place rather
+# than behind a proxy, so the store keeps its type (the window checks it).
+# Listings are timed until their last row is read; a SQLite store also
+# counts the rows each call writes, triggers included. flush() is where a
+# WriteBehindStore or RemoteStore sends its queued edits. Calls the store
+# makes to itself (a write-behind read flushing first) count as part of the
+# outer call.
+def profile_store(store, profiler):
+    conn = getattr(store, "conn", None)
+    total_changes = lambda: getattr(conn, "total_changes", 0)
+    calls = threading.local()
+    names = [name for name, value in vars(ShelfwiseStore).items()
+             if inspect.isfunction(value) and not name.startswith("_") and name not in ("close", "transaction")]
+    for name in names + ["flush"]:
+        method = getattr(store, name, None)
+        if method is not None:
+            setattr(store, name, _profiled(profiler, name, method, total_changes, calls))
+    return store
+
+def _profiled(profiler, name, method, total_changes, calls):
+    @functools.wraps(method)
+    def call(*args, **kwargs):
+        if getattr(calls, "active", False):
+            return method(*args, **kwargs)
+        before = total_changes()
+        with profiler.span(name, "sql") as span:
+            calls.active = True
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                calls.active = False
+            changes = lambda: total_changes() - before
+            if result is None or isinstance(result, (tuple, int, float, str, dict)):
+                span["rows"] = (1 if isinstance(result, tuple) else 0) + changes()
+                return result
+            if isinstance(result, list):
+                span["rows"] = len(result) + changes()
+                return result
+            span["rows"] = changes()
+        return profiled_rows(profiler, name, result)
+    return call
@@ -0,0 +1,572 @@
+import argparse
+import asyncio
+import inspect
+import functools
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import shelfwise_audit
+import shelfwise_db
+import shelfwise_metrics
+from shelfwise_audit import USER_FIELDS, USER_ROW, ITEM_FIELDS
+from shelfwise_db import (API_ROUTES, DEFAULT_STORE, NEXT_HOLD_EXPIRY, ROLE_COLLECTOR, VIEWS, Permission,
+                          ShelfwiseStore, OutOfStockError, allowed, counts_holds, open_backend, timestamp)
+from shelfwise_session import SessionManager, RateLimitedError
+
+# HTTP/JSON service over the Shelfwise data layer, so the web storefront and
+# barcode scanners share the same inventory as the desktop app.
+#
+#   python shelfwise_server.py --port 8080
+#   python shelfwise_server.py --db postgresql://shelfwise@dbhost/shelfwise
+#
+# Routes come from shelfwise_db.API_ROUTES. List endpoints answer
+# {"columns": [...], "rows": [[...], ...]}, everything else {"result": value}.
+# GET responses carry an ETag that changes whenever the database does (and,
+# for reads that count stock holds, when the next hold lapses), and
+# POST /api/batch runs several calls in one round trip. GET /metrics has
+# request counts and latencies for Prometheus (see shelfwise_metrics).
+#
+# POST /api/login {"username": ..., "password": ..., "admin": ...} opens a
+# session and answers {"result": user_id, "token": ..., "permissions": ...}
+# ({"result": null} for wrong credentials). Every other call, bar the few
+# routes that are PUBLIC, must carry the token as "Authorization: Bearer
+# TOKEN" and is checked against what the session's role allows (the last
+# field of API_ROUTES). Failed logins are limited per username and per
+# client address as on a terminal (shelfwise_session). POST /api/logout
+# closes the session.
+#
+# Writes are recorded in the audit log (shelfwise_audit, --audit PATH) with
+# the session's user as the actor, whichever client made them.
+
+# Seconds between purges of deleted rows, normally and while there is a backlog
+PURGE_INTERVAL = 5
+PURGE_BUSY_INTERVAL = 0.05
+# Seconds between sweeps of lapsed stock holds
+HOLD_SWEEP_INTERVAL = 30
+# Seconds between rounds on the neighbour queue, normally and with a backlog
+NEIGHBOURS_INTERVAL = 10
+NEIGHBOURS_BUSY_INTERVAL = 0.05
+
+SIGNATURES = {method: inspect.signature(getattr(ShelfwiseStore, method)) for _, _, method, _, _ in API_ROUTES}
+ROUTE_KINDS = {method: (http_method, kind, access) for http_method, _, method, kind, access in API_ROUTES}
+
+# A pool of reader connections plus a single writer. Database calls block,
+# so each one runs on a worker thread; every reader is used by one request at
+# a time, and the writer has a one-thread executor of its own so writes are
+# applied strictly one after another. On SQLite, WAL lets the readers keep
+# going while the writer commits.
+class StorePool:
+    def __init__(self, backend, readers=4):
+        self.backend = backend
+        self.writer = backend.open_store()
+        backend.prepare_writer(self.writer.conn)
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shelfwise-writer")
+        self.read_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="shelfwise-reader")
+        self.readers = asyncio.Queue()
+        self.all_readers = []
+        for _ in range(readers):
+            store = backend.open_store()
+            self.all_readers.append(store)
+            self.readers.put_nowait(store)
+        # Never writes, so its data_version moves whenever any other
+        # connection (ours or another process's) commits. It has a thread
+        # of its own, and requests that want an ETag while one is being
+        # read share it.
+        self.version_conn = backend.connect()
+        self.version_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shelfwise-version")
+        self.etags = {}
+
+    # holds: for a read that counts holds (shelfwise_db.counts_holds), whose
+    # results also change when the next one lapses
+    async def etag(self, holds=False):
+        pending = self.etags.get(holds)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = self.etags[holds] = loop.run_in_executor(self.version_executor, self.read_etag, holds)
+
+            def forget(done):
+                if self.etags.get(holds) is done:
+                    del self.etags[holds]
+            pending.add_done_callback(forget)
+        return await pending
+
+    def read_etag(self, holds):
+        try:
+            version = self.backend.data_version(self.version_conn)
+            if holds:
+                expires = self.backend.query_one(self.version_conn, NEXT_HOLD_EXPIRY, (timestamp(),))[0]
+                return f'"{version}-{expires or ""}"'
+            return f'"{version}"'
+        finally:
+            # Nothing to keep; on PostgreSQL the connection would otherwise
+            # sit in a transaction between requests
+            self.version_conn.rollback()
+
+    # function(store, *args) on a reader
+    async def run(self, function, *args):
+        store = await self.readers.get()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.read_executor, function, store, *args)
+        finally:
+            self.readers.put_nowait(store)
+
+    async def read(self, method, params):
+        return await self.run(call_store, method, params)
+
+    # audit(before, result), for a write in AUDITED, is called on the writer
+    # once the call has gone through (see call_write)
+    async def write(self, method, params, audit=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.write_executor, call_write, self.writer, method, params, audit)
+
+    def close(self):
+        self.read_executor.shutdown()
+        self.write_executor.shutdown()
+        self.version_executor.shutdown()
+        for store in self.all_readers:
+            store.close()
+        self.writer.close()
+        self.backend.release(self.version_conn)
+        if hasattr(self.backend, "close"):
+            self.backend.close()
+
+# Runs on a worker thread: call the store method and turn the result into
+# something JSON can carry before the connection is handed back
+def call_store(store, method, params):
+    start = time.perf_counter()
+    value = getattr(store, method)(**params)
+    if hasattr(value, "fetchall"):
+        # Server-side cursors only know their columns once rows have been read
+        rows = value.fetchall()
+        columns = [d[0] for d in value.description or ()]
+        result = {"columns": columns, "rows": rows}
+    else:
+        result = {"result": value}
+    shelfwise_metrics.QUERY_SECONDS.observe(time.perf_counter() - start, method)
+    shelfwise_metrics.record_result(method, value)
+    return result
+
+# Runs on the writer: read the row as it is before the call, so no other
+# write can come in between, then make the call and hand audit both
+def call_write(store, method, params, audit=None):
+    read_before = AUDITED[method][2] if audit else None
+    before = read_before(store, params) if read_before else None
+    result = call_store(store, method, params)
+    if audit:
+        audit(before, result)
+    return result
+
+# How the writes are recorded in the audit log, with the tables, ids and
+# field names the desktop uses:
+#   method: (table, target id(params, result), before(store, params) or None,
+#            after(params, result) or None)
+# Holds come and go with every cart and view settings are only how
+# someone's tables look, so those writes are left out.
+
+def added(params, result):
+    return result
+
+def param(name):
+    return lambda params, result: params[name]
+
+def store_of(params):
+    return params.get("store_id", DEFAULT_STORE)
+
+def named(names, row):
+    return dict(zip(names, row)) if row else None
+
+def user_row(store, params):
+    return named(USER_ROW, store.get_user(params["user_id"]))
+
+# password None keeps the current one
+def user_fields(params, result):
+    after = dict(zip(USER_FIELDS, (params["first_name"], params["last_name"], params["username"],
+                                   params["password"], params["email"], params["date_joined"],
+                                   params.get("role_id", ROLE_COLLECTOR))))
+    if after["Password"] is None:
+        del after["Password"]
+    return after
+
+def account_fields(params, result):
+    after = {"FirstName": params["first_name"], "LastName": params["last_name"], "Username": params["username"],
+             "Email": params["email"]}
+    if params["password"] is not None:
+        after["Password"] = params["password"]
+    return after
+
+def collection_row(store, params):
+    for collection_id, name, description in store.list_collections():
+        if collection_id == params["collection_id"]:
+            return {"CollectionName": name, "Description": description}
+    return None
+
+def collection_fields(params, result):
+    return {"CollectionName": params["name"], "Description": params["description"]}
+
+def item_row(store, params):
+    return named(("ItemID",) + ITEM_FIELDS, store.get_item(params["item_id"], store_of(params)))
+
+def item_fields(params, result):
+    return dict(zip(ITEM_FIELDS, (params["collection_id"], params["name"], params["description"], params["price"],
+                                  params["stock"])))
+
+# The row of a listing in VIEWS as the desktop's table shows it, for
+# deletes. The names are the view's own: PostgreSQL folds the cursor's to
+# lower case.
+def view_row(view, name):
+    def read(store, params):
+        spec = VIEWS[view]
+        rows = store.list_view(view, [(spec.key, "=", params[name])]).fetchall()
+        return named(spec.columns, rows[0] if rows else None)
+    return read
+
+def merged(params, result):
+    return {"MergedInto": params["keep_id"]}
+
+def user_item_row(store, params):
+    row = store.get_user_item(params["ui_id"])
+    return {"Quantity": row[4]} if row else None
+
+def checkout_fields(params, result):
+    items = {}
+    for item_id, quantity in params["lines"]:
+        items[item_id] = items.get(item_id, 0) + quantity
+    return {"UserID": params["user_id"], "StoreID": store_of(params), "Items": items}
+
+AUDITED = {
+    "sign_up": ("Users", added, None, user_fields),
+    "add_user": ("Users", added, None, user_fields),
+    "update_user": ("Users", param("user_id"), user_row, user_fields),
+    "update_account": ("Users", param("user_id"), user_row, account_fields),
+    "delete_user": ("Users", param("user_id"), view_row("users", "user_id"), None),
+    "merge_users": ("Users", param("drop_id"), None, merged),
+    "add_collection": ("Collections", added, None, collection_fields),
+    "update_collection": ("Collections", param("collection_id"), collection_row, collection_fields),
+    "delete_collection": ("Collections", param("collection_id"), collection_row, None),
+    "add_item": ("Items", added, None, item_fields),
+    "update_item": ("Items", param("item_id"), item_row, item_fields),
+    "delete_item": ("Items", param("item_id"), view_row("items", "item_id"), None),
+    "merge_items": ("Items", param("drop_id"), None, merged),
+    "set_reorder_level": ("Items", param("item_id"),
+                          lambda store, params: {"reorder_level": store.get_reorder_level(params["item_id"],
+                                                                                          store_of(params))},
+                          lambda params, result: {"reorder_level": params["level"]}),
+    "set_item_image": ("Items", param("item_id"),
+                       lambda store, params: {"ImagePath": store.get_item_image(params["item_id"])},
+                       lambda params, result: {"ImagePath": params["image_path"] or ""}),
+    "set_item_sku": ("Items", param("item_id"),
+                     lambda store, params: {"SKU": store.get_item_sku(params["item_id"])},
+                     lambda params, result: {"SKU": params["sku"] or ""}),
+    "update_user_item_quantity": ("Users_Items", param("ui_id"), user_item_row,
+                                  lambda params, result: {"Quantity": params["quantity"]}),
+    "reserve_item": ("Items", param("item_id"), None,
+                     lambda params, result: {"UserID": params["user_id"], "StoreID": store_of(params),
+                                                     "Quantity": params["quantity"], "Holding": result[1]}),
+    "set_reserved_quantity": ("Items", param("item_id"), None,
+                              lambda params, result: {"UserID": params["user_id"], "StoreID": store_of(params),
+                                                      "Holding": result[1]}),
+    "checkout": ("Users_Items", lambda params, result: None, None, checkout_fields),
+}
+
+# Path and query string values arrive as text; "3" and "true" become 3 and True
+def parse_param(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def error_response(status, message, **extra):
+    return web.json_response(dict(error=message, **extra), status=status)
+
+# The open session a request's bearer token names, or None. Every
+# shelfwise_session.RECHECK_INTERVAL seconds the user is looked up again, so a
+# session ends soon after its user is deleted or their role or password
+# changes, wherever that was.
+async def request_session(request):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme != "Bearer" or not token:
+        return None
+    sessions = request.app["sessions"]
+    session = sessions.get(token.strip())
+    if session and sessions.due(session):
+        pool = request.app["pool"]
+        try:
+            if not await pool.run(sessions.verify, session):
+                return None
+        except pool.backend.Error:
+            # Checked again on the next request
+            shelfwise_metrics.DB_ERRORS.inc("get_login_stamp")
+    return session
+
+# (HTTP status, JSON body) refusing the call to session, or None if it may
+# make it
+def refuse(method, access, session, params):
+    if method == "list_view" and params.get("view") in VIEWS:
+        access = VIEWS[params["view"]].access
+    if session is None:
+        user_id, permissions = None, Permission(0)
+    else:
+        user_id, permissions = session.user_id, session.permissions
+    if allowed(access, user_id, permissions, params):
+        return None
+    if session is None:
+        return 401, {"error": "Log in first (POST /api/login), or again if the session has expired"}
+    return 403, {"error": "Your role doesn't allow this"}
+
+# Writes after which the named user's sessions end: a deleted or merged
+# away user can't go on, and an edited one may have a new password or role
+ENDS_SESSIONS = {"delete_user": "user_id", "update_user": "user_id", "merge_users": "drop_id"}
+
+# Run one store call and return (HTTP status, JSON body)
+# audit: for a write, see StorePool.write
+async def dispatch(pool, method, kind, params, audit=None):
+    try:
+        SIGNATURES[method].bind(None, **params)
+    except TypeError as e:
+        return 400, {"error": str(e)}
+    start = time.perf_counter()
+    try:
+        if kind == "write":
+            return 200, await pool.write(method, params, audit)
+        return 200, await pool.read(method, params)
+    except OutOfStockError as e:
+        shelfwise_metrics.OUT_OF_STOCK.inc(method)
+        return 409, {"error": str(e), "available": e.available, "item_id": e.item_id}
+    # Arguments the store refused (ViewError, a hold of no units)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    except pool.backend.IntegrityError as e:
+        return 409, {"error": str(e)}
+    except pool.backend.Error as e:
+        shelfwise_metrics.DB_ERRORS.inc(method)
+        return 500, {"error": str(e)}
+    finally:
+        # Includes waiting for a free connection
+        shelfwise_metrics.ACTION_SECONDS.observe(time.perf_counter() - start, method)
+
+# Record a write session made in the audit log (AUDITED), with the row as
+# it was before the call; the log only notes that a password changed.
+# Runs on the writer, where recording is only a queue put.
+def audit_write(audit_log, session, method, params, before, result):
+    value = result.get("result")
+    # A write that answers False changed nothing (update_account with the
+    # wrong current password)
+    if value is False:
+        return
+    table, target, _, after = AUDITED[method]
+    audit_log.record(session.user_id if session else None, method, table, target(params, value), before,
+                     after(params, value) if after else None)
+
+# dispatch, recording the call in the audit log, then end the sessions it
+# ended
+async def run_call(app, session, method, kind, params):
+    audit = None
+    if kind == "write" and method in AUDITED and app["audit"]:
+        audit = functools.partial(audit_write, app["audit"], session, method, params)
+    status, body = await dispatch(app["pool"], method, kind, params, audit)
+    if status == 200 and method in ENDS_SESSIONS:
+        app["sessions"].revoke_user(params[ENDS_SESSIONS[method]])
+    return status, body
+
+def make_handler(pool, method, kind, access):
+    async def handler(request):
+        params = {k: parse_param(v) for k, v in request.match_info.items()}
+        if request.method == "GET":
+            params.update((k, parse_param(v)) for k, v in request.query.items())
+        elif request.can_read_body:
+            try:
+                body = await request.json()
+            except ValueError:
+                return error_response(400, "Request body is not valid JSON")
+            if not isinstance(body, dict):
+                return error_response(400, "Request body must be a JSON object")
+            params.update(body)
+        session = await request_session(request)
+        refused = refuse(method, access, session, params)
+        if refused:
+            return web.json_response(refused[1], status=refused[0])
+        etag = None
+        if request.method == "GET":
+            # The ETag is taken before the query runs, so a write landing in
+            # between can only make it look older than the body, never newer
+            etag = await pool.etag(counts_holds(method, params))
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers={"ETag": etag})
+        status, body = await run_call(request.app, session, method, kind, params)
+        response = web.json_response(body, status=status)
+        if etag and status == 200:
+            response.headers["ETag"] = etag
+        return response
+
+    return handler
+
+# POST /api/batch  {"calls": [{"method": ..., "params": {...}, "etag": ...}, ...]}
+# Calls run in order, each checked like its own route; each gets
+# {"status": ..., "body": ...} and GET-style calls also an "etag" (status
+# 304 with no body when the given etag matches). Logging in is only done
+# through /api/login, where failures are counted.
+def make_batch_handler(pool):
+    async def handler(request):
+        try:
+            calls = (await request.json())["calls"]
+        except (ValueError, KeyError, TypeError):
+            return error_response(400, "Expected a JSON object with a \"calls\" list")
+        session = await request_session(request)
+        results = []
+        for call in calls:
+            method = call.get("method") if isinstance(call, dict) else None
+            if method not in ROUTE_KINDS or method == "authenticate":
+                results.append({"status": 400, "body": {"error": f"Unknown method: {method}"}})
+                continue
+            http_method, kind, access = ROUTE_KINDS[method]
+            params = call.get("params") or {}
+            if not isinstance(params, dict):
+                results.append({"status": 400, "body": {"error": "params must be a JSON object"}})
+                continue
+            refused = refuse(method, access, session, params)
+            if refused:
+                results.append({"status": refused[0], "body": refused[1]})
+                continue
+            result = {}
+            if http_method == "GET":
+                result["etag"] = await pool.etag(counts_holds(method, params))
+                if call.get("etag") == result["etag"]:
+                    result["status"] = 304
+                    results.append(result)
+                    continue
+            result["status"], result["body"] = await run_call(request.app, session, method, kind, params)
+            results.append(result)
+        return web.json_response({"results": results})
+
+    return handler
+
+# POST /api/login. Logins run side by side; SessionManager.login counts
+# each attempt before asking the database, so a burst of guesses can't all
+# get past the failure count.
+def make_login_handler(pool, sessions):
+    async def handler(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return error_response(400, "Request body is not valid JSON")
+        if not isinstance(body, dict) or not isinstance(body.get("username"), str) \
+                or not isinstance(body.get("password"), str):
+            return error_response(400, "Expected a JSON object with \"username\" and \"password\"")
+        try:
+            session = await pool.run(sessions.login, body["username"], body["password"],
+                                     bool(body.get("admin", False)), request.remote)
+        except RateLimitedError as e:
+            return web.json_response({"error": str(e), "retry_after": e.retry_after}, status=429,
+                                     headers={"Retry-After": str(e.retry_after)})
+        except pool.backend.Error as e:
+            shelfwise_metrics.DB_ERRORS.inc("authenticate")
+            return error_response(500, str(e))
+        if session is None:
+            shelfwise_metrics.FAILED_LOGINS.inc()
+            return web.json_response({"result": None})
+        shelfwise_metrics.LOGINS.inc()
+        return web.json_response({"result": session.user_id, "token": session.token,
+                                  "permissions": int(session.permissions)})
+
+    return handler
+
+# POST /api/logout, with the session's token
+async def logout_handler(request):
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme == "Bearer" and token:
+        request.app["sessions"].revoke(token.strip())
+    return web.json_response({"result": None})
+
+async def metrics_handler(request):
+    return web.Response(body=shelfwise_metrics.REGISTRY.render().encode("utf-8"),
+                        headers={"Content-Type": shelfwise_metrics.CONTENT_TYPE})
+
+# database: path to a sqlite file or a postgresql:// URL (see shelfwise_db.open_backend);
+# audit: path to the audit log, shelfwise_audit.db by default, or False for none
+def create_app(database=None, readers=4, audit=None):
+    app = web.Application()
+    # Readers, the writer and the ETag connection each hold one connection
+    backend = open_backend(database, threaded=True, max_connections=readers + 2)
+    pool = StorePool(backend, readers)
+    app["pool"] = pool
+    # Sessions of every client; each login opens its own
+    sessions = app["sessions"] = SessionManager(shared=True)
+    app["audit"] = None
+    if audit is not False:
+        # Entries that can't be saved are kept and tried again
+        app["audit"] = shelfwise_audit.AuditLog(
+            audit, on_error=lambda message: print(f"Audit log: {message}", file=sys.stderr))
+    for http_method, path, method, kind, access in API_ROUTES:
+        if method == "authenticate":
+            app.router.add_route(http_method, path, make_login_handler(pool, sessions))
+        else:
+            app.router.add_route(http_method, path, make_handler(pool, method, kind, access))
+    app.router.add_post("/api/logout", logout_handler)
+    app.router.add_post("/api/batch", make_batch_handler(pool))
+    app.router.add_get("/metrics", metrics_handler)
+
+    # Remove deleted rows in small batches on the writer, between requests
+    async def purge_deleted(pool):
+        batch = ShelfwiseStore.PURGE_BATCH
+        while True:
+            try:
+                removed = (await pool.write("purge_deleted", {"batch": batch}))["result"]
+            except pool.backend.Error:
+                removed = 0
+            await asyncio.sleep(PURGE_BUSY_INTERVAL if removed == batch else PURGE_INTERVAL)
+
+    # Give lapsed holds back to the shop
+    async def sweep_holds(pool):
+        while True:
+            try:
+                await pool.write("sweep_holds", {})
+            except pool.backend.Error:
+                pass
+            await asyncio.sleep(HOLD_SWEEP_INTERVAL)
+
+    # Count "also hold" neighbours again for items whose holders changed
+    async def update_neighbours(pool):
+        batch = ShelfwiseStore.NEIGHBOURS_BATCH
+        while True:
+            try:
+                done = (await pool.write("update_neighbours", {"batch": batch}))["result"]
+            except pool.backend.Error:
+                done = 0
+            await asyncio.sleep(NEIGHBOURS_BUSY_INTERVAL if done == batch else NEIGHBOURS_INTERVAL)
+
+    async def start_purger(app):
+        app["purger"] = asyncio.create_task(purge_deleted(pool))
+        app["sweeper"] = asyncio.create_task(sweep_holds(pool))
+        app["neighbours"] = asyncio.create_task(update_neighbours(pool))
+
+    async def close_pool(app):
+        app["purger"].cancel()
+        app["sweeper"].cancel()
+        app["neighbours"].cancel()
+        pool.close()
+        if app["audit"]:
+            app["audit"].close()
+
+    app.on_startup.append(start_purger)
+    app.on_cleanup.append(close_pool)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Shelfwise database over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--db", default=shelfwise_db.DB_NAME, help="path to shelfwise.db or a postgresql:// URL")
+    parser.add_argument("--readers", type=int, default=4, help="number of reader connections")
+    parser.add_argument("--audit", default=shelfwise_audit.AUDIT_DB, help="path to the audit log")
+    args = parser.parse_args()
+
+    open_backend(args.db).init_schema()
+    web.run_app(create_app(args.db, args.readers, args.audit), host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+import collections
+import hashlib
+import hmac
+import math
+import secrets
+import socket
+import threading
+import time
+
+from shelfwise_db import Permission
+
+# Logins on this terminal. A successful login opens a session: an opaque
+# token for the user, kept in memory until SESSION_TTL seconds after the
+# user last entered their password here, but never more than
+# SESSION_MAX_AGE after it opened, with what the user's role allows (read
+# once, when it opens). Logging in again on the same terminal while the
+# session is open is checked against it, the password only as an HMAC under
+# a key that never leaves this process; the database is asked just for the
+# user's login stamp (ShelfwiseStore.get_login_stamp), one row by its key.
+# If the user has since been deleted, or their role, username or password
+# changed anywhere, the session ends and the login goes to the database.
+#
+# Failed logins are counted in a sliding window, per username and for the
+# whole terminal. Once either has reached its limit, further attempts are
+# refused before they reach the database until the oldest failure in the
+# window has aged out.
+#
+# shelfwise_server keeps the sessions of all its clients in one shared
+# SessionManager, with the client's address in place of the terminal: there
+# every login opens a session of its own, and none is reused; instead each
+# session's stamp is checked again once it is RECHECK_INTERVAL seconds old.
+# Neither is one reused on a terminal logged in through the server
+# (RemoteStore), which holds the session the server opened.
+
+SESSION_TTL = 8 * 3600
+SESSION_MAX_AGE = 24 * 3600
+RECHECK_INTERVAL = 30
+ATTEMPT_WINDOW = 300
+MAX_USER_ATTEMPTS = 5
+MAX_TERMINAL_ATTEMPTS = 20
+
+class RateLimitedError(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many failed logins. Try again in {retry_after} seconds.")
+        # Whole seconds until the next attempt is allowed
+        self.retry_after = retry_after
+
+# At most max_attempts failures per key in any window seconds
+class RateLimiter:
+    def __init__(self, max_attempts, window=ATTEMPT_WINDOW, clock=time.monotonic):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.clock = clock
+        # key -> times of its failures in the window, oldest first
+        self.failures = {}
+        # Keys are dropped when seen again after their window, and the rest
+        # once per window, so a stream of usernames that fail once each
+        # doesn't pile up
+        self.pruned = clock()
+
+    def recent(self, key, now):
+        times = self.failures.get(key)
+        if times is None:
+            return None
+        while times and times[0] <= now - self.window:
+            times.popleft()
+        if not times:
+            del self.failures[key]
+            return None
+        return times
+
+    # Seconds until key may try again, 0 if it may now
+    def retry_after(self, key):
+        now = self.clock()
+        times = self.recent(key, now)
+        if times is None or len(times) < self.max_attempts:
+            return 0
+        return times[-self.max_attempts] + self.window - now
+
+    def failed(self, key, now=None):
+        now = self.clock() if now is None else now
+        if now - self.pruned >= self.window:
+            self.prune(now)
+        times = self.recent(key, now)
+        if times is None:
+            times = self.failures[key] = collections.deque()
+        times.append(now)
+
+    def clear(self, key):
+        self.failures.pop(key, None)
+
+    # Take back the failure recorded for key at now (an attempt that
+    # turned out not to be one)
+    def forgive(self, key, now):
+        times = self.failures.get(key)
+        if times and now in times:
+            times.remove(now)
+            if not times:
+                del self.failures[key]
+
+    # Drop every key whose failures have all aged out
+    def prune(self, now):
+        for key in list(self.failures):
+            self.recent(key, now)
+        self.pruned = now
+
+class Session:
+    __slots__ = ("token", "user_id", "username", "admin", "permissions", "digest", "expires", "stamp",
+                 "opened", "checked")
+
+    def __init__(self, token, user_id, username, admin, permissions, digest, expires, stamp=None, opened=0):
+        self.token = token
+        self.user_id = user_id
+        self.username = username
+        self.admin = admin
+        # Permission bits of the user's role
+        self.permissions = permissions
+        # HMAC of the password that opened it; None makes the next login
+        # on this terminal go to the database
+        self.digest = digest
+        self.expires = expires
+        # The user's login stamp when it opened; None if it was opened
+        # without one, and can't be reused
+        self.stamp = stamp
+        self.opened = opened
+        # When the stamp was last found unchanged
+        self.checked = opened
+
+class SessionManager:
+    def __init__(self, ttl=SESSION_TTL, terminal=None, clock=time.monotonic, shared=False,
+                 max_age=SESSION_MAX_AGE):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.terminal = terminal or socket.gethostname()
+        self.clock = clock
+        self.shared = shared
+        # The server logs in on worker threads while requests look up sessions
+        self.lock = threading.RLock()
+        self.key = secrets.token_bytes(32)
+        # token -> Session
+        self.sessions = {}
+        # (username, admin) -> token of the user's open session
+        self.by_user = {}
+        self.users = RateLimiter(MAX_USER_ATTEMPTS, clock=clock)
+        self.terminals = RateLimiter(MAX_TERMINAL_ATTEMPTS, clock=clock)
+
+    def digest(self, username, password):
+        return hmac.new(self.key, f"{username}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+
+    # The session for username and password, reusing the one open on this
+    # terminal if the password matches it, or None for wrong credentials.
+    # terminal is where the attempt comes from (this one by default).
+    # Raises RateLimitedError without asking the store after too many
+    # failures; store errors are passed on.
+    #
+    # The attempt is counted as a failure before the store is asked and
+    # taken back if it succeeds (or the store fails), so logins can run at
+    # the same time without a burst of guesses all getting past the limit.
+    def login(self, store, username, password, admin=False, terminal=None):
+        terminal = terminal or self.terminal
+        with self.lock:
+            retry_after = max(self.users.retry_after(username), self.terminals.retry_after(terminal))
+            if retry_after:
+                raise RateLimitedError(math.ceil(retry_after))
+            attempt = self.clock()
+            self.users.failed(username, attempt)
+            self.terminals.failed(terminal, attempt)
+        try:
+            session = self.check(store, username, password, admin)
+        except Exception:
+            # A store error says nothing about the password
+            with self.lock:
+                self.users.forgive(username, attempt)
+                self.terminals.forgive(terminal, attempt)
+            raise
+        if session is not None:
+            with self.lock:
+                self.users.clear(username)
+                self.terminals.forgive(terminal, attempt)
+        return session
+
+    # login without the failure counts
+    def check(self, store, username, password, admin):
+        digest = self.digest(username, password)
+        if not self.shared and not getattr(store, "keeps_sessions", False):
+            session = self.get(self.by_user.get((username, admin)))
+            if session and session.digest is not None and hmac.compare_digest(session.digest, digest) \
+                    and self.verify(store, session):
+                session.expires = min(self.clock() + self.ttl, session.opened + self.max_age)
+                return session
+        user_id = store.authenticate(username, password, admin=admin)
+        if user_id is None:
+            return None
+        return self.issue(user_id, username, admin, Permission(store.get_permissions(user_id)), digest,
+                          store.get_login_stamp(user_id))
+
+    # Whether the user is as they were when session opened (see
+    # get_login_stamp); if not, the session ends. Store errors are passed on.
+    def verify(self, store, session):
+        stamp = store.get_login_stamp(session.user_id)
+        with self.lock:
+            if session.stamp is not None and stamp is not None and tuple(stamp) == session.stamp:
+                session.checked = self.clock()
+                return True
+            self.revoke(session.token)
+            return False
+
+    # Whether session is due to be verified again (on the server)
+    def due(self, session):
+        return self.clock() - session.checked >= RECHECK_INTERVAL
+
+    # A new session, replacing any the user had open here
+    def issue(self, user_id, username, admin=False, permissions=Permission(0), digest=None, stamp=None):
+        with self.lock:
+            self.evict()
+            if not self.shared:
+                old = self.by_user.get((username, admin))
+                if old:
+                    self.sessions.pop(old, None)
+            now = self.clock()
+            session = Session(secrets.token_urlsafe(32), user_id, username, admin, permissions, digest,
+                              now + min(self.ttl, self.max_age), tuple(stamp) if stamp is not None else None, now)
+            self.sessions[session.token] = session
+            if not self.shared:
+                self.by_user[(username, admin)] = session.token
+            return session
+
+    # The open session with token, or None once it has expired
+    def get(self, token):
+        with self.lock:
+            session = self.sessions.get(token)
+            if session and session.expires <= self.clock():
+                self.revoke(token)
+                return None
+            return session
+
+    def revoke(self, token):
+        with self.lock:
+            session = self.sessions.pop(token, None)
+            if session and self.by_user.get((session.username, session.admin)) == token:
+                del self.by_user[(session.username, session.admin)]
+
+    def evict(self):
+        now = self.clock()
+        with self.lock:
+            for token in [token for token, session in self.sessions.items() if session.expires <= now]:
+                self.revoke(token)
+
+    # After the user's password, username or role changed: their sessions
+    # stay open, but logging in again checks the database
+    def require_password(self, user_id):
+        with self.lock:
+            for session in self.sessions.values():
+                if session.user_id == user_id:
+                    session.digest = None
+
+    # After the user was deleted
+    def revoke_user(self, user_id):
+        with self.lock:
+            for token in [token for token, session in self.sessions.items() if session.user_id == user_id]:
+                self.revoke(token)
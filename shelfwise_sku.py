@@ -0,0 +1,62 @@
+import time
+
+# Barcodes (Items.SKU) for the front desk: scanning one picks the item.
+#
+# SkuIndex keeps SKU -> (ItemID, CollectionID) for every item in a dict,
+# read in one query the first time it is needed, so resolving a scan is a
+# dict lookup rather than a round trip. A SKU the dict doesn't know (given
+# on another terminal since) is looked up in the database and remembered.
+# Call invalidate() after SKUs change here; the admin pages also do it
+# whenever they refresh, which picks up SKUs moved or removed elsewhere.
+
+def normalize(code):
+    # Scanners can add a prefix or suffix of whitespace or control characters
+    return code.strip()
+
+class SkuIndex:
+    def __init__(self, store):
+        self.store = store
+        # sku -> (item_id, collection_id); None until first used
+        self.items = None
+
+    def invalidate(self):
+        self.items = None
+
+    # (item_id, collection_id) of the item with the code, or None. With
+    # cached_only, codes the dict doesn't know aren't looked up (for input
+    # that may not be a whole code yet). Raises store.Error like the store.
+    def lookup(self, code, cached_only=False):
+        sku = normalize(code)
+        if not sku:
+            return None
+        if self.items is None:
+            self.items = {sku: (item_id, collection_id) for sku, item_id, collection_id in self.store.list_skus()}
+        found = self.items.get(sku)
+        if found is None and not cached_only:
+            row = self.store.find_item_by_sku(sku)
+            if row:
+                found = self.items[sku] = (row[0], row[1])
+        return found
+
+# Keyboard-wedge scanners type the code as a burst of key presses, usually
+# followed by Enter. Feed edited() every change to the input; it says
+# whether the text so far came in as one burst, i.e. no gap between key
+# presses was longer than gap seconds. Typing by hand is slower, so a
+# half-typed code isn't taken for a scanned one.
+class ScanBurst:
+    GAP = 0.05
+
+    def __init__(self, gap=GAP, clock=time.monotonic):
+        self.gap = gap
+        self.clock = clock
+        self.last = None
+        self.typed = False
+
+    def edited(self, text):
+        now = self.clock()
+        if len(text) <= 1:
+            self.typed = False
+        elif self.last is None or now - self.last > self.gap:
+            self.typed = True
+        self.last = now
+        return bool(text) and not self.typed
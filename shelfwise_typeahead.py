@@ -0,0 +1,130 @@
+import bisect
+import collections
+
+from shelfwise_dedupe import normalize, trigrams
+
+# Typeahead for pickers too long for a combo box (every collector, every
+# item of a collection): what has been typed so far is matched against an
+# in-memory index and only the best LIMIT entries are shown.
+#
+# Entries are matched on their normalized text (see shelfwise_dedupe), best
+# first:
+#   1. the text starts with what was typed ("harry p" -> "Harry Potter 1")
+#   2. every typed word starts a word of the text ("pot har" -> the same)
+#   3. loosely, by letter trigrams, for typos ("hary poter")
+# 1 and 2 come from sorted lists searched with bisect, so they don't get
+# slower with more entries. For 3, an inverted index (trigram -> entries)
+# gives the entries sharing the typed text's rarest trigrams, and the ones
+# sharing the most are checked against all of it.
+
+LIMIT = 20
+# Lowest share of the typed text's trigrams a loose match has
+LOOSE = 0.6
+# Entries counted from the inverted index at most (more if the rarest
+# trigram alone has more), and how many of those are checked
+POSTINGS = 20000
+CANDIDATES = 200
+# Just past any character, for the end of a prefix's range
+LAST = "\U0010ffff"
+
+class Typeahead:
+    # entries: (value, label, text) with label shown and text matched
+    # (the label if None)
+    def __init__(self, entries=()):
+        self.values = []
+        self.labels = []
+        # value -> index
+        self.positions = {}
+        self.keys = []
+        self.words = []
+        starts = []
+        words = []
+        # trigram -> [index, ...]
+        self.grams = collections.defaultdict(list)
+        for value, label, text in entries:
+            index = len(self.values)
+            key = normalize(label if text is None else text)
+            self.positions[value] = index
+            self.values.append(value)
+            self.labels.append(label)
+            self.keys.append(key)
+            self.words.append(key.split())
+            starts.append((key, index))
+            words.extend((word, index) for word in set(self.words[index]))
+            for gram in trigrams(key):
+                self.grams[gram].append(index)
+        # (text, index) and (word, index), sorted for bisect
+        self.starts = sorted(starts)
+        self.word_index = sorted(words)
+
+    def __len__(self):
+        return len(self.values)
+
+    # The label of value, or None if there is no such entry
+    def label(self, value):
+        index = self.positions.get(value)
+        return None if index is None else self.labels[index]
+
+    # [(value, label), ...] for the best matches of text, at most limit.
+    # With nothing typed, the first entries in order.
+    def matches(self, text, limit=LIMIT):
+        query = normalize(text)
+        found = []
+        seen = set()
+
+        def add(indexes):
+            for index in indexes:
+                if len(found) >= limit:
+                    return
+                if index not in seen:
+                    seen.add(index)
+                    found.append(index)
+
+        # Everything starts with ""
+        add(self._starts_with(query))
+        if query and len(found) < limit:
+            add(self._word_matches(query.split()))
+        if len(query) >= 3 and len(found) < limit:
+            add(self._loose_matches(query, limit))
+        return [(self.values[index], self.labels[index]) for index in found]
+
+    def _starts_with(self, query):
+        for position in range(bisect.bisect_left(self.starts, (query,)), len(self.starts)):
+            key, index = self.starts[position]
+            if not key.startswith(query):
+                return
+            yield index
+
+    # Entries where each token starts a word, scanning the rarest token's
+    # words, in order
+    def _word_matches(self, tokens):
+        ranges = [(bisect.bisect_left(self.word_index, (token,)), bisect.bisect_left(self.word_index, (token + LAST,)))
+                  for token in tokens]
+        low, high = min(ranges, key=lambda bounds: bounds[1] - bounds[0])
+        for position in range(low, high):
+            index = self.word_index[position][1]
+            words = self.words[index]
+            if all(any(word.startswith(token) for word in words) for token in tokens):
+                yield index
+
+    def _loose_matches(self, query, limit):
+        # What was typed is usually the start of a word, so it isn't padded
+        # at the end like the entries are
+        padded = f"  {query}"
+        wanted = {padded[i:i + 3] for i in range(len(padded) - 2)}
+        shared = collections.Counter()
+        budget = POSTINGS
+        for indexes in sorted((self.grams.get(gram, ()) for gram in wanted), key=len):
+            if not indexes:
+                continue
+            if shared and len(indexes) > budget:
+                break
+            shared.update(indexes)
+            budget -= len(indexes)
+        best = []
+        for index, count in shared.most_common(CANDIDATES):
+            score = len(wanted & trigrams(self.keys[index])) / len(wanted)
+            if score >= LOOSE:
+                # Shorter texts first among equal scores
+                best.append((-score, len(self.keys[index]), index))
+        return [index for score, length, index in sorted(best)[:limit]]
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shelfwise_db
+
+@pytest.fixture
+def store(tmp_path):
+    backend = shelfwise_db.open_backend(str(tmp_path / "shelfwise.db"))
+    backend.init_schema()
+    store = backend.open_store()
+    yield store
+    store.close()
+
+@pytest.fixture
+def users(store):
+    return [store.add_user(name, "", name.lower(), "pw", "", "2024-01-01") for name in ("Ann", "Ben", "Cat")]
+
+# A hold of no units, or fewer, would hand other collectors' held stock on
+@pytest.mark.parametrize("quantity", [0, -5])
+def test_hold_needs_units(store, users, quantity):
+    item_id = store.add_item(1, "Dune", "", 9.5, 5)
+    store.hold_stock(users[0], item_id, 5)
+    with pytest.raises(ValueError):
+        store.hold_stock(users[1], item_id, quantity)
+    with pytest.raises(shelfwise_db.OutOfStockError):
+        store.checkout(users[2], [(item_id, 5)])
+    assert store.checkout(users[0], [(item_id, 5)]) == 5
+
+def test_holds_table_checks_quantity(store, users):
+    item_id = store.add_item(1, "Dune", "", 9.5, 5)
+    with pytest.raises(store.IntegrityError):
+        with store.transaction() as c:
+            c.execute("INSERT INTO Holds (UserID, ItemID, Quantity, Expires) VALUES (?, ?, ?, ?)",
+                      (users[0], item_id, -1, shelfwise_db.timestamp(60)))
+
+def test_shop_view_without_user_counts_every_hold(store, users):
+    item_id = store.add_item(1, "Dune", "", 9.5, 5)
+    store.hold_stock(users[0], item_id, 3)
+    available = {view: dict((row[0], row[4]) for row in store.list_view("shop", user_id=user_id))
+                 for view, user_id in (("anyone", None), ("holder", users[0]))}
+    assert available == {"anyone": {item_id: 2}, "holder": {item_id: 5}}
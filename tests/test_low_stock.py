@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shelfwise_db
+
+@pytest.fixture
+def store(tmp_path):
+    backend = shelfwise_db.open_backend(str(tmp_path / "shelfwise.db"))
+    backend.init_schema()
+    store = backend.open_store()
+    yield store
+    store.close()
+
+def low_items(store):
+    return [row[0] for row in store.list_low_stock()]
+
+# Editing an item already on the low-stock list, while it stays there, used
+# to fail the LowStock trigger under the ItemStock upsert
+def test_edit_item_already_low(store):
+    item_id = store.add_item(1, "Dune", "", 9.5, 10)
+    store.set_reorder_level(item_id, 5)
+    store.update_item(item_id, 1, "Dune", "", 9.5, 3)
+    store.update_item(item_id, 1, "Dune", "", 9.5, 2)
+    store.set_reorder_level(item_id, 6)
+    assert low_items(store) == [item_id]
+    store.update_item(item_id, 1, "Dune", "", 9.5, 7)
+    assert low_items(store) == []
+
+def test_merge_items_already_low(store):
+    keep_id = store.add_item(1, "Dune", "", 9.5, 1)
+    drop_id = store.add_item(1, "Dune (copy)", "", 9.5, 1)
+    store.set_reorder_level(keep_id, 5)
+    store.set_reorder_level(drop_id, 5)
+    store.merge_items(keep_id, drop_id)
+    assert low_items(store) == [keep_id]
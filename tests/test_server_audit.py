@@ -0,0 +1,65 @@
+import functools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shelfwise_audit
+import shelfwise_db
+import shelfwise_server
+
+class Session:
+    user_id = 1
+
+# Keeps what would be written, cut down the way the log does it
+class Entries:
+    def __init__(self):
+        self.entries = []
+
+    def record(self, actor_id, action, target_table=None, target_id=None, before=None, after=None):
+        before, after = shelfwise_audit.changes(before, after)
+        self.entries.append((action, target_table, target_id, before, after))
+
+@pytest.fixture
+def store(tmp_path):
+    backend = shelfwise_db.open_backend(str(tmp_path / "shelfwise.db"))
+    backend.init_schema()
+    store = backend.open_store()
+    yield store
+    store.close()
+
+# A write as the server makes it, on the writer with the audit log
+def write(store, log, method, **params):
+    audit = functools.partial(shelfwise_server.audit_write, log, Session(), method, params)
+    return shelfwise_server.call_write(store, method, params, audit)["result"]
+
+def test_edits_record_before_and_after(store):
+    log = Entries()
+    user_id = write(store, log, "add_user", first_name="Bob", last_name="B", username="bob", password="pw",
+                    email="b@x", date_joined="2026-01-01")
+    write(store, log, "update_user", user_id=user_id, first_name="Robert", last_name="B", username="bob",
+          password="pw2", email="b@x", date_joined="2026-01-01")
+    item_id = write(store, log, "add_item", collection_id=1, name="Dune", description="", price=9.5, stock=10)
+    write(store, log, "update_item", item_id=item_id, collection_id=1, name="Dune", description="", price=12.0,
+          stock=10)
+    write(store, log, "set_reorder_level", item_id=item_id, level=3)
+    write(store, log, "delete_item", item_id=item_id)
+    assert log.entries[0] == ("add_user", "Users", user_id, None,
+                              {"FirstName": "Bob", "LastName": "B", "Username": "bob", "Email": "b@x",
+                               "DateJoined": "2026-01-01", "RoleID": shelfwise_db.ROLE_COLLECTOR})
+    assert log.entries[1] == ("update_user", "Users", user_id, {"FirstName": "Bob"},
+                              {"FirstName": "Robert", "Password": "(changed)"})
+    assert log.entries[3] == ("update_item", "Items", item_id, {"Price": 9.5}, {"Price": 12.0})
+    assert log.entries[4] == ("set_reorder_level", "Items", item_id, {"reorder_level": 0}, {"reorder_level": 3})
+    action, table, target_id, before, after = log.entries[5]
+    assert (action, target_id, after) == ("delete_item", item_id, None)
+    assert before["ItemName"] == "Dune" and before["stock_quantity"] == 10
+
+# A write that changed nothing isn't recorded
+def test_wrong_current_password_not_recorded(store):
+    log = Entries()
+    write(store, log, "update_account", user_id=1, first_name="A", last_name="B", username="admin",
+          password=None, email="", current_password="wrong")
+    assert log.entries == []
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shelfwise_db
+import shelfwise_session
+
+# Usernames that each fail once are forgotten once their window has passed
+def test_rate_limiter_forgets_old_keys():
+    now = [0.0]
+    limiter = shelfwise_session.RateLimiter(5, window=300, clock=lambda: now[0])
+    for n in range(1000):
+        limiter.failed(f"user{n}")
+    now[0] = 301
+    limiter.failed("latest")
+    assert list(limiter.failures) == ["latest"]
+
+def test_rate_limiter_still_limits():
+    now = [0.0]
+    limiter = shelfwise_session.RateLimiter(2, window=300, clock=lambda: now[0])
+    limiter.failed("bob")
+    now[0] = 200
+    limiter.failed("bob")
+    now[0] = 350
+    limiter.failed("ann")
+    assert limiter.retry_after("bob") == 0
+    limiter.failed("bob")
+    assert limiter.retry_after("bob") == 150
+
+class SlowStore:
+    def __init__(self):
+        self.asked = 0
+        self.lock = threading.Lock()
+
+    def authenticate(self, username, password, admin=False):
+        with self.lock:
+            self.asked += 1
+        time.sleep(0.05)
+        return 1 if password == "right" else None
+
+    def get_permissions(self, user_id):
+        return int(shelfwise_db.Permission.SHOP)
+
+    def get_login_stamp(self, user_id):
+        return (0, shelfwise_db.ROLE_COLLECTOR, 0)
+
+# Guesses made at the same time are counted before any of them is checked
+def test_concurrent_guesses_stop_at_the_limit():
+    sessions = shelfwise_session.SessionManager(shared=True)
+    store = SlowStore()
+    outcomes = []
+
+    def guess():
+        try:
+            outcomes.append(sessions.login(store, "bob", "wrong", terminal="10.0.0.1"))
+        except shelfwise_session.RateLimitedError:
+            outcomes.append("limited")
+
+    threads = [threading.Thread(target=guess) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.asked == shelfwise_session.MAX_USER_ATTEMPTS
+    assert outcomes.count("limited") == 20 - shelfwise_session.MAX_USER_ATTEMPTS
+
+def test_successful_login_is_not_counted():
+    sessions = shelfwise_session.SessionManager(shared=True)
+    for _ in range(shelfwise_session.MAX_USER_ATTEMPTS + 1):
+        assert sessions.login(SlowStore(), "bob", "right", terminal="10.0.0.1") is not None
+    assert not sessions.users.failures and not sessions.terminals.failures
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shelfwise_db
+
+@pytest.fixture
+def store(tmp_path):
+    backend = shelfwise_db.open_backend(str(tmp_path / "shelfwise.db"))
+    backend.init_schema()
+    store = shelfwise_db.WriteBehindStore(backend.open_store())
+    yield store
+    store.store.close()
+
+# Every edit that fails is reported, and the others are still saved
+def test_flush_reports_every_lost_edit(store):
+    ids = [store.add_item(1, name, "", 9.5, 10) for name in ("Dune", "Emma", "Ulysses")]
+    store.update_item(ids[0], 1, None, "", 9.5, 10)
+    store.update_item(ids[1], 1, "Emma", "", 12.0, 4)
+    store.update_item(ids[2], 1, None, "", 9.5, 10)
+    with pytest.raises(shelfwise_db.FlushError) as raised:
+        store.flush()
+    assert [(method, params["item_id"]) for method, params, _ in raised.value.failed] == \
+        [("update_item", ids[0]), ("update_item", ids[2])]
+    assert str(raised.value).count("update_item(") == 2
+    assert store.get_item(ids[1])[4:] == (12.0, 4)
+    assert isinstance(raised.value, store.Error)